@@ -6,12 +6,13 @@
 # remaining columns represent the number of compilations
 # for a particular optimization level.
 #
-# Usage: python3 CompTimeline.py vlogFilename
+# Usage: python3 CompTimeline.py vlogFilename [--format text|tsv|csv|jsonl|parquet] [--output prefix]
 #
 # Author: Marius Pirvu
 
 import re # for regular expressions
 import sys # for accessing parameters and exit
+import outputWriter
 
 statsGranularity = 100000 # print one entry every 100000 ms
 
@@ -26,27 +27,29 @@ knownOptLevels = {
 
 
 
-def printHeaderStats():
+def openTimelineTable(outputConfig):
     stringList = []
     for opt in knownOptLevels.keys():
         levelName = knownOptLevels[opt]
         stringList.append("\t{levelName:7s}".format(levelName=levelName))
-    print("".join(stringList))
+    columns = ["timeSec"] + [knownOptLevels[opt].strip() for opt in knownOptLevels.keys()]
+    textFormat = "{}" + "\t{:5d}" * len(knownOptLevels)
+    return outputConfig.openTable("timeline", columns, textFormat=textFormat, textHeader="".join(stringList))
 
 '''
-Print one line with stats for each defined opt level 
+Add one row with stats for each defined opt level
 '''
-def printStatsPerOptLevel(header, compPerLevel):
-    stringToPrint = header
+def printStatsPerOptLevel(table, timestampSec, compPerLevel):
+    row = [timestampSec]
     for opt in knownOptLevels.keys():
         levelName = knownOptLevels[opt]
         numComp = compPerLevel.get(levelName, 0)
-        stringToPrint += "\t{numComp:5d}".format(numComp=numComp)
-    print(stringToPrint)
-    
-        
-def parseVlog(vlog):
-    printHeaderStats()
+        row.append(numComp)
+    table.writeRow(*row)
+
+
+def parseVlog(vlog, outputConfig):
+    table = openTimelineTable(outputConfig)
     # + (cold) sun/reflect/Reflection.getCallerClass()Ljava/lang/Class; @ 00007FB21300003C-00007FB213000167 OrdinaryMethod - Q_SZ=1 Q_SZI=1 QW=2 j9m=000000000004D1D8 bcsz=2 JNI time=995us mem=[region=704 system=2048]KB compThreadID=0 CpuLoad=163%(10%avg) JvmCpu=0%
     compEndPattern  = re.compile('^\+ \(([\w\s-]+)\) (\S+) ')
     # ! (cold) java/nio/Buffer.<init>(IIII)V Q_SZ=274 Q_SZI=274 QW=275 j9m=00000000000B3970 time=99us compilationAotClassReloFailure memLimit=206574 KB freePhysicalMemory=205 MB mem=[region=64 system=2048]KB compThreadID=0
@@ -62,7 +65,7 @@ def parseVlog(vlog):
             if crtTimeMs > oldTimeMs + statsGranularity:
                 # Old interval finished, print values seen for last interval
                 timestampSec = oldTimeMs // 1000 # convert to seconds
-                printStatsPerOptLevel(str(timestampSec), compPerLevel)
+                printStatsPerOptLevel(table, timestampSec, compPerLevel)
                 # empty my hash for queue sizes because a new interval starts
                 compPerLevel = {}
                 # Update time for the new interval
@@ -76,10 +79,12 @@ def parseVlog(vlog):
                 levelName = knownOptLevels[opt]
                 # Increment the number of compilations for given opt level
                 compPerLevel[levelName] = compPerLevel.get(levelName, 0) + 1
-            
+    table.close()
+
 
 
 ###############################################
+outputConfig = outputWriter.parseOutputArgs(sys.argv)
 # Get the name of vlog
 if  len(sys.argv) < 2:
     print ("Program must have an argument: the name of the vlog\n")
@@ -89,5 +94,5 @@ if  len(sys.argv) < 2:
 vlogFileName = str(sys.argv[1])
 Vlog = open(vlogFileName, 'r', 1)
 
-parseVlog(Vlog)
+parseVlog(Vlog, outputConfig)
 
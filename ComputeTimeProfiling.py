@@ -4,10 +4,14 @@
 # so if several different methods with the same name exist in
 # the system (because of different class loaders), the script
 # mai produce incorrect results.
+#
+# Usage: python3 ComputeTimeProfiling.py vlogFilename [--format text|tsv|csv|jsonl|parquet] [--output prefix]
+#
 # Author: Marius Pirvu
 
 import re # for regular expressions
 import sys # for accessing parameters and exit
+import outputWriter
 
 profilingTimeThreshold = 2000 # ms. Method spending more than this in profiling, will be printed
 
@@ -89,26 +93,27 @@ def parseVlog(vlog, methodHash):
                     assert 'tComp' in compList[-1], "lastEntry for this method must be a compilation with start and end. Line: {l}".format(l=line)
                     compList.append({'optLevel':opt, 'tStart':ms})
 
-def printStatsHeader():
-    print("                       \tSamples\tTOTAL(sec)\tMIN(ms)\tAVG(ms)\tMAX(ms)")
-
-def printStats(name, dataList):
+def printStats(outputConfig, name, dataList):
     numSamples = len(dataList)
     sumValue = sum(dataList)
     meanValue = sumValue/numSamples
     minValue = min(dataList)
     maxValue = max(dataList)
-    print("{name}\t{n:7d}\t{s:8.0f}\t{min:7.0f}\t{avg:7.0f}\t{max:7.0f}".format(name=name, n=numSamples, s=sumValue/1000, min=minValue, avg=meanValue, max=maxValue))
+    with outputConfig.openTable("profilingStats", ["name", "samples", "totalSec", "minMs", "avgMs", "maxMs"], textFormat="{}\t{:7d}\t{:8.0f}\t{:7.0f}\t{:7.0f}\t{:7.0f}",
+                                textHeader="                       \tSamples\tTOTAL(sec)\tMIN(ms)\tAVG(ms)\tMAX(ms)") as table:
+        table.writeRow(name, numSamples, sumValue/1000, minValue, meanValue, maxValue)
 
 '''
 Walk the give method hash and for each method determine
 1. If the method remains in profiling (last successful compilation is profiling)
 2. How much time is spent in profiling mode
 If time spent in profiling exceeds the given threshold, print that method name
+(after the diagnostics about inconsistent compilation histories)
 '''
-def walkMethodHash(methodHash, profTimeThreshold):
+def walkMethodHash(methodHash, profTimeThreshold, outputConfig):
 
     timesSpentProfiling = [] # one entry for each method that spent time in profiling mode
+    longProfilingMethods = [] # (profilingTime, method) for methods that exceed the threshold
     for method in methodHash:
         compList = methodHash[method]
         prevCompWasProfiling = False
@@ -147,11 +152,13 @@ def walkMethodHash(methodHash, profTimeThreshold):
         if atLeastOneProfilingComp:
             timesSpentProfiling.append(profilingTime)
             if profilingTime > profTimeThreshold:
-                print("Spent", profilingTime, "ms profiling for method", method)
-    printStatsHeader()
-    printStats("Time-Spent-Profiling-ms", timesSpentProfiling)
+                longProfilingMethods.append((profilingTime, method))
+    with outputConfig.openTable("longProfiling", ["profilingMs", "method"], textFormat="Spent {} ms profiling for method {}") as table:
+        table.writeRows(longProfilingMethods)
+    printStats(outputConfig, "Time-Spent-Profiling-ms", timesSpentProfiling)
 
 
+outputConfig = outputWriter.parseOutputArgs(sys.argv)
 # Get the name of vlog
 if  len(sys.argv) < 2:
     print ("Program must have an argument: the name of the vlog\n")
@@ -162,4 +169,4 @@ vlogFileName = str(sys.argv[1])
 Vlog = open(vlogFileName, 'r', 1)
 methodHash = {}
 parseVlog(Vlog, methodHash)
-walkMethodHash(methodHash, profilingTimeThreshold)
+walkMethodHash(methodHash, profilingTimeThreshold, outputConfig)
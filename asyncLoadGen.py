@@ -0,0 +1,279 @@
+# Built-in HTTP/1.1 load generator based on asyncio, as an alternative to the JMeter and
+# wrk containers. Every connection is kept alive and reused for all its requests.
+# Two modes:
+#  - closed-loop (rate=0): each of the `numConnections` clients sends a request, waits for
+#    the response and for `thinkTime` ms, then sends the next one
+#  - open-loop (rate>0): requests are issued at a constant arrival rate, independent of the
+#    response times, and served by a pool of `numConnections` connections. The latency of a
+#    request is measured from the time it was scheduled, not from the time it was sent, so the
+#    queueing caused by a slow server is included (no coordinated omission).
+# High rates can be spread over several worker processes (`numProcesses`), each running its
+# own event loop with a share of the connections and of the rate; their results are merged.
+# The result contains the throughput, the number of completed requests for every second
+# of the run and an HDR histogram of the latencies (see latencyHistogram.py).
+# For testing, the script can also start a stub HTTP server that answers every request with 200.
+#
+# Usage: python3 asyncLoadGen.py url durationSec [--connections N] [--rate requestsPerSec] [--processes P] [--thinkTime ms]
+#        python3 asyncLoadGen.py --stub port [--delay ms]
+#
+# Author: Marius Pirvu
+
+import asyncio
+import logging
+import math
+import multiprocessing
+import sys # for accessing parameters and exit
+import time
+import urllib.parse
+import latencyHistogram
+
+################## Configuration #####################
+drainTime = 5.0 # seconds to wait for the responses still in flight at the end of the run
+reconnectDelay = 0.1 # seconds to wait before reconnecting after a connection error
+#######################################################
+
+
+class LoadResult:
+    '''
+    Latency histogram (microseconds), completed requests per second and number of errors
+    '''
+    def __init__(self, duration):
+        self.duration = duration
+        self.histogram = latencyHistogram.LatencyHistogram()
+        self.perSecond = [0] * (math.ceil(duration + drainTime) + 1)
+        self.numErrors = 0
+
+    def merge(self, other):
+        self.histogram.merge(other.histogram)
+        self.perSecond = [a + b for a, b in zip(self.perSecond, other.perSecond)]
+        self.numErrors += other.numErrors
+
+    def throughput(self):
+        return self.histogram.totalCount / self.duration
+
+    '''
+    Completed requests per second; the seconds after the end of the run are dropped
+    '''
+    def throughputSeries(self):
+        return self.perSecond[:math.ceil(self.duration)]
+
+    def printSummary(self):
+        print("Throughput={thr:9.1f}/s  Requests={n}  Errors={e}".format(thr=self.throughput(), n=self.histogram.totalCount, e=self.numErrors))
+        print("Latency: " + self.histogram.formatPercentiles())
+        print("Per second:", " ".join(str(count) for count in self.throughputSeries()))
+
+
+class Connection:
+    '''
+    A keep-alive HTTP/1.1 connection that reconnects when the server closes it
+    '''
+    def __init__(self, host, port, request):
+        self.host = host
+        self.port = port
+        self.request = request
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    '''
+    Send the request and read the whole response. Returns the HTTP status code
+    '''
+    async def get(self):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(self.request)
+        statusLine = await self.reader.readline()
+        if not statusLine:
+            raise ConnectionResetError("Connection closed by the server")
+        status = int(statusLine.split()[1])
+        contentLength = 0
+        chunked = False
+        keepAlive = not statusLine.startswith(b"HTTP/1.0")
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, sep, value = line.partition(b":")
+            name = name.strip().lower()
+            value = value.strip().lower()
+            if name == b"content-length":
+                contentLength = int(value)
+            elif name == b"transfer-encoding":
+                chunked = b"chunked" in value
+            elif name == b"connection":
+                keepAlive = value == b"keep-alive" or (keepAlive and value != b"close")
+        if chunked:
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2) # data and CRLF; the last chunk has size 0
+                if size == 0:
+                    break
+        elif contentLength:
+            await self.reader.readexactly(contentLength)
+        if not keepAlive:
+            await self.close()
+        return status
+
+
+class LoadGenerator:
+    def __init__(self, url, duration, numConnections, rate=0, thinkTime=0):
+        parsedUrl = urllib.parse.urlsplit(url)
+        self.host = parsedUrl.hostname
+        self.port = parsedUrl.port or 80
+        path = (parsedUrl.path or "/") + ("?" + parsedUrl.query if parsedUrl.query else "")
+        self.request = "GET {p} HTTP/1.1\r\nHost: {h}\r\nConnection: keep-alive\r\n\r\n".format(p=path, h=parsedUrl.netloc).encode()
+        self.duration = duration
+        self.numConnections = numConnections
+        self.rate = rate
+        self.thinkTime = thinkTime / 1000.0
+        self.result = LoadResult(duration)
+
+    '''
+    Send one request and record its latency, measured from `startTime` (time.monotonic())
+    '''
+    async def issue(self, connection, startTime):
+        try:
+            status = await connection.get()
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+            logging.debug("Request failed: {e}".format(e=e))
+            self.result.numErrors += 1
+            await connection.close()
+            await asyncio.sleep(reconnectDelay)
+            return
+        endTime = time.monotonic()
+        if status >= 400:
+            self.result.numErrors += 1
+            return
+        self.result.histogram.recordValue((endTime - startTime) * 1e6)
+        second = int(endTime - self.startTime)
+        if second < len(self.result.perSecond):
+            self.result.perSecond[second] += 1
+
+    async def closedLoopClient(self):
+        connection = Connection(self.host, self.port, self.request)
+        while time.monotonic() < self.endTime:
+            await self.issue(connection, time.monotonic())
+            if self.thinkTime:
+                await asyncio.sleep(self.thinkTime)
+        await connection.close()
+
+    async def openLoopClient(self, scheduled):
+        connection = Connection(self.host, self.port, self.request)
+        while True:
+            intendedTime = await scheduled.get()
+            if intendedTime is None:
+                break
+            await self.issue(connection, intendedTime)
+        await connection.close()
+
+    '''
+    Put the intended start times of the requests in the queue, at a constant rate
+    '''
+    async def scheduleRequests(self, scheduled):
+        interval = 1.0 / self.rate
+        i = 0
+        while True:
+            intendedTime = self.startTime + i * interval
+            if intendedTime >= self.endTime:
+                break
+            delay = intendedTime - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            scheduled.put_nowait(intendedTime)
+            i += 1
+        for c in range(self.numConnections):
+            scheduled.put_nowait(None)
+
+    async def run(self):
+        self.startTime = time.monotonic()
+        self.endTime = self.startTime + self.duration
+        if self.rate > 0:
+            scheduled = asyncio.Queue()
+            clients = [self.openLoopClient(scheduled) for c in range(self.numConnections)]
+            clients.append(self.scheduleRequests(scheduled))
+        else:
+            clients = [self.closedLoopClient() for c in range(self.numConnections)]
+        try:
+            await asyncio.wait_for(asyncio.gather(*clients), self.duration + drainTime)
+        except asyncio.TimeoutError:
+            logging.warning("Some requests were still in flight {d} sec after the end of the load".format(d=drainTime))
+        return self.result
+
+
+def runLoadInProcess(args):
+    return asyncio.run(LoadGenerator(*args).run())
+
+
+'''
+Apply load on `url` for `duration` seconds; open-loop with `rate` requests/sec, or closed-loop when rate is 0.
+The connections and the rate are divided among `numProcesses` worker processes. Returns a LoadResult
+'''
+def runLoad(url, duration, numConnections, rate=0, numProcesses=1, thinkTime=0):
+    numProcesses = max(min(numProcesses, numConnections), 1)
+    if numProcesses == 1:
+        return runLoadInProcess((url, duration, numConnections, rate, thinkTime))
+    args = [(url, duration, numConnections // numProcesses + (1 if p < numConnections % numProcesses else 0), rate / numProcesses, thinkTime)
+            for p in range(numProcesses)]
+    with multiprocessing.Pool(numProcesses) as pool:
+        results = pool.map(runLoadInProcess, args)
+    for result in results[1:]:
+        results[0].merge(result)
+    return results[0]
+
+
+'''
+Stub HTTP server for testing: answers every request with "200 OK" after `delay` ms
+'''
+async def runStubServer(port, delay=0):
+    async def handle(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                while line not in (b"\r\n", b"\n", b""): # skip the headers
+                    line = await reader.readline()
+                if delay:
+                    await asyncio.sleep(delay / 1000.0)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nContent-Length: 2\r\n\r\nOK")
+                await writer.drain()
+        except OSError:
+            pass
+        writer.close()
+
+    server = await asyncio.start_server(handle, "0.0.0.0", port)
+    async with server:
+        await server.serve_forever()
+
+
+def parseOptions(argv, options):
+    i = 1
+    while i < len(argv):
+        if argv[i] in options and i + 1 < len(argv):
+            options[argv[i]] = float(argv[i + 1])
+            del argv[i:i + 2]
+        else:
+            i += 1
+    return options
+
+
+if __name__ == "__main__":
+    options = parseOptions(sys.argv, {"--connections": 10, "--rate": 0, "--processes": 1, "--thinkTime": 0, "--delay": 0})
+    if len(sys.argv) == 3 and sys.argv[1] == "--stub":
+        asyncio.run(runStubServer(int(sys.argv[2]), options["--delay"]))
+    elif len(sys.argv) == 3:
+        result = runLoad(sys.argv[1], float(sys.argv[2]), int(options["--connections"]), rate=options["--rate"],
+                         numProcesses=int(options["--processes"]), thinkTime=options["--thinkTime"])
+        result.printSummary()
+    else:
+        print("Usage: python3 asyncLoadGen.py url durationSec [--connections N] [--rate requestsPerSec] [--processes P] [--thinkTime ms]")
+        print("       python3 asyncLoadGen.py --stub port [--delay ms]")
+        sys.exit(-1)
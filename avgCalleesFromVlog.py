@@ -1,13 +1,16 @@
 # Read a vlog and compute the average number of callees inlined
+#
+# Usage: python3 avgCalleesFromVlog.py vlogFilename [--format text|tsv|csv|jsonl|parquet] [--output prefix]
 
 import re # for regular expressions
 import sys # for number of arguments
+import outputWriter
 
-def computeAverageInlined(filePath):
+def computeAverageInlined(filePath, outputConfig):
     totalInlined = 0
     count = 0
 
-    with open(filePath, 'r') as file:
+    with open(filePath, 'r') as file, outputConfig.openTable("largeInlines", ["numCallees", "line"], textFormat="{1}") as table:
         pattern = re.compile("^#INL:\s+(\d+) methods inlined into")
         for line in file:
             line = line.strip()
@@ -16,19 +19,19 @@ def computeAverageInlined(filePath):
                 if m:
                     numCallees = int(m.group(1))
                     if numCallees > 70:
-                        print(line)
+                        table.writeRow(numCallees, line)
                     totalInlined += numCallees
                     count += 1
 
-    if count == 0:
-        return 0.0
-    print("TotalInlined=", totalInlined, " count=", count)
-    return totalInlined / count
+    average = totalInlined / count if count > 0 else 0.0
+    with outputConfig.openTable("inlining", ["totalInlined", "count", "average"],
+                                textFormat="TotalInlined= {}  count= {}\nAverage methods inlined: {:.2f}") as table:
+        table.writeRow(totalInlined, count, average)
 
 
+outputConfig = outputWriter.parseOutputArgs(sys.argv)
 if  len(sys.argv) < 2:
     print ("Program must have an argument: the vlog\n")
     sys.exit(-1)
 vlog = sys.argv[1]
-average = computeAverageInlined(vlog)
-print(f"Average methods inlined: {average:.2f}")
+computeAverageInlined(vlog, outputConfig)
@@ -0,0 +1,275 @@
+# Statistics used by the run* scripts and the analyzers to summarize benchmark results.
+# All functions accept lists or NumPy arrays; NaN values (failed experiments) are
+# masked out rather than propagated. Functions that take an `axis` argument work
+# on multi-dimensional results, e.g. the [benchmark, jdk, jvmOptions, run] tensor
+# built by runDaCapo.py, and return plain floats for 1-D inputs.
+# Provided:
+#  - nanmean, nanstd, nanmin, nanmax, countNotNan, eliminateNans
+#  - exact Student t quantiles (tQuantile, tDistributionValue95) computed from the
+#    regularized incomplete beta function, so no t-table and no scipy are needed
+#  - meanConfidenceInterval95 and computeStats (same return values as the old runner helpers)
+#  - IQR outlier rejection (computeOutlierFences, rejectOutliers)
+#  - geometric means, bootstrap confidence intervals and paired A/B ratio CIs
+#
+# Usage: import benchStats  (or: from benchStats import nanmean, computeStats, ...)
+#
+# Author: Marius Pirvu
+
+import functools
+import math
+import statistics
+import numpy as np
+
+################## Configuration #####################
+outlierIQRFactor = 3.0 # values outside [Q1 - k*IQR, Q3 + k*IQR] are outliers
+numBootstrapSamples = 10000
+#######################################################
+
+
+'''
+Return a float for 0-d results, so that 1-D inputs give plain numbers
+'''
+def asScalar(result):
+    return float(result) if np.ndim(result) == 0 else result
+
+
+def countNotNan(values, axis=None):
+    counts = np.count_nonzero(~np.isnan(np.asarray(values, dtype=float)), axis=axis)
+    return int(counts) if np.ndim(counts) == 0 else counts
+
+
+def nanmean(values, axis=None):
+    a = np.asarray(values, dtype=float)
+    valid = ~np.isnan(a)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return asScalar(np.where(valid, a, 0.0).sum(axis=axis) / valid.sum(axis=axis))
+
+
+'''
+Sample standard deviation (ddof=1); 0 for a single value and NaN when there are no values
+'''
+def nanstd(values, axis=None):
+    a = np.asarray(values, dtype=float)
+    valid = ~np.isnan(a)
+    count = valid.sum(axis=axis)
+    mean = nanmean(a, axis=axis)
+    deviations = np.where(valid, a - (np.expand_dims(mean, axis) if axis is not None else mean), 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.sqrt((deviations**2).sum(axis=axis) / (count - 1))
+    return asScalar(np.where(count == 1, 0.0, np.where(count == 0, math.nan, std)))
+
+
+def nanmin(values, axis=None):
+    a = np.asarray(values, dtype=float)
+    valid = ~np.isnan(a)
+    return asScalar(np.where(valid.any(axis=axis), np.where(valid, a, np.inf).min(axis=axis), math.nan))
+
+
+def nanmax(values, axis=None):
+    a = np.asarray(values, dtype=float)
+    valid = ~np.isnan(a)
+    return asScalar(np.where(valid.any(axis=axis), np.where(valid, a, -np.inf).max(axis=axis), math.nan))
+
+
+'''
+Given an input list of values, eliminate all NaNs and return a new 1-D array
+'''
+def eliminateNans(values):
+    a = np.asarray(values, dtype=float).ravel()
+    return a[~np.isnan(a)]
+
+
+'''
+Regularized incomplete beta function I_x(a, b), evaluated with the continued
+fraction expansion (modified Lentz's method)
+'''
+def incompleteBeta(x, a, b):
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    # The continued fraction converges quickly only for x < (a+1)/(a+b+2)
+    if x > (a + 1.0) / (a + b + 2.0):
+        return 1.0 - incompleteBeta(1.0 - x, b, a)
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)) / a
+    tiny = 1e-300
+    f, c, d = 1.0, 1.0, 0.0
+    for i in range(1000):
+        m = i // 2
+        if i == 0:
+            numerator = 1.0
+        elif i % 2 == 0:
+            numerator = (m * (b - m) * x) / ((a + 2.0 * m - 1.0) * (a + 2.0 * m))
+        else:
+            numerator = -((a + m) * (a + b + m) * x) / ((a + 2.0 * m) * (a + 2.0 * m + 1.0))
+        d = 1.0 + numerator * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + numerator / c
+        c = c if abs(c) > tiny else tiny
+        f *= c * d
+        if abs(1.0 - c * d) < 1e-14:
+            break
+    return front * (f - 1.0)
+
+
+'''
+Cumulative distribution function of the Student t distribution
+'''
+def studentTCdf(t, df):
+    tail = 0.5 * incompleteBeta(df / (df + t * t), df / 2.0, 0.5)
+    return 1.0 - tail if t > 0 else tail
+
+
+'''
+Probability density function of the Student t distribution
+'''
+def studentTPdf(t, df):
+    return math.exp(math.lgamma((df + 1.0) / 2.0) - math.lgamma(df / 2.0) - (df + 1.0) / 2.0 * math.log1p(t * t / df)) / math.sqrt(df * math.pi)
+
+
+'''
+Exact quantile of the Student t distribution with `df` (possibly fractional)
+degrees of freedom: the value t such that P(T <= t) = p.
+Solved with Newton's method starting from the normal quantile: for p > 0.5 the CDF
+is concave above 0 and the normal quantile is below the solution, so the iterations
+increase monotonically towards it.
+'''
+@functools.lru_cache(maxsize=4096)
+def tQuantileScalar(p, df):
+    if not df >= 1 or not 0.0 < p < 1.0:
+        return math.nan
+    if p < 0.5:
+        return -tQuantileScalar(1.0 - p, df)
+    t = statistics.NormalDist().inv_cdf(p)
+    for i in range(200):
+        step = (p - studentTCdf(t, df)) / studentTPdf(t, df)
+        t += step
+        if step < 1e-12 * t:
+            break
+    return t
+
+
+def tQuantile(p, df):
+    if np.ndim(df) == 0:
+        return tQuantileScalar(float(p), float(df))
+    # Evaluate each distinct value only once
+    uniqueDf, inverse = np.unique(np.asarray(df, dtype=float), return_inverse=True)
+    quantiles = np.array([tQuantileScalar(float(p), float(d)) for d in uniqueDf])
+    return quantiles[inverse].reshape(np.shape(df))
+
+
+'''
+Critical value for a two-sided 95% confidence interval. NaN for less than 1 degree of freedom.
+'''
+def tDistributionValue95(degreesOfFreedom):
+    return tQuantile(0.975, degreesOfFreedom)
+
+
+'''
+Half-width of the 95% confidence interval of the mean, as a percentage of the mean
+mean +- t * std / sqrt(n)
+'''
+def meanConfidenceInterval95(values, axis=None):
+    n = countNotNan(values, axis=axis)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        marginOfError = tDistributionValue95(np.asarray(n) - 1) * nanstd(values, axis=axis) / np.sqrt(n)
+        return asScalar(100.0 * marginOfError / nanmean(values, axis=axis))
+
+
+'''
+Compute the lower (Q1 - k*IQR) and upper (Q3 + k*IQR) fences of the values, where IQR=Q3-Q1.
+Quartiles use the 'inclusive' method of statistics.quantiles (linear interpolation).
+'''
+def computeOutlierFences(values, k=None):
+    k = outlierIQRFactor if k is None else k
+    Q1, Q3 = np.percentile(eliminateNans(values), [25, 75])
+    IQR = Q3 - Q1
+    return (Q1 - k * IQR, Q3 + k * IQR)
+
+
+'''
+Split the values (NaNs excluded) into (goodValues, outliers). Needs at least 4 data points.
+'''
+def rejectOutliers(values, k=None):
+    a = eliminateNans(values)
+    if len(a) <= 3:
+        return a, a[:0]
+    lowerFence, upperFence = computeOutlierFences(a, k)
+    isOutlier = (a < lowerFence) | (a > upperFence)
+    return a[~isOutlier], a[isOutlier]
+
+
+'''
+Return avg, stdDev, min, max, ci95 (percent of the mean), numSamples and the list of outliers
+'''
+def computeStats(values, eliminateOutliers=False):
+    goodValues, outliers = rejectOutliers(values) if eliminateOutliers else (eliminateNans(values), [])
+    numSamples = len(goodValues)
+    if numSamples < 1:
+        return math.nan, math.nan, math.nan, math.nan, math.nan, 0, []
+    return (nanmean(goodValues), nanstd(goodValues), nanmin(goodValues), nanmax(goodValues),
+            meanConfidenceInterval95(goodValues), numSamples, [float(value) for value in outliers])
+
+
+'''
+Summarize a tensor of results along `axis` (the runs). Returns a dictionary with arrays
+for "mean", "std", "min", "max", "ci95" (percent of the mean) and "n" (valid experiments)
+'''
+def summarizeResults(results, axis=-1):
+    return {"mean": nanmean(results, axis=axis), "std": nanstd(results, axis=axis),
+            "min": nanmin(results, axis=axis), "max": nanmax(results, axis=axis),
+            "ci95": meanConfidenceInterval95(results, axis=axis), "n": countNotNan(results, axis=axis)}
+
+
+def meanLastValues(values, numLastValues):
+    assert numLastValues > 0
+    if numLastValues > len(values):
+        numLastValues = len(values)
+    return nanmean(values[-numLastValues:])
+
+
+'''
+Geometric mean of the positive values (NaNs ignored), e.g. to average ratios across benchmarks
+'''
+def geomean(values, axis=None):
+    a = np.asarray(values, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return asScalar(np.exp(nanmean(np.where(a > 0, np.log(a), math.nan), axis=axis)))
+
+
+'''
+Bootstrap percentile confidence interval of `statistic` (a function reducing along axis=-1).
+All resamples are evaluated at once on a (numBootstrapSamples, n) matrix.
+Returns (low, high)
+'''
+def bootstrapCI(values, statistic=np.mean, confidence=0.95, seed=None):
+    a = eliminateNans(values)
+    if len(a) < 2:
+        return math.nan, math.nan
+    rng = np.random.default_rng(seed)
+    resamples = a[rng.integers(0, len(a), size=(numBootstrapSamples, len(a)))]
+    estimates = statistic(resamples, axis=-1)
+    alpha = (1.0 - confidence) / 2.0
+    low, high = np.percentile(estimates, [100.0 * alpha, 100.0 * (1.0 - alpha)])
+    return float(low), float(high)
+
+
+'''
+Ratio B/A of paired experiments (e.g. A and B run back to back in each iteration).
+The ratio is the geometric mean of the per-pair ratios and its confidence interval
+is the t interval of the mean log ratio. Pairs with a NaN are dropped.
+Returns (ratio, low, high)
+'''
+def pairedRatioCI(valuesA, valuesB, confidence=0.95):
+    a = np.asarray(valuesA, dtype=float)
+    b = np.asarray(valuesB, dtype=float)
+    valid = ~np.isnan(a) & ~np.isnan(b) & (a > 0) & (b > 0)
+    logRatios = np.log(b[valid] / a[valid])
+    n = len(logRatios)
+    if n < 1:
+        return math.nan, math.nan, math.nan
+    mean = logRatios.mean()
+    if n < 2:
+        return math.exp(mean), math.nan, math.nan
+    marginOfError = tQuantile(1.0 - (1.0 - confidence) / 2.0, n - 1) * logRatios.std(ddof=1) / math.sqrt(n)
+    return math.exp(mean), math.exp(mean - marginOfError), math.exp(mean + marginOfError)
@@ -0,0 +1,139 @@
+# Python script that measures the throughput of the vlog analyzers.
+# Synthetic vlogs of the sizes given in `vlogSizes` are generated with
+# genSyntheticVlog.py and every analyzer from `analyzers` is run on each
+# of them in a separate process (output discarded). For each (analyzer, size)
+# pair the script reports the best and the median wall time over
+# `numRepetitions` runs, the throughput in vlog lines/sec and the peak RSS
+# of the analyzer process.
+# Results are appended, together with the current git commit, to `historyFile`
+# and the speedup relative to the previous entry for the same (analyzer, size)
+# is printed, so that regressions and improvements of the parsers can be tracked.
+#
+# Usage: python3 benchVlogTools.py [analyzer ...] [--format text|tsv|csv|jsonl|parquet] [--output prefix]
+#        Without arguments all analyzers from the configuration are benchmarked
+#
+# Author: Marius Pirvu
+
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys # for accessing parameters and exit
+import tempfile
+import time
+import genSyntheticVlog
+import outputWriter
+
+################## Configuration #####################
+vlogSizes = [10000, 100000] # number of compilations in the generated vlogs
+numRepetitions = 3 # each analyzer is run this many times on each vlog
+analyzers = ["parseVlog.py", "parseVlogs.py", "CompTimeline.py", "CompTimeTimeline.py", "CompTimelineHot.py",
+             "queueSizeFromVlog.py", "jvmCPUTimelineFromVlog.py", "ComputeTimeProfiling.py", "vlogFailures.py"]
+historyFile = "benchVlogTools.history.jsonl" # set to None to disable; relative paths are relative to this script
+keepVlogs = False # keep the generated vlogs in the temporary directory
+#######################################################
+
+scriptDir = os.path.dirname(os.path.abspath(__file__))
+
+
+def getGitCommit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=scriptDir, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+'''
+Run one analyzer on the given vlog with its output discarded.
+Returns (wallTimeSec, peakRssKB, exitCode)
+'''
+def runAnalyzer(analyzer, vlogFileName):
+    startTime = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(scriptDir, analyzer), vlogFileName], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # wait4 gives the resource usage of this particular child, including its peak RSS
+    pid, status, rusage = os.wait4(proc.pid, 0)
+    wallTime = time.perf_counter() - startTime
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return wallTime, rusage.ru_maxrss, proc.returncode
+
+
+'''
+Read the history file and return a dictionary (analyzer, numCompilations) --> last result
+'''
+def readHistory(historyFileName):
+    lastResults = {}
+    if not historyFileName or not os.path.exists(historyFileName):
+        return lastResults
+    with open(historyFileName) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue # ignore partially written lines
+            lastResults[(entry["analyzer"], entry["numCompilations"])] = entry
+    return lastResults
+
+
+def benchmark(selectedAnalyzers, outputConfig):
+    historyFileName = os.path.join(scriptDir, historyFile) if historyFile else None
+    lastResults = readHistory(historyFileName)
+    gitCommit = getGitCommit()
+    timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+    workDir = tempfile.mkdtemp(prefix="benchVlogTools.")
+    results = []
+    try:
+        for numComps in vlogSizes:
+            vlogFileName = os.path.join(workDir, "synthetic.{n}.log".format(n=numComps))
+            with open(vlogFileName, "w") as vlog:
+                numLines = genSyntheticVlog.generateVlog(vlog, numComps)
+            print("Generated {f} with {n} lines ({s:.1f} MB)".format(f=vlogFileName, n=numLines, s=os.path.getsize(vlogFileName) / 1e6), file=sys.stderr)
+            for analyzer in selectedAnalyzers:
+                wallTimes = []
+                peakRss = 0
+                for rep in range(numRepetitions):
+                    wallTime, rssKB, exitCode = runAnalyzer(analyzer, vlogFileName)
+                    if exitCode != 0:
+                        print("{a} failed with exit code {c} on {f}".format(a=analyzer, c=exitCode, f=vlogFileName), file=sys.stderr)
+                        break
+                    wallTimes.append(wallTime)
+                    peakRss = max(peakRss, rssKB)
+                if not wallTimes:
+                    continue
+                entry = {"timestamp": timestamp, "gitCommit": gitCommit, "analyzer": analyzer, "numCompilations": numComps,
+                         "numLines": numLines, "bestSec": min(wallTimes), "medianSec": statistics.median(wallTimes),
+                         "linesPerSec": numLines / min(wallTimes), "peakRssKB": peakRss}
+                results.append(entry)
+                print("{a:28s} {n:8d} lines {t:8.3f} sec".format(a=analyzer, n=numLines, t=entry["bestSec"]), file=sys.stderr)
+    finally:
+        if keepVlogs:
+            print("Generated vlogs kept in", workDir, file=sys.stderr)
+        else:
+            shutil.rmtree(workDir, ignore_errors=True)
+
+    with outputConfig.openTable("throughput", ["analyzer", "numCompilations", "numLines", "bestSec", "medianSec", "linesPerSec", "peakRssMB", "speedup"],
+                                textFormat="{:28s}\t{:8d}\t{:9d}\t{:8.3f}\t{:8.3f}\t{:10.0f}\t{:8.1f}\t{:>7s}",
+                                textHeader="Analyzer                    \t   Comps\t    Lines\tBest(s)\t Median(s)\t Lines/sec\tRSS(MB)\tSpeedup") as table:
+        for entry in results:
+            previous = lastResults.get((entry["analyzer"], entry["numCompilations"]))
+            # Speedup vs. the previous recorded run of the same analyzer on the same vlog size
+            speedup = "{:.2f}".format(entry["linesPerSec"] / previous["linesPerSec"]) if previous and previous.get("linesPerSec") else "-"
+            table.writeRow(entry["analyzer"], entry["numCompilations"], entry["numLines"], entry["bestSec"], entry["medianSec"],
+                           entry["linesPerSec"], entry["peakRssKB"] / 1024, speedup)
+
+    if historyFileName and results:
+        with open(historyFileName, "a") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in results))
+
+
+###############################################
+outputConfig = outputWriter.parseOutputArgs(sys.argv)
+selectedAnalyzers = sys.argv[1:] if len(sys.argv) > 1 else analyzers
+for analyzer in selectedAnalyzers:
+    if not os.path.exists(os.path.join(scriptDir, analyzer)):
+        print("Unknown analyzer:", analyzer)
+        sys.exit(-1)
+benchmark(selectedAnalyzers, outputConfig)
@@ -0,0 +1,175 @@
+# Declarative benchmark campaigns with crash-safe resume.
+# Instead of editing the configuration globals of a runner (jdks, jvmOptions, configs, ...),
+# the experiment matrix is described in a JSON campaign file:
+#   {
+#     "name": "acmeair-j17-vs-j21",
+#     "iterations": 10,
+#     "schedule": "roundRobin",            # see campaignScheduler.schedules; default "sequential"
+#     "seed": 1,                           # for the "randomBlocks" schedule
+#     "resultsLog": "acmeair.results.jsonl",  # default: <campaign file>.results.jsonl
+#     "matrix": {                          # the cells are the cartesian product of the axes
+#       "jdk": ["/opt/jdk17", "/opt/jdk21"],
+#       "jvmOpts": ["-Xmx1G", "-Xmx1G -XX:+UseJITServer"],
+#       "workload": [{"numClients": 50}, {"numClients": 100}]
+#     }
+#   }
+# Every runner documents the axes it accepts (e.g. "image" and "args" for the container
+# runners). A "workload" entry is a set of overrides for the configuration globals of the runner;
+# the overrides of a cell are undone before the next cell. Variables used to compute other
+# configuration globals (e.g. useSCCVolume for mountOpts) cannot be overridden, because the
+# globals computed from them when the runner was loaded would not change.
+# Each finished run is appended to the results log (JSON Lines, flushed and fsync-ed) together
+# with its metrics. When the campaign is restarted, the runs already in the log are loaded
+# instead of being run again, so an interrupted campaign resumes where it stopped.
+#
+# Usage (in a runner):  python3 runAcmeAirEE8.py --campaign campaign.json
+#   campaign = campaignFile.parseCampaignArgs(sys.argv, axes=("jdk", "jvmOpts", "workload"))
+#   resultsLog = campaignFile.ResultsLog(campaign["resultsLog"])
+#
+# Author: Marius Pirvu
+
+import ast
+import datetime
+import itertools
+import json
+import logging
+import os
+import sys # for exit
+import threading
+
+
+'''
+Remove "--campaign <file>" from argv and return the loaded campaign, or None without the option
+'''
+def parseCampaignArgs(argv, axes):
+    for i, arg in enumerate(argv):
+        name, sep, value = arg.partition("=")
+        if name == "--campaign":
+            if not sep:
+                if i + 1 >= len(argv):
+                    print("Option --campaign needs a value")
+                    sys.exit(-1)
+                value = argv[i + 1]
+                del argv[i + 1]
+            del argv[i]
+            return loadCampaign(value, axes)
+    return None
+
+
+'''
+Read a campaign file. Returns a dictionary with "name", "iterations", "schedule", "seed",
+"resultsLog" and "cells", the list of configurations (dictionaries axis --> value)
+'''
+def loadCampaign(fileName, axes):
+    try:
+        with open(fileName) as f:
+            campaign = json.load(f)
+    except (OSError, ValueError) as e:
+        print("Cannot read campaign file {f}: {e}".format(f=fileName, e=e))
+        sys.exit(-1)
+    matrix = campaign.get("matrix", {})
+    unknownAxes = [axis for axis in matrix if axis not in axes]
+    if unknownAxes or not matrix or "iterations" not in campaign:
+        print("Campaign file {f} needs \"iterations\" and a \"matrix\" with the axes {axes}; unknown axes: {u}".format(f=fileName, axes=axes, u=unknownAxes))
+        sys.exit(-1)
+    axisNames = list(matrix)
+    campaign["cells"] = [dict(zip(axisNames, values)) for values in itertools.product(*[matrix[axis] for axis in axisNames])]
+    campaign.setdefault("name", os.path.splitext(os.path.basename(fileName))[0])
+    campaign.setdefault("schedule", "sequential")
+    campaign.setdefault("seed", None)
+    campaign.setdefault("resultsLog", os.path.splitext(fileName)[0] + ".results.jsonl")
+    return campaign
+
+
+# Values of the overridden globals before the first override: runner module name --> {variable: value}
+defaultValues = {}
+
+
+'''
+Return a dictionary variable --> globals computed from it, for the configuration
+section of a runner (the assignments before its first function or class)
+'''
+def derivedGlobals(fileName):
+    with open(fileName) as f:
+        tree = ast.parse(f.read(), fileName)
+    assignments = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            break
+        if isinstance(node, ast.Assign):
+            assignments.append(node)
+    assigned = {target.id for node in assignments for target in node.targets if isinstance(target, ast.Name)}
+    derived = {}
+    for node in assignments:
+        for used in {n.id for n in ast.walk(node.value) if isinstance(n, ast.Name) and n.id in assigned}:
+            derived.setdefault(used, []).extend(target.id for target in node.targets if isinstance(target, ast.Name))
+    return derived
+
+
+'''
+Apply the configuration overrides of a workload to the globals of a runner, after restoring
+the values changed by the previous workload. Only existing configuration variables that
+no other global is computed from can be overridden.
+'''
+def applyWorkload(runnerGlobals, workload):
+    defaults = defaultValues.setdefault(runnerGlobals["__name__"], {})
+    runnerGlobals.update(defaults)
+    derived = derivedGlobals(runnerGlobals["__file__"]) if workload else {}
+    for name, value in (workload or {}).items():
+        if name not in runnerGlobals:
+            print("Unknown configuration variable {n} in workload {w}".format(n=name, w=workload))
+            sys.exit(-1)
+        if name in derived:
+            print("Configuration variable {n} cannot be overridden in workload {w}: {d} are computed from it; override them instead".
+                  format(n=name, w=workload, d=derived[name]))
+            sys.exit(-1)
+        defaults.setdefault(name, runnerGlobals[name])
+        runnerGlobals[name] = value
+
+
+class ResultsLog:
+    '''
+    Append-only JSON Lines log of the finished runs of a campaign.
+    Each line is {"cell": ..., "iteration": ..., "time": ..., "metrics": {...}}
+    '''
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.completed = {}
+        self.lock = threading.Lock() # runs in parallel slots (campaignSlots.py) append from several threads
+        endsWithNewline = True
+        if os.path.exists(fileName):
+            with open(fileName) as f:
+                for lineNumber, line in enumerate(f, 1):
+                    endsWithNewline = line.endswith("\n")
+                    try:
+                        record = json.loads(line)
+                        self.completed[self.key(record["cell"], record["iteration"])] = record["metrics"]
+                    except (ValueError, KeyError, TypeError):
+                        # A line truncated by a crash while it was being written
+                        logging.warning("Ignoring invalid line {n} in results log {f}".format(n=lineNumber, f=fileName))
+            if self.completed:
+                print("Resuming from {f}: {n} runs already done".format(f=fileName, n=len(self.completed)))
+        self.file = open(fileName, "a")
+        if not endsWithNewline:
+            self.file.write("\n") # do not glue the next record to a truncated line
+
+    @staticmethod
+    def key(cell, iteration):
+        return json.dumps(cell, sort_keys=True), iteration
+
+    '''
+    Return the metrics of a finished run, or None if the run has not been done yet
+    '''
+    def get(self, cell, iteration):
+        return self.completed.get(self.key(cell, iteration))
+
+    def append(self, cell, iteration, metrics):
+        record = {"cell": cell, "iteration": iteration, "time": datetime.datetime.now().isoformat(timespec="seconds"), "metrics": metrics}
+        with self.lock:
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno()) # the run must survive a crash of the machine as well
+            self.completed[self.key(cell, iteration)] = metrics
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,150 @@
+# Scheduler for benchmark campaigns that compare several configurations (JDK x JVM options).
+# Running all the iterations of configuration A before those of configuration B lets
+# machine drift (thermal, background activity) leak into the A/B comparison.
+# Instead, the runs are executed in rounds: every round runs each configuration once,
+# either in the same rotated order (schedule="roundRobin") or in a random order
+# (schedule="randomBlocks"). With schedule="sequential" the old order is kept.
+# Since the configurations of one round run close in time, the per-round differences
+# between a configuration and the baseline (the first configuration) are paired,
+# and their confidence interval is usually much tighter than the one of the difference
+# of two independent means (see printPairedDeltas()).
+# SCC state:
+#  - with doOnlyColdRuns the SCC of a configuration is destroyed before each of its runs
+#  - with doColdRun the SCC of every configuration is destroyed and populated by a cold
+#    run (not included in the results) before the first round; only the cache of that
+#    configuration (its cacheDir and name, see sccDestroyOption) is destroyed, and all the
+#    caches are destroyed before the first cold run, because a configuration without a cache
+#    name destroys its whole cacheDir
+#  - warm runs need a separate SCC for every configuration; if two configurations
+#    share an SCC (same cacheDir and name) they cannot be interleaved, so the campaign
+#    falls back to the sequential schedule
+# With a results log (campaignFile.ResultsLog) every finished run is recorded, and the
+# runs already in the log are not repeated, so an interrupted campaign can be resumed.
+# The cold run of a configuration is repeated only if some of its runs are still to be done.
+#
+# Usage (in a runner):
+#   results, coldResults = campaignScheduler.runCampaign(configs, numRounds, runOnce, clearSCC, sccKey, ...)
+#   campaignScheduler.printPairedDeltas(labels, values)
+#
+# Author: Marius Pirvu
+
+import logging
+import random
+import re # for regular expressions
+import numpy as np
+import benchStats
+
+schedules = ("sequential", "roundRobin", "randomBlocks")
+
+
+'''
+Return the SCC used by a configuration as (cacheDir, name), parsed from
+-Xshareclasses:cacheDir=<dir>,name=<name> in the JVM options
+'''
+def sccKeyFromOptions(jvmOpts, defaultCacheDir):
+    m = re.search(r'cacheDir=([^,\s]+)', jvmOpts)
+    cacheDir = m.group(1) if m else defaultCacheDir
+    m = re.search(r'-Xshareclasses:\S*name=([^,\s]+)', jvmOpts)
+    return (cacheDir, m.group(1) if m else None)
+
+
+'''
+-Xshareclasses option that destroys only the SCC identified by `sccKey`, so that the caches
+of the other configurations in the same cacheDir survive. Without a name, the whole cacheDir is destroyed
+'''
+def sccDestroyOption(sccKey):
+    cacheDir, name = sccKey
+    if name is None:
+        return f"-Xshareclasses:cacheDir={cacheDir},destroyall"
+    return f"-Xshareclasses:cacheDir={cacheDir},name={name},destroy"
+
+
+'''
+Return the order of the runs as a list of (round, configIndex)
+'''
+def buildSchedule(numConfigs, numRounds, schedule="roundRobin", seed=None):
+    if schedule not in schedules:
+        raise ValueError("Unknown schedule {s}; use one of {all}".format(s=schedule, all=schedules))
+    if schedule == "sequential":
+        return [(r, c) for c in range(numConfigs) for r in range(numRounds)]
+    rng = random.Random(seed)
+    order = []
+    for r in range(numRounds):
+        if schedule == "roundRobin":
+            # Rotate the order so that no configuration always runs first after a round boundary
+            configs = [(r + i) % numConfigs for i in range(numConfigs)]
+        else:
+            configs = list(range(numConfigs))
+            rng.shuffle(configs)
+        order.extend((r, c) for c in configs)
+    return order
+
+
+'''
+Run `numRounds` runs of every configuration in the order given by `schedule`.
+runOnce(config, round) executes one run and returns its results;
+clearSCC(config) destroys the SCC of a configuration;
+sccKey(config) identifies the SCC used by a configuration.
+With a resultsLog, the results of runOnce must be JSON serializable; the runs found
+in the log are skipped and their logged results are returned instead.
+Returns (results, coldResults) where results[configIndex][round] is the result of a run
+and coldResults[configIndex] is the result of the cold run (None without doColdRun)
+'''
+def runCampaign(configs, numRounds, runOnce, clearSCC, sccKey, doColdRun=False, doOnlyColdRuns=False, schedule="roundRobin", seed=None, resultsLog=None):
+    if schedule != "sequential" and not doOnlyColdRuns and len({sccKey(config) for config in configs}) < len(configs):
+        logging.warning("Some configurations share an SCC, so warm runs cannot be interleaved; using the sequential schedule")
+        schedule = "sequential"
+    order = buildSchedule(len(configs), numRounds, schedule, seed)
+    results = [[None] * numRounds for config in configs]
+    coldResults = [None] * len(configs)
+    if resultsLog:
+        for i, config in enumerate(configs):
+            for r in range(numRounds):
+                results[i][r] = resultsLog.get(config, r)
+        order = [(r, i) for r, i in order if results[i][r] is None]
+    pending = {i for r, i in order}
+
+    # The SCC of each configuration is populated by a cold run, before the first round
+    # or, with the sequential schedule, before the first run of the configuration
+    coldRunFirst = doColdRun and not doOnlyColdRuns
+    if coldRunFirst and schedule != "sequential":
+        # Destroy all the SCCs before any cold run: clearing a configuration without a cache name
+        # destroys the whole cacheDir, including the caches already populated by other cold runs
+        for i in sorted(pending):
+            clearSCC(configs[i])
+    for r, i in ([(0, i) for i in sorted(pending)] if coldRunFirst and schedule != "sequential" else []) + order:
+        config = configs[i]
+        if coldRunFirst and coldResults[i] is None:
+            if schedule == "sequential":
+                clearSCC(config)
+            logging.info("Cold run for configuration {i}".format(i=i))
+            coldResults[i] = runOnce(config, -1)
+            if schedule != "sequential":
+                continue
+        if doOnlyColdRuns:
+            clearSCC(config)
+        logging.info("Round {r}: configuration {i}".format(r=r, i=i))
+        results[i][r] = runOnce(config, r)
+        if resultsLog:
+            resultsLog.append(config, r, results[i][r])
+    return results, coldResults
+
+
+'''
+Print the per-round differences of each configuration relative to the first one.
+`values` is a (numConfigs x numRounds) array with the primary metric of every run (NaN for failures).
+The summary line is the paired ratio with its 95% confidence interval (benchStats.pairedRatioCI).
+'''
+def printPairedDeltas(labels, values, metricName="Thr"):
+    values = np.asarray(values, dtype=float)
+    print("\nPaired per-round {m} deltas relative to configuration 0: {l}".format(m=metricName, l=labels[0]))
+    for i in range(1, len(labels)):
+        print("Configuration {i}: {l}".format(i=i, l=labels[i]))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            deltas = 100.0 * (values[i] - values[0]) / values[0]
+        print("Round", end="")
+        for r in range(values.shape[1]):
+            print("\t{d:+6.2f}%".format(d=deltas[r]), end="")
+        ratio, low, high = benchStats.pairedRatioCI(values[0], values[i])
+        print("\nPaired delta: {d:+6.2f}%  CI95=[{low:+6.2f}%, {high:+6.2f}%]  numPairs={n}".format(
+              d=100.0 * (ratio - 1), low=100.0 * (low - 1), high=100.0 * (high - 1), n=benchStats.countNotNan(deltas)))
@@ -0,0 +1,176 @@
+# Divide a large machine into isolated slots, so that independent benchmark runs
+# can execute at the same time instead of one after another.
+# Each slot gets:
+#  - its own set of CPUs, taken from a single NUMA node whenever possible
+#  - the memory node of those CPUs
+#  - its own ports (basePort + index * portStride)
+#  - its own container names (<baseName>-slot<index>)
+#  - its own SCC directory (<baseDir>/slot<index>), so that cold runs in one slot
+#    do not destroy the SCC used by another slot
+# The CPUs given to the slots can be restricted with `allowedCpus` (e.g. "0-15,32-47"),
+# leaving the rest of the machine to the load generators, databases, JITServers, ...
+# The NUMA topology is read from /sys/devices/system/node; without it the machine
+# is considered a single node.
+#
+# Usage (in a runner):
+#   slots = campaignSlots.buildSlots(numSlots, cpusPerSlot, allowedCpus)
+#   results = campaignSlots.runInSlots(tasks, slots, runTask) # runTask(task, slot) executes one task
+#
+# Author: Marius Pirvu
+
+import glob
+import logging
+import os
+import queue
+import re # for regular expressions
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+################## Configuration #####################
+portStride = 100 # port offset between consecutive slots
+#######################################################
+
+
+'''
+Parse a Linux CPU list like "0-3,8,10-11" into a sorted list of CPU numbers
+'''
+def parseCpuList(cpuList):
+    cpus = set()
+    for part in cpuList.strip().split(","):
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        cpus.update(range(int(first), int(last if sep else first) + 1))
+    return sorted(cpus)
+
+
+'''
+Format a list of CPU numbers as a compact CPU list like "0-3,8"
+'''
+def formatCpuList(cpus):
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(first) if first == last else "{f}-{l}".format(f=first, l=last) for first, last in ranges)
+
+
+'''
+Return a dictionary NUMA node --> list of CPUs
+'''
+def readNumaTopology():
+    topology = {}
+    for cpuListFile in glob.glob("/sys/devices/system/node/node*/cpulist"):
+        node = int(re.search(r'node(\d+)', cpuListFile).group(1))
+        with open(cpuListFile) as f:
+            cpus = parseCpuList(f.read())
+        if cpus:
+            topology[node] = cpus
+    if not topology:
+        topology[0] = sorted(os.sched_getaffinity(0))
+    return topology
+
+
+class Slot:
+    '''
+    The resources of one slot
+    '''
+    def __init__(self, index, cpus, memNode):
+        self.index = index
+        self.cpus = cpus
+        self.memNode = memNode
+
+    def cpuList(self):
+        return formatCpuList(self.cpus)
+
+    '''
+    Command prefix that binds a process to the CPUs (and, with numactl, the memory node) of the slot
+    '''
+    def affinity(self, tool="numactl"):
+        if tool == "numactl":
+            return "numactl --physcpubind={c} --membind={m}".format(c=self.cpuList(), m=self.memNode)
+        return "taskset -c {c}".format(c=self.cpuList())
+
+    '''
+    docker/podman run options that bind a container to the slot
+    '''
+    def dockerCpuset(self):
+        return "--cpuset-cpus={c} --cpuset-mems={m}".format(c=self.cpuList(), m=self.memNode)
+
+    def port(self, basePort):
+        return int(basePort) + self.index * portStride
+
+    def name(self, baseName):
+        return "{b}-slot{i}".format(b=baseName, i=self.index)
+
+    def sccDir(self, baseDir):
+        return os.path.join(baseDir, "slot{i}".format(i=self.index))
+
+    '''
+    Rewrite the -Xshareclasses option of `jvmOpts` to use the SCC directory of the slot.
+    Options without -Xshareclasses are returned unchanged (they use the default SCC,
+    which is shared by all the slots).
+    '''
+    def jvmOptsWithSCCDir(self, jvmOpts, baseDir):
+        m = re.search(r'-Xshareclasses(:\S*)?', jvmOpts)
+        if not m:
+            return jvmOpts
+        subOptions = [o for o in (m.group(1) or ":")[1:].split(",") if o and not o.startswith("cacheDir=")]
+        option = "-Xshareclasses:" + ",".join(["cacheDir=" + self.sccDir(baseDir)] + subOptions)
+        return jvmOpts[:m.start()] + option + jvmOpts[m.end():]
+
+    def __str__(self):
+        return "slot{i}: cpus={c} memNode={m}".format(i=self.index, c=self.cpuList(), m=self.memNode)
+
+
+'''
+Divide the allowed CPUs of the machine into `numSlots` slots of `cpusPerSlot` CPUs
+(by default, all the allowed CPUs divided evenly). Slots are filled node by node, so
+that a slot does not straddle two NUMA nodes unless it is bigger than a node.
+'''
+def buildSlots(numSlots, cpusPerSlot=None, allowedCpus=None, topology=None):
+    topology = topology if topology is not None else readNumaTopology()
+    allowed = set(parseCpuList(allowedCpus)) if allowedCpus else None
+    nodeCpus = [(node, [cpu for cpu in cpus if allowed is None or cpu in allowed]) for node, cpus in sorted(topology.items())]
+    numCpus = sum(len(cpus) for node, cpus in nodeCpus)
+    cpusPerSlot = cpusPerSlot or numCpus // numSlots
+    if cpusPerSlot < 1 or numSlots * cpusPerSlot > numCpus:
+        raise ValueError("Cannot fit {n} slots of {c} CPUs in the {a} allowed CPUs".format(n=numSlots, c=cpusPerSlot, a=numCpus))
+    slots = []
+    # First the slots that fit in a node, then the leftovers of all nodes
+    leftovers = []
+    for node, cpus in nodeCpus:
+        while len(cpus) >= cpusPerSlot and len(slots) < numSlots:
+            slots.append(Slot(len(slots), cpus[:cpusPerSlot], node))
+            cpus = cpus[cpusPerSlot:]
+        leftovers.extend((node, cpu) for cpu in cpus)
+    while len(slots) < numSlots:
+        chunk, leftovers = leftovers[:cpusPerSlot], leftovers[cpusPerSlot:]
+        nodes = sorted({node for node, cpu in chunk})
+        slots.append(Slot(len(slots), [cpu for node, cpu in chunk], ",".join(str(node) for node in nodes)))
+    for slot in slots:
+        logging.info(str(slot))
+    return slots
+
+
+'''
+Execute runTask(task, slot) for every task, running up to len(slots) tasks at the same time.
+Each task gets a slot for itself while it executes. Returns the results in the order of the tasks.
+'''
+def runInSlots(tasks, slots, runTask):
+    freeSlots = queue.Queue()
+    for slot in slots:
+        freeSlots.put(slot)
+
+    def runTaskInSlot(task):
+        slot = freeSlots.get()
+        threading.current_thread().name = "slot{i}".format(i=slot.index)
+        try:
+            return runTask(task, slot)
+        finally:
+            freeSlots.put(slot)
+
+    with ThreadPoolExecutor(max_workers=len(slots)) as executor:
+        return list(executor.map(runTaskInSlot, tasks))
@@ -11,11 +11,14 @@
 # Use case: determine if one JDK takes more time to perform AOT compilations
 # than another JDK. Each JDK will write verbose files in their own directory.
 #
+# Usage: python3 compareAvgAOTCompTimeVlogs.py dir1 dir2 [--format text|tsv|csv|jsonl|parquet] [--output prefix]
+#
 # Author: Marius Pirvu
 
 import re # for regular expressions
 import sys # for accessing parameters and exit
 from pathlib import Path
+import outputWriter
 
 
 
@@ -37,42 +40,46 @@ def parseVlog(vlog, methodHash):
                 methodHash[methodName] = [compTime]
 
 
-def processAllFilesInDirectory(dirName):
+'''
+Parse all the vlogs in a directory and return (methodHash, numFiles, totalCompTime)
+'''
+def processAllFilesInDirectory(dirName, outputConfig):
     methodHash = {}
     numFiles = 0
     directory = Path(dirName)
     for entry in directory.iterdir():
         if entry.is_file():
             numFiles += 1
-            # print(entry.name)
-            print("Processing", entry.absolute())
+            if outputConfig.isText(): # progress information
+                print("Processing", entry.absolute())
             Vlog = open(entry.absolute(), 'r', 1)
             parseVlog(Vlog, methodHash)
     total = 0
     for method in methodHash:
         total += sum(methodHash[method])
-    print("Total compilation time:", total)
-    return methodHash, numFiles
+    return methodHash, numFiles, total
 
-def findCompTimeDiffs(methodHash1, methodHash2, numFiles1, numFiles2):
+def findCompTimeDiffs(methodHash1, methodHash2, numFiles1, numFiles2, outputConfig):
     resultingHash = {} # this is my result
-    for method in methodHash1:
-        if method in methodHash2: # must be present in both dictionaries
-            list1 = methodHash1[method]
-            list2 = methodHash2[method]
-            mean1 = sum(list1)/len(list1)
-            mean2 = sum(list2)/len(list2)
-            resultingHash[method] = {'mean1':mean1, 'mean2':mean2, 'len1':len(list1), 'len2':len(list2)}
-            # Print only if the method appears in all the files
-            if len(list1) == numFiles1 and len(list2) == numFiles2:
-                # Print only if all entries in one list are larger than the entries in the other list
-                if min(list1) > max(list2) or min(list2) > max(list1):
-                    print("{mean1:8.1f} {mean2:8.1f} {l1:2d} {l2:2d} {ratio:8.1f} {method:s}".format(mean1=mean1, mean2=mean2, l1=len(list1), l2=len(list2), ratio=mean1/mean2, method=method))
+    with outputConfig.openTable("compTimeDiffs", ["mean1", "mean2", "len1", "len2", "ratio", "method"], textFormat="{:8.1f} {:8.1f} {:2d} {:2d} {:8.1f} {:s}") as table:
+        for method in methodHash1:
+            if method in methodHash2: # must be present in both dictionaries
+                list1 = methodHash1[method]
+                list2 = methodHash2[method]
+                mean1 = sum(list1)/len(list1)
+                mean2 = sum(list2)/len(list2)
+                resultingHash[method] = {'mean1':mean1, 'mean2':mean2, 'len1':len(list1), 'len2':len(list2)}
+                # Print only if the method appears in all the files
+                if len(list1) == numFiles1 and len(list2) == numFiles2:
+                    # Print only if all entries in one list are larger than the entries in the other list
+                    if min(list1) > max(list2) or min(list2) > max(list1):
+                        table.writeRow(mean1, mean2, len(list1), len(list2), mean1/mean2, method)
     #for method in resultingHash:
     #    print()
 
 
 ###################################################
+outputConfig = outputWriter.parseOutputArgs(sys.argv)
 # Get the name of the two directories
 if  len(sys.argv) != 3:
     print ("Program must have 2 arguments representing directory names that are to be processed\n")
@@ -80,9 +87,11 @@ if  len(sys.argv) != 3:
 
 dir1Name = sys.argv[1]
 dir2Name = sys.argv[2]
-(methodHash1, numFiles1) = processAllFilesInDirectory(dir1Name)
-(methodHash2, numFiles2) = processAllFilesInDirectory(dir2Name)
-findCompTimeDiffs(methodHash1, methodHash2, numFiles1, numFiles2)
+(methodHash1, numFiles1, total1) = processAllFilesInDirectory(dir1Name, outputConfig)
+(methodHash2, numFiles2, total2) = processAllFilesInDirectory(dir2Name, outputConfig)
+with outputConfig.openTable("totalCompTime", ["directory", "numFiles", "totalUsec"], textFormat="Total compilation time for {0}: {2}") as table:
+    table.writeRows([(dir1Name, numFiles1, total1), (dir2Name, numFiles2, total2)])
+findCompTimeDiffs(methodHash1, methodHash2, numFiles1, numFiles2, outputConfig)
 
 
 
@@ -0,0 +1,165 @@
+# Python script that takes an OpenJ9 verbose log and a javacore obtained from the same run
+# and tries to explain why methods were compiled for the first time with the JIT
+# instead of being loaded from the shared class cache (SCC) as AOT bodies.
+# The non-shared classes from the javacore are indexed by class name (together
+# with the names of the class loaders that loaded them). Then, the first successful
+# compilation of every method that is not an AOT load is attributed to one cause:
+#   JNI                  - JNI thunks are never AOT loaded
+#   DLT                  - DLT compilations are never AOT loaded
+#   AOT load failure     - an AOT load was attempted but it failed (the failure reason is shown)
+#   AOT compilation      - the method was AOT compiled in this run, i.e. it was not yet in the SCC
+#   EDO                  - the compilation was triggered by exception directed optimizations
+#   class not in SCC     - the class of the method is not shared
+#   class not in javacore- the class was not found in the javacore (e.g. unloaded)
+#   filtered             - the class is shared, but no AOT body exists for the method
+# The causes are ranked by the compilation time they cost.
+# Note: the vlog does not show class loaders, so a class that is loaded by several
+# loaders counts as non-shared if any of them did not share it.
+#
+# Usage: python3 explainNonAOTLoads.py vlog javacore [--format text|tsv|csv|jsonl|parquet] [--output prefix]
+#
+# Author: Marius Pirvu
+
+import re # for regular expressions
+import sys # for accessing parameters and exit
+import javacoreParser
+import outputWriter
+
+################## Configuration #####################
+maxMethodsToPrint = 100 # the most expensive methods are printed; -1 means print all
+#######################################################
+
+# + (cold) sun/reflect/Reflection.getCallerClass()Ljava/lang/Class; @ 00007FB21300003C-00007FB213000167 OrdinaryMethod - Q_SZ=1 Q_SZI=1 QW=2 j9m=000000000004D1D8 bcsz=2 JNI time=995us mem=[region=704 system=2048]KB compThreadID=0 CpuLoad=163%(10%avg) JvmCpu=0%
+compEndPattern = re.compile(r'^\+ \(([\S -]+)\) (\S+) @ .* time=(\d+)us')
+# ! (AOT load) java/nio/Buffer.<init>(IIII)V Q_SZ=274 Q_SZI=274 QW=275 j9m=00000000000B3970 time=99us compilationAotClassReloFailure memLimit=206574 KB freePhysicalMemory=205 MB mem=[region=64 system=2048]KB compThreadID=0
+compFailPattern = re.compile(r'^\! \((.+)\) (\S+) .*time=(\d+)us (\S+) ')
+
+
+'''
+Parse the vlog and return (firstComps, aotLoadFailures) where
+firstComps: methodName --> (optLevel, usec, vlogLine) for the first successful compilation of each method
+aotLoadFailures: methodName --> [lastFailureReason, totalFailureUsec] for AOT load failures that preceded it
+'''
+def parseVlog(vlog):
+    firstComps = {}
+    aotLoadFailures = {}
+    for line in vlog:
+        if line.startswith("+ "):
+            m = compEndPattern.match(line)
+            if m and m.group(2) not in firstComps:
+                firstComps[m.group(2)] = (m.group(1), int(m.group(3)), line)
+        elif line.startswith("! (AOT load)"):
+            m = compFailPattern.match(line)
+            if m and m.group(2) not in firstComps:
+                failure = aotLoadFailures.setdefault(m.group(2), ["", 0])
+                failure[0] = m.group(4)
+                failure[1] += int(m.group(3))
+    return firstComps, aotLoadFailures
+
+
+'''
+Return (nonSharedClasses, sharedClassNames) where
+nonSharedClasses: className --> {classLoaderName: numClasses}
+'''
+def indexClasses(classLoaderSection):
+    nonSharedClasses = {}
+    sharedClassNames = set()
+    classLoaderHash = classLoaderSection.classLoaderHash
+    for attribs in classLoaderSection.classHash.values():
+        if attribs['shared']:
+            sharedClassNames.add(attribs['className'])
+        else:
+            loaders = nonSharedClasses.setdefault(attribs['className'], {})
+            loaderName = classLoaderHash[attribs['classLoaderAddr']]['classLoaderName']
+            loaders[loaderName] = loaders.get(loaderName, 0) + 1
+    return nonSharedClasses, sharedClassNames
+
+
+'''
+Return (cause, costUsec, classLoaderNames) for the first compilation of a method, or None if it was an AOT load
+'''
+def attributeCause(methodName, optLevel, usec, line, aotLoadFailures, nonSharedClasses, sharedClassNames):
+    if optLevel == "AOT load":
+        return None
+    failure = aotLoadFailures.get(methodName)
+    costUsec = usec + (failure[1] if failure else 0)
+    # java/lang/String.lengthInternal()I --> java/lang/String
+    className = methodName.partition("(")[0].rpartition(".")[0]
+    loaderNames = ""
+    if " JNI " in line:
+        cause = "JNI"
+    elif " DLT" in line:
+        cause = "DLT"
+    elif failure:
+        cause = "AOT load failure: " + failure[0]
+    elif optLevel.startswith("AOT"):
+        cause = "AOT compilation"
+    elif " EDO " in line:
+        cause = "EDO"
+    elif className in nonSharedClasses:
+        cause = "class not in SCC"
+        loaderNames = ",".join(nonSharedClasses[className])
+    elif className in sharedClassNames:
+        cause = "filtered"
+    else:
+        cause = "class not in javacore"
+    return cause, costUsec, loaderNames
+
+
+def explainNonAOTLoads(vlog, javacore, outputConfig):
+    firstComps, aotLoadFailures = parseVlog(vlog)
+    try:
+        nonSharedClasses, sharedClassNames = indexClasses(javacoreParser.parseClassLoaders(javacore))
+    except ValueError as e:
+        print(e)
+        sys.exit(-1)
+
+    methods = [] # (costUsec, methodName, optLevel, cause, loaderNames)
+    causes = {} # cause --> [numMethods, costUsec]
+    loaders = {} # classLoaderName --> [numMethods, costUsec] for the "class not in SCC" cause
+    for methodName, (optLevel, usec, line) in firstComps.items():
+        attribution = attributeCause(methodName, optLevel, usec, line, aotLoadFailures, nonSharedClasses, sharedClassNames)
+        if attribution is None:
+            continue
+        cause, costUsec, loaderNames = attribution
+        methods.append((costUsec, methodName, optLevel, cause, loaderNames))
+        entry = causes.setdefault(cause, [0, 0])
+        entry[0] += 1
+        entry[1] += costUsec
+        if loaderNames:
+            for loaderName in loaderNames.split(","):
+                entry = loaders.setdefault(loaderName, [0, 0])
+                entry[0] += 1
+                entry[1] += costUsec
+    totalUsec = sum(costUsec for numMethods, costUsec in causes.values())
+    print("First time compilations that are not AOT loads:", len(methods), " Compilation time: {t:.0f} ms".format(t=totalUsec / 1000))
+
+    with outputConfig.openTable("causes", ["cause", "numMethods", "compTimeMs", "percent"], textFormat="{:52s}\t{:7d}\t{:9.1f}\t{:5.1f}",
+                                textHeader="\nCause                                               \tMethods\tCompTime(ms)\tPercent") as table:
+        for cause, (numMethods, costUsec) in sorted(causes.items(), key=lambda item: item[1][1], reverse=True):
+            table.writeRow(cause, numMethods, costUsec / 1000, 100.0 * costUsec / totalUsec if totalUsec else 0.0)
+
+    with outputConfig.openTable("nonSharedLoaders", ["classLoader", "numMethods", "compTimeMs"], textFormat="{:60s}\t{:7d}\t{:9.1f}",
+                                textHeader="\nClass loaders of the non shared classes{pad}\tMethods\tCompTime(ms)".format(pad=" " * 21)) as table:
+        for loaderName, (numMethods, costUsec) in sorted(loaders.items(), key=lambda item: item[1][1], reverse=True):
+            table.writeRow(loaderName, numMethods, costUsec / 1000)
+
+    methods.sort(reverse=True)
+    if maxMethodsToPrint >= 0:
+        methods = methods[:maxMethodsToPrint]
+    with outputConfig.openTable("methods", ["compTimeUsec", "method", "optLevel", "cause", "classLoaders"], textFormat="{:9d}\t{}\t{}\t{}\t{}",
+                                textHeader="\nMost expensive first time compilations that are not AOT loads\n     usec\tMethod\tOptLevel\tCause\tClassLoaders") as table:
+        table.writeRows(methods)
+
+
+###############################################
+outputConfig = outputWriter.parseOutputArgs(sys.argv)
+if  len(sys.argv) < 3:
+    print ("Program must have two arguments: the name of the vlog and the name of the javacore\n")
+    sys.exit(-1)
+
+# Open my files in read only mode with line buffering
+Vlog = open(str(sys.argv[1]), 'r', 1)
+javacore = open(str(sys.argv[2]), 'r', 1)
+
+explainNonAOTLoads(Vlog, javacore, outputConfig)
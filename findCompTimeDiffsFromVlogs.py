@@ -1,9 +1,12 @@
 # Script that takes 2 vlog files and compares the compilation times
 # for each method.
+#
+# Usage: python3 findCompTimeDiffsFromVlogs.py vlog1 vlog2 [--format text|tsv|csv|jsonl|parquet] [--output prefix]
 
 import re # for regular expressions
 import sys # for accessing parameters and exit
 import glob
+import outputWriter
 
 
 
@@ -41,6 +44,7 @@ def parseVlog(vlogName, methodHash):
                     methodHash[methodName] = {opt:[compTime]}
 
 
+outputConfig = outputWriter.parseOutputArgs(sys.argv)
 # Get the name of vlogs
 if  len(sys.argv) < 3:
     print ("Program must have two arguments: the names of the vlogs to compare\n")
@@ -69,6 +73,7 @@ for method in methodHash1:
                 methodHashDiff[key] = avgCompTime1 - avgCompTime2
 
 # Print the data from methodHashDiff sorted by the difference in compilation times
-for hotness_method in sorted(methodHashDiff, key=lambda k: methodHashDiff[k]):
-    print(methodHashDiff[hotness_method], hotness_method)
+with outputConfig.openTable("compTimeDiffs", ["diffUsec", "hotnessMethod"], textFormat="{} {}") as table:
+    for hotness_method in sorted(methodHashDiff, key=lambda k: methodHashDiff[k]):
+        table.writeRow(methodHashDiff[hotness_method], hotness_method)
 
@@ -0,0 +1,149 @@
+# Measure the start-up of an AppServer: the time of the first successful HTTP response
+# and the other start-up events, with nanosecond timestamps.
+# FirstResponseProber replaces loop_curl.sh: instead of spawning a curl process in a
+# tight bash loop (which adds jitter and steals CPU from the AppServer while it starts),
+# one background thread keeps trying to connect and send a GET request, and records
+# the time at which the first "200" status line arrives.
+# StartupTimeline keeps the events of one start-up, each with an epoch and a monotonic
+# timestamp in nanoseconds:
+#   "launch"             - the harness starts the AppServer/container (mark() right before)
+#   "containerStartedAt" - State.StartedAt from `docker inspect` (see parseDockerTimestamp)
+#   "appServerStart"     - first line of `docker logs --timestamps`
+#   "ready"              - the ready line of the AppServer log
+#   "firstResponse"      - first HTTP 200 seen by the prober
+# Timestamps from docker are UTC with nanoseconds, so no hour/time zone fix-ups are needed.
+#
+# Usage (in a runner):
+#   timeline = firstResponseProber.StartupTimeline()
+#   prober = firstResponseProber.FirstResponseProber(host, port, "/fruits", timeline)
+#   prober.start(); timeline.mark("launch"); ...start the AppServer...
+#   prober.wait(timeout)
+#   timeline.durationMs("launch", "firstResponse")
+# Standalone: python3 firstResponseProber.py host port path [timeoutSec]
+#   waits for the first HTTP 200 and prints the elapsed time (start the prober before the AppServer)
+#
+# Author: Marius Pirvu
+
+import calendar
+import logging
+import re # for regular expressions
+import socket
+import sys # for accessing parameters and exit
+import threading
+import time
+
+################## Configuration #####################
+probeInterval = 0.001 # seconds between two connection attempts
+connectTimeout = 1.0 # seconds for a connection attempt or a response
+#######################################################
+
+
+class StartupTimeline:
+    '''
+    Start-up events: name --> (epochNs, monotonicNs)
+    '''
+    def __init__(self):
+        self.events = {}
+        # Used to place external (epoch) timestamps on the monotonic clock
+        self.monotonicMinusEpochNs = time.monotonic_ns() - time.time_ns()
+
+    '''
+    Record an event now, or at the given epoch time (e.g. a timestamp reported by docker)
+    '''
+    def mark(self, name, epochNs=None):
+        if epochNs is None:
+            self.events[name] = (time.time_ns(), time.monotonic_ns())
+        else:
+            self.events[name] = (epochNs, epochNs + self.monotonicMinusEpochNs)
+
+    '''
+    Milliseconds between two events, or NaN if one of them is missing
+    '''
+    def durationMs(self, fromEvent, toEvent):
+        if fromEvent not in self.events or toEvent not in self.events:
+            return float("nan")
+        return (self.events[toEvent][1] - self.events[fromEvent][1]) / 1e6
+
+    def __str__(self):
+        if "launch" not in self.events:
+            return " ".join(self.events)
+        return "  ".join("{n}=+{d:.1f}ms".format(n=name, d=self.durationMs("launch", name))
+                         for name in sorted(self.events, key=lambda name: self.events[name][1]))
+
+
+'''
+Convert an RFC 3339 timestamp with nanoseconds, as printed by docker/podman
+(e.g. "2025-10-23T15:01:39.342994166Z"), to epoch nanoseconds. Returns None if the format is wrong
+'''
+def parseDockerTimestamp(timestamp):
+    m = re.match(r'(\d+)-(\d+)-(\d+)T(\d+):(\d+):(\d+)(?:\.(\d+))?(Z|[+-]\d\d:?\d\d)', timestamp.strip())
+    if not m:
+        return None
+    seconds = calendar.timegm(tuple(int(m.group(i)) for i in range(1, 7)))
+    fraction = (m.group(7) or "0")[:9].ljust(9, "0")
+    zone = m.group(8)
+    if zone != "Z":
+        sign = -1 if zone[0] == "+" else 1
+        zone = zone[1:].replace(":", "")
+        seconds += sign * (int(zone[:2]) * 3600 + int(zone[2:]) * 60)
+    return seconds * 1000000000 + int(fraction)
+
+
+class FirstResponseProber:
+    '''
+    Keeps sending "GET path" to host:port from a background thread until the first HTTP 200
+    '''
+    def __init__(self, host, port, path, timeline=None):
+        self.address = (host, int(port))
+        self.request = "GET {p} HTTP/1.1\r\nHost: {h}\r\nConnection: close\r\n\r\n".format(p=path, h=host).encode()
+        self.timeline = timeline if timeline is not None else StartupTimeline()
+        self.numAttempts = 0
+        self.stopEvent = threading.Event()
+        self.thread = threading.Thread(target=self.probe, name="prober", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def isOK(self):
+        self.numAttempts += 1
+        try:
+            with socket.create_connection(self.address, timeout=connectTimeout) as s:
+                s.sendall(self.request)
+                statusLine = s.makefile("rb").readline() # b"HTTP/1.1 200 OK\r\n"
+        except OSError: # refused, reset or timed out: not ready yet
+            return False
+        return statusLine.split()[1:2] == [b"200"]
+
+    def probe(self):
+        while not self.stopEvent.is_set():
+            if self.isOK():
+                self.timeline.mark("firstResponse")
+                return
+            self.stopEvent.wait(probeInterval)
+
+    '''
+    Wait at most `timeout` seconds for the first response. Returns True if it was received
+    '''
+    def wait(self, timeout):
+        self.thread.join(timeout)
+        self.stop()
+        received = "firstResponse" in self.timeline.events
+        if not received:
+            logging.warning("No HTTP 200 from {a} after {n} attempts".format(a=self.address, n=self.numAttempts))
+        return received
+
+    def stop(self):
+        self.stopEvent.set()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("Usage: python3 firstResponseProber.py host port path [timeoutSec]")
+        sys.exit(-1)
+    timeline = StartupTimeline()
+    prober = FirstResponseProber(sys.argv[1], sys.argv[2], sys.argv[3], timeline)
+    timeline.mark("launch")
+    prober.start()
+    if not prober.wait(float(sys.argv[4]) if len(sys.argv) > 4 else 300):
+        sys.exit(-1)
+    print("First response after {t:.1f} ms ({n} attempts)".format(t=timeline.durationMs("launch", "firstResponse"), n=prober.numAttempts))
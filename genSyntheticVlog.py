@@ -0,0 +1,154 @@
+# Python script that generates a synthetic OpenJ9 verbose log.
+# The generated vlog uses the same line layouts as a vlog obtained with
+# -Xjit:verbose={compilePerformance},verbose={inlining}: compilation starts,
+# compilation ends, compilation failures, #JITSTATE, #INL and #INFO lines.
+# It is meant as input for benchmarking the speed of the vlog analyzers
+# (see benchVlogTools.py), not for testing the JIT.
+# The size of the vlog, the opt level mix and the number of distinct methods
+# can be changed in the configuration section below.
+#
+# Usage: python3 genSyntheticVlog.py outputVlog [numCompilations]
+#
+# Author: Marius Pirvu
+
+import random
+import sys # for accessing parameters and exit
+
+################## Configuration #####################
+numCompilations = 100000 # compilation events (successful or failed) to generate
+numMethods = 20000 # number of distinct methods that get compiled
+vlogDurationMs = 600000 # timestamps are spread evenly over this interval
+randomSeed = 42 # same parameters and seed produce the same vlog
+# Weights of the opt levels for successful compilations
+optLevelMix = {
+    "AOT load"          : 30,
+    "cold"              : 25,
+    "AOT cold"          : 5,
+    "warm"              : 20,
+    "AOT warm"          : 5,
+    "hot"               : 4,
+    "profiled hot"      : 2,
+    "very-hot"          : 2,
+    "profiled very-hot" : 1,
+    "scorching"         : 1,
+    "no-opt"            : 1,
+}
+failureRatio = 0.03 # fraction of compilations that fail
+failureReasons = {
+    "compilationAotClassReloFailure" : 50,
+    "compilationInterrupted"         : 20,
+    "compilationEnforceProfiling"    : 10,
+    "compilationExcessiveComplexity" : 5,
+    "compilationLowPhysicalMemory"   : 5,
+    "compilationAotValidateFieldFailure" : 10,
+}
+jniRatio = 0.02 # fraction of cold compilations that are JNI thunks
+dltRatio = 0.005 # fraction of compilations that are DLT
+inliningRatio = 0.3 # fraction of compilations followed by a #INL line
+interpretedRatio = 0.001 # fraction of compilations followed by a "will continue as interpreted" #INFO line
+# JIT state changes as (fraction of vlogDurationMs, fromState, toState)
+jitStateChanges = [(0.05, "STARTUP", "RAMPUP"), (0.3, "RAMPUP", "STEADY"), (0.9, "STEADY", "DEEPSTEADY")]
+vmNotStartupFraction = 0.05 # "VM changed state to NOT_STARTUP" happens at this fraction of vlogDurationMs
+#######################################################
+
+packageNames = ["java/lang", "java/util", "java/util/concurrent", "org/apache/felix/resolver", "com/ibm/ws/kernel", "io/netty/buffer", "org/jboss/modules"]
+signatures = ["()V", "(I)I", "(Ljava/lang/String;)Z", "(J)D", "([BII)I", "()Ljava/lang/Object;", "(Ljava/lang/Object;Ljava/lang/Object;)Z"]
+
+
+def makeMethodNames(rng, count):
+    methodNames = []
+    for i in range(count):
+        package = packageNames[i % len(packageNames)]
+        methodNames.append("{p}/Class{c}.method{m}{s}".format(p=package, c=i // 7, m=i % 7, s=rng.choice(signatures)))
+    return methodNames
+
+
+'''
+Generate a synthetic vlog and write it to `out`, one block of lines at a time.
+Returns the number of lines written.
+'''
+def generateVlog(out, numComps=None, seed=None):
+    numComps = numCompilations if numComps is None else numComps
+    rng = random.Random(randomSeed if seed is None else seed)
+    methodNames = makeMethodNames(rng, numMethods)
+    # Draw all the random choices in bulk
+    levels = rng.choices(list(optLevelMix.keys()), weights=list(optLevelMix.values()), k=numComps)
+    methods = rng.choices(range(numMethods), k=numComps)
+    reasons = rng.choices(list(failureReasons.keys()), weights=list(failureReasons.values()), k=numComps)
+    pendingStateChanges = [(int(fraction * vlogDurationMs), fromState, toState) for fraction, fromState, toState in jitStateChanges]
+    pendingStateChanges.append((int(vmNotStartupFraction * vlogDurationMs), None, None))
+    pendingStateChanges.sort(key=lambda change: change[0])
+
+    lines = ["#INFO:  _______________________________________",
+             "#INFO:  Version Information:",
+             "#INFO:       JIT Level  - synthetic",
+             "#INFO:  Number of processors: 8",
+             "#INFO:  Free Physical Memory: 75755 MB",
+             "#INFO:  _______________________________________"]
+    numLines = 0
+    startAddr = 0x00007FB213000000
+    qSZ = 0
+    jvmCpu = 100
+    for i in range(numComps):
+        timeMs = i * vlogDurationMs // numComps
+        while pendingStateChanges and pendingStateChanges[0][0] <= timeMs:
+            changeMs, fromState, toState = pendingStateChanges.pop(0)
+            if fromState is None:
+                lines.append("#JITSTATE:  t={t:6d} VM changed state to NOT_STARTUP".format(t=changeMs))
+            else:
+                lines.append("#JITSTATE:  t={t:6d} JIT changed state from {f} to {to} cSmpl {c:3d} iSmpl {s:3d} comp {n:3d} recomp {r:3d}, Q_SZ {q:3d} CLP=ON jvmCPU={cpu}%".format(
+                             t=changeMs, f=fromState, to=toState, c=rng.randint(0, 200), s=rng.randint(0, 500), n=rng.randint(0, 100), r=rng.randint(0, 20), q=qSZ, cpu=jvmCpu))
+        level = levels[i]
+        methodName = methodNames[methods[i]]
+        j9m = 0x0000000000097B18 + methods[i] * 0x40
+        qSZ = max(0, qSZ + rng.randint(-3, 3))
+        jvmCpu = max(0, min(800, jvmCpu + rng.randint(-20, 20)))
+        dlt = level != "AOT load" and rng.random() < dltRatio
+        methodType = "DLT" if dlt else "OrdinaryMethod"
+        usec = int(rng.expovariate(1.0 / (60 if level == "AOT load" else 2000))) + 10
+        regionMem = rng.randint(64, 8192)
+        # (cold) Compiling java/lang/Double.longBitsToDouble(J)D  OrdinaryMethod j9m=0000000000097B18 t=20 compThreadID=0 memLimit=262144 KB freePhysicalMemory=75755 MB
+        lines.append(" ({l}) Compiling {m}  {mt} j9m={j9m:016X} t={t} compThreadID=0 memLimit=262144 KB freePhysicalMemory=75755 MB".format(
+                     l=level, m=methodName, mt=methodType, j9m=j9m, t=timeMs))
+        if not dlt and rng.random() < failureRatio: # failure lines do not show the DLT marker
+            # ! (cold) java/nio/Buffer.<init>(IIII)V Q_SZ=274 Q_SZI=274 QW=275 j9m=00000000000B3970 time=99us compilationAotClassReloFailure memLimit=206574 KB freePhysicalMemory=205 MB mem=[region=64 system=2048]KB compThreadID=0
+            lines.append("! ({l}) {m} Q_SZ={q} Q_SZI={q} QW={qw} j9m={j9m:016X} time={u}us {r} memLimit=206574 KB freePhysicalMemory=205 MB mem=[region={rm} system=2048]KB compThreadID=0".format(
+                         l=level, m=methodName, q=qSZ, qw=qSZ + 1, j9m=j9m, u=usec, r=reasons[i], rm=regionMem))
+        else:
+            bodySize = 0x40 + (usec * 7) % 0x3000
+            endAddr = startAddr + bodySize
+            if level == "AOT load":
+                # + (AOT load) java/lang/String.lengthInternal()I @ 00007FA6F8001140-00007FA6F8001168 Q_SZ=1 Q_SZI=1 QW=2 j9m=00000000000493F8 bcsz=37 time=51us compThreadID=0 queueTime=293us
+                lines.append("+ ({l}) {m} @ {s:016X}-{e:016X} Q_SZ={q} Q_SZI={q} QW={qw} j9m={j9m:016X} bcsz={b} time={u}us compThreadID=0 queueTime={qt}us".format(
+                             l=level, m=methodName, s=startAddr, e=endAddr, q=qSZ, qw=qSZ + 1, j9m=j9m, b=bodySize // 8, u=usec, qt=usec * 3))
+            else:
+                # + (cold) sun/reflect/Reflection.getCallerClass()Ljava/lang/Class; @ 00007FB21300003C-00007FB213000167 OrdinaryMethod - Q_SZ=1 Q_SZI=1 QW=2 j9m=000000000004D1D8 bcsz=2 JNI time=995us mem=[region=704 system=2048]KB compThreadID=0 CpuLoad=163%(10%avg) JvmCpu=0%
+                jni = " JNI" if level == "cold" and rng.random() < jniRatio else ""
+                lines.append("+ ({l}) {m} @ {s:016X}-{e:016X} {mt} - Q_SZ={q} Q_SZI={q} QW={qw} j9m={j9m:016X} bcsz={b}{jni} time={u}us mem=[region={rm} system=2048]KB compThreadID=0 CpuLoad={cl}%({ca}%avg) JvmCpu={cpu}%".format(
+                             l=level, m=methodName, s=startAddr, e=endAddr, mt=methodType, q=qSZ, qw=qSZ + 1, j9m=j9m, b=bodySize // 8, jni=jni, u=usec,
+                             rm=regionMem, cl=jvmCpu + 50, ca=(jvmCpu + 50) // 8, cpu=jvmCpu))
+                if rng.random() < inliningRatio:
+                    # #INL: 12 methods inlined into 4f5ab7c3 java/util/HashMap.putVal(ILjava/lang/Object;Ljava/lang/Object;ZZ)Ljava/lang/Object; @ 00007FB213001A40
+                    lines.append("#INL: {n} methods inlined into {h:08x} {m} @ {s:016X}".format(n=rng.randint(1, 80), h=j9m & 0xFFFFFFFF, m=methodName, s=startAddr))
+            startAddr = endAddr
+        if rng.random() < interpretedRatio:
+            lines.append("#INFO:  Method {m} will continue as interpreted".format(m=methodName))
+        if len(lines) >= 8192:
+            lines.append("")
+            out.write("\n".join(lines))
+            numLines += len(lines) - 1
+            lines = []
+    lines.append("")
+    out.write("\n".join(lines))
+    numLines += len(lines) - 1
+    return numLines
+
+
+if __name__ == "__main__":
+    if  len(sys.argv) < 2:
+        print ("Program must have an argument: the name of the vlog to generate\n")
+        sys.exit(-1)
+    numComps = int(sys.argv[2]) if len(sys.argv) > 2 else numCompilations
+    with open(sys.argv[1], "w") as vlog:
+        numLines = generateVlog(vlog, numComps)
+    print("Generated", numLines, "lines in", sys.argv[1])
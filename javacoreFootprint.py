@@ -0,0 +1,139 @@
+# Python script that analyzes the footprint related sections of OpenJ9 javacores,
+# such as the ones collected by the run* scripts when `memAnalysis` is enabled.
+# From the NATIVEMEMINFO section it prints the native memory used by a few
+# categories of interest (JIT code cache, JIT data cache, JIT scratch and other
+# JIT memory, classes, SCC, threads, ...) followed by the whole category tree.
+# From the THREADS section it prints the threads grouped by name (with the
+# numbers replaced by '#'), with their native stack sizes and CPU time,
+# and the thread CPU usage summary.
+# When two javacores are given (e.g. from two configurations) all values are
+# shown side by side together with the difference B-A.
+# Both sections are parsed in a single pass over the javacore (see javacoreParser.py).
+#
+# Usage: python3 javacoreFootprint.py javacoreA [javacoreB] [--format text|tsv|csv|jsonl|parquet] [--output prefix]
+#
+# Author: Marius Pirvu
+
+import re # for regular expressions
+import sys # for accessing parameters and exit
+import javacoreParser
+import outputWriter
+
+################## Configuration #####################
+# Categories of interest and their paths in the NATIVEMEMINFO tree
+footprintCategories = {
+    "Total JRE"         : "JRE",
+    "Java heap"         : "JRE/VM/Memory Manager (GC)/Java Heap",
+    "GC other"          : "JRE/VM/Memory Manager (GC)/Other",
+    "Classes"           : "JRE/VM/Classes",
+    "Shared class cache": "JRE/VM/Classes/Shared Class Cache",
+    "Threads"           : "JRE/VM/Threads",
+    "JIT total"         : "JRE/JIT",
+    "JIT code cache"    : "JRE/JIT/JIT Code Cache",
+    "JIT data cache"    : "JRE/JIT/JIT Data Cache",
+    "JIT scratch/other" : "JRE/JIT/Other",
+    "Class libraries"   : "JRE/Class Libraries",
+}
+printNativeMemoryTree = True
+printThreads = True
+#######################################################
+
+threadNumberPattern = re.compile(r'\d+')
+
+
+def parseJavacoreFile(javacoreFileName):
+    with open(javacoreFileName, 'r') as javacore:
+        nativeMemory, threads = javacoreParser.parseJavacoreSections(javacore, [javacoreParser.NativeMemorySection(), javacoreParser.ThreadSection()])
+    if not nativeMemory.categories:
+        print("Warning: no NATIVEMEMINFO section in", javacoreFileName)
+    return nativeMemory, threads
+
+
+'''
+Group threads by name, with numbers replaced by '#' ("JIT Compilation Thread-003" --> "JIT Compilation Thread-#")
+and without the " Suspended" suffix of the inactive compilation threads
+Returns a dictionary groupName --> (numThreads, stackKB, cpuSecs)
+'''
+def groupThreads(threadSection):
+    groups = {}
+    for thread in threadSection.threads:
+        groupName = threadNumberPattern.sub("#", thread["name"]).replace(" Suspended", "")
+        numThreads, stackKB, cpuSecs = groups.get(groupName, (0, 0.0, 0.0))
+        groups[groupName] = (numThreads + 1, stackKB + thread["stackSize"] / 1024, cpuSecs + thread["cpuSecs"])
+    return groups
+
+
+'''
+Write one row per key, with the values of all the javacores side by side,
+followed by the difference between the last and the first javacore.
+`valuesPerJavacore` is a list of dictionaries key --> tuple of values.
+'''
+def writeComparison(table, valuesPerJavacore, numValues, keyFormatter=lambda key: key):
+    keys = {}
+    for values in valuesPerJavacore:
+        keys.update(dict.fromkeys(values))
+    zero = (0,) * numValues
+    for key in keys:
+        row = [keyFormatter(key)]
+        for values in valuesPerJavacore:
+            row.extend(values.get(key, zero))
+        if len(valuesPerJavacore) > 1:
+            first = valuesPerJavacore[0].get(key, zero)
+            last = valuesPerJavacore[-1].get(key, zero)
+            row.extend(b - a for a, b in zip(first, last))
+        table.writeRow(*row)
+
+
+'''
+Column names, text format and text header for a comparison table
+'''
+def comparisonLayout(keyColumn, keyWidth, valueColumns, valueFormats, numJavacores):
+    labels = ["A", "B"][:numJavacores] if numJavacores > 1 else [""]
+    if numJavacores > 1:
+        labels.append("Delta")
+    columns = [keyColumn] + [column + label for label in labels for column in valueColumns]
+    textFormat = "{:" + str(keyWidth) + "s}" + "".join("\t" + valueFormat for label in labels for valueFormat in valueFormats)
+    textHeader = keyColumn.ljust(keyWidth) + "".join("\t" + (column + label).rjust(10) for label in labels for column in valueColumns)
+    return columns, textFormat, textHeader
+
+
+def printFootprint(javacoreFileNames, outputConfig):
+    parsed = [parseJavacoreFile(fileName) for fileName in javacoreFileNames]
+    numJavacores = len(parsed)
+    for label, fileName in zip(("A", "B"), javacoreFileNames):
+        print("Javacore {l}: {f}".format(l=label, f=fileName) if numJavacores > 1 else "Javacore: " + fileName)
+
+    # Categories of interest
+    footprints = [{name: (nativeMemory.categories.get(path, (0, 0))[0] / 1024,) for name, path in footprintCategories.items()} for nativeMemory, threads in parsed]
+    columns, textFormat, textHeader = comparisonLayout("category", 20, ["KB"], ["{:10.0f}"], numJavacores)
+    with outputConfig.openTable("footprint", columns, textFormat, "\n" + textHeader) as table:
+        writeComparison(table, footprints, 1)
+
+    if printNativeMemoryTree:
+        trees = [{path: (bytes / 1024, allocations) for path, (bytes, allocations) in nativeMemory.categories.items()} for nativeMemory, threads in parsed]
+        columns, textFormat, textHeader = comparisonLayout("category", 50, ["KB", "Allocs"], ["{:10.0f}", "{:10d}"], numJavacores)
+        # In text mode the tree is shown with indentation instead of full paths
+        keyFormatter = (lambda path: "  " * path.count("/") + path.rpartition("/")[2]) if outputConfig.isText() else (lambda path: path)
+        with outputConfig.openTable("nativeMemory", columns, textFormat, "\nNative memory categories\n" + textHeader) as table:
+            writeComparison(table, trees, 2, keyFormatter)
+
+    if printThreads:
+        threadGroups = [groupThreads(threads) for nativeMemory, threads in parsed]
+        columns, textFormat, textHeader = comparisonLayout("threadGroup", 40, ["Threads", "StackKB", "CpuSecs"], ["{:10d}", "{:10.0f}", "{:10.2f}"], numJavacores)
+        with outputConfig.openTable("threadGroups", columns, textFormat, "\nThreads grouped by name\n" + textHeader) as table:
+            writeComparison(table, threadGroups, 3)
+
+        cpuCategories = [{path: (cpuSecs,) for path, cpuSecs in threads.cpuCategories.items()} for nativeMemory, threads in parsed]
+        columns, textFormat, textHeader = comparisonLayout("cpuCategory", 40, ["CpuSecs"], ["{:10.2f}"], numJavacores)
+        keyFormatter = (lambda path: "  " * path.count("/") + path.rpartition("/")[2]) if outputConfig.isText() else (lambda path: path)
+        with outputConfig.openTable("threadCpu", columns, textFormat, "\nThread CPU usage summary\n" + textHeader) as table:
+            writeComparison(table, cpuCategories, 1, keyFormatter)
+
+
+###############################################
+outputConfig = outputWriter.parseOutputArgs(sys.argv)
+if  len(sys.argv) < 2:
+    print ("Program must have an argument: the name of the javacore and optionally the name of a second javacore to compare with\n")
+    sys.exit(-1)
+
+printFootprint(sys.argv[1:3], outputConfig)
@@ -0,0 +1,326 @@
+# Library for parsing OpenJ9 javacores.
+# A javacore is made of sections that start with a "0SECTION" line, e.g.
+#   0SECTION       CLASSES subcomponent dump routine
+# and every line starts with a fixed tag (1CLTEXTCLLSS, 2CLTEXTCLLOADER, 3CLTEXTCLASS, ...)
+# whose first digit is the nesting level of the information on that line.
+# parseSections() reads the javacore only once, skips the sections that were not
+# requested and dispatches every other line to the handler registered for its tag.
+# Parsers for individual sections are built on top of it: each one is a class with a
+# `sectionName` and a handlers() method (see ClassLoaderSection, NativeMemorySection
+# and ThreadSection), and several of them can share the same pass (see parseJavacoreSections).
+#
+# Author: Marius Pirvu
+
+import re # for regular expressions
+
+
+'''
+Read the javacore once and call handlers[tag](payload) for every line of the
+requested sections whose tag has a handler. `payload` is the line without the
+tag and without the surrounding whitespace.
+`sections` is a collection of section names (e.g. "CLASSES", "NATIVEMEMINFO", "THREADS")
+or None for all sections. Lines that precede the first 0SECTION line are always
+dispatched, so that excerpts of a javacore can be parsed as well.
+Reading stops as soon as all the requested sections have been seen.
+'''
+def parseSections(javacore, sections, handlers):
+    remainingSections = set(sections) if sections is not None else None
+    active = True
+    for line in javacore:
+        if line.startswith("0SECTION"):
+            # 0SECTION       SHARED CLASSES subcomponent dump routine
+            sectionName = line[8:].strip().partition(" subcomponent")[0]
+            if remainingSections is None:
+                continue
+            if active:
+                if not remainingSections:
+                    break # all requested sections were parsed
+            active = sectionName in remainingSections
+            remainingSections.discard(sectionName)
+            continue
+        if active:
+            # The tag is separated from the payload by spaces and/or tabs
+            fields = line.split(None, 1)
+            if fields:
+                handler = handlers.get(fields[0])
+                if handler is not None:
+                    handler(fields[1].rstrip() if len(fields) > 1 else "")
+
+
+'''
+1CLTEXTCLLSS            12345678: 1=primordial,2=extension,3=shareable,4=middleware,5=system,6=trusted,7=application,8=delegating
+2CLTEXTCLLOADER         -----t-- Loader org/jboss/modules/ModuleClassLoader(0x00000000B1701190), Parent jdk/internal/loader/ClassLoaders$AppClassLoader(0x00000000AED4F1C0)
+3CLNMBRLOADEDLIB                Number of loaded libraries 0
+3CLNMBRLOADEDCL                 Number of loaded classes 15
+2CLTEXTCLLOADER         -x--st-- Loader jdk/internal/loader/ClassLoaders$PlatformClassLoader(0x00000000AED3DEF0), Parent *none*(0x0000000000000000)
+3CLNMBRLOADEDLIB                Number of loaded libraries 1
+3CLNMBRLOADEDCL                 Number of loaded classes 77
+3CLNMBRSHAREDCL                 Number of shared classes 72
+2CLTEXTCLLOADER         p---st-- Loader *System*(0x00000000FFF0A2B8)
+...
+2CLTEXTCLLOAD           Loader org/jboss/modules/ModuleClassLoader(0x00000000B1701190)
+3CLTEXTCLASS                    com/fasterxml/jackson/databind/exc/UnrecognizedPropertyException(0x00000000030DFB00)
+3CLTEXTCLASS                    com/ibm/ws/sib/jfapchannel/server/impl/JFapDiscriminator(0x0000000000AD5800 shared)
+'''
+classLoaderPattern = re.compile(r'([-\w]{8}) Loader (\S+)\(0x([0-9A-F]+)\), Parent (\S+)\(0x([0-9A-F]+)\)')
+systemClassLoaderPattern = re.compile(r'([-\w]{8}) Loader \*System\*\(0x([0-9A-F]+)\)') # the system class loader has no parent specified
+classLoaderHeaderPattern = re.compile(r'Loader (\S+)\(0x([0-9A-F]+)\)')
+
+
+'''
+Information from the CLASSES section of a javacore.
+classLoaderHash: classLoaderAddr --> {"classLoaderName", "flags", "parentCLName", "parentCLAddr",
+                                      "numLibsLoaded", "numClassesLoaded", "numClassesShared"}
+classHash: classAddr --> {"className", "shared", "classLoaderAddr"}
+'''
+class ClassLoaderSection:
+    sectionName = "CLASSES"
+
+    def __init__(self):
+        self.classLoaderHash = {}
+        self.classHash = {}
+        self.totalClasses = 0
+        self.totalSharedClasses = 0
+        self.foundLegend = False
+        self.activeClassLoader = None
+        self.hierarchyCache = {} # classLoaderAddr --> tuple of class loader names
+        self.uniqueHierarchies = {} # used to intern the hierarchy tuples
+
+    def handlers(self):
+        return {"1CLTEXTCLLSS"    : self.parseLegend,
+                "2CLTEXTCLLOADER" : self.parseClassLoader,
+                "3CLNMBRLOADEDLIB": self.parseNumLibsLoaded,
+                "3CLNMBRLOADEDCL" : self.parseNumClassesLoaded,
+                "3CLNMBRSHAREDCL" : self.parseNumClassesShared,
+                "2CLTEXTCLLOAD"   : self.parseClassLoaderHeader,
+                "3CLTEXTCLASS"    : self.parseClass}
+
+    def parseLegend(self, payload):
+        self.foundLegend = True
+
+    def parseClassLoader(self, payload):
+        m = classLoaderPattern.match(payload)
+        if m:
+            classLoaderAddr = int(m.group(3), base=16)
+            self.classLoaderHash[classLoaderAddr] = {"classLoaderName":m.group(2), "flags":m.group(1), "parentCLName":m.group(4), "parentCLAddr":int(m.group(5), base=16)}
+        else:
+            m = systemClassLoaderPattern.match(payload)
+            if not m:
+                raise ValueError("Unrecognized classLoaderPattern: {p}".format(p=payload))
+            classLoaderAddr = int(m.group(2), base=16)
+            self.classLoaderHash[classLoaderAddr] = {"classLoaderName":"System", "flags":m.group(1), "parentCLName":"*none*", "parentCLAddr":0}
+        self.activeClassLoader = classLoaderAddr
+
+    def parseNumLibsLoaded(self, payload):
+        assert payload.startswith("Number of loaded libraries"), "Wrong line with 3CLNMBRLOADEDLIB heading: {l}".format(l=payload)
+        self.classLoaderHash[self.activeClassLoader]['numLibsLoaded'] = int(payload.rpartition(" ")[2])
+
+    def parseNumClassesLoaded(self, payload):
+        assert payload.startswith("Number of loaded classes"), "Wrong line with 3CLNMBRLOADEDCL heading: {l}".format(l=payload)
+        numClasses = int(payload.rpartition(" ")[2])
+        self.classLoaderHash[self.activeClassLoader]['numClassesLoaded'] = numClasses
+        self.totalClasses += numClasses
+
+    def parseNumClassesShared(self, payload):
+        assert payload.startswith("Number of shared classes"), "Wrong line with 3CLNMBRSHAREDCL heading: {l}".format(l=payload)
+        numShared = int(payload.rpartition(" ")[2])
+        self.classLoaderHash[self.activeClassLoader]['numClassesShared'] = numShared
+        self.totalSharedClasses += numShared
+
+    def parseClassLoaderHeader(self, payload):
+        m = classLoaderHeaderPattern.match(payload)
+        assert m, "Wrong line with 2CLTEXTCLLOAD heading: {l}".format(l=payload)
+        classLoaderAddr = int(m.group(2), base=16)
+        assert classLoaderAddr in self.classLoaderHash, "Class loader must have been seen before"
+        self.activeClassLoader = classLoaderAddr
+
+    def parseClass(self, payload):
+        # com/ibm/ws/sib/jfapchannel/server/impl/JFapDiscriminator(0x0000000000AD5800 shared)
+        # Plain string operations instead of a regex because there can be 100k+ of these lines
+        className, sep, addr = payload.rpartition("(0x")
+        if not sep:
+            return
+        shared = addr.endswith(" shared)")
+        addr = addr[:-8] if shared else addr[:-1]
+        try:
+            classAddr = int(addr, base=16)
+        except ValueError:
+            return
+        self.classHash[classAddr] = {'className':className, 'shared':shared, 'classLoaderAddr':self.activeClassLoader}
+
+    '''
+    Return the names of the class loader and of all its ancestors as a tuple,
+    starting with the class loader itself. Names are used instead of addresses
+    because many loaders have the same name, but different addresses.
+    The hierarchy is computed once per class loader and equal hierarchies
+    are represented by the same tuple object.
+    '''
+    def classLoaderHierarchy(self, classLoaderAddr):
+        hierarchyCache = self.hierarchyCache
+        hierarchy = hierarchyCache.get(classLoaderAddr)
+        if hierarchy is not None:
+            return hierarchy
+        # Walk up until we find an ancestor with a known hierarchy or the root
+        chain = []
+        addr = classLoaderAddr
+        while addr != 0 and addr in self.classLoaderHash and addr not in hierarchyCache and len(chain) <= len(self.classLoaderHash):
+            chain.append(addr)
+            addr = self.classLoaderHash[addr]['parentCLAddr']
+        hierarchy = hierarchyCache.get(addr, ())
+        for addr in reversed(chain):
+            hierarchy = (self.classLoaderHash[addr]['classLoaderName'],) + hierarchy
+            hierarchy = self.uniqueHierarchies.setdefault(hierarchy, hierarchy)
+            hierarchyCache[addr] = hierarchy
+        return hierarchy
+
+    '''
+    Group the shared (or non shared) classes by the hierarchy of their class loader.
+    Returns a dictionary hierarchy --> list of class names
+    '''
+    def classesByHierarchy(self, shared):
+        groups = {}
+        for attribs in self.classHash.values():
+            if attribs['shared'] == shared:
+                hierarchy = self.classLoaderHierarchy(attribs['classLoaderAddr'])
+                classNames = groups.get(hierarchy)
+                if classNames is None:
+                    groups[hierarchy] = classNames = []
+                classNames.append(attribs['className'])
+        return groups
+
+
+'''
+Feed several section parsers (ClassLoaderSection, NativeMemorySection, ...)
+from a single pass over the javacore
+'''
+def parseJavacoreSections(javacore, sectionParsers):
+    handlers = {}
+    for sectionParser in sectionParsers:
+        handlers.update(sectionParser.handlers())
+    parseSections(javacore, [sectionParser.sectionName for sectionParser in sectionParsers], handlers)
+    return sectionParsers
+
+
+'''
+Parse the CLASSES section of a javacore and return a ClassLoaderSection.
+Raises ValueError if the javacore does not contain the class loader legend.
+'''
+def parseClassLoaders(javacore):
+    classLoaderSection = ClassLoaderSection()
+    parseSections(javacore, ("CLASSES",), classLoaderSection.handlers())
+    if not classLoaderSection.foundLegend:
+        raise ValueError("Cannot find classloader legend in the javacore")
+    return classLoaderSection
+
+
+'''
+0MEMUSER
+1MEMUSER       JRE: 1,196,573,864 bytes / 38506 allocations
+1MEMUSER       |
+2MEMUSER       +--VM: 915,306,936 bytes / 30478 allocations
+2MEMUSER       |  |
+3MEMUSER       |  +--Classes: 52,358,904 bytes / 12345 allocations
+3MEMUSER       |  |  |
+4MEMUSER       |  |  +--Shared Class Cache: 62,914,656 bytes / 2 allocations
+...
+2MEMUSER       +--JIT: 120,233,136 bytes / 2398 allocations
+3MEMUSER       |  +--JIT Code Cache: 67,108,864 bytes / 1 allocation
+3MEMUSER       |  +--JIT Data Cache: 2,097,216 bytes / 1 allocation
+3MEMUSER       |  +--Other: 51,027,056 bytes / 2396 allocations
+'''
+nativeMemoryPattern = re.compile(r'([^:]+): ([\d,]+) bytes / (\d+) allocations?')
+
+
+'''
+Native memory categories from the NATIVEMEMINFO section of a javacore.
+categories: "JRE/VM/Classes" --> (bytes, allocations); the key is the path
+of the category in the tree, so that categories with the same name
+(e.g. "Other") are not mixed up. Insertion order follows the javacore.
+'''
+class NativeMemorySection:
+    sectionName = "NATIVEMEMINFO"
+
+    def __init__(self):
+        self.categories = {}
+        self.path = [] # names of the categories on the path to the current one
+
+    def handlers(self):
+        # The digit in the tag is the depth of the category in the tree
+        return {"{d}MEMUSER".format(d=depth) : (lambda payload, depth=depth: self.parseCategory(depth, payload)) for depth in range(1, 10)}
+
+    def parseCategory(self, depth, payload):
+        # |  |  +--Shared Class Cache: 62,914,656 bytes / 2 allocations
+        m = nativeMemoryPattern.match(payload.lstrip("|+- "))
+        if not m:
+            return # tree drawing lines like "|  |"
+        del self.path[depth - 1:]
+        self.path.append(m.group(1))
+        self.categories["/".join(self.path)] = (int(m.group(2).replace(",", "")), int(m.group(3)))
+
+
+'''
+3XMTHREADINFO      "JIT Compilation Thread-000" J9VMThread:0x0000000000122F00, omrthread_t:0x00007F2A6C0E5E48, java/lang/Thread:0x00000000FFF05CE8, state:R, prio=10
+3XMTHREADINFO1            (native thread ID:0x1F25, native priority:0xB, native policy:UNKNOWN, vmstate:CW, vm thread flags:0x00000081)
+3XMTHREADINFO2            (native stack address range from:0x00007F2A4CAEE000, to:0x00007F2A4CBEE000, size:0x100000)
+3XMCPUTIME               CPU usage total: 1.234567890 secs, current category="JIT"
+...
+1XMTHDSUMMARY  Threads CPU Usage Summary
+1XMTHDCATEGORY All JVM attached threads: 3.456789000 secs
+1XMTHDCATEGORY |
+2XMTHDCATEGORY +--System-JVM: 2.345678000 secs
+2XMTHDCATEGORY |  |
+3XMTHDCATEGORY |  +--JIT: 1.234567000 secs
+'''
+threadNamePattern = re.compile(r'"(.*)" ')
+threadStatePattern = re.compile(r'state:(\w+)')
+threadStackSizePattern = re.compile(r'size:0x([0-9A-Fa-f]+)')
+threadCpuPattern = re.compile(r'CPU usage total: ([\d.]+) secs(?:, current category="(.+)")?')
+cpuCategoryPattern = re.compile(r'([^:]+): ([\d.]+) secs')
+
+
+'''
+Threads from the THREADS section of a javacore.
+threads: list of {"name", "state", "stackSize", "cpuSecs", "cpuCategory"}
+cpuCategories: "All JVM attached threads/System-JVM/JIT" --> CPU seconds, from the thread CPU usage summary
+'''
+class ThreadSection:
+    sectionName = "THREADS"
+
+    def __init__(self):
+        self.threads = []
+        self.cpuCategories = {}
+        self.path = []
+
+    def handlers(self):
+        handlers = {"3XMTHREADINFO" : self.parseThread,
+                    "3XMTHREADINFO2": self.parseStack,
+                    "3XMCPUTIME"    : self.parseThreadCpuTime}
+        for depth in range(1, 10):
+            handlers["{d}XMTHDCATEGORY".format(d=depth)] = lambda payload, depth=depth: self.parseCpuCategory(depth, payload)
+        return handlers
+
+    def parseThread(self, payload):
+        m = threadNamePattern.match(payload)
+        name = m.group(1) if m else payload # e.g. "Anonymous native thread"
+        m = threadStatePattern.search(payload)
+        self.threads.append({"name":name, "state":m.group(1) if m else "", "stackSize":0, "cpuSecs":0.0, "cpuCategory":""})
+
+    def parseStack(self, payload):
+        m = threadStackSizePattern.search(payload)
+        if m and self.threads:
+            self.threads[-1]["stackSize"] = int(m.group(1), base=16)
+
+    def parseThreadCpuTime(self, payload):
+        m = threadCpuPattern.match(payload)
+        if m and self.threads:
+            self.threads[-1]["cpuSecs"] = float(m.group(1))
+            self.threads[-1]["cpuCategory"] = m.group(2) or ""
+
+    def parseCpuCategory(self, depth, payload):
+        # The thread CPU usage summary is a tree like the NATIVEMEMINFO one
+        m = cpuCategoryPattern.match(payload.lstrip("|+- "))
+        if not m:
+            return # tree drawing lines like "|  |"
+        del self.path[depth - 1:]
+        self.path.append(m.group(1))
+        self.cpuCategories["/".join(self.path)] = float(m.group(2))
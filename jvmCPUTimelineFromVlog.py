@@ -1,44 +1,207 @@
 # Python script that parses an OpenJ9 verbose log and
 # prints a timeline of JVM CPU utilizations.
+# The irregular JvmCpu samples from the vlog are resampled into a uniform
+# series with `resolutionMs` granularity. Each output value is the time-weighted
+# average of the JVM CPU utilization over that interval (a sample is assumed
+# to hold until the next sample is seen). The CpuLoad samples (CPU utilization
+# of the whole machine) are resampled on the same grid and printed as a second
+# column; intervals before the first CpuLoad sample have no value (nan).
+# The series can be optionally smoothed with an EWMA or with a rolling-window average.
+# At the end, the time-weighted average JVM CPU and CpuLoad are printed for each JIT
+# phase (STARTUP, RAMPUP, STEADY, ...) as determined from #JITSTATE lines.
 #
-# Usage: python3 jvmCPUTimelineFromVlog.py vlogFilename
+# Usage: python3 jvmCPUTimelineFromVlog.py vlogFilename [--format text|tsv|csv|jsonl|parquet] [--output prefix]
 #
 # Author: Marius Pirvu
 
 import re # for regular expressions
 import sys # for accessing parameters and exit
+from array import array
+import numpy as np
+import outputWriter
 
+################## Configuration #####################
+resolutionMs = 100 # granularity of the output series
+smoothing = "none" # one of "none", "ewma", "rolling"
+ewmaAlpha = 0.2 # weight of the newest value for "ewma" smoothing
+rollingWindow = 10 # number of intervals averaged for "rolling" smoothing
+printPhaseAverages = True
+#######################################################
+
+
+'''
+Parse the vlog and return (sampleTimes, jvmCpuSamples, cpuLoadTimes, cpuLoadSamples, phaseChanges, endTimeMs)
+where the first four are numpy arrays and phaseChanges is a list of (timeMs, fromState, toState)
+'''
 def parseVlog(vlog):
+    sampleTimes = array('q')
+    jvmCpuSamples = array('q')
+    cpuLoadTimes = array('q')
+    cpuLoadSamples = array('q')
+    phaseChanges = []
     crtTimeMs = 0
-    lastPrintedTime = 0
-    jvmCpu = 0
-    lastPrintedCpu = 0
+    timePattern = re.compile(r"\st=\s*(\d+)")
+    jvmCpuPattern = re.compile(r"\sJvmCpu=(\d+)%", re.IGNORECASE) # JvmCpu or JvmCPU
+    cpuLoadPattern = re.compile(r"\sCpuLoad=(\d+)%")
+    # #JITSTATE:  t=  3150 JIT changed state from STARTUP to RAMPUP cSmpl  87 iSmpl 126 comp  46 recomp   0, Q_SZ  18 CLP=ON jvmCPU=96%
+    jitStatePattern = re.compile(r"#JITSTATE:\s+t=\s*(\d+)\s+JIT changed state from (\S+) to (\S+)")
     for line in vlog:
         # search for lines with timestamp t= 76254
-        match = re.search(r"\st=\s*(\d+)", line)
+        match = timePattern.search(line)
         if match:
             crtTimeMs = max(crtTimeMs, int(match.group(1)))
+            if line.startswith("#JITSTATE"):
+                m = jitStatePattern.match(line)
+                if m:
+                    phaseChanges.append((crtTimeMs, m.group(2), m.group(3)))
 
-        match = re.search(r"\sJvmCpu=(\d+)%", line, re.IGNORECASE) # JvmCpu or JvmCPU
+        match = jvmCpuPattern.search(line)
+        if match:
+            sampleTimes.append(crtTimeMs)
+            jvmCpuSamples.append(int(match.group(1)))
+        match = cpuLoadPattern.search(line)
         if match:
-            jvmCpu = int(match.group(1)) # last seen CPU utilization
-
-            printIt = True
-            # We are about to print the newly read CPU utilization
-            # If the timestamp has not changed since the last printout,
-            # then we either add a small time bump if the new CPU utilization is different
-            # or suppress printing altogether if the new CPU utilization is the same
-            if lastPrintedTime == crtTimeMs:
-                if lastPrintedCpu != jvmCpu:
-                    crtTimeMs += 1
-                else:
-                    printIt = False
-            if printIt:
-                print("{time:10d}\t{jvmCpu:3d}".format(time=crtTimeMs, jvmCpu=jvmCpu))
-                lastPrintedTime = crtTimeMs
-                lastPrintedCpu = jvmCpu
+            cpuLoadTimes.append(crtTimeMs)
+            cpuLoadSamples.append(int(match.group(1)))
+    toFloats = lambda samples: np.frombuffer(samples, dtype=np.int64).astype(float)
+    return toFloats(sampleTimes), toFloats(jvmCpuSamples), toFloats(cpuLoadTimes), toFloats(cpuLoadSamples), phaseChanges, crtTimeMs
+
+
+'''
+Return a function that computes the integral of the step function
+defined by (sampleTimes, values) from sampleTimes[0] up to the given times.
+Each value holds until the next sample; the last one holds until endTimeMs.
+For duplicate timestamps only the last value has an effect.
+'''
+def stepIntegral(sampleTimes, values, endTimeMs):
+    widths = np.diff(sampleTimes, append=endTimeMs)
+    cumIntegral = np.concatenate(([0.0], np.cumsum(values * widths)))
+    def integral(x):
+        x = np.clip(x, sampleTimes[0], endTimeMs)
+        k = np.clip(np.searchsorted(sampleTimes, x, side='right') - 1, 0, len(sampleTimes) - 1)
+        return cumIntegral[k] + values[k] * (x - sampleTimes[k])
+    return integral
+
+
+'''
+Edges of the intervals of `resolution` ms that cover [firstTimeMs, endTimeMs]
+'''
+def intervalEdges(firstTimeMs, endTimeMs, resolution):
+    firstEdge = (firstTimeMs // resolution) * resolution
+    return np.arange(firstEdge, endTimeMs + resolution, resolution, dtype=float)
+
+
+'''
+Resample the step function into the intervals delimited by `edges`.
+Returns the average value of every interval; intervals before the first
+sample have no value (nan)
+'''
+def resample(sampleTimes, values, endTimeMs, edges):
+    if len(sampleTimes) == 0:
+        return np.full(len(edges) - 1, np.nan)
+    integral = stepIntegral(sampleTimes, values, endTimeMs)
+    coveredEdges = np.clip(edges, sampleTimes[0], endTimeMs)
+    covered = np.diff(coveredEdges)
+    areas = np.diff(integral(edges))
+    averages = np.divide(areas, covered, out=np.zeros_like(areas), where=covered > 0)
+    averages[edges[1:] <= sampleTimes[0]] = np.nan
+    return averages
+
+
+'''
+Exponentially weighted moving average: y[i] = alpha*x[i] + (1-alpha)*y[i-1]
+The recurrence is evaluated in closed form over blocks that are short enough
+for the powers of (1-alpha) to stay well within the float range.
+'''
+def ewma(values, alpha):
+    result = np.empty_like(values)
+    if len(values) == 0:
+        return result
+    if alpha >= 1.0:
+        result[:] = values
+        return result
+    decay = 1.0 - alpha
+    blockSize = max(1, int(27.0 / -np.log(decay))) # keeps decay**-blockSize below ~1e12
+    prev = values[0]
+    for start in range(0, len(values), blockSize):
+        block = values[start:start + blockSize]
+        powers = decay ** np.arange(1, len(block) + 1)
+        # y[i] = decay^(i+1) * prev + sum_{k<=i} alpha * x[k] * decay^(i-k)
+        result[start:start + len(block)] = powers * (prev + np.cumsum(alpha * block / powers))
+        prev = result[start + len(block) - 1]
+    return result
+
+
+'''
+Trailing rolling average over `window` intervals (shorter at the start of the series)
+'''
+def rollingAverage(values, window):
+    cumSum = np.concatenate(([0.0], np.cumsum(values)))
+    idx = np.arange(1, len(values) + 1)
+    lo = np.maximum(idx - window, 0)
+    return (cumSum[idx] - cumSum[lo]) / (idx - lo)
+
+
+'''
+Apply the configured smoothing to the intervals that have a value
+(they are contiguous: from the first sample to the end of the vlog)
+'''
+def smooth(values):
+    valid = ~np.isnan(values)
+    if smoothing == "ewma":
+        values[valid] = ewma(values[valid], ewmaAlpha)
+    elif smoothing == "rolling":
+        values[valid] = rollingAverage(values[valid], rollingWindow)
+    return values
+
+
+'''
+Compute the time-weighted average value (JVM CPU or CpuLoad) for each JIT state.
+Returns a list of (state, durationMs, avgValue) in order of first appearance.
+'''
+def computePhaseAverages(sampleTimes, values, endTimeMs, phaseChanges):
+    if phaseChanges:
+        boundaries = [0] + [timeMs for timeMs, fromState, toState in phaseChanges] + [endTimeMs]
+        states = [phaseChanges[0][1]] + [toState for timeMs, fromState, toState in phaseChanges]
+    else:
+        boundaries = [0, endTimeMs]
+        states = ["ALL"]
+    boundaries = np.array(boundaries, dtype=float)
+    if len(sampleTimes) > 0:
+        integral = stepIntegral(sampleTimes, values, endTimeMs)
+        areas = np.diff(integral(boundaries))
+        durations = np.diff(np.clip(boundaries, sampleTimes[0], endTimeMs))
+    else: # no samples: every average is nan
+        areas = durations = np.zeros(len(states))
+    totals = {} # state --> [area, duration, wallDuration]
+    for state, area, duration, wallDuration in zip(states, areas, durations, np.diff(boundaries)):
+        entry = totals.setdefault(state, [0.0, 0.0, 0.0])
+        entry[0] += area
+        entry[1] += duration
+        entry[2] += wallDuration
+    return [(state, wallDuration, area/duration if duration > 0 else np.nan) for state, (area, duration, wallDuration) in totals.items()]
+
+
+def printJvmCpuTimeline(vlog, outputConfig):
+    sampleTimes, jvmCpuSamples, cpuLoadTimes, cpuLoadSamples, phaseChanges, endTimeMs = parseVlog(vlog)
+    if len(sampleTimes) == 0:
+        print("No JvmCpu samples found in the vlog")
+        return
+    edges = intervalEdges(sampleTimes[0], endTimeMs, resolutionMs)
+    jvmCpu = smooth(resample(sampleTimes, jvmCpuSamples, endTimeMs, edges))
+    cpuLoad = smooth(resample(cpuLoadTimes, cpuLoadSamples, endTimeMs, edges))
+    with outputConfig.openTable("jvmCpu", ["timeMs", "jvmCpu", "cpuLoad"], textFormat="{:10d}\t{:5.0f}\t{:5.0f}") as table:
+        table.writeRows(zip(edges[:-1].astype(int).tolist(), jvmCpu.tolist(), cpuLoad.tolist()))
+
+    if printPhaseAverages:
+        jvmCpuAverages = computePhaseAverages(sampleTimes, jvmCpuSamples, endTimeMs, phaseChanges)
+        cpuLoadAverages = computePhaseAverages(cpuLoadTimes, cpuLoadSamples, endTimeMs, phaseChanges)
+        with outputConfig.openTable("phaseAverages", ["phase", "durationMs", "avgJvmCpu", "avgCpuLoad"], textFormat="{:12s}\t{:10.0f}\t{:7.1f}\t{:7.1f}",
+                                    textHeader="\nPhase       \tDuration(ms)\tAvg JvmCpu(%)\tAvg CpuLoad(%)") as table:
+            table.writeRows((state, durationMs, avgJvmCpu, avgCpuLoad) for (state, durationMs, avgJvmCpu), (_, _, avgCpuLoad) in zip(jvmCpuAverages, cpuLoadAverages))
 
 ###############################################
+outputConfig = outputWriter.parseOutputArgs(sys.argv)
 # Get the name of vlog
 if  len(sys.argv) < 2:
     print ("Program must have an argument: the name of the vlog\n")
@@ -48,4 +211,4 @@ if  len(sys.argv) < 2:
 vlogFileName = str(sys.argv[1])
 Vlog = open(vlogFileName, 'r', 1)
 
-parseVlog(Vlog)
+printJvmCpuTimeline(Vlog, outputConfig)
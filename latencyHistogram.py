@@ -0,0 +1,106 @@
+# HDR (high dynamic range) histogram of latencies, in the style of HdrHistogram:
+# values are integers (microseconds) recorded with `significantDigits` decimal digits
+# of precision over the whole range, in a sparse set of log-linear buckets.
+# Recording is O(1), histograms from several processes can be merged, and the
+# percentiles (p50 ... p99.99) are exact up to the chosen precision.
+#
+# Usage:
+#   histogram = latencyHistogram.LatencyHistogram()
+#   histogram.recordValue(latencyUs)  # or histogram.recordValues(arrayOfLatenciesUs)
+#   histogram.valueAtPercentile(99.9)
+#   print(histogram.formatPercentiles())
+#
+# Author: Marius Pirvu
+
+import math
+import numpy as np
+
+################## Configuration #####################
+reportedPercentiles = (50, 90, 99, 99.9, 99.99)
+#######################################################
+
+
+class LatencyHistogram:
+    '''
+    Sparse HDR histogram: bucket index --> count
+    '''
+    def __init__(self, significantDigits=3):
+        # The linear part of each bucket must resolve 10^significantDigits distinct values
+        self.subBucketBits = (2 * 10**significantDigits - 1).bit_length()
+        self.subBucketHalfCount = 1 << (self.subBucketBits - 1)
+        self.counts = {}
+        self.totalCount = 0
+        self.total = 0 # sum of the values, for the mean
+        self.minValue = math.inf
+        self.maxValue = 0
+
+    def indexOf(self, value):
+        bucket = max(value.bit_length() - self.subBucketBits, 0)
+        return (bucket << (self.subBucketBits - 1)) + (value >> bucket)
+
+    '''
+    Return the range [lowest, highest] of the values recorded in the bucket with the given index
+    '''
+    def valueRange(self, index):
+        bucket = max(index // self.subBucketHalfCount - 1, 0)
+        lowest = (index - (bucket << (self.subBucketBits - 1))) << bucket
+        return lowest, lowest + (1 << bucket) - 1
+
+    def recordValue(self, value, count=1):
+        value = max(int(value), 0)
+        index = self.indexOf(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.totalCount += count
+        self.total += value * count
+        self.minValue = min(self.minValue, value)
+        self.maxValue = max(self.maxValue, value)
+
+    '''
+    Record an array of values at once (vectorized bucket computation)
+    '''
+    def recordValues(self, values):
+        values = np.maximum(np.asarray(values, dtype=np.int64), 0)
+        if values.size == 0:
+            return
+        bitLength = np.frexp(values.astype(float))[1] # v = m * 2^e with 0.5 <= m < 1, so e is the bit length
+        buckets = np.maximum(bitLength - self.subBucketBits, 0)
+        indexes, counts = np.unique((buckets << (self.subBucketBits - 1)) + (values >> buckets), return_counts=True)
+        for index, count in zip(indexes.tolist(), counts.tolist()):
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.totalCount += int(values.size)
+        self.total += int(values.sum())
+        self.minValue = min(self.minValue, int(values.min()))
+        self.maxValue = max(self.maxValue, int(values.max()))
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.totalCount += other.totalCount
+        self.total += other.total
+        self.minValue = min(self.minValue, other.minValue)
+        self.maxValue = max(self.maxValue, other.maxValue)
+
+    def mean(self):
+        return self.total / self.totalCount if self.totalCount else math.nan
+
+    '''
+    Smallest recorded value (up to the precision of the histogram) such that
+    `percentile` percent of the values are smaller or equal to it
+    '''
+    def valueAtPercentile(self, percentile):
+        if not self.totalCount:
+            return math.nan
+        countAtPercentile = max(math.ceil(percentile / 100.0 * self.totalCount), 1)
+        cumulativeCount = 0
+        for index in sorted(self.counts):
+            cumulativeCount += self.counts[index]
+            if cumulativeCount >= countAtPercentile:
+                return min(self.valueRange(index)[1], self.maxValue)
+        return self.maxValue
+
+    '''
+    "p50=... p90=... ... max=..." with the values converted from microseconds to milliseconds
+    '''
+    def formatPercentiles(self, percentiles=reportedPercentiles):
+        values = ["p{p:g}={v:.3f}".format(p=p, v=self.valueAtPercentile(p) / 1000.0) for p in percentiles]
+        return "{v} max={m:.3f} ms (n={n})".format(v=" ".join(values), m=self.maxValue / 1000.0, n=self.totalCount)
@@ -0,0 +1,127 @@
+# Latency percentiles from the output of the load generators, so that every load pulse
+# can report p50/p90/p99/max latency next to its throughput:
+#  - wrk run with --latency prints a "Latency Distribution" section (50/75/90/99%) and
+#    the maximum latency in the "Thread Stats" table; parseWrkLatency reads both
+#  - JMeter writes one CSV line per sample in a JTL file (-l results.jtl); parseJTL
+#    streams the file in chunks of `chunkSize` lines, converts the "elapsed" and "success"
+#    columns with NumPy and records the latencies in an HDR histogram (latencyHistogram.py),
+#    so files with millions of samples are processed in constant memory
+# All latencies are returned in milliseconds, as a dictionary {"p50", "p90", "p99", "max"};
+# the values that are not available are NaN.
+#
+# Usage (in a runner):
+#   latency = loadLatency.parseWrkLatency(lines)
+#   with open(jtlFile) as f: histogram, numErrors = loadLatency.parseJTL(f)
+#   latency = loadLatency.latencySummary(histogram)
+# Standalone: python3 loadLatency.py <wrk output or JTL file>
+#
+# Author: Marius Pirvu
+
+import csv
+import itertools
+import math
+import re # for regular expressions
+import sys # for accessing parameters and exit
+import numpy as np
+import latencyHistogram
+
+################## Configuration #####################
+chunkSize = 100000 # JTL lines converted at once
+latencyKeys = ("p50", "p90", "p99", "max")
+#######################################################
+
+unitToMs = {"us": 0.001, "ms": 1.0, "s": 1000.0, "m": 60000.0, "h": 3600000.0}
+
+
+'''
+Convert a wrk duration like "812.00us", "2.55ms" or "1.39s" to milliseconds
+'''
+def wrkTimeToMs(value):
+    m = re.match(r'(\d+(?:\.\d+)?)(us|ms|s|m|h)$', value)
+    return float(m.group(1)) * unitToMs[m.group(2)] if m else math.nan
+
+
+def emptyLatency():
+    return {key: math.nan for key in latencyKeys}
+
+
+'''
+Latency percentiles from the output of `wrk --latency`:
+#  Thread Stats   Avg      Stdev     Max   +/- Stdev
+#    Latency     2.55ms    3.79ms  24.81ms   83.61%
+#    Req/Sec     1.22k   263.42     3.51k    73.94%
+#  Latency Distribution
+#     50%    1.10ms
+#     75%    1.50ms
+#     90%    2.31ms
+#     99%   18.41ms
+'''
+def parseWrkLatency(lines):
+    latency = emptyLatency()
+    threadStatsPattern = re.compile(r'\s*Latency\s+(\S+)\s+(\S+)\s+(\S+)\s+')
+    percentilePattern = re.compile(r'\s*(50|90|99)(?:\.0+)?%\s+(\S+)\s*$')
+    for line in lines:
+        m = threadStatsPattern.match(line)
+        if m:
+            latency["max"] = wrkTimeToMs(m.group(3))
+            continue
+        m = percentilePattern.match(line)
+        if m:
+            latency["p" + m.group(1)] = wrkTimeToMs(m.group(2))
+    return latency
+
+
+'''
+Stream a JMeter JTL (CSV) file and return (histogram, numErrors). The histogram holds the
+"elapsed" time of the successful samples in microseconds. `lines` is an open file or any
+other iterable of lines, e.g. the stdout of "ssh host cat results.jtl"
+'''
+def parseJTL(lines, chunkSize=chunkSize):
+    histogram = latencyHistogram.LatencyHistogram()
+    numErrors = 0
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if not header or "elapsed" not in header:
+        raise ValueError("Not a JTL file with a CSV header: {h}".format(h=header))
+    elapsedColumn = header.index("elapsed")
+    successColumn = header.index("success") if "success" in header else None
+    while True:
+        rows = [row for row in itertools.islice(reader, chunkSize) if len(row) == len(header)]
+        if not rows:
+            break
+        elapsedMs = np.array([row[elapsedColumn] for row in rows], dtype=np.int64)
+        if successColumn is not None:
+            success = np.array([row[successColumn] for row in rows]) == "true"
+            numErrors += int(np.count_nonzero(~success))
+            elapsedMs = elapsedMs[success]
+        histogram.recordValues(elapsedMs * 1000)
+    return histogram, numErrors
+
+
+'''
+{"p50", "p90", "p99", "max"} in milliseconds from a histogram of microseconds
+'''
+def latencySummary(histogram):
+    if not histogram.totalCount:
+        return emptyLatency()
+    latency = {key: histogram.valueAtPercentile(float(key[1:])) / 1000.0 for key in latencyKeys if key != "max"}
+    latency["max"] = histogram.maxValue / 1000.0
+    return latency
+
+
+def formatLatency(latency):
+    return "  ".join("{k}={v:.2f}".format(k=key, v=latency.get(key, math.nan)) for key in latencyKeys) + " ms"
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python3 loadLatency.py <wrk output or JTL file>")
+        sys.exit(-1)
+    with open(sys.argv[1], errors="replace") as f:
+        firstLine = f.readline()
+        f.seek(0)
+        if "elapsed" in firstLine.split(","):
+            histogram, numErrors = parseJTL(f)
+            print("Samples={n}  Errors={e}  Latency: {lat}".format(n=histogram.totalCount, e=numErrors, lat=histogram.formatPercentiles()))
+        else:
+            print("Latency: " + formatLatency(parseWrkLatency(f)))
@@ -0,0 +1,156 @@
+# Shared output layer for the analyzer scripts.
+# Rows are accumulated in blocks and each block is rendered and written
+# with a single write() call, which matters when the output of a script
+# that processes a large vlog is redirected to a file or a pipe.
+# Supported formats:
+#   text    - the historical human readable format of each script (default)
+#   tsv/csv - header with the column names followed by one row per line
+#   jsonl   - one JSON object per row
+#   parquet - one row group per block; needs pyarrow and an --output prefix
+#
+# Scripts call parseOutputArgs(sys.argv) which removes the
+# "--format FMT" and "--output PREFIX" options from the argument list.
+# When an output prefix is given, each table goes into its own file
+# named PREFIX.<tableName>.<format>, otherwise tables go to stdout.
+#
+# Author: Marius Pirvu
+
+import csv
+import io
+import json
+import sys # for accessing parameters and exit
+
+knownFormats = ("text", "tsv", "csv", "jsonl", "parquet")
+defaultBlockSize = 8192 # number of rows rendered and written at once
+
+
+class TableWriter:
+    def __init__(self, columns, fmt, stream, textFormat=None, textHeader=None, blockSize=defaultBlockSize, closeStream=False):
+        self.columns = list(columns)
+        self.fmt = fmt
+        self.stream = stream
+        # In text mode rows are rendered with textFormat.format(*row)
+        self.textFormat = textFormat if textFormat else "\t".join("{}" for c in self.columns)
+        self.blockSize = blockSize
+        self.closeStream = closeStream
+        self.rows = []
+        self.parquetWriter = None
+        if fmt == "text":
+            if textHeader is not None:
+                self.rows.append(None) # placeholder, rendered as the text header
+                self.textHeader = textHeader
+        elif fmt in ("tsv", "csv"):
+            self.stream.write(self._renderDelimited([self.columns]))
+
+    def writeRow(self, *row):
+        self.rows.append(row)
+        if len(self.rows) >= self.blockSize:
+            self.flush()
+
+    def writeRows(self, rows):
+        self.rows.extend(rows)
+        if len(self.rows) >= self.blockSize:
+            self.flush()
+
+    def _renderDelimited(self, rows):
+        buf = io.StringIO()
+        csvWriter = csv.writer(buf, delimiter="\t" if self.fmt == "tsv" else ",", lineterminator="\n")
+        csvWriter.writerows(rows)
+        return buf.getvalue()
+
+    def _renderText(self, rows):
+        textFormat = self.textFormat
+        lines = [self.textHeader if row is None else textFormat.format(*row) for row in rows]
+        lines.append("")
+        return "\n".join(lines)
+
+    def _writeParquet(self, rows):
+        import pyarrow as pa # optional dependency, only needed for parquet output
+        import pyarrow.parquet as pq
+        table = pa.table({name: [row[i] for row in rows] for i, name in enumerate(self.columns)})
+        if self.parquetWriter is None:
+            self.parquetWriter = pq.ParquetWriter(self.stream, table.schema)
+        self.parquetWriter.write_table(table)
+
+    def flush(self):
+        if not self.rows:
+            return
+        rows = self.rows
+        self.rows = []
+        if self.fmt == "text":
+            self.stream.write(self._renderText(rows))
+        elif self.fmt == "jsonl":
+            columns = self.columns
+            self.stream.write("".join(json.dumps(dict(zip(columns, row))) + "\n" for row in rows))
+        elif self.fmt == "parquet":
+            self._writeParquet(rows)
+        else:
+            self.stream.write(self._renderDelimited(rows))
+
+    def close(self):
+        self.flush()
+        if self.parquetWriter is not None:
+            self.parquetWriter.close()
+        if self.closeStream:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
+
+
+class OutputConfig:
+    def __init__(self, fmt="text", outputPrefix=None):
+        if fmt not in knownFormats:
+            print("Unknown output format:", fmt, " Known formats:", ", ".join(knownFormats))
+            sys.exit(-1)
+        if fmt == "parquet" and not outputPrefix:
+            print("Parquet output needs an output prefix given with --output")
+            sys.exit(-1)
+        self.fmt = fmt
+        self.outputPrefix = outputPrefix
+
+    def isText(self):
+        return self.fmt == "text"
+
+    '''
+    Return a TableWriter for a table called `name` with the given columns.
+    textFormat/textHeader describe how the table is printed in text mode.
+    '''
+    def openTable(self, name, columns, textFormat=None, textHeader=None):
+        if self.outputPrefix:
+            fileName = "{prefix}.{name}.{ext}".format(prefix=self.outputPrefix, name=name, ext="txt" if self.fmt == "text" else self.fmt)
+            stream = open(fileName, "wb" if self.fmt == "parquet" else "w")
+            return TableWriter(columns, self.fmt, stream, textFormat, textHeader, closeStream=True)
+        # Text output may be interleaved with print() statements, so make sure those are written first
+        sys.stdout.flush()
+        return TableWriter(columns, self.fmt, sys.stdout, textFormat, textHeader)
+
+
+'''
+Remove "--format FMT" / "--format=FMT" and "--output PREFIX" / "--output=PREFIX"
+from argv (in place) and return the corresponding OutputConfig
+'''
+def parseOutputArgs(argv):
+    options = {"--format": "text", "--output": None}
+    i = 1
+    while i < len(argv):
+        arg = argv[i]
+        name, sep, value = arg.partition("=")
+        if name in options:
+            if not sep:
+                if i + 1 >= len(argv):
+                    print("Option", name, "needs a value")
+                    sys.exit(-1)
+                value = argv[i + 1]
+                del argv[i + 1]
+            options[name] = value
+            del argv[i]
+        else:
+            i += 1
+    return OutputConfig(options["--format"], options["--output"])
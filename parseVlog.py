@@ -1,11 +1,13 @@
 # Python script that parses an OpenJ9 verbose log and computes
 # compilation statistics
-# Usage: python3 parseVlog.py vlogFilename
+# Usage: python3 parseVlog.py vlogFilename [--format text|tsv|csv|jsonl|parquet] [--output prefix]
+# The --format option applies to the tables and method lists; the summary is always text
 #
 # Author: Marius Pirvu
 
 import re # for regular expressions
 import sys # for accessing parameters and exit
+import outputWriter
 
 ################## Configuration #####################
 # Compilations that take more than this value (in usec) are printed on screen
@@ -16,6 +18,12 @@ analyzeOnlyStartup = False
 # Exclude the start-up from the analysis
 dontAnalyzeStartup = False
 
+# The following boolean controls whether per-phase stats are printed.
+# Phases are determined from the "#JITSTATE: ... JIT changed state from X to Y" lines
+# (STARTUP, RAMPUP, STEADY, DEEPSTEADY, IDLE) and each phase gets its own accumulators.
+# If a phase is visited several times, all the visits are cumulated.
+printPhaseStats = True
+
 # The following integers control the region of the vlog for which we want to collect stats.
 # Note the analyzeOnlyStartup and dontAnalyzeStartup must be false for these to work.
 startLine = 0 # stats will be kept starting from line
@@ -59,44 +67,121 @@ knownOptLevels = {
 }
 
 
-def printHeaderStats():
-    print("OptLvl\tSamples\tTOTAL(ms)\tMIN(usec)\tAVG(usec)\tMAX(ms)")
+statsTextFormat = "{}\t{:7d}\t{:8.0f}\t{:8.0f}\t{:8.0f}\t{:6.1f}"
+
+def openStatsTable(outputConfig):
+    return outputConfig.openTable("compTimes", ["optLevel", "samples", "totalMs", "minUsec", "avgUsec", "maxMs"],
+                                  textFormat=statsTextFormat, textHeader="OptLvl\tSamples\tTOTAL(ms)\tMIN(usec)\tAVG(usec)\tMAX(ms)")
 
-def printBodySizeHeaderStats():
-    print("    \tSamples\tTOTAL(KB)\t     MIN\t     AVG\tMAX(KB)")
+def openBodySizeStatsTable(outputConfig):
+    return outputConfig.openTable("bodySizes", ["name", "samples", "totalKB", "min", "avg", "maxKB"],
+                                  textFormat=statsTextFormat, textHeader="    \tSamples\tTOTAL(KB)\t     MIN\t     AVG\tMAX(KB)")
 
-def printStats(name, dataList):
+def printStats(table, name, dataList):
     numSamples = len(dataList)
     sumValue = sum(dataList)
     meanValue = sumValue/numSamples
     minValue = min(dataList)
     maxValue = max(dataList)/1000
-    print("{name}\t{n:7d}\t{s:8.0f}\t{min:8.0f}\t{avg:8.0f}\t{max:6.1f}".format(name=name, n=numSamples, s=sumValue/1000, min=minValue, avg=meanValue, max=maxValue))
-
-
-def parseVlog(vlog):
-    maxCompLine = "" # Remember the compilation that took the longest
-    maxCompTime = 0
-    maxQSZ = 0
-    numGCRBodies = 0
-    numGCR = 0
-    numSync = 0
-    numDLT = 0
-    numRemote = 0
-    numDeserialized = 0
-    numLocalNonAOTLoad = 0
-    maxJvmCPU = 0
-    minFreeMem = sys.maxsize
-    maxScratchMem = 0
-    maxRegionMem = 0
-    numLowPhysicalMemEvents = 0
-    numRecomp = 0
-    compilationWasDisabled = False
-    numInterpreted = 0 # number of messages "will continue as interpreted"
-    interpretedMethods = set() # set of methods that will continue as interpreted
-    compTimes = [] # List with compilation times
-    compTimesPerLevel = {} # the key of this hash is the name of the optimization level
-    compBodySizes = [] # List with sizes of the compiled bodies
+    table.writeRow(name if table.fmt == "text" else name.strip(), numSamples, sumValue/1000, minValue, meanValue, maxValue)
+
+'''
+Write a list of methods or vlog lines as a single column table
+'''
+def printList(outputConfig, tableName, columnName, title, values, textFormat="{}"):
+    with outputConfig.openTable(tableName, [columnName], textFormat=textFormat, textHeader=title) as table:
+        table.writeRows((value,) for value in values)
+
+
+'''
+Compilation statistics that are reset when the analyzed region of the vlog starts
+(see startLine and dontAnalyzeStartup)
+'''
+class CompStats:
+    def __init__(self):
+        self.maxCompLine = "" # Remember the compilation that took the longest
+        self.maxCompTime = 0
+        self.maxQSZ = 0
+        self.numGCRBodies = 0
+        self.numGCR = 0
+        self.numSync = 0
+        self.numDLT = 0
+        self.numRemote = 0
+        self.numDeserialized = 0
+        self.numLocalNonAOTLoad = 0
+        self.maxJvmCPU = 0
+        self.minFreeMem = sys.maxsize
+        self.maxScratchMem = 0
+        self.maxRegionMem = 0
+        self.numLowPhysicalMemEvents = 0
+        self.numRecomp = 0
+        self.compilationWasDisabled = False
+        self.numInterpreted = 0 # number of messages "will continue as interpreted"
+        self.interpretedMethods = set() # set of methods that will continue as interpreted
+        self.compTimes = [] # List with compilation times
+        self.compTimesPerLevel = {} # the key of this hash is the name of the optimization level
+        self.compBodySizes = [] # List with sizes of the compiled bodies
+
+
+'''
+Compilation statistics for one JIT phase (JIT state)
+'''
+class PhaseStats:
+    def __init__(self):
+        self.durationMs = 0
+        self.numComp = 0
+        self.compTimeUsec = 0
+        self.numCompPerLevel = {} # the key of this hash is the name of the optimization level
+        self.numFailures = 0
+        self.failureTimeUsec = 0
+        self.failureHash = {}
+        self.maxQSZ = 0
+        self.sumQSZ = 0 # used to compute the average Q_SZ seen at compilation end
+        self.numQSZ = 0
+
+    def addQSZ(self, qSZ):
+        self.maxQSZ = max(self.maxQSZ, qSZ)
+        self.sumQSZ += qSZ
+        self.numQSZ += 1
+
+    def addCompilation(self, levelName, usec, qSZ):
+        self.numComp += 1
+        self.compTimeUsec += usec
+        self.numCompPerLevel[levelName] = self.numCompPerLevel.get(levelName, 0) + 1
+        self.addQSZ(qSZ)
+
+    def addFailure(self, failureReason, usec):
+        self.numFailures += 1
+        self.failureTimeUsec += usec
+        self.failureHash[failureReason] = self.failureHash.get(failureReason, 0) + 1
+
+
+def printPhaseStatsTables(outputConfig, phaseStatsHash):
+    with outputConfig.openTable("phases", ["phase", "durationMs", "numComp", "compTimeMs", "numFailures", "failureTimeMs", "maxQSZ", "avgQSZ"],
+                                textFormat="{:10s}\t{:10d}\t{:7d}\t{:9.0f}\t{:7d}\t{:9.0f}\t{:6d}\t{:6.1f}",
+                                textHeader="\nPhase     \tDuration(ms)\t  Comps\tTOTAL(ms)\t  Fails\tFAIL(ms)\tMAX Q_SZ\tAVG Q_SZ") as table:
+        for phase, phaseStats in phaseStatsHash.items():
+            avgQSZ = phaseStats.sumQSZ / phaseStats.numQSZ if phaseStats.numQSZ > 0 else 0.0
+            table.writeRow(phase, phaseStats.durationMs, phaseStats.numComp, phaseStats.compTimeUsec/1000,
+                           phaseStats.numFailures, phaseStats.failureTimeUsec/1000, phaseStats.maxQSZ, avgQSZ)
+
+    # Failures are counted in the "phases" and "phaseFailures" tables, not per opt level
+    levelNames = [knownOptLevels[opt] for opt in knownOptLevels.keys() if opt != "failure"]
+    with outputConfig.openTable("phaseOptLevels", ["phase"] + [levelName.strip() for levelName in levelNames],
+                                textFormat="{:10s}" + "\t{:5d}" * len(levelNames),
+                                textHeader="\nComps per phase and opt level:\n          " + "".join("\t" + levelName for levelName in levelNames)) as table:
+        for phase, phaseStats in phaseStatsHash.items():
+            table.writeRow(phase, *[phaseStats.numCompPerLevel.get(levelName, 0) for levelName in levelNames])
+
+    with outputConfig.openTable("phaseFailures", ["phase", "reason", "count"], textFormat="{:10s}\t{} = {}",
+                                textHeader="\nFailure reasons per phase:") as table:
+        for phase, phaseStats in phaseStatsHash.items():
+            for reason, samples in phaseStats.failureHash.items():
+                table.writeRow(phase, reason, samples)
+
+
+def parseVlog(vlog, outputConfig):
+    stats = CompStats()
     failureHash = {}
     failedMethods = set() # set for tracking whether methods remain interpreted after a failure
     recompMethods = set() # set for computing the number of recompilations
@@ -106,7 +191,13 @@ def parseVlog(vlog):
     veryLongCompilations = []
     methodCompTimes = {} # hash that maps method names to compilation times
     firstTimeCompsExplainNonAOTLoad = {} # hash that maps method names to a tuple {vlogCompLine, AOTLoadFail?, JNI?, AOTLoad?, FollowAOTLoadFail}
+    unrecognizedFailureLines = [] # failure lines that could not be parsed; printed at the end
     startTime = 0 # ms
+    # The name of the first phase is only known at the first JIT state change
+    phaseStats = PhaseStats()
+    phaseStatsHash = {} # maps JIT state names to PhaseStats; insertion order is the order of first appearance
+    crtPhase = None
+    phaseStartMs = 0
 
     #  (cold) Compiling java/lang/Double.longBitsToDouble(J)D  OrdinaryMethod j9m=0000000000097B18 t=20 compThreadID=0 memLimit=262144 KB freePhysicalMemory=75755 MB
     compStartPattern = re.compile(r'^.+\((.+)\) Compiling (\S+) .+ t=(\d+)')
@@ -118,36 +209,27 @@ def parseVlog(vlog):
     jvmCpuPattern = re.compile(r'^.+jvmCPU=(\d+)', re.IGNORECASE)
     freeMemPattern = re.compile(r'^.+freePhysicalMemory=(\d+) MB')
     scratchMemPattern = re.compile(r'^.+mem=\[region=(\d+) system=(\d+)\]KB')
+    # #JITSTATE:  t=  3150 JIT changed state from STARTUP to RAMPUP cSmpl  87 iSmpl 126 comp  46 recomp   0, Q_SZ  18 CLP=ON jvmCPU=96%
+    jitStatePattern = re.compile(r'^#JITSTATE:\s+t=\s*(\d+)\s+JIT changed state from (\S+) to (\S+)')
     lineNum = 0
     # Parse the vlog
     for line in vlog:
         lineNum += 1
         if startLine > 0 and lineNum == startLine:
-            # reset all compilation stats
-            maxCompLine = "" # Remember the compilation that took the longest
-            maxCompTime = 0
-            maxQSZ = 0
-            numGCRBodies = 0
-            numGCR = 0
-            numSync = 0
-            numDLT = 0
-            numRemote = 0
-            numDeserialized = 0
-            numLocalNonAOTLoad = 0
-            maxJvmCPU = 0
-            minFreeMem = sys.maxsize
-            maxScratchMem = 0
-            maxRegionMem = 0
-            numLowPhysicalMemEvents = 0
-            numRecomp = 0
-            compilationWasDisabled = False
-            numInterpreted = 0 # number of messages "will continue as interpreted"
-            interpretedMethods.clear()
-            compTimes.clear() # List with compilation times
-            compTimesPerLevel.clear() # the key of this hash is the name of the optimization level
-            compBodySizes.clear() # List with sizes of the compiled bodies
+            stats = CompStats() # reset all compilation stats
         if endLine != -1 and lineNum > endLine:
             break
+        if line.startswith("#JITSTATE"):
+            m = jitStatePattern.match(line)
+            if m:
+                ms = int(m.group(1))
+                if crtPhase is None: # first state change; now we know the name of the initial phase
+                    crtPhase = m.group(2)
+                    phaseStatsHash[crtPhase] = phaseStats
+                phaseStats.durationMs += ms - phaseStartMs
+                phaseStartMs = ms
+                crtPhase = m.group(3)
+                phaseStats = phaseStatsHash.setdefault(crtPhase, PhaseStats())
         # #JITSTATE:  t=  6544 VM changed state to NOT_STARTUP
         if "VM changed state to NOT_STARTUP" in line: # start-up point detected
             # Determine the start time
@@ -157,29 +239,7 @@ def parseVlog(vlog):
             if analyzeOnlyStartup:
                 break
             if dontAnalyzeStartup:
-                # reset all compilation stats
-                maxCompLine = "" # Remember the compilation that took the longest
-                maxCompTime = 0
-                maxQSZ = 0
-                numGCRBodies = 0
-                numGCR = 0
-                numSync = 0
-                numDLT = 0
-                numRemote = 0
-                numDeserialized = 0
-                numLocalNonAOTLoad = 0
-                maxJvmCPU = 0
-                minFreeMem = sys.maxsize
-                maxScratchMem = 0
-                maxRegionMem = 0
-                numLowPhysicalMemEvents = 0
-                numRecomp = 0
-                compilationWasDisabled = False
-                numInterpreted = 0 # number of messages "will continue as interpreted"
-                interpretedMethods.clear()
-                compTimes.clear() # List with compilation times
-                compTimesPerLevel.clear() # the key of this hash is the name of the optimization level
-                compBodySizes.clear() # List with sizes of the compiled bodies
+                stats = CompStats() # reset all compilation stats
                 continue
         m = compEndPattern.match(line)
         if m:
@@ -196,25 +256,26 @@ def parseVlog(vlog):
             if usec > compTimeThreshold:
                 veryLongCompilations.append(line)
 
-            if usec > maxCompTime:
-                maxCompTime = usec
-                maxCompLine = line
+            if usec > stats.maxCompTime:
+                stats.maxCompTime = usec
+                stats.maxCompLine = line
 
-            maxQSZ = max(maxQSZ, qSZ)
+            stats.maxQSZ = max(stats.maxQSZ, qSZ)
 
-            compTimes.append(usec)
+            stats.compTimes.append(usec)
             if opt not in knownOptLevels:
                 print("Unknown opt level encountered:", opt)
                 exit(-1)
             levelName = knownOptLevels[opt]
-            if levelName in compTimesPerLevel:
-                compTimesPerLevel[levelName].append(usec)
+            phaseStats.addCompilation(levelName, usec, qSZ)
+            if levelName in stats.compTimesPerLevel:
+                stats.compTimesPerLevel[levelName].append(usec)
             else:
-                compTimesPerLevel[levelName] = [usec]
+                stats.compTimesPerLevel[levelName] = [usec]
 
             bodySize = methodEndAddr - methodStartAddr
             if bodySize > 0:
-                compBodySizes.append(bodySize)
+                stats.compBodySizes.append(bodySize)
             else:
                 print("Warning: detected negative body size in line", line)
 
@@ -225,19 +286,19 @@ def parseVlog(vlog):
                 methodCompTimes[mName] = usec
 
             if " GCR " in line:
-                numGCRBodies += 1
+                stats.numGCRBodies += 1
             if " G " in line or " g " in line:
-                numGCR += 1
+                stats.numGCR += 1
             if " sync " in line:
-                numSync += 1
+                stats.numSync += 1
             if " DLT" in line:
-                numDLT += 1
+                stats.numDLT += 1
             if " remote " in line:
-                numRemote += 1
+                stats.numRemote += 1
                 if " deserialized " in line:
-                    numDeserialized += 1
+                    stats.numDeserialized += 1
             elif "AOT load" not in line:
-                numLocalNonAOTLoad += 1
+                stats.numLocalNonAOTLoad += 1
 
             # If a method has compiled successfully after a failure, delete entry from the failure set
             failedMethods.discard(methodName) # no change if entry does not exist
@@ -251,7 +312,7 @@ def parseVlog(vlog):
                 recompMethods.add(methodName)
             else: # Possible recomp
                 if opt != "AOT load": # AOT loads after AOT compilations are not counted as recompilations
-                    numRecomp += 1
+                    stats.numRecomp += 1
                     if methodName in aotLoadsNotRecompiled:
                         # Recompilation of an AOT load; remove from set
                         aotLoadsNotRecompiled.remove(methodName)
@@ -278,12 +339,13 @@ def parseVlog(vlog):
                     usec = int(m.group(2))
                     failureReason = m.group(3)
                     levelName = " fail" # Treat compilation failures as a separate opt level
-                    if levelName in compTimesPerLevel:
-                        compTimesPerLevel[levelName].append(usec)
+                    if levelName in stats.compTimesPerLevel:
+                        stats.compTimesPerLevel[levelName].append(usec)
                     else:
-                        compTimesPerLevel[levelName] = [usec]
+                        stats.compTimesPerLevel[levelName] = [usec]
                     # Update failure reasons
                     failureHash[failureReason] = failureHash.get(failureReason, 0) + 1
+                    phaseStats.addFailure(failureReason, usec)
                     # Track methods that failed to compile
                     failedMethods.add(methodName)
 
@@ -291,7 +353,8 @@ def parseVlog(vlog):
                     match = re.search(r"Q_SZ=(\d+)", line)
                     if match:
                         qSZ = int(match.group(1))
-                        maxQSZ = max(maxQSZ, qSZ)
+                        stats.maxQSZ = max(stats.maxQSZ, qSZ)
+                        phaseStats.addQSZ(qSZ)
                     if printFirstCompilationsNonAOTLoads and not " DLT" in line:
                         # Look for first time compilations that are AOT loads that failed
                         if methodName not in firstTimeCompsExplainNonAOTLoad:
@@ -304,8 +367,9 @@ def parseVlog(vlog):
                     if re.search(r"cannot be translated$", line):
                         failureReason = "uncompilable"
                         failureHash[failureReason] = failureHash.get(failureReason, 0) + 1
+                        phaseStats.addFailure(failureReason, 0)
                     else:
-                        print(line)
+                        unrecognizedFailureLines.append(line)
             else: # Look for compilation starts that have the current timestamp
                 m = compStartPattern.match(line)
                 if m:
@@ -321,92 +385,89 @@ def parseVlog(vlog):
         m = jvmCpuPattern.match(line)
         if m:
             jvmCPU = int(m.group(1))
-            maxJvmCPU = max(jvmCPU, maxJvmCPU)
+            stats.maxJvmCPU = max(jvmCPU, stats.maxJvmCPU)
         m = freeMemPattern.match(line)
         if m:
             freeMem = int(m.group(1))
-            minFreeMem = min(minFreeMem, freeMem)
+            stats.minFreeMem = min(stats.minFreeMem, freeMem)
         m = scratchMemPattern.match(line)
         if m:
             regionMem = int(m.group(1))
             systemMem = int(m.group(2))
-            maxScratchMem = max(maxScratchMem, systemMem)
-            maxRegionMem = max(maxRegionMem, regionMem)
+            stats.maxScratchMem = max(stats.maxScratchMem, systemMem)
+            stats.maxRegionMem = max(stats.maxRegionMem, regionMem)
         if "Low On Physical Memory" in line: # JIT aborts the compilation if this is seen
-            numLowPhysicalMemEvents += 1
+            stats.numLowPhysicalMemEvents += 1
         if "Disable further compilation" in line:
-            compilationWasDisabled = True
+            stats.compilationWasDisabled = True
         #INFO:  Method jdk/internal/loader/NativeLibraries.load(Ljdk/internal/loader/NativeLibraries$NativeLibraryImpl;Ljava/lang/String;ZZZ)Z will continue as interpreted
         if "will continue as interpreted" in line:
             m = re.match(r"#INFO:\s+Method (\S+) will continue as interpreted", line)
             if m:
-                interpretedMethods.add(m.group(1))
+                stats.interpretedMethods.add(m.group(1))
             else:
                 print("Interpreted method could not be identified from line:", line)
-            numInterpreted += 1
+            stats.numInterpreted += 1
 
     # Print statistics
-    printHeaderStats()
-    printStats("Total", compTimes)
-    for opt in knownOptLevels.keys():
-        levelName = knownOptLevels[opt]
-        valueList = compTimesPerLevel.get(levelName, [])
-        if valueList: # if not empty
-            printStats(levelName, valueList)
+    with openStatsTable(outputConfig) as table:
+        printStats(table, "Total", stats.compTimes)
+        for opt in knownOptLevels.keys():
+            levelName = knownOptLevels[opt]
+            valueList = stats.compTimesPerLevel.get(levelName, [])
+            if valueList: # if not empty
+                printStats(table, levelName, valueList)
 
     print("\nFailure reasons:")
     for reason, samples in failureHash.items():
         print(reason, "=",   samples)
 
-    print("\nMAXLINE:", maxCompLine)
+    if unrecognizedFailureLines:
+        print("\nUnrecognized failure lines:", len(unrecognizedFailureLines))
+        sys.stdout.write("".join(unrecognizedFailureLines))
+
+    print("\nMAXLINE:", stats.maxCompLine)
 
     print("Stats regarding compiled body sizes")
-    printBodySizeHeaderStats()
-    printStats("All", compBodySizes)
+    with openBodySizeStatsTable(outputConfig) as table:
+        printStats(table, "All", stats.compBodySizes)
     print("")
 
-    print("Num recomps   =", numRecomp)
-    print("GCR bodies    =", numGCRBodies) # not accurate for remote compilations
-    print("GCR recomp    =", numGCR)
-    print("Sync          =", numSync)
-    print("DLT           =", numDLT)
-    if numRemote > 0:
-        print("Remote        =", numRemote, " Deserialized =", numDeserialized, " Local-Non-AOTLoad =", numLocalNonAOTLoad)
-    print("MAX Q_SZ      =", maxQSZ)
-    print("MAX JvmCPU    =", maxJvmCPU, "%")
-    print("MaxScratchMem =", maxScratchMem, "KB")
-    print("MaxRegionMem  =", maxRegionMem, "KB")
-    print("Min free mem  =", minFreeMem, "MB")
-    if numLowPhysicalMemEvents > 0:
-        print("NumLowPhysMem =", numLowPhysicalMemEvents)
+    print("Num recomps   =", stats.numRecomp)
+    print("GCR bodies    =", stats.numGCRBodies) # not accurate for remote compilations
+    print("GCR recomp    =", stats.numGCR)
+    print("Sync          =", stats.numSync)
+    print("DLT           =", stats.numDLT)
+    if stats.numRemote > 0:
+        print("Remote        =", stats.numRemote, " Deserialized =", stats.numDeserialized, " Local-Non-AOTLoad =", stats.numLocalNonAOTLoad)
+    print("MAX Q_SZ      =", stats.maxQSZ)
+    print("MAX JvmCPU    =", stats.maxJvmCPU, "%")
+    print("MaxScratchMem =", stats.maxScratchMem, "KB")
+    print("MaxRegionMem  =", stats.maxRegionMem, "KB")
+    print("Min free mem  =", stats.minFreeMem, "MB")
+    if stats.numLowPhysicalMemEvents > 0:
+        print("NumLowPhysMem =", stats.numLowPhysicalMemEvents)
     if len(failedMethods) > 0:
-        print("Methods that remain interpreted after a failure:")
-        for method in failedMethods:
-            # Method could have been compiled and a recompilation could have failed
-            # Those failures don't result in an interpreted method
-            if method not in recompMethods:
-                print(method)
+        # Method could have been compiled and a recompilation could have failed
+        # Those failures don't result in an interpreted method
+        printList(outputConfig, "failedMethods", "method", "Methods that remain interpreted after a failure:",
+                  [method for method in failedMethods if method not in recompMethods])
     print("Start Timestamp =", startTime, "ms")
     print("Last TimeStamp  =", crtTimeMs, "ms")
     if len(veryLongCompilations) > 0:
-        print("\nVery long compilations:")
-        for l in veryLongCompilations:
-            print(l)
-    if compilationWasDisabled:
+        printList(outputConfig, "veryLongCompilations", "vlogLine", "\nVery long compilations:", [l.rstrip() for l in veryLongCompilations])
+    if printPhaseStats:
+        phaseStats.durationMs += crtTimeMs - phaseStartMs
+        phaseStatsHash.setdefault(crtPhase if crtPhase is not None else "ALL", phaseStats)
+        printPhaseStatsTables(outputConfig, phaseStatsHash)
+    if stats.compilationWasDisabled:
         print("WARNING: compilation was disabled at some point during JVM lifetime")
-    if numInterpreted > 0:
-        print(numInterpreted, "methods will continue as interpreted due to compilation filters")
-        for method in interpretedMethods:
-            print("\t", method)
+    if stats.numInterpreted > 0:
+        printList(outputConfig, "interpretedMethods", "method", "{n} methods will continue as interpreted due to compilation filters".format(n=stats.numInterpreted),
+                  stats.interpretedMethods, textFormat="\t {}")
     if printAOTLoadsNotRecompiled:
-        print("\nAOT loads that were not recompiled:")
-        sortedMethods = sorted(aotLoadsNotRecompiled)
-        for method in sortedMethods:
-            print(method)
-        print("\nAOT loads that were recompiled:")
-        sortedMethods = sorted(aotLoadsRecompiled)
-        for method in sortedMethods:
-            print(method)
+        printList(outputConfig, "aotLoadsNotRecompiled", "method", "\nAOT loads that were not recompiled:", sorted(aotLoadsNotRecompiled))
+        printList(outputConfig, "aotLoadsRecompiled", "method", "\nAOT loads that were recompiled:", sorted(aotLoadsRecompiled))
 
     if printCompTimeCDF:
         # Sort our methodCompTimes hash by compilation time
@@ -415,8 +476,8 @@ def parseVlog(vlog):
         print("\nWill print compilation time CDF into file", compTimeCDFFilename, "\n ")
         cdfFile = open(compTimeCDFFilename, "w")
         cdfFile.write("CDF for compilation times\n")
-        totalCompTime = sum(compTimes)
-        totalCompilations = len(compTimes)
+        totalCompTime = sum(stats.compTimes)
+        totalCompilations = len(stats.compTimes)
         crtCompTime = 0
         nextTarget = 5.0
         compCounter = 0
@@ -430,17 +491,19 @@ def parseVlog(vlog):
         cdfFile.close()
 
     if printFirstCompilationsNonAOTLoads:
-        print("\nFirst time compilations that are not AOT loads:")
+        nonAOTLoadLines = []
         for method, info in firstTimeCompsExplainNonAOTLoad.items():
             if not info["AOTLoad"] and not info["JNI"] and not info["FollowAOTLoadFail"]:
                 # Also ignore AOT compilations and EDO triggerred compilations
                 if not ("+ (AOT" in info["line"]) and not (" EDO " in info["line"]):
-                    print(info["line"], end='')
+                    nonAOTLoadLines.append(info["line"].rstrip())
+        printList(outputConfig, "firstCompilationsNonAOTLoads", "vlogLine", "\nFirst time compilations that are not AOT loads:", nonAOTLoadLines)
 ###################################################
 
 if startLine != 0 or endLine != -1:
     assert (not analyzeOnlyStartup) and (not dontAnalyzeStartup)
 
+outputConfig = outputWriter.parseOutputArgs(sys.argv)
 # Get the name of vlog
 if  len(sys.argv) < 2:
     print ("Program must have an argument: the name of the vlog\n")
@@ -450,5 +513,5 @@ if  len(sys.argv) < 2:
 vlogFileName = str(sys.argv[1])
 Vlog = open(vlogFileName, 'r', 1)
 
-parseVlog(Vlog)
+parseVlog(Vlog, outputConfig)
 
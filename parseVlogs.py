@@ -1,12 +1,13 @@
 # Python script that parses N OpenJ9 verbose logs and computes
 # compilation statistics across all of them
-# Example of invocation:  python3 parseVlogs.py "vlog*.txt"
+# Example of invocation:  python3 parseVlogs.py "vlog*.txt" [--format text|tsv|csv|jsonl|parquet] [--output prefix]
 #
 # Author: Marius Pirvu
 
 import re # for regular expressions
 import sys # for accessing parameters and exit
 import glob
+import outputWriter
 
 # The following boolean controls whether vlog parsing should stop after JVM detects end of start-up
 analyzeOnlyStartup = False
@@ -30,31 +31,29 @@ knownOptLevels = {
 }
 
 
-def printGenericHeader():
-    print("\tSamples\t    SUM\t    MIN\t    AVG\t    MAX")
+def openGenericStatsTable(outputConfig):
+    return outputConfig.openTable("genericStats", ["name", "samples", "sum", "min", "avg", "max"],
+                                  textFormat="{}\t{:7d}\t{:7.0f}\t{:7.0f}\t{:7.0f}\t{:7.0f}", textHeader="\tSamples\t    SUM\t    MIN\t    AVG\t    MAX")
 
-def printGenericStats(name, dataList):
+def printGenericStats(table, name, dataList):
     numSamples = len(dataList)
     sumValue = sum(dataList)
     meanValue = sumValue/numSamples if numSamples > 0  else 0
     minValue = min(dataList)
     maxValue = max(dataList)
+    table.writeRow(name, numSamples, sumValue, minValue, meanValue, maxValue)
 
-    print("{name}\t{n:7d}\t{s:7.0f}\t{min:7.0f}\t{avg:7.0f}\t{max:7.0f}".format(name=name, n=numSamples, s=sumValue, min=minValue, avg=meanValue, max=maxValue))
+def openStatsTable(outputConfig):
+    return outputConfig.openTable("compTimes", ["optLevel", "samples", "totalMs", "minUsec", "avgUsec", "maxMs"],
+                                  textFormat="{}\t{:7d}\t{:8.0f}\t{:8.0f}\t{:8.0f}\t{:6.1f}", textHeader="OptLvl\tSamples\tTOTAL(ms)\tMIN(usec)\tAVG(usec)\tMAX(ms)")
 
-def printHeaderStats():
-    print("OptLvl\tSamples\tTOTAL(ms)\tMIN(usec)\tAVG(usec)\tMAX(ms)")
-
-def printBodySizeHeaderStats():
-    print("    \tSamples\tTOTAL(KB)\tMIN\tAVG\tMAX(KB)")
-
-def printStats(name, dataList):
+def printStats(table, name, dataList):
     numSamples = len(dataList)
     sumValue = sum(dataList)
     meanValue = sumValue/numSamples
     minValue = min(dataList)
     maxValue = max(dataList)/1000
-    print("{name}\t{n:7d}\t{s:8.0f}\t{min:8.0f}\t{avg:8.0f}\t{max:6.1f}".format(name=name, n=numSamples, s=sumValue/1000, min=minValue, avg=meanValue, max=maxValue))
+    table.writeRow(name if table.fmt == "text" else name.strip(), numSamples, sumValue/1000, minValue, meanValue, maxValue)
 
 
 def parseVlog(vlog):
@@ -146,6 +145,7 @@ def parseVlog(vlog):
 ###################################################
 
 
+outputConfig = outputWriter.parseOutputArgs(sys.argv)
 # Get the name of vlog
 if  len(sys.argv) < 2:
     print ("Program must have an argument: the name of the vlog\n")
@@ -193,22 +193,21 @@ for filepath in glob.iglob(filesWithWildCard):
     dltList.append(vlogStats['numDLT'])
 
 
-printHeaderStats()
-printStats(" All", compTimes)
-for opt in knownOptLevels.keys():
-    levelName = knownOptLevels[opt]
-    valueList = compTimePerLevel.get(levelName, [])
-    if valueList: # if not empty
-        printStats(levelName, valueList)
+with openStatsTable(outputConfig) as table:
+    printStats(table, " All", compTimes)
+    for opt in knownOptLevels.keys():
+        levelName = knownOptLevels[opt]
+        valueList = compTimePerLevel.get(levelName, [])
+        if valueList: # if not empty
+            printStats(table, levelName, valueList)
 
 print("")
-printGenericHeader()
-printGenericStats("MaxQSZ", maxqszList)
-printGenericStats("NumGCR", gcrList)
-printGenericStats("NumSync", syncList)
-printGenericStats("NumDLT", dltList)
-
-print("\nFailure reasons (average per vlog):")
-for reason, samples in failureReasons.items():
-    print("{reason} = {avg:10.4}".format(reason=reason, avg=samples/numVlogs))
+with openGenericStatsTable(outputConfig) as table:
+    printGenericStats(table, "MaxQSZ", maxqszList)
+    printGenericStats(table, "NumGCR", gcrList)
+    printGenericStats(table, "NumSync", syncList)
+    printGenericStats(table, "NumDLT", dltList)
+
+with outputConfig.openTable("failureReasons", ["reason", "avgPerVlog"], textFormat="{} = {:10.4}", textHeader="\nFailure reasons (average per vlog):") as table:
+    table.writeRows((reason, samples/numVlogs) for reason, samples in failureReasons.items())
 
@@ -6,18 +6,154 @@
 # Then, the two configurations are compared head-to-head.
 # The comparison includes information about (1) contributions of various dlls
 # and (2) contributions of various symbols in the dlls
-# Usage: python3 perfReportDiff.py A1.perf A2.perf ... An.perf B1.perf B2.perf ... Bn.perf
+# The samples of each profile are obtained either from `perf report --stdio`
+# or, with perfInputMode="script", by aggregating the output of `perf script`
+# in one streaming pass (no truncation of long DSO and thread names).
+# The profiles are processed in parallel and the aggregated samples of each profile
+# are cached on disk, keyed by the hash of the profile, so diffing the same profiles
+# again (e.g. with other thresholds) or adding a profile to a set does not re-run perf
+# for the profiles that were already seen.
+# With 2 or more profiles per configuration, the samples of every DSO and symbol
+# are normalized by the total samples of each profile and the A and B groups are
+# compared with a Welch t-test (or a bootstrap confidence interval of the difference),
+# so that only the differences that are statistically significant are printed.
+# JIT symbols are folded by Java method (the opt level suffixes like "_cold" are
+# removed), or optionally by class or by package (see `jitSymbolFolding`).
+# When the vlogs of the two configurations are given, the JIT methods are annotated
+# with their last compilation (opt level, body size and number of compilations),
+# showing at which tier the hot Java methods were compiled in A and B.
+# Usage: python3 perfReportDiff.py A1.perf A2.perf ... An.perf B1.perf B2.perf ... Bn.perf [--vlogA vlog] [--vlogB vlog]
 
 # Author: Marius Pirvu (mpirvu@ca.ibm.com)
 
 
+import hashlib
+import json
+import multiprocessing
 import operator # for sorting the dictionary
+import os
 import re # for regular expressions
 import sys # for accessing parameters and exit
 import shlex, subprocess
+import numpy as np
+import benchStats
 
+################## Configuration #####################
+perfInputMode = "report" # "report" parses `perf report --stdio`; "script" aggregates the samples from `perf script`
+numProcesses = os.cpu_count() # number of profiles processed in parallel
+useCache = True # keep the aggregated samples of each profile in `cacheDir`, keyed by the hash of the profile
+cacheDir = os.path.join(os.path.expanduser("~"), ".cache", "perfReportDiff")
+minDsoPercentForSymbols = 1.0 # symbols are printed only for DSOs with at least this percentage of the samples in A or B
+maxSymbolsPerDso = 20 # don't print more than this many symbols per DSO
+significanceTest = "welch" # "welch", "bootstrap" (needs 5+ profiles per configuration) or None to print all differences; the confidence level is 95%
+numBootstrapSamples = 2000 # resamples used by the bootstrap test
+bootstrapSeed = 1 # fixed seed so that the same profiles always produce the same output
+jitSymbolFolding = "method" # None (keep the perf symbols), "method", "class" or "package"
+#######################################################
 
-def processPerfProfile(perfFileName, globalDictionary):
+perfReportHeaderPattern = re.compile(r'^# Overhead\s+Samples\s+Command\s+Shared Object\s+Symbol')
+perfReportLinePattern = re.compile(r'^\s+(\d+\.\d+)%\s+(\d+)\s+(...............)\s+(..................)\s+\[.\]\s+(.+)')
+# comm tid ip sym (dso)
+perfScriptLinePattern = re.compile(r'^\s*(.+?)\s+(\d+)\s+([0-9a-f]+)\s+(.*?)\s+\((.*)\)$')
+jitMapFilePattern = re.compile(r'perf-\d+\.map$')
+# java/lang/String.hashCode()I_cold  or  org/foo/Bar.get(I)Lorg/foo/My_Class;_profiled very-hot
+jitSymbolPattern = re.compile(r'^([^(\s]+)\.([^.(\s]+\(.*\)\[*(?:L[^;]+;|[ZBCSIJFDV]))(?:_.*)?$')
+# + (cold) sun/reflect/Reflection.getCallerClass()Ljava/lang/Class; @ 00007FB21300003C-00007FB213000167 OrdinaryMethod - Q_SZ=1 Q_SZI=1 QW=2 j9m=000000000004D1D8 bcsz=2 JNI time=995us
+compEndPattern = re.compile(r'^\+ \(([\S -]+)\) (\S+) @ ([0-9A-F]+)-([0-9A-F]+) ')
+
+
+'''
+Return the name used for a DSO: jitted code (perf-<pid>.map) becomes "[JIT]"
+and paths are reduced to the file name, like `perf report` does
+'''
+def normalizeDsoName(dsoName):
+    if dsoName.startswith("[JIT]") or jitMapFilePattern.search(dsoName): # delete the thread ID from the jitted thread
+        return "[JIT]"
+    return os.path.basename(dsoName) if dsoName.startswith("/") else dsoName
+
+
+'''
+Return the name used for a JIT symbol according to `jitSymbolFolding`:
+  java/util/HashMap.get(Ljava/lang/Object;)Ljava/lang/Object;_hot -->
+    method : java/util/HashMap.get(Ljava/lang/Object;)Ljava/lang/Object;
+    class  : java/util/HashMap
+    package: java/util
+Symbols that are not Java methods (e.g. JIT helpers) are not changed
+'''
+def foldJitSymbol(symbolName):
+    m = jitSymbolPattern.match(symbolName)
+    if not m:
+        return symbolName
+    if jitSymbolFolding == "class":
+        return m.group(1)
+    if jitSymbolFolding == "package":
+        return m.group(1).rpartition("/")[0] or m.group(1)
+    return m.group(1) + "." + m.group(2)
+
+
+'''
+Return a new aggregate where the JIT symbols are folded with foldJitSymbol()
+'''
+def foldJitSymbols(aggregate):
+    folded = {}
+    for (dsoName, symbolName, thrName), samples in aggregate.items():
+        key = (dsoName, foldJitSymbol(symbolName) if dsoName == "[JIT]" else symbolName, thrName)
+        folded[key] = folded.get(key, 0) + samples
+    return folded
+
+
+'''
+Parse a vlog and return a dictionary method --> [optLevel, bodySize, numCompilations]
+describing the last compilation of each method
+'''
+def parseVlogCompilations(vlogFileName):
+    compilations = {}
+    with open(vlogFileName, 'r') as vlog:
+        for line in vlog:
+            if line.startswith("+ "):
+                m = compEndPattern.match(line)
+                if m:
+                    entry = compilations.setdefault(m.group(2), [None, 0, 0])
+                    entry[0] = m.group(1)
+                    entry[1] = int(m.group(4), base=16) - int(m.group(3), base=16)
+                    entry[2] += 1
+    return compilations
+
+
+'''
+Describe the compilations of a JIT symbol, e.g. "hot 2340B x3"
+Only possible when JIT symbols are folded by method
+'''
+def describeCompilation(compilations, symbolName):
+    entry = compilations.get(symbolName) if compilations is not None else None
+    if entry is None:
+        return "-"
+    return "{level} {size}B x{n}".format(level=entry[0], size=entry[1], n=entry[2])
+
+
+'''
+Extract the --vlogA and --vlogB options from argv
+'''
+def parseVlogArgs(argv):
+    vlogs = {"--vlogA": None, "--vlogB": None}
+    i = 1
+    while i < len(argv):
+        if argv[i] in vlogs:
+            if i + 1 >= len(argv):
+                print("Option", argv[i], "needs a value")
+                sys.exit(-1)
+            vlogs[argv[i]] = argv[i + 1]
+            del argv[i:i + 2]
+        else:
+            i += 1
+    return vlogs["--vlogA"], vlogs["--vlogB"]
+
+
+'''
+Aggregate the samples of a profile by (dso, symbol, thread) from the output of `perf report`
+Returns None if the output is not in the expected format
+'''
+def aggregatePerfReport(perfFileName):
     # Process the profile getting the ticks for various symbols
     # Example of text to be parsed
     '''
@@ -33,38 +169,234 @@ def processPerfProfile(perfFileName, globalDictionary):
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
     lines = output.splitlines()
 
+    aggregate = {}
     foundHeader = False
     for line in lines:
         # Search for the header first
         if not foundHeader:
-            pattern = re.compile('^# Overhead\s+Samples\s+Command\s+Shared Object\s+Symbol')
-            m = pattern.match(line)
-            if m:
+            if perfReportHeaderPattern.match(line):
                 foundHeader = True
             continue
         else: # Now parse the lines with samples
-            pattern = re.compile('^\s+(\d+\.\d+)%\s+(\d+)\s+(...............)\s+(..................)\s+\[.\]\s+(.+)')
-            m = pattern.match(line)
+            m = perfReportLinePattern.match(line)
             if m:
-                #print(line)
-                percentage = float(m.group(1))  # First group is percentage contribution
                 samples    = int(m.group(2))
                 thrName    = (m.group(3)).strip()
-                dsoName    = (m.group(4)).strip()
+                dsoName    = normalizeDsoName((m.group(4)).strip())
                 symbolName = (m.group(5)).strip()
-
-                if dsoName.startswith("[JIT]"): # delete the thread ID from the jitted thread
-                    dsoName = dsoName[0:5]
-
-                # Add to our dictionary
-                if dsoName in globalDictionary:
-                    symbolDictionary = globalDictionary[dsoName]
-                    symbolDictionary[symbolName] = symbolDictionary.get(symbolName, 0) + samples
-                else:
-                    globalDictionary[dsoName] = {symbolName:samples}
+                key = (dsoName, symbolName, thrName)
+                aggregate[key] = aggregate.get(key, 0) + samples
     if not foundHeader:
         print("perf report output from ", cmd, " is not in expected format\n")
-        sys.exit(-1)
+        return None
+    return aggregate
+
+
+'''
+Aggregate the samples of a profile by (dso, symbol, thread) reading the output of `perf script` as a stream
+Example of text to be parsed
+    Default Executo 31480     7f1c2a3b4c5d convertClassNameToStackMapType (/opt/java/lib/default/libj9vm29.so)
+'''
+def aggregatePerfScript(perfFileName):
+    cmd = f"perf script --hide-call-graph -F comm,tid,ip,sym,dso -i {perfFileName}"
+    aggregate = {}
+    with subprocess.Popen(shlex.split(cmd), stdout=subprocess.PIPE, universal_newlines=True, bufsize=1024*1024) as proc:
+        for line in proc.stdout:
+            m = perfScriptLinePattern.match(line)
+            if m:
+                key = (normalizeDsoName(m.group(5)), m.group(4), m.group(1))
+                aggregate[key] = aggregate.get(key, 0) + 1
+    if proc.returncode != 0:
+        print("Command", cmd, "failed with exit code", proc.returncode)
+        return None
+    return aggregate
+
+
+'''
+Return a hash of the content of the profile. The hashes are remembered in
+the cache index together with the size and mtime of each file, so an
+unchanged profile is not read again.
+'''
+def profileHash(perfFileName, hashIndex):
+    fileStat = os.stat(perfFileName)
+    key = os.path.abspath(perfFileName)
+    entry = hashIndex.get(key)
+    if entry and entry[0] == fileStat.st_size and entry[1] == fileStat.st_mtime:
+        return entry[2]
+    digest = hashlib.blake2b(digest_size=20)
+    with open(perfFileName, "rb") as f:
+        for block in iter(lambda: f.read(1024*1024), b""):
+            digest.update(block)
+    hashIndex[key] = [fileStat.st_size, fileStat.st_mtime, digest.hexdigest()]
+    return hashIndex[key][2]
+
+
+def cacheFileName(fileHash):
+    return os.path.join(cacheDir, "{h}.{mode}.json".format(h=fileHash, mode=perfInputMode))
+
+
+def readHashIndex():
+    try:
+        with open(os.path.join(cacheDir, "index.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def writeHashIndex(hashIndex):
+    try:
+        os.makedirs(cacheDir, exist_ok=True)
+        with open(os.path.join(cacheDir, "index.json"), "w") as f:
+            json.dump(hashIndex, f)
+    except OSError:
+        pass # caching is only an optimization
+
+
+def loadCachedAggregate(fileHash):
+    try:
+        with open(cacheFileName(fileHash)) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return {(dso, symbol, thread): samples for dso, symbol, thread, samples in cached}
+
+
+def saveCachedAggregate(fileHash, aggregate):
+    try:
+        os.makedirs(cacheDir, exist_ok=True)
+        # Write to a temporary file first so that concurrent runs never see a partial cache entry
+        tmpFileName = cacheFileName(fileHash) + ".{pid}.tmp".format(pid=os.getpid())
+        with open(tmpFileName, "w") as f:
+            json.dump([[dso, symbol, thread, samples] for (dso, symbol, thread), samples in aggregate.items()], f)
+        os.replace(tmpFileName, cacheFileName(fileHash))
+    except OSError:
+        pass # caching is only an optimization
+
+
+'''
+Return the samples of one profile as a dictionary (dso, symbol, thread) --> samples
+or None if the profile cannot be processed. Runs in a worker process.
+`fileHash` is None when caching is disabled.
+'''
+def processPerfProfile(perfFileName, fileHash=None):
+    aggregate = aggregatePerfScript(perfFileName) if perfInputMode == "script" else aggregatePerfReport(perfFileName)
+    if aggregate is not None and fileHash is not None:
+        saveCachedAggregate(fileHash, aggregate)
+    return aggregate
+
+
+'''
+Return the aggregates of all profiles in order. Cached aggregates are loaded
+directly; only the remaining profiles are processed in a process pool.
+'''
+def processPerfProfiles(perfFileNames):
+    aggregates = [None] * len(perfFileNames)
+    fileHashes = [None] * len(perfFileNames)
+    if useCache:
+        hashIndex = readHashIndex()
+        fileHashes = [profileHash(perfFileName, hashIndex) for perfFileName in perfFileNames]
+        writeHashIndex(hashIndex)
+        aggregates = [loadCachedAggregate(fileHash) for fileHash in fileHashes]
+    missing = [i for i, aggregate in enumerate(aggregates) if aggregate is None]
+    if missing:
+        with multiprocessing.Pool(processes=max(1, min(numProcesses, len(missing)))) as pool:
+            results = pool.starmap(processPerfProfile, [(perfFileNames[i], fileHashes[i]) for i in missing], chunksize=1)
+        for i, aggregate in zip(missing, results):
+            aggregates[i] = aggregate
+    return aggregates
+
+
+'''
+Add the samples of one profile to a dictionary dso --> {symbol --> samples}
+'''
+def mergePerfProfile(aggregate, globalDictionary):
+    for (dsoName, symbolName, thrName), samples in aggregate.items():
+        symbolDictionary = globalDictionary.get(dsoName)
+        if symbolDictionary is None:
+            globalDictionary[dsoName] = symbolDictionary = {}
+        symbolDictionary[symbolName] = symbolDictionary.get(symbolName, 0) + samples
+
+
+'''
+Build the matrix of normalized samples: one row per key and one column per profile.
+`keyOf` maps (dso, symbol) to the key (e.g. the DSO alone). The samples of each
+profile are expressed as a percentage of the total samples of that profile.
+Returns (keys, matrix)
+'''
+def buildSampleMatrix(aggregates, keyOf):
+    keyIndex = {}
+    for aggregate in aggregates:
+        for dsoName, symbolName, thrName in aggregate:
+            keyIndex.setdefault(keyOf(dsoName, symbolName), len(keyIndex))
+    matrix = np.zeros((len(keyIndex), len(aggregates)))
+    for j, aggregate in enumerate(aggregates):
+        rows = np.fromiter((keyIndex[keyOf(dsoName, symbolName)] for dsoName, symbolName, thrName in aggregate), dtype=np.int64, count=len(aggregate))
+        np.add.at(matrix[:, j], rows, np.fromiter(aggregate.values(), dtype=np.float64, count=len(aggregate)))
+    totals = matrix.sum(axis=0)
+    matrix *= 100.0 / np.where(totals > 0, totals, 1.0)
+    return list(keyIndex), matrix
+
+
+'''
+Welch t-test for each row of the matrix: columns [0, numProfilesA) are group A and the rest are group B.
+Returns a boolean array with True for the rows whose means differ at 95% confidence.
+'''
+def welchSignificant(matrix, numProfilesA):
+    a, b = matrix[:, :numProfilesA], matrix[:, numProfilesA:]
+    nA, nB = a.shape[1], b.shape[1]
+    seA = a.var(axis=1, ddof=1) / nA
+    seB = b.var(axis=1, ddof=1) / nB
+    diff = b.mean(axis=1) - a.mean(axis=1)
+    stdErr = np.sqrt(seA + seB)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Welch-Satterthwaite degrees of freedom
+        df = (seA + seB)**2 / (seA**2 / (nA - 1) + seB**2 / (nB - 1))
+        # Rounding the degrees of freedom down is slightly conservative and there are only a few distinct values
+        significant = np.abs(diff) > benchStats.tDistributionValue95(np.floor(df)) * stdErr
+    # Without any variance, every difference is real
+    return np.where(stdErr > 0, significant, diff != 0)
+
+
+'''
+Bootstrap test for each row of the matrix: the profiles of each group are resampled with
+replacement and the row is significant if the 95% confidence interval of the difference
+of the means does not contain 0. Resampling is done with multinomial weights, so one
+matrix product computes the means of all the resamples; rows are processed in chunks to bound memory.
+'''
+def bootstrapSignificant(matrix, numProfilesA):
+    rng = np.random.default_rng(bootstrapSeed)
+    a, b = matrix[:, :numProfilesA], matrix[:, numProfilesA:]
+    weightsA = rng.multinomial(a.shape[1], np.full(a.shape[1], 1.0 / a.shape[1]), size=numBootstrapSamples).T / a.shape[1]
+    weightsB = rng.multinomial(b.shape[1], np.full(b.shape[1], 1.0 / b.shape[1]), size=numBootstrapSamples).T / b.shape[1]
+    significant = np.zeros(matrix.shape[0], dtype=bool)
+    chunkSize = 4096
+    for start in range(0, matrix.shape[0], chunkSize):
+        diffs = b[start:start+chunkSize] @ weightsB - a[start:start+chunkSize] @ weightsA
+        low, high = np.percentile(diffs, [2.5, 97.5], axis=1)
+        significant[start:start+chunkSize] = (low > 0) | (high < 0)
+    return significant
+
+
+'''
+Return (significantDsos, significantSymbols): the set of DSOs and the set of (dso, symbol)
+whose share of the samples differs significantly between the two halves of the profiles,
+or (None, None) if no test can be done
+'''
+def findSignificantDifferences(aggregates):
+    numProfilesA = len(aggregates) // 2
+    if significanceTest is None:
+        return None, None
+    if numProfilesA < 2:
+        print("At least 2 profiles per configuration are needed to test significance; printing all differences\n")
+        return None, None
+    testFunction = bootstrapSignificant if significanceTest == "bootstrap" else welchSignificant
+    dsos, dsoMatrix = buildSampleMatrix(aggregates, lambda dsoName, symbolName: dsoName)
+    symbols, symbolMatrix = buildSampleMatrix(aggregates, lambda dsoName, symbolName: (dsoName, symbolName))
+    significantDsos = {dsos[i] for i in np.nonzero(testFunction(dsoMatrix, numProfilesA))[0]}
+    significantSymbols = {symbols[i] for i in np.nonzero(testFunction(symbolMatrix, numProfilesA))[0]}
+    print("Significance test: {t} at 95% confidence. Significant differences: {d}/{nd} DSOs, {s}/{ns} symbols\n".format(
+          t=significanceTest, d=len(significantDsos), nd=len(dsos), s=len(significantSymbols), ns=len(symbols)))
+    return significantDsos, significantSymbols
 
 
 def printLibraryContribution(globalDictionary, dsoName):
@@ -101,7 +433,13 @@ def printAllLibrariesContribution(globalDictionary):
 
 
 
-def printDiffPerSymbol(symbolDictionary1, symbolDictionary2):
+'''
+Print the symbol differences of one DSO. If `significantSymbols` is not None
+only the symbols in that set are printed. If `compilations` is not None
+(a pair of dictionaries returned by parseVlogCompilations()) the compilation
+of each symbol in A and B is printed as well.
+'''
+def printDiffPerSymbol(symbolDictionary1, symbolDictionary2, significantSymbols=None, compilations=None):
     numPrintedSymbols = 0
     totalSamples1 = 0
     totalSamples2 = 0
@@ -120,26 +458,38 @@ def printDiffPerSymbol(symbolDictionary1, symbolDictionary2):
             else:
                 symbolUnion[symbol] = {'samples1':0, 'samples2':samples2}
 
-    print("| {s1:6s}\t | {s2:6s} \t | {diff:7s} \t | {percent:6s} \t | {sym:20s} ".format(s1='samples', s2='samples', diff='   diff', percent=' diff %', sym='Symbol'))
-    print("| {s1:6s}\t | {s2:6s} \t | {diff:7s} \t | {percent:6s} \t | {sym:20s} ".format(s1='-------', s2='-------', diff='-------', percent='-------', sym='------'))
+    # The compilations of the JIT methods are printed before the symbol which has a variable width
+    compHeader = "{c1:20s} | {c2:20s} | ".format(c1="Compilation A", c2="Compilation B") if compilations else ""
+    compSeparator = "{c1:20s} | {c2:20s} | ".format(c1="-------------", c2="-------------") if compilations else ""
+    print("| {s1:6s}\t | {s2:6s} \t | {diff:7s} \t | {percent:6s} \t | {comp}{sym:20s} ".format(s1='samples', s2='samples', diff='   diff', percent=' diff %', comp=compHeader, sym='Symbol'))
+    print("| {s1:6s}\t | {s2:6s} \t | {diff:7s} \t | {percent:6s} \t | {comp}{sym:20s} ".format(s1='-------', s2='-------', diff='-------', percent='-------', comp=compSeparator, sym='------'))
     percent = (totalSamples2 - totalSamples1)*100.0/float(totalSamples1) if totalSamples1 != 0 else 0.0
-    print("| {s1:6d}\t | {s2:6d} \t | {diff:7d} \t | {percent:6.1f}% \t | {symbol:20s} ".
-        format(s1=totalSamples1, s2=totalSamples2, diff=totalSamples2-totalSamples1, percent=percent, symbol="TOTAL"))
+    print("| {s1:6d}\t | {s2:6d} \t | {diff:7d} \t | {percent:6.1f}% \t | {comp}{symbol:20s} ".
+        format(s1=totalSamples1, s2=totalSamples2, diff=totalSamples2-totalSamples1, percent=percent, comp=" " * len(compHeader), symbol="TOTAL"))
     # Sort symbolUnion based on the absolute difference of samples
     sortedSymbols = sorted(symbolUnion.items(), key=lambda i: abs(i[1]['samples1']-i[1]['samples2']), reverse=True)
+    if significantSymbols is not None:
+        sortedSymbols = [item for item in sortedSymbols if item[0] in significantSymbols]
     for item in sortedSymbols:
         symbol = item[0]
         samples1 = item[1]['samples1']
         samples2 = item[1]['samples2']
         percent = (samples2 - samples1)*100.0/float(samples1)  if samples1 != 0 else 0.0
-        print("| {s1:6d} \t | {s2:6d} \t | {diff:7d} \t | {percent:6.1f}% \t | {sym:20s} ".format(s1=samples1, s2=samples2, diff=samples2-samples1, percent=percent, sym=symbol))
+        compInfo = "{c1:20s} | {c2:20s} | ".format(c1=describeCompilation(compilations[0], symbol), c2=describeCompilation(compilations[1], symbol)) if compilations else ""
+        print("| {s1:6d} \t | {s2:6d} \t | {diff:7d} \t | {percent:6.1f}% \t | {comp}{sym:20s} ".format(s1=samples1, s2=samples2, diff=samples2-samples1, percent=percent, comp=compInfo, sym=symbol))
         numPrintedSymbols += 1
-        if numPrintedSymbols > 20: # don't print more than 20 symbols per dso
+        if numPrintedSymbols > maxSymbolsPerDso: # don't print too many symbols per dso
             print("...")
             break
 
 
-def printDiffPerLibrary(globalDictionary1, globalDictionary2):
+'''
+Print the DSO differences followed by the symbol differences of the important DSOs.
+If `significantDsos` and `significantSymbols` are not None, only the significant
+differences are printed (the TOTAL line is always printed).
+`compilations` are the vlog compilations of A and B used to annotate the JIT symbols.
+'''
+def printDiffPerLibrary(globalDictionary1, globalDictionary2, significantDsos=None, significantSymbols=None, compilations=None):
     totalSamples1 = 0
     totalSamples2 = 0
     unionDsos = {}
@@ -164,6 +514,8 @@ def printDiffPerLibrary(globalDictionary1, globalDictionary2):
     sortedDsos = sorted(unionDsos.items(), key=lambda i: abs(i[1]['samples1']-i[1]['samples2']), reverse=True)
     for item in sortedDsos:
         dso = item[0]
+        if significantDsos is not None and dso not in significantDsos:
+            continue
         samples1 = item[1]['samples1']
         samples2 = item[1]['samples2']
         percent = (samples2 - samples1)*100.0/float(samples1)  if samples1 != 0 else 0.0
@@ -175,40 +527,51 @@ def printDiffPerLibrary(globalDictionary1, globalDictionary2):
         dso = item[0]
         samples1 = item[1]['samples1']
         samples2 = item[1]['samples2']
-        # Do not print symbols for dsos that use very little CPU compared to the total (less than 1%)
-        if samples1/float(totalSamples1) >= 0.01 or samples2/float(totalSamples2) >= 0.01:
+        # Do not print symbols for dsos that use very little CPU compared to the total
+        if samples1*100.0/float(totalSamples1) >= minDsoPercentForSymbols or samples2*100.0/float(totalSamples2) >= minDsoPercentForSymbols:
             symbolDictionary1 = globalDictionary1[dso] if dso in globalDictionary1 else None
             symbolDictionary2 = globalDictionary2[dso] if dso in globalDictionary2 else None
+            dsoSymbols = None if significantSymbols is None else {symbol for dsoName, symbol in significantSymbols if dsoName == dso}
+            if dsoSymbols is not None and not dsoSymbols:
+                continue
             print("======== ", dso, " ===========")
-            printDiffPerSymbol(symbolDictionary1, symbolDictionary2)
-
+            printDiffPerSymbol(symbolDictionary1, symbolDictionary2, dsoSymbols, compilations if dso == "[JIT]" else None)
 
 
-# Get the name of vlog
-if  len(sys.argv) < 2:
-    print ("Program must have 2N arguments: the perf profiles\n")
-    sys.exit(-1)
 
-numPerfProfiles = len(sys.argv) - 1
-if numPerfProfiles % 2 != 0:
-    print("Number of perf profiles must be even")
-    sys.exit(-1)
+if __name__ == "__main__":
+    vlogFileNames = parseVlogArgs(sys.argv)
+    if  len(sys.argv) < 2:
+        print ("Program must have 2N arguments: the perf profiles\n")
+        sys.exit(-1)
 
-# Process half the profiles
-globalDictionary1 = {}
-for i in range(numPerfProfiles//2):
-    perfFileName = str(sys.argv[i+1])
-    print(perfFileName)
-    processPerfProfile(perfFileName, globalDictionary1)
+    numPerfProfiles = len(sys.argv) - 1
+    if numPerfProfiles % 2 != 0:
+        print("Number of perf profiles must be even")
+        sys.exit(-1)
 
-# Process the other half
-globalDictionary2 = {}
-for i in range(numPerfProfiles//2, numPerfProfiles):
-    perfFileName = str(sys.argv[i+1])
-    print(perfFileName)
-    processPerfProfile(perfFileName, globalDictionary2)
+    # Process all the profiles in parallel
+    perfFileNames = [str(arg) for arg in sys.argv[1:]]
+    aggregates = processPerfProfiles(perfFileNames)
+    if jitSymbolFolding:
+        aggregates = [foldJitSymbols(aggregate) if aggregate is not None else None for aggregate in aggregates]
+    compilations = None
+    if any(vlogFileNames):
+        if jitSymbolFolding != "method":
+            print("JIT symbols can be matched with vlog compilations only when jitSymbolFolding is \"method\"")
+        else:
+            compilations = [parseVlogCompilations(vlogFileName) if vlogFileName else None for vlogFileName in vlogFileNames]
 
-#printAllLibrariesContribution(globalDictionary1)
-#printAllLibrariesContribution(globalDictionary2)
-printDiffPerLibrary(globalDictionary1, globalDictionary2)
+    # First half of the profiles goes into globalDictionary1, the other half into globalDictionary2
+    globalDictionary1 = {}
+    globalDictionary2 = {}
+    for i, (perfFileName, aggregate) in enumerate(zip(perfFileNames, aggregates)):
+        print(perfFileName)
+        if aggregate is None:
+            sys.exit(-1)
+        mergePerfProfile(aggregate, globalDictionary1 if i < numPerfProfiles//2 else globalDictionary2)
 
+    #printAllLibrariesContribution(globalDictionary1)
+    #printAllLibrariesContribution(globalDictionary2)
+    significantDsos, significantSymbols = findSignificantDifferences(aggregates)
+    printDiffPerLibrary(globalDictionary1, globalDictionary2, significantDsos, significantSymbols, compilations)
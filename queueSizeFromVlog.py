@@ -10,15 +10,17 @@
 # two timestamps we can have a lot of Q_SZ fluctuation. In such cases
 # we print the maximum value of the Q_SZ seen in between two timestamps
 #
-# Usage: python3 queueSizeFromVlog.py vlogFilename
+# Usage: python3 queueSizeFromVlog.py vlogFilename [--format text|tsv|csv|jsonl|parquet] [--output prefix]
 #
 # Author: Marius Pirvu
 
 import re # for regular expressions
 import sys # for accessing parameters and exit
+import outputWriter
 
 
-def parseVlog(vlog):
+def parseVlog(vlog, outputConfig):
+    table = outputConfig.openTable("queueSize", ["timeMs", "qsz", "jvmCpu"], textFormat="{:8d}\t{:5d}\t{:4d}")
     # + (cold) sun/reflect/Reflection.getCallerClass()Ljava/lang/Class; @ 00007FB21300003C-00007FB213000167 OrdinaryMethod - Q_SZ=1 Q_SZI=1 QW=2 j9m=000000000004D1D8 bcsz=2 JNI time=995us mem=[region=704 system=2048]KB compThreadID=0 CpuLoad=163%(10%avg) JvmCpu=0%
     compEndPattern  = re.compile('^\+ \((.+)\) (\S+) \@ (0x)?([0-9A-F]+)-(0x)?([0-9A-F]+).+ Q_SZ=(\d+).+ time=(\d+)us')
     # ! (cold) java/nio/Buffer.<init>(IIII)V Q_SZ=274 Q_SZI=274 QW=275 j9m=00000000000B3970 time=99us compilationAotClassReloFailure memLimit=206574 KB freePhysicalMemory=205 MB mem=[region=64 system=2048]KB compThreadID=0
@@ -49,7 +51,7 @@ def parseVlog(vlog):
                 else:
                     cpu = lastCPUvalue
 
-                print("{time:8d}\t{qsz:5d}\t{cpu:4d}".format(time=oldTimeMs, qsz=qsz, cpu=cpu))
+                table.writeRow(oldTimeMs, qsz, cpu)
                 # empty the list of values for queue sizes because a new interval starts
                 qszList = []
                 jvmCpuList = []
@@ -65,9 +67,11 @@ def parseVlog(vlog):
         if match:
             lastCPUvalue = int(match.group(1))
             jvmCpuList.append(lastCPUvalue)
+    table.close()
 
 
 ###############################################
+outputConfig = outputWriter.parseOutputArgs(sys.argv)
 # Get the name of vlog
 if  len(sys.argv) < 2:
     print ("Program must have an argument: the name of the vlog\n")
@@ -77,5 +81,5 @@ if  len(sys.argv) < 2:
 vlogFileName = str(sys.argv[1])
 Vlog = open(vlogFileName, 'r', 1)
 
-parseVlog(Vlog)
+parseVlog(Vlog, outputConfig)
 
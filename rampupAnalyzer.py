@@ -0,0 +1,175 @@
+# Warm-up (rampup) analysis of a throughput curve, used to compare how fast
+# JIT and JITServer configurations reach their steady-state throughput.
+# A curve is the throughput of consecutive intervals of one load pulse:
+#  - JMeter prints one "summary +" line per summariser interval (parseJMeterRampup)
+#  - asyncLoadGen.py counts the completed requests of every second (curveFromPerSecond)
+# and is kept as two lists (times, thr): the end of each interval in seconds since
+# the start of the load, and the throughput of that interval.
+# For a curve, analyzeRampup computes:
+#  - peak:   the best average of `peakWindow` consecutive intervals
+#  - steady: the average of the last `steadyStateFraction` of the intervals
+#  - t90/t95: the time (sec) at which the moving average first reaches 90%/95% of the peak
+#  - deficit: the requests lost while warming up, i.e. the area between the steady-state
+#             line and the curve, and lostSec = deficit/steady (seconds of steady-state work lost)
+#  - a fitted warm-up model thr(t) = fitSteady - A*exp(-t/tau) (least squares, with a grid
+#    search for tau), with its coefficient of determination fitR2
+# averageCurves averages the curves of several iterations interval by interval.
+#
+# Usage (in a runner):
+#   times, thr = rampupAnalyzer.parseJMeterRampup(lines)
+#   print(rampupAnalyzer.formatRampup(rampupAnalyzer.analyzeRampup(times, thr)))
+# Standalone: python3 rampupAnalyzer.py jmeterOutput1 [jmeterOutput2 ...]
+#   analyzes every file, then the average curve
+#
+# Author: Marius Pirvu
+
+import math
+import re # for regular expressions
+import sys # for accessing parameters and exit
+import numpy as np
+from benchStats import nanmean
+
+################## Configuration #####################
+peakWindow = 3 # number of consecutive intervals averaged for the peak throughput
+steadyStateFraction = 0.25 # the last 25% of the intervals are the steady state
+numTauValues = 200 # grid size for the time constant of the warm-up model
+rampupKeys = ("peak", "steady", "t90", "t95", "deficit", "lostSec", "fitSteady", "fitTau", "fitR2")
+#######################################################
+
+
+'''
+Return (times, thr) from the "summary +" lines of a JMeter output:
+# summary +  17050 in 00:00:06 = 2841.7/s Avg:     0 Min:     0 Max:    49 Err:     0 (0.00%) Active: 2 Started: 2 Finished: 0
+# summary +  20312 in     6.1s = 3329.8/s Avg:     0 Min:     0 Max:    12 Err:     0 (0.00%) Active: 2 Started: 2 Finished: 0
+Intervals in which some JMeter threads already finished (the end of the run) are ignored
+'''
+def parseJMeterRampup(lines):
+    pattern1 = re.compile(r'summary \+\s+(\d+) in\s+(\d+\.*\d*)s =\s+(\d+\.\d+)/s.+Finished: 0')
+    pattern2 = re.compile(r'summary \+\s+(\d+) in\s+(\d\d):(\d\d):(\d\d) =\s+(\d+\.\d+)/s.+Finished: 0')
+    times, thr = [], []
+    elapsed = 0.0
+    for line in lines:
+        if not line.startswith("summary +"):
+            continue
+        m = pattern1.match(line)
+        if m:
+            interval, value = float(m.group(2)), float(m.group(3))
+        else:
+            m = pattern2.match(line)
+            if not m:
+                continue
+            interval = float(m.group(2))*3600 + float(m.group(3))*60 + float(m.group(4))
+            value = float(m.group(5))
+        elapsed += interval
+        times.append(elapsed)
+        thr.append(value)
+    return times, thr
+
+
+'''
+Return (times, thr) from the number of completed requests of every second
+'''
+def curveFromPerSecond(perSecond):
+    return [float(second + 1) for second in range(len(perSecond))], [float(count) for count in perSecond]
+
+
+'''
+Trailing moving average over `window` intervals (shorter at the start of the curve)
+'''
+def movingAverage(thr, window=peakWindow):
+    cumulative = np.concatenate(([0.0], np.cumsum(thr)))
+    ends = np.arange(1, len(thr) + 1)
+    starts = np.maximum(ends - window, 0)
+    return (cumulative[ends] - cumulative[starts]) / (ends - starts)
+
+
+def peakThroughput(thr, window=peakWindow):
+    if len(thr) == 0:
+        return math.nan
+    window = min(window, len(thr))
+    return float(movingAverage(thr, window)[window - 1:].max())
+
+
+'''
+Least squares fit of thr(t) = steady - A*exp(-t/tau). For every tau of a logarithmic grid
+the model is linear in (steady, A); the tau with the smallest squared error is kept.
+Returns (steady, A, tau, r2)
+'''
+def fitWarmupModel(t, thr):
+    t, y = np.asarray(t, dtype=float), np.asarray(thr, dtype=float)
+    if len(y) < 3:
+        return math.nan, math.nan, math.nan, math.nan
+    taus = np.logspace(math.log10(max(t[0], 1e-3) / 10), math.log10(t[-1] * 10), numTauValues)
+    e = np.exp(-t[np.newaxis, :] / taus[:, np.newaxis]) # one row for every tau
+    eMean = e.mean(axis=1, keepdims=True)
+    eVar = ((e - eMean)**2).sum(axis=1)
+    slope = np.divide(((e - eMean) * (y - y.mean())).sum(axis=1), eVar, out=np.zeros_like(eVar), where=eVar > 1e-12)
+    intercept = y.mean() - slope * eMean[:, 0]
+    sse = ((y[np.newaxis, :] - intercept[:, np.newaxis] - slope[:, np.newaxis] * e)**2).sum(axis=1)
+    best = int(np.argmin(sse))
+    sst = ((y - y.mean())**2).sum()
+    r2 = 1.0 - sse[best] / sst if sst > 0 else math.nan
+    return float(intercept[best]), float(-slope[best]), float(taus[best]), float(r2)
+
+
+'''
+Warm-up metrics of a curve, as a dictionary with the keys in `rampupKeys` (NaN when not available)
+'''
+def analyzeRampup(times, thr):
+    metrics = {key: math.nan for key in rampupKeys}
+    if len(thr) == 0:
+        return metrics
+    times, thr = np.asarray(times, dtype=float), np.asarray(thr, dtype=float)
+    durations = np.diff(np.concatenate(([0.0], times)))
+    smoothed = movingAverage(thr)
+    metrics["peak"] = peak = peakThroughput(thr)
+    metrics["steady"] = steady = float(thr[-max(int(len(thr) * steadyStateFraction), 1):].mean())
+    for key, fraction in (("t90", 0.90), ("t95", 0.95)):
+        reached = np.nonzero(smoothed >= fraction * peak)[0]
+        metrics[key] = float(times[reached[0]]) if len(reached) else math.nan
+    metrics["deficit"] = float((np.maximum(steady - thr, 0.0) * durations).sum())
+    metrics["lostSec"] = metrics["deficit"] / steady if steady > 0 else math.nan
+    midpoints = times - durations / 2
+    metrics["fitSteady"], amplitude, metrics["fitTau"], metrics["fitR2"] = fitWarmupModel(midpoints, thr)
+    return metrics
+
+
+'''
+Average the curves of several iterations interval by interval. Curves are aligned on
+their first interval; a shorter curve does not contribute to the intervals it lacks.
+'''
+def averageCurves(curves):
+    curves = [(times, thr) for times, thr in curves if len(thr) > 0]
+    if not curves:
+        return [], []
+    length = max(len(thr) for times, thr in curves)
+    padded = np.full((len(curves), 2, length), math.nan)
+    for i, (times, thr) in enumerate(curves):
+        padded[i, 0, :len(times)] = times
+        padded[i, 1, :len(thr)] = thr
+    averages = nanmean(padded, axis=0)
+    return averages[0].tolist(), averages[1].tolist()
+
+
+def formatRampup(metrics):
+    return ("peak={peak:7.1f} steady={steady:7.1f} t90={t90:5.0f}s t95={t95:5.0f}s lost={lostSec:5.1f}s "
+            "fit: steady={fitSteady:7.1f} tau={fitTau:6.1f}s R2={fitR2:5.2f}".format(**metrics))
+
+
+def formatCurve(times, thr):
+    return " ".join("{t:.0f}:{v:.1f}".format(t=t, v=v) for t, v in zip(times, thr))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 rampupAnalyzer.py jmeterOutput1 [jmeterOutput2 ...]")
+        sys.exit(-1)
+    curves = []
+    for fileName in sys.argv[1:]:
+        with open(fileName, errors="replace") as f:
+            curves.append(parseJMeterRampup(f))
+        print("{f}: {r}".format(f=fileName, r=formatRampup(analyzeRampup(*curves[-1]))))
+    if len(curves) > 1:
+        times, thr = averageCurves(curves)
+        print("Average curve: {c}".format(c=formatCurve(times, thr)))
+        print("Average: {r}".format(r=formatRampup(analyzeRampup(times, thr))))
@@ -0,0 +1,143 @@
+# Detect the moment an AppServer becomes ready (or fails) by following its log,
+# instead of sleeping for a fixed time and re-reading the whole log afterwards.
+#  - LogFileWatcher follows a log file on the local machine (messages.log, quarkus.log).
+#    It is created before the AppServer is started and remembers where the file ended,
+#    so lines from previous runs are ignored. If the file is rotated or truncated
+#    (Liberty renames the old messages.log at startup) the new file is read from its start.
+#    The watcher reads only the bytes appended since the previous read, every `pollInterval`.
+#  - watchCommand follows the output of a command such as `docker logs -f <containerID>`
+#    and reacts to every line as soon as it is written.
+# Both return (ready, line, readyTime): ready is True when readyPattern matched a line,
+# False for an error line, an exited AppServer or a timeout; readyTime is the time.time()
+# at which the ready line was seen.
+#
+# Usage (in a runner):
+#   logWatcher = readinessWatcher.LogFileWatcher(logFile) # before starting the AppServer
+#   ...start the AppServer...
+#   ready, line, readyTime = logWatcher.wait(readyPattern, errPattern, timeout, isAlive)
+#
+# Author: Marius Pirvu
+
+import logging
+import os
+import queue
+import shlex, subprocess
+import threading
+import time # for sleep
+
+################## Configuration #####################
+pollInterval = 0.05 # seconds between two reads of a log file that did not change
+printLogLines = False # when True, print the log lines read while waiting
+#######################################################
+
+
+'''
+Return True for a ready line, False for an error line and None otherwise
+'''
+def matchLine(line, readyPattern, errorPattern):
+    if printLogLines:
+        print(line)
+    if errorPattern and errorPattern.search(line):
+        return False
+    if readyPattern.search(line):
+        return True
+    return None
+
+
+class LogFileWatcher:
+    '''
+    Follows a log file, starting from its end at the time the watcher is created
+    '''
+    def __init__(self, fileName):
+        self.fileName = fileName
+        try:
+            stat = os.stat(fileName)
+            self.inode, self.offset = stat.st_ino, stat.st_size
+        except OSError: # the AppServer will create it
+            self.inode, self.offset = None, 0
+
+    '''
+    Wait until a line matches readyPattern or errorPattern, for at most `timeout` seconds.
+    isAlive() is checked while the log is idle, so that a crashed AppServer is detected immediately
+    '''
+    def wait(self, readyPattern, errorPattern, timeout, isAlive=None):
+        deadline = time.monotonic() + timeout
+        f = None
+        partialLine = ""
+        try:
+            while True:
+                if f is None:
+                    f = self.openLog()
+                chunk = f.read() if f else ""
+                if chunk:
+                    lines = (partialLine + chunk).split("\n")
+                    partialLine = lines.pop() # not terminated yet
+                    for line in lines:
+                        status = matchLine(line, readyPattern, errorPattern)
+                        if status is not None:
+                            return status, line, time.time()
+                    continue
+                if isAlive and not isAlive():
+                    return False, "AppServer exited", None
+                if time.monotonic() > deadline:
+                    return False, "Timeout after {t} sec waiting for {f}".format(t=timeout, f=self.fileName), None
+                if f and self.isRotated(f):
+                    f.close()
+                    f, partialLine = None, ""
+                    continue
+                time.sleep(pollInterval)
+        finally:
+            if f:
+                f.close()
+
+    def openLog(self):
+        try:
+            f = open(self.fileName, errors="replace")
+        except OSError:
+            return None
+        inode = os.fstat(f.fileno()).st_ino
+        if inode == self.inode:
+            f.seek(self.offset)
+        self.inode, self.offset = inode, 0 # a rotated file is read from its start
+        return f
+
+    def isRotated(self, f):
+        try:
+            stat = os.stat(self.fileName)
+        except OSError:
+            return False # being renamed; keep reading the old file until the new one appears
+        return stat.st_ino != self.inode or stat.st_size < f.tell()
+
+
+'''
+Run `cmd` (e.g. "docker logs -f <containerID>") and wait until one of its output lines
+(stdout or stderr) matches readyPattern or errorPattern, for at most `timeout` seconds.
+The command is killed when the wait is over.
+'''
+def watchCommand(cmd, readyPattern, errorPattern, timeout):
+    deadline = time.monotonic() + timeout
+    process = subprocess.Popen(shlex.split(cmd), universal_newlines=True, errors="replace", stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    lines = queue.Queue()
+
+    def readLines():
+        for line in process.stdout:
+            lines.put(line.rstrip("\n"))
+        lines.put(None) # end of the stream
+
+    threading.Thread(target=readLines, daemon=True).start()
+    try:
+        while True:
+            try:
+                line = lines.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return False, "Timeout after {t} sec waiting for: {cmd}".format(t=timeout, cmd=cmd), None
+            if line is None:
+                return False, "Log stream ended: {cmd}".format(cmd=cmd), None
+            status = matchLine(line, readyPattern, errorPattern)
+            if status is not None:
+                return status, line, time.time()
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        logging.debug("Stopped following: {cmd}".format(cmd=cmd))
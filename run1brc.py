@@ -1,16 +1,19 @@
 # Python script for runing one billion row challenge
 import logging
-import math
 import os
 import re # for regular expressions
 import shlex, subprocess
 import sys # for accessing parameters and exit
+import sequentialSampling
+from benchStats import computeStats
 from timeit import default_timer
-import statistics
 
 
 doColdRun = False # If True, destroy the SCC before each benchmark
 doOnlyColdRuns = False
+adaptiveRuns = False # when True stop iterating once the CI95 of the run time drops below targetCI95; the number of iterations becomes the maximum
+targetCI95 = 1.0 # target half-width of the CI95, as a percentage of the mean
+minRuns = 5 # minimum number of measured iterations when adaptiveRuns is True
 affinity = "" # Use numactl or taskset
 #level=logging.DEBUG,
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s :: %(levelname)s :: (%(threadName)-6s) :: %(message)s',)
@@ -32,47 +35,6 @@ jdks = [
     #"/team/mpirvu/sdks/OpenJDK21U-jre_x64_linux_hotspot_21.0.5_11"
 ]
 
-def eliminateNans(myList):
-    return [value for value in myList if not math.isnan(value)]
-    max = -math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] > max:
-            max = myList[i]
-    return max
-
-def tDistributionValue95(degreeOfFreedom):
-    if degreeOfFreedom < 1:
-        return math.nan
-        #import scipy.stats as stats
-        #  stats.t.ppf(0.975, degreesOfFreedom))
-    tValues = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
-               2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
-               2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,]
-    if degreeOfFreedom <= 30:
-        return tValues[degreeOfFreedom-1]
-    else:
-        if degreeOfFreedom <= 60:
-            return 2.042 - 0.001 * (degreeOfFreedom - 30)
-        else:
-            return 1.96
-
-def computeStats(myList):
-    myList = eliminateNans(myList)
-    numSamples = len(myList)
-    if numSamples < 1:
-        return math.nan, math.nan, math.nan, math.nan, math.nan, 0
-    avg = statistics.fmean(myList)
-    stdDev = statistics.stdev(myList)
-    minVal = min(myList)
-    maxVal = max(myList)
-
-    tvalue = tDistributionValue95(numSamples-1)
-    marginOfError = tvalue * stdDev / math.sqrt(numSamples)
-    ci95 = 100.0*marginOfError/avg
-
-    return avg, stdDev, minVal, maxVal, ci95, numSamples
-
-
 def clearSCC(jvm, jvmOpts):
     print(jvm, jvmOpts)
     cmd = ""
@@ -117,18 +79,24 @@ def runBenchmarkIteratively(numIter, jdk, javaOpts):
     if doColdRun or doOnlyColdRuns:
         clearSCC(jdk, javaOpts)
 
+    startIter = 0 if (doOnlyColdRuns or not doColdRun) else 1
+    sampler = sequentialSampling.SequentialSampler(targetCI95, minRuns)
     for iter in range(numIter):
         if doOnlyColdRuns:
             clearSCC(jdk, javaOpts)
         thr = runBenchmarkOnce(jdk, javaOpts)
         thrResults.append(thr)
+        if iter >= startIter:
+            sampler.add(thr)
+        if adaptiveRuns and sampler.isDone():
+            print(f"CI95 target reached after {iter+1} runs: {sampler}")
+            break
 
    # print stats
-    startIter = 0 if (doOnlyColdRuns or not doColdRun) else 1
     print(f"\nResults for jdk: {jdk} and opts: {javaOpts}")
     if startIter > 0:
         print("First run is a cold run and is not included in the stats")
-    avg, stdDev, min, max, ci95, numSamples = computeStats(thrResults[startIter:])
+    avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(thrResults[startIter:])
     print("Runtime stats:  Avg={avg:7.1f}  StdDev={stdDev:7.1f}  Min={min:7.1f}  Max={max:7.1f}  Max/Min={maxmin:4.0f}% CI95={ci95:7.1f}% numSamples={numSamples:3d}".
                         format(avg=avg, stdDev=stdDev, min=min, max=max, maxmin=(max-min)*100.0/min, ci95=ci95, numSamples=numSamples))
 
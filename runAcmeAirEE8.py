@@ -1,6 +1,7 @@
 # Python script to run AcmeAirEE8 app in Liberty
 # Liberty is not run in containers. The script should be run on the same machine as the app server
 # Mongo and JMeter are run in containers. Both docker and podman should work.
+# Usage: python3 runAcmeAirEE8.py numIterations   or   python3 runAcmeAirEE8.py --campaign campaign.json (see campaignFile.py)
 
 import datetime # for datetime.datetime.now()
 import logging # https://www.machinelearningplus.com/python/python-logging-guide/
@@ -8,10 +9,16 @@ import math
 import os # for environment variables
 import re # for regular expressions
 import shlex, subprocess
-import statistics
 import sys # for number of arguments
+import sequentialSampling
+import readinessWatcher
+import smapsFootprint
+import campaignScheduler
+import campaignFile
+import rampupAnalyzer
+import loadLatency
+from benchStats import nanmean, countNotNan, computeStats, meanLastValues
 import time # for sleep
-from collections import deque
 
 
 # Set level to level=logging.DEBUG, level=logging.INFO or level=WARNING reduced level of verbosity
@@ -23,6 +30,11 @@ netOpts = "--network=slirp4netns" if docker == "podman" else "" # for podman we
 ################### Benchmark configuration #################
 doColdRun          = False # when True we clear the SCC before the first run. Set it to False for embedded SCC
 doOnlyColdRuns     = False # when True we run only the cold runs (doColdRun flag is ignored)
+adaptiveRuns       = False # when True stop iterating once the CI95 of the throughput drops below targetCI95; the number of iterations becomes the maximum
+targetCI95         = 2.0 # target half-width of the throughput CI95, as a percentage of the mean
+minRuns            = 5 # minimum number of measured iterations when adaptiveRuns is True
+campaignSchedule   = "sequential" # "sequential" runs all iterations of a configuration before the next one; "roundRobin" or "randomBlocks" interleave the configurations (adaptiveRuns and memAnalysis are not used then)
+campaignSeed       = None # seed for the "randomBlocks" schedule
 AppServerHost      = "localhost" # the host where the app server is running from the point of view of the JMeter machine
 AppServerPort      = 9080
 AppServerLocation  = "/opt/IBM/OL-23.0.0.3/liberty"
@@ -32,9 +44,10 @@ applicationLocation= f"{AppServerLocation}/usr/servers/{applicationName}"
 logFile            = f"{applicationLocation}/logs/messages.log"
 appServerStartCmd  = f"{AppServerAffinity} {AppServerLocation}/bin/server run {applicationName}"
 appServerStopCmd   = f"{AppServerLocation}/bin/server stop {applicationName}"
-startupWaitTime    = 30 # seconds to wait before checking to see if AppServer is up
+startupWaitTime    = 60 # maximum seconds to wait for the AppServer to be ready (the log is followed, see readinessWatcher.py)
 
 memAnalysis = False # Collect javacores and smaps for memory analysis
+smapsSummaryEveryIteration = False # Log the RSS of each type of memory mapping (see smapsFootprint.py) at the end of every iteration
 dirForMemAnalysisFiles = "/tmp"
 extraArgsForMemAnalysis = f" -Dcom.ibm.dbgmalloc=true -Xdump:none -Xdump:system:events=user,file={dirForMemAnalysisFiles}/core.%pid.%seq.dmp -Xdump:java:events=user,file={dirForMemAnalysisFiles}/javacore.%pid.%seq.txt"
 # For collection of profiles, -Xjit:perfTool may need to be added to the OpenJ9 command line
@@ -65,7 +78,9 @@ jmeterUsername      = "" # To connect to JMeter machine; leave empty to connect
 jmeterImage         = "localhost/jmeter-acmeair:5.3"
 jmeterContainerName = "jmeter"
 jmeterAffinity      = "16-19"
-printRampup         =  False # If True, print all JMeter throughput values to plot rampup curve
+printRampup         =  False # If True, print all JMeter throughput values and the warm-up metrics of every pulse
+jmeterJTLOpts       = "" # docker options that make the JMeter image write a JTL file, e.g. "-v /tmp/jtl:/jtl -e JRESULTS=/jtl/results.jtl"
+jmeterJTLFile       = "" # The JTL file on jmeterMachine, e.g. "/tmp/jtl/results.jtl"; leave empty to skip the latency percentiles
 
 ################ Load CONFIG ###############
 numRepetitionsOneClient = 0
@@ -102,145 +117,6 @@ jdks = [
     "/home/mpirvu/FullJava17/openj9-openjdk-jdk17/build/linux-x86_64-server-release/images/jdk",
 ]
 
-def count_not_nan(myList):
-    total = 0
-    for elem in myList:
-        if not math.isnan(elem):
-            total += 1
-    return total
-
-def nanmean(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-    return total/numValidElems if numValidElems > 0 else math.nan
-
-
-def nanstd(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-
-    if numValidElems == 0:
-        return math.nan
-    if numValidElems == 1:
-        return 0
-    else:
-        mean = total/numValidElems
-        total = 0
-        for i in range(len(myList)):
-            if not math.isnan(myList[i]):
-                total += (myList[i] - mean)**2
-        return math.sqrt(total/(numValidElems-1))
-
-
-def nanmin(myList):
-    min = math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] < min:
-            min = myList[i]
-    return min
-
-
-def nanmax(myList):
-    max = -math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] > max:
-            max = myList[i]
-    return max
-
-'''
-Given an input list of values, eliminate all NaNs and return a new list
-'''
-def eliminateNans(myList):
-    return [value for value in myList if not math.isnan(value)]
-
-
-'''
-Receives an array reference with results.
-We compute the lower and and upper quartile, then compute the interquartile
-range (IQR=Q3-Q1) and the lower (Q1 - 1.5*IQR) and upper (Q3 + 1.5*IQR) fences.
-The two fences are returned to the caller in an array with 2 elements.
-Needs at least 4 data points
-'''
-def computeOutlierFences(myList):
-    Q1, Q2, Q3 = statistics.quantiles(myList, n = 4, method='inclusive')
-    # Compute the interquartile range
-    IQR = Q3 - Q1
-    lowerFence = Q1 - 3 * IQR
-    upperFence  = Q3 + 3 * IQR
-    return (lowerFence, upperFence)
-
-def tDistributionValue95(degreeOfFreedom):
-    if degreeOfFreedom < 1:
-        return math.nan
-        #import scipy.stats as stats
-        #  stats.t.ppf(0.975, degreesOfFreedom))
-    tValues = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
-               2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
-               2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,]
-    if degreeOfFreedom <= 30:
-        return tValues[degreeOfFreedom-1]
-    else:
-        if degreeOfFreedom <= 60:
-            return 2.042 - 0.0014 * (degreeOfFreedom - 30)
-        else:
-            return 1.96
-
-# Confidence intervals tutorial
-# mean +- t * std / sqrt(n)
-# For 95% confidence interval, t = 1.96 if we have many samples
-def meanConfidenceInterval95(myList):
-    n = len(myList)
-    if n <= 1:
-        return math.nan
-    tvalue = tDistributionValue95(n-1)
-    avg, stdDev = nanmean(myList), nanstd(myList)
-    marginOfError = tvalue * stdDev / math.sqrt(n)
-    return 100.0*marginOfError/avg
-
-
-def computeStats(myList, eliminateOutliers=False):
-    newList = eliminateNans(myList)
-    if len(newList) < 1:
-        return math.nan, math.nan, math.nan, math.nan, math.nan, 0, []
-    # Eliminate outliers
-    outlierList = []
-    goodValuesList = []
-    if eliminateOutliers and len(newList) > 3:
-        lowerFence, upperFence = computeOutlierFences(newList)
-        for val in newList:
-            if val < lowerFence or val > upperFence:
-                outlierList.append(val)
-            else:
-                goodValuesList.append(val)
-    else:
-        goodValuesList = newList
-    avg = statistics.fmean(goodValuesList)
-    stdDev = statistics.stdev(goodValuesList) if len(myList) > 1 else 0
-    minVal = min(goodValuesList)
-    maxVal = max(goodValuesList)
-    numSamples = len(goodValuesList)
-    tvalue = tDistributionValue95(numSamples-1)
-    marginOfError = tvalue * stdDev / math.sqrt(numSamples)
-    ci95 = 100.0*marginOfError/avg
-
-    return avg, stdDev, minVal, maxVal, ci95, numSamples, outlierList
-
-
-def meanLastValues(myList, numLastValues):
-    assert numLastValues > 0
-    if numLastValues > len(myList):
-        numLastValues = len(myList)
-    return nanmean(myList[-numLastValues:])
-
-
 def getJavaProcesses():
     cmd = "ps -eo pid,cmd --no-headers"
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
@@ -337,6 +213,13 @@ def collectJavacoreAndSmaps(javaPID):
     collectSmaps(javaPID)
 
 
+def logSmapsSummary(javaPID):
+    try:
+        logging.info("RSS per mapping type (MB): " + smapsFootprint.formatRssSummary(javaPID))
+    except IOError as ioe:
+        logging.warning("Cannot read smaps for javaPID {javaPID}: {msg}".format(javaPID=javaPID, msg=str(ioe)))
+
+
 """
 Find the main compilation thread ID of an OpenJ9 JVM process
 The JVM can have multiple compilation threads; in this case we will
@@ -430,29 +313,15 @@ def clearSCC(jdk, sccDestroyParams):
     # TODO: make sure the SCC does not exist anymore
 
 
-def verifyAppserverStarted():
+def verifyAppserverStarted(logWatcher, childProcess):
     #[5/3/23, 8:27:25:850 PDT] 0000002a com.ibm.ws.kernel.feature.internal.FeatureManager   A CWWKF0011I: The crudserver server is ready to run a smarter planet. The crudserver server started in 48.607 seconds.
     # Look for "server is ready to run a smarter planet" in messages.log
     errPattern = re.compile('.+\[ERROR')
     readyPattern = re.compile(".+is ready to run a smarter planet")
-    for iter in range(20):
-        try:
-            with open(logFile) as f:
-                for line in f:
-                    print(line)
-                    m = errPattern.match(line)
-                    if m:
-                        logging.warning("AppServer {applicationName} errored while starting:\n\t {line}").format(applicationName=applicationName,line=line)
-                        return False
-                    m1 = readyPattern.match(line)
-                    if m1:
-                        return True # True means success
-        except IOError:
-            print("Could not open file", logFile)
-            return False
-        logging.warning("sleeping 1 sec and trying again")
-        time.sleep(1) # wait 1 sec and try again
-    return False # False means failure
+    ready, line, readyTime = logWatcher.wait(readyPattern, errPattern, startupWaitTime, isAlive=lambda: childProcess.poll() is None)
+    if not ready:
+        logging.warning("AppServer {applicationName} did not start correctly: {line}".format(applicationName=applicationName, line=line))
+    return ready # True means success
 
 
 def killAppServerIfRunning(childProcess):
@@ -473,15 +342,15 @@ def startAppServer(jdk, jvmArgs):
     myEnv["TR_OptionsAOT"] = TR_OptionsAOT
     myEnv["MONGO_HOST"] = dbMachine
     myEnv["MONGO_PORT"] = dbPort
+    logWatcher = readinessWatcher.LogFileWatcher(logFile) # only the lines written by this AppServer count
     # Fork a process and run in background
     childProcess = subprocess.Popen(shlex.split(appServerStartCmd), env=myEnv, universal_newlines=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    logging.debug(f"Waiting for {startupWaitTime} sec for the AppServer to start")
-    time.sleep(startupWaitTime)
+    logging.debug(f"Waiting up to {startupWaitTime} sec for the AppServer to start")
     startOK = False
     if childProcess.poll() is None: # It's running
         logging.debug("AppServer started with pid {pid}".format(pid=childProcess.pid))
         # Verify that server started correctly
-        startOK = verifyAppserverStarted()
+        startOK = verifyAppserverStarted(logWatcher, childProcess)
         if not startOK:
             logging.error("AppServer did not start correctly")
             outs, errs = childProcess.communicate(timeout=15)
@@ -589,15 +458,20 @@ def stopJITServer(jitServerProcess):
             stderrFile.write(stderr)
 
 def applyLoad(duration, numClients):
+    if jmeterJTLFile: # JMeter appends to an existing JTL file
+        remoteCmd = f"rm -f {jmeterJTLFile}"
+        cmd = f"ssh {jmeterUsername}@{jmeterMachine} \"{remoteCmd}\"" if jmeterUsername else remoteCmd
+        subprocess.run(shlex.split(cmd), check=False)
     # Run jmeter remotely
-    remoteCmd = f"{docker} run -d --network=host --cpuset-cpus={jmeterAffinity} -e JTHREAD={numClients} -e JDURATION={duration} -e JUSER={maxUsers} -e JHOST={AppServerHost} -e JPORT={AppServerPort} --name {jmeterContainerName} {jmeterImage}"
+    remoteCmd = f"{docker} run -d --network=host --cpuset-cpus={jmeterAffinity} -e JTHREAD={numClients} -e JDURATION={duration} -e JUSER={maxUsers} -e JHOST={AppServerHost} -e JPORT={AppServerPort} {jmeterJTLOpts} --name {jmeterContainerName} {jmeterImage}"
     cmd = f"ssh {jmeterUsername}@{jmeterMachine} \"{remoteCmd}\"" if jmeterUsername else remoteCmd
     logging.info("Apply load: {cmd}".format(cmd=cmd))
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
 
 def getThroughput():
     logging.debug("Getting throughput info...")
-    remoteCmd = f"{docker} logs --tail=200 {jmeterContainerName}"
+    # The whole log is needed for the rampup curve (one "summary +" line per JMeter interval)
+    remoteCmd = f"{docker} logs {jmeterContainerName}"
     cmd = f"ssh {jmeterUsername}@{jmeterMachine} \"{remoteCmd}\"" if jmeterUsername else remoteCmd
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True, stderr=subprocess.DEVNULL)
     lines = output.splitlines()
@@ -611,26 +485,8 @@ def getThroughput():
     errs = 0
     totalTransactions = 0
     lastSummaryLine = ""
-    slidingWindow = deque([0.0, 0.0, 0.0])
-    pattern1 = re.compile('summary \+\s+(\d+) in\s+(\d+\.*\d*)s =\s+(\d+\.\d+)/s.+Finished: 0')
-    pattern2 = re.compile('summary \+\s+(\d+) in\s+(\d\d):(\d\d):(\d\d) =\s+(\d+\.\d+)/s.+Finished: 0')
+    # The "summary +" lines (throughput of every interval) are analyzed by rampupAnalyzer
     for line in lines:
-        # summary +  17050 in 00:00:06 = 2841.7/s Avg:     0 Min:     0 Max:    49 Err:     0 (0.00%) Active: 2 Started: 2 Finished: 0
-        if line.startswith("summary +"):
-            if printRampup:
-                print(line)
-            m = pattern1.match(line)
-            if m:
-                thr = float(m.group(3))
-                slidingWindow.pop()
-                slidingWindow.appendleft(thr)
-            else:
-                m = pattern2.match(line)
-                if m:
-                    thr = float(m.group(5))
-                    slidingWindow.pop()
-                    slidingWindow.appendleft(thr)
-
         if line.startswith("summary ="):
             lastSummaryLine = line
 
@@ -650,14 +506,35 @@ def getThroughput():
             elapsedTime = float(m.group(2))*3600 + float(m.group(3))*60 + float(m.group(4))
             throughput = float(m.group(5))  # Fifth group is the throughput value
             errs = int(m.group(6)) # Sixth group is the number of errors
-    # Compute the peak throughput as a sliding window of 3 consecutive entries
-    peakThr = sum(slidingWindow)/len(slidingWindow)
+    # The peak throughput is the best average of 3 consecutive intervals
+    times, thrSeries = rampupAnalyzer.parseJMeterRampup(lines)
+    peakThr = rampupAnalyzer.peakThroughput(thrSeries)
+    if printRampup and thrSeries:
+        print("Rampup: " + rampupAnalyzer.formatCurve(times, thrSeries))
+        print("Warm-up: " + rampupAnalyzer.formatRampup(rampupAnalyzer.analyzeRampup(times, thrSeries)))
 
     #print (str(elapsedTime), throughput, sep='\t')
     if errs > 0:
         logging.error("JMeter Errors: {n}".format(n=errs))
     return throughput, elapsedTime, peakThr, errs
 
+'''
+Latency percentiles of the last JMeter pulse, streamed from the JTL file on the JMeter machine
+'''
+def getLatencyJMeter():
+    remoteCmd = f"cat {jmeterJTLFile}"
+    cmd = f"ssh {jmeterUsername}@{jmeterMachine} \"{remoteCmd}\"" if jmeterUsername else remoteCmd
+    process = subprocess.Popen(shlex.split(cmd), universal_newlines=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        histogram, numErrors = loadLatency.parseJTL(process.stdout)
+    except ValueError as e:
+        logging.warning("Cannot read latencies from {f}: {e}".format(f=jmeterJTLFile, e=e))
+        return loadLatency.emptyLatency()
+    finally:
+        process.stdout.close()
+        process.wait()
+    return loadLatency.latencySummary(histogram)
+
 def stopJMeter():
     remoteCmd = f"{docker} rm {jmeterContainerName}"
     cmd = f"ssh {jmeterUsername}@{jmeterMachine} \"{remoteCmd}\"" if jmeterUsername else remoteCmd
@@ -677,15 +554,16 @@ def runPhase(duration, numClients):
     logging.debug("Wait for {jmeter} to end: {cmd}".format(jmeter=jmeterContainerName, cmd=cmd))
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
 
-    # Read throughput
+    # Read throughput and latency
     thr, elapsed, peakThr, errors = getThroughput()
+    latency = getLatencyJMeter() if jmeterJTLFile else loadLatency.emptyLatency()
 
     stopJMeter()
     if logging.root.level <= logging.DEBUG:
-        print("Throughput={thr:7.1f} duration={elapsed:6.1f} peak={peakThr:7.1f} errors={err:4d}".format(thr=thr,elapsed=elapsed,peakThr=peakThr,err=errors))
+        print("Throughput={thr:7.1f} duration={elapsed:6.1f} peak={peakThr:7.1f} errors={err:4d}  Latency: {lat}".format(thr=thr,elapsed=elapsed,peakThr=peakThr,err=errors,lat=loadLatency.formatLatency(latency)))
     if errors > 0:
         logging.error(f"JMeter encountered {errors} errors")
-    return thr, elapsed, peakThr, errors
+    return thr, elapsed, peakThr, errors, latency
 
 
 def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
@@ -696,6 +574,7 @@ def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
     # Will apply load in small bursts
     maxPulses = numRepetitionsOneClient + numRepetitions50Clients
     thrResults = [math.nan for i in range(maxPulses)] # np.full((maxPulses), fill_value=np.nan, dtype=np.float)
+    latencyResults = [loadLatency.emptyLatency() for i in range(maxPulses)] # p50/p90/p99/max for each pulse
     rss, peakRss, cpu, startupTime = math.nan, math.nan, math.nan, math.nan
     peakThroughput = math.nan
 
@@ -706,7 +585,7 @@ def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
 
     childProcess = startAppServer(jdk=jdk, jvmArgs=jvmArgs)
     if childProcess is None: # Failed to start properly
-        return thrResults, peakThroughput, rss, peakRss, cpu, startupTime
+        return thrResults, peakThroughput, rss, peakRss, cpu, startupTime, latencyResults
 
     # Compute AppServer start-up time
     startupTime = getStartupTime(startTimeMs)
@@ -733,7 +612,7 @@ def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
             else:
                 logging.error("Failed to start JVM perf profiling because Java process has terminated")
 
-        thrResults[pulse], elapsed, peakThr, errors = runPhase(duration, cli)
+        thrResults[pulse], elapsed, peakThr, errors, latencyResults[pulse] = runPhase(duration, cli)
         if errors == 0:
             peakThroughput = max(peakThroughput, peakThr)
         logging.info("Throughput={thr}".format(thr=thrResults[pulse]))
@@ -741,6 +620,8 @@ def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
     # Collect RSS at end of run
     if childProcess.poll() is None: # Still running
         rss, peakRss = getRss(pid=childProcess.pid)
+        if smapsSummaryEveryIteration:
+            logSmapsSummary(childProcess.pid)
 
         if doMemAnalysis:
             logging.info("Generating javacore, core and smaps for process {pid}".format(pid=childProcess.pid))
@@ -754,47 +635,17 @@ def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
     cpu = getCompCPU(childProcess)
 
     # return throughput as an array of throughput values for each burst and also the RSS, PeakRSS and CPU
-    return thrResults, peakThroughput, rss, peakRss, cpu, startupTime
+    return thrResults, peakThroughput, rss, peakRss, cpu, startupTime, latencyResults
 
 
-def runBenchmarkIteratively(numIter, jdk, javaOpts):
-    # Initialize stats; 2D array of throughput results
+'''
+Print the results of all the runs of a configuration and their statistics.
+The runs before `startIter` (the cold run) are not included in the statistics.
+`latencyResults` holds the p50/p90/p99/max latency pulses of every run.
+'''
+def printResults(jdk, javaOpts, thrResults, rssResults, cpuResults, startupResults, latencyResults, startIter):
+    numIter = len(thrResults)
     numPulses = numRepetitionsOneClient + numRepetitions50Clients
-    thrResults = [] # List of lists
-    rssResults = [] # Just a list
-    cpuResults = []
-    startupResults = []
-
-    # clear SCC if needed (by destroying the SCC volume)
-    if doColdRun:
-        clearSCC(jdk, sccDestroyParams)
-
-    # Start JITServer if needed
-    jitServerHandle = None
-    if "-XX:+UseJITServer" in javaOpts:
-        jitServerHandle = startJITServer(jdk)
-        if jitServerHandle == None:
-            sys.exit(-1)
-
-    for iter in range(numIter):
-        if doOnlyColdRuns:
-            clearSCC(jdk, sccDestroyParams)
-        # if memAnalysis is True, add the options required for memory analysis, but only for the last iteration
-        doMemAnalysis = memAnalysis and iter == numIter - 1
-        if doMemAnalysis:
-            javaOpts = javaOpts + extraArgsForMemAnalysis
-        thrList, peakThr, rss, peakRss, cpu, startupTime = runBenchmarkOnce(jdk, javaOpts, doMemAnalysis)
-        lastThr = meanLastValues(thrList, numMeasurementTrials) # average for last N pulses
-        print(f"Run {iter}: Thr={lastThr:6.1f} RSS={rss:6.1f} MB  PeakRSS={peakRss:6.1f} MB  CPU={cpu:4.1f} sec  Startup={startupTime:5.0f} PeakThr={peakThr:6.1f}".
-              format(lastThr=lastThr, rss=rss, peakRss=peakRss, cpu=cpu, startupTime=startupTime, peakThr=peakThr), flush=True)
-        thrResults.append(thrList) # copy all the pulses
-        rssResults.append(rss)
-        cpuResults.append(cpu)
-        startupResults.append(startupTime)
-
-    startIter = 0 if (doOnlyColdRuns or not doColdRun) else 1
-
-    # print stats
     print(f"\nResults for jdk: {jdk} and opts: {javaOpts}")
     if startIter > 0:
         print("First run is a cold run and is not included in the stats")
@@ -838,10 +689,118 @@ def runBenchmarkIteratively(numIter, jdk, javaOpts):
     avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(startupResults[startIter:], eliminateOutliers=True)
     print("StartupTime stats:Avg={avg:7.1f}  StdDev={stdDev:7.1f}  Min={min:7.1f}  Max={max:7.1f}  Max/Min={maxmin:4.0f}% CI95={ci95:7.1f}% numSamples={numSamples:3d}".
                         format(avg=avg, stdDev=stdDev, min=min, max=max, maxmin=(max-min)*100.0/min, ci95=ci95, numSamples=numSamples))
+    # Latency stats (average of the last N pulses of every run), available when JMeter writes a JTL file
+    for key in loadLatency.latencyKeys:
+        latencyAvgResults = [meanLastValues([latency[key] for latency in latencyList], numMeasurementTrials) for latencyList in latencyResults[startIter:]]
+        if countNotNan(latencyAvgResults) == 0:
+            continue
+        avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(latencyAvgResults, eliminateOutliers=True)
+        print("Latency {key} ms:   Avg={avg:7.2f}  StdDev={stdDev:7.2f}  Min={min:7.2f}  Max={max:7.2f}  Max/Min={maxmin:4.0f}% CI95={ci95:7.1f}% numSamples={numSamples:3d}".
+                            format(key=key, avg=avg, stdDev=stdDev, min=min, max=max, maxmin=(max-min)*100.0/min if min > 0 else math.nan, ci95=ci95, numSamples=numSamples))
+
+
+def runBenchmarkIteratively(numIter, jdk, javaOpts):
+    # Initialize stats; 2D array of throughput results
+    thrResults = [] # List of lists
+    rssResults = [] # Just a list
+    cpuResults = []
+    startupResults = []
+    latencyResults = []
+
+    # clear SCC if needed (by destroying the SCC volume)
+    if doColdRun:
+        clearSCC(jdk, sccDestroyParams)
+
+    # Start JITServer if needed
+    jitServerHandle = None
+    if "-XX:+UseJITServer" in javaOpts:
+        jitServerHandle = startJITServer(jdk)
+        if jitServerHandle == None:
+            sys.exit(-1)
+
+    startIter = 0 if (doOnlyColdRuns or not doColdRun) else 1
+    sampler = sequentialSampling.SequentialSampler(targetCI95, minRuns)
+    for iter in range(numIter):
+        if doOnlyColdRuns:
+            clearSCC(jdk, sccDestroyParams)
+        # if memAnalysis is True, add the options required for memory analysis, but only for the last iteration
+        doMemAnalysis = memAnalysis and iter == numIter - 1
+        if doMemAnalysis:
+            javaOpts = javaOpts + extraArgsForMemAnalysis
+        thrList, peakThr, rss, peakRss, cpu, startupTime, latencyList = runBenchmarkOnce(jdk, javaOpts, doMemAnalysis)
+        lastThr = meanLastValues(thrList, numMeasurementTrials) # average for last N pulses
+        p99 = meanLastValues([latency["p99"] for latency in latencyList], numMeasurementTrials)
+        print(f"Run {iter}: Thr={lastThr:6.1f} p99={p99:7.2f} ms RSS={rss:6.1f} MB  PeakRSS={peakRss:6.1f} MB  CPU={cpu:4.1f} sec  Startup={startupTime:5.0f} PeakThr={peakThr:6.1f}".
+              format(lastThr=lastThr, rss=rss, peakRss=peakRss, cpu=cpu, startupTime=startupTime, peakThr=peakThr), flush=True)
+        thrResults.append(thrList) # copy all the pulses
+        rssResults.append(rss)
+        cpuResults.append(cpu)
+        startupResults.append(startupTime)
+        latencyResults.append(latencyList)
+        if iter >= startIter:
+            sampler.add(lastThr)
+        if adaptiveRuns and sampler.isDone():
+            print(f"Throughput CI95 target reached after {iter+1} runs: {sampler}")
+            numIter = iter + 1
+            break
+
+    printResults(jdk, javaOpts, thrResults, rssResults, cpuResults, startupResults, latencyResults, startIter)
 
     if jitServerHandle:
         stopJITServer(jitServerHandle)
 
+'''
+Run one iteration of a campaign configuration: a dictionary with "jdk", "jvmOpts"
+and optionally "workload" (overrides for the configuration globals, see campaignFile.py).
+Returns the metrics of the run as a dictionary.
+'''
+def runCampaignIteration(config, round):
+    campaignFile.applyWorkload(globals(), config.get("workload"))
+    jdk, javaOpts = config["jdk"], config["jvmOpts"]
+    thrList, peakThr, rss, peakRss, cpu, startupTime, latencyList = runBenchmarkOnce(jdk, javaOpts, False)
+    lastThr = meanLastValues(thrList, numMeasurementTrials) # average for last N pulses
+    p99 = meanLastValues([latency["p99"] for latency in latencyList], numMeasurementTrials)
+    print(f"Round {round}: Thr={lastThr:6.1f} p99={p99:7.2f} ms RSS={rss:6.1f} MB  PeakRSS={peakRss:6.1f} MB  CPU={cpu:4.1f} sec  Startup={startupTime:5.0f} PeakThr={peakThr:6.1f}  {campaignLabel(config)}", flush=True)
+    return {"thrPulses": thrList, "peakThr": peakThr, "rss": rss, "peakRss": peakRss, "compCPU": cpu, "startup": startupTime, "latencyPulses": latencyList}
+
+
+def campaignLabel(config):
+    return f"jdk: {config['jdk']} opts: {config['jvmOpts']}" + (f" workload: {config['workload']}" if config.get("workload") else "")
+
+
+'''
+Run all the configurations of a campaign in rounds, according to `schedule` (see campaignScheduler.py),
+then print the results of each configuration and the paired per-round throughput deltas relative
+to the first configuration. With a resultsLog, the runs already done are loaded instead of being repeated.
+'''
+def runCampaign(configs, numIter, schedule, seed, resultsLog=None):
+    # The JITServer of a jdk is shared by all the configurations that use it
+    jitServerHandles = {}
+    for config in configs:
+        jdk = config["jdk"]
+        if "-XX:+UseJITServer" in config["jvmOpts"] and jdk not in jitServerHandles:
+            jitServerHandles[jdk] = startJITServer(jdk)
+            if jitServerHandles[jdk] == None:
+                sys.exit(-1)
+
+    sccKey = lambda config: campaignScheduler.sccKeyFromOptions(config["jvmOpts"], sccDir)
+    destroySCC = lambda config: clearSCC(config["jdk"], campaignScheduler.sccDestroyOption(sccKey(config)))
+    results, coldResults = campaignScheduler.runCampaign(configs, numIter, runCampaignIteration, destroySCC, sccKey, doColdRun=doColdRun,
+                                                         doOnlyColdRuns=doOnlyColdRuns, schedule=schedule, seed=seed, resultsLog=resultsLog)
+    for config, runs in zip(configs, results):
+        campaignFile.applyWorkload(globals(), config.get("workload")) # the number of pulses may depend on the workload
+        printResults(config["jdk"], config["jvmOpts"], [run["thrPulses"] for run in runs], [run["rss"] for run in runs],
+                     [run["compCPU"] for run in runs], [run["startup"] for run in runs],
+                     [run.get("latencyPulses", [loadLatency.emptyLatency()]) for run in runs], 0) # logs written before latencies were recorded have no "latencyPulses"
+    if doColdRun and not doOnlyColdRuns:
+        print("The cold runs are not included in the stats")
+    campaignScheduler.printPairedDeltas([campaignLabel(config) for config in configs],
+                                        [[meanLastValues(run["thrPulses"], numMeasurementTrials) for run in runs] for runs in results])
+
+    for jitServerHandle in jitServerHandles.values():
+        stopJITServer(jitServerHandle)
+
+
 def cleanup():
     stopContainersFromImage(dbMachine, dbUsername, dbImage)
     # CWWKE0029E: An instance of server crudserver is already running.
@@ -849,8 +808,9 @@ def cleanup():
 
 
 ############################ MAIN ##################################
-if  len(sys.argv) < 2:
-    print ("Program must have an argument: the number of iterations\n")
+campaign = campaignFile.parseCampaignArgs(sys.argv, axes=("jdk", "jvmOpts", "workload"))
+if  len(sys.argv) < 2 and not campaign:
+    print ("Program must have an argument: the number of iterations, or --campaign <campaign file>\n")
     sys.exit(-1)
 
 # Clean-up from a previous possible bad run
@@ -864,9 +824,16 @@ if doOnlyColdRuns:
 elif doColdRun:
     print("Will do a cold run before each set")
 
-for jvmOpts in jvmOptions:
-    for jdk in jdks:
-        runBenchmarkIteratively(numIter=int(sys.argv[1]), jdk=jdk, javaOpts=jvmOpts)
+if campaign:
+    resultsLog = campaignFile.ResultsLog(campaign["resultsLog"])
+    runCampaign(campaign["cells"], campaign["iterations"], campaign["schedule"], campaign["seed"], resultsLog)
+    resultsLog.close()
+elif campaignSchedule == "sequential":
+    for jvmOpts in jvmOptions:
+        for jdk in jdks:
+            runBenchmarkIteratively(numIter=int(sys.argv[1]), jdk=jdk, javaOpts=jvmOpts)
+else:
+    runCampaign([{"jdk": jdk, "jvmOpts": jvmOpts} for jvmOpts in jvmOptions for jdk in jdks], int(sys.argv[1]), campaignSchedule, campaignSeed)
 
 # Stop the database
 stopDatabase(dbMachine, dbUsername)
@@ -4,6 +4,10 @@ import time # for sleep
 import re # for regular expressions
 import math
 import sys # for number of arguments
+import sequentialSampling
+import readinessWatcher
+import loadLatency
+from benchStats import nanmean, countNotNan, computeStats, meanLastValues
 #import threading
 
 # Set level to level=logging.DEBUG, level=logging.INFO or level=WARNING reduced level of verbosity
@@ -11,6 +15,9 @@ logging.basicConfig(level=logging.WARNING, format='%(asctime)s :: %(levelname)s
 
 ################### Benchmark configuration #################
 doColdRun       = True  # when True we clear the SCC before the first run
+adaptiveRuns    = False # when True stop iterating once the CI95 of the throughput drops below targetCI95; the number of iterations becomes the maximum
+targetCI95      = 2.0 # target half-width of the throughput CI95, as a percentage of the mean
+minRuns         = 5 # minimum number of measured iterations when adaptiveRuns is True
 appServerHost   = "192.168.1.9"
 username        = "mpirvu" # for connecting remotely to the SUT
 instanceName    = "jboss"
@@ -18,7 +25,7 @@ appServerPort   = "8080"
 appServerHttpsPort = "8443"
 cpuAffinity     = "0-3"
 memLimit        = "2G"
-delayToStart    = 10 # seconds; waiting for the AppServer to start before checking for valid startup
+startupTimeout  = 30 # maximum seconds to wait for the AppServer to be ready (the container log is followed, see readinessWatcher.py)
 ############### JBoss configuration #####################
 appServerDir    = "/opt/jboss/jboss" # This is the directory in the container instance
 sccInstanceDir  = f"{appServerDir}/.classCache" # Location of the shared class cache in the instance
@@ -39,6 +46,8 @@ jmeterMachine   = "192.168.1.9"
 jmeterUsername  = "mpirvu"
 jmeterAffinity  = "0-7"
 protocol        = "https" # http or https
+jmeterJTLOpts   = "" # docker options that make the JMeter image write a JTL file, e.g. "-v /tmp/jtl:/jtl -e JRESULTS=/jtl/results.jtl"
+jmeterJTLFile   = "" # The JTL file on jmeterMachine, e.g. "/tmp/jtl/results.jtl"; leave empty to skip the latency percentiles
 ################ Load CONFIG ###############
 numRepetitionsOneClient = 1
 numRepetitions50Clients = 2
@@ -59,22 +68,6 @@ appImages = [
 ]
 
 
-def nanmean(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-    return total/numValidElems if numValidElems > 0 else math.nan
-
-def meanLastValues(myList, numLastValues):
-    assert numLastValues > 0
-    if numLastValues > len(myList):
-        numLastValues = len(myList)
-    return nanmean(myList[-numLastValues:])
-
-
 def stopContainersFromImage(host, username, imageName):
     # Find all running containers from image
     remoteCmd = f"docker ps --quiet --filter ancestor={imageName}"
@@ -213,29 +206,18 @@ def verifyAppServerInContainerIDStarted(instanceID, host, username):
         logging.warning("AppServer container {instanceID} is not running").format(instanceID=instanceID)
         return False
 
-    remoteCmd = f"docker logs --tail=100 {instanceID}"
+    remoteCmd = f"docker logs -f {instanceID}"
     cmd = f"ssh {username}@{host} \"{remoteCmd}\""
     errPattern = re.compile('^.+ ERROR ')
     #readyPattern = re.compile(".+is ready to run a smarter planet")
     # 19:10:46,911 INFO  [org.jboss.as] (Controller Boot Thread) WFLYSRV0025: JBoss EAP 7.3.0.GA (WildFly Core 10.1.2.Final-redhat-00001) started in 4703ms - Started 444 of 668 services (374 services are lazy, passive or on-demand)
     readyPattern = re.compile('^(.+) INFO .+ JBoss .+ started in')
-
-    for iter in range(10):
-        output = subprocess.check_output(shlex.split(cmd), universal_newlines=True, stderr=subprocess.STDOUT)
-        liblines = output.splitlines()
-        for line in liblines:
-            m = errPattern.match(line)
-            if m:
-                logging.error("AppServer container {instanceID} errored while starting: {line}").format(instanceID=instanceID,line=line)
-                return False
-            m1 = readyPattern.match(line)
-            if m1:
-                if logging.root.level <= logging.INFO:
-                    print(line)
-                return True # True means success
-        time.sleep(1) # wait 1 sec and try again
-        logging.warning("Checking again")
-    return False
+    ready, line, readyTime = readinessWatcher.watchCommand(cmd, readyPattern, errPattern, startupTimeout)
+    if not ready:
+        logging.error("AppServer container {instanceID} did not start correctly: {line}".format(instanceID=instanceID, line=line))
+    elif logging.root.level <= logging.INFO:
+        print(line)
+    return ready # True means success
 
 def checkAppServerForErrors(instanceID, host, username):
     remoteCmd = f"docker ps --quiet --filter id={instanceID}"
@@ -282,7 +264,6 @@ def startAppServerContainer(host, username, instanceName, image, port, httpsport
     if logging.root.level <= logging.DEBUG:
         print(lines)
     instanceID = lines[0] # ['2ccae49f3c03af57da27f5990af54df8a81c7ce7f7aace9a834e4c3dddbca97e']
-    time.sleep(delayToStart) # delay to let JBoss start
     started = verifyAppServerInContainerIDStarted(instanceID, host, username)
     if not started:
         logging.error("AppServer failed to start")
@@ -293,8 +274,12 @@ def startAppServerContainer(host, username, instanceName, image, port, httpsport
 
 # Run jmeter remotely
 def applyLoad(duration, clients):
+    if jmeterJTLFile: # JMeter appends to an existing JTL file
+        remoteCmd = f"rm -f {jmeterJTLFile}"
+        cmd = f"ssh {jmeterUsername}@{jmeterMachine} \"{remoteCmd}\""
+        subprocess.run(shlex.split(cmd), check=False)
     port = appServerHttpsPort if protocol == "https" else appServerPort
-    remoteCmd = f"docker run -d --net=host --cpuset-cpus={jmeterAffinity} -e JTHREAD={clients} -e JDURATION={duration} -e JUSERBOTTOM=0 -e JUSER={numUsers} -e JPORT={port} -e JPROTOCOL={protocol} -e JHOST={appServerHost} -e JRAMP=0 --name {jmeterContainerName} {jmeterImage}"
+    remoteCmd = f"docker run -d --net=host --cpuset-cpus={jmeterAffinity} -e JTHREAD={clients} -e JDURATION={duration} -e JUSERBOTTOM=0 -e JUSER={numUsers} -e JPORT={port} -e JPROTOCOL={protocol} -e JHOST={appServerHost} -e JRAMP=0 {jmeterJTLOpts} --name {jmeterContainerName} {jmeterImage}"
     cmd = f"ssh {jmeterUsername}@{jmeterMachine} \"{remoteCmd}\""
     logging.info("Apply load: {cmd}".format(cmd=cmd))
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
@@ -373,6 +358,23 @@ def getJMeterSummary():
     #print (str(elapsedTime), throughput, sep='\t')
     return throughput, elapsedTime, peakThr, errs
 
+'''
+Latency percentiles of the last JMeter pulse, streamed from the JTL file on the JMeter machine
+'''
+def getLatencyJMeter():
+    remoteCmd = f"cat {jmeterJTLFile}"
+    cmd = f"ssh {jmeterUsername}@{jmeterMachine} \"{remoteCmd}\""
+    process = subprocess.Popen(shlex.split(cmd), universal_newlines=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        histogram, numErrors = loadLatency.parseJTL(process.stdout)
+    except ValueError as e:
+        logging.warning("Cannot read latencies from {f}: {e}".format(f=jmeterJTLFile, e=e))
+        return loadLatency.emptyLatency()
+    finally:
+        process.stdout.close()
+        process.wait()
+    return loadLatency.latencySummary(histogram)
+
 
 def runPhase(duration, clients):
     logging.debug("Sleeping for {n} sec".format(n=delayBetweenRepetitions))
@@ -386,25 +388,27 @@ def runPhase(duration, clients):
     logging.debug("Wait for {jmeter} to end: {cmd}".format(jmeter=jmeterContainerName, cmd=cmd))
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
 
-    # Read throughput
+    # Read throughput and latency
     thr, elapsed, peakThr, errors = getJMeterSummary()
+    latency = getLatencyJMeter() if jmeterJTLFile else loadLatency.emptyLatency()
 
     stopJMeter()
-    print("Throughput={thr:7.1f} duration={elapsed:6.1f} peak={peakThr:7.1f} errors={err:4d}".format(thr=thr,elapsed=elapsed,peakThr=peakThr,err=errors))
+    print("Throughput={thr:7.1f} duration={elapsed:6.1f} peak={peakThr:7.1f} errors={err:4d}  Latency: {lat}".format(thr=thr,elapsed=elapsed,peakThr=peakThr,err=errors,lat=loadLatency.formatLatency(latency)))
     if errors > 0:
         logging.error(f"JMeter encountered {errors} errors")
-    return thr
+    return thr, latency
 
 
 def runBenchmarkOnce(image, javaOpts):
     # Will apply load in small bursts
     maxPulses = numRepetitionsOneClient + numRepetitions50Clients
     thrResults = [math.nan for i in range(maxPulses)] # np.full((maxPulses), fill_value=np.nan, dtype=np.float)
+    latencyResults = [loadLatency.emptyLatency() for i in range(maxPulses)] # p50/p90/p99/max for each pulse
     rss, peakRss = math.nan, math.nan
 
     instanceID = startAppServerContainer(host=appServerHost, username=username, instanceName=instanceName, image=image, port=appServerPort, httpsport=appServerHttpsPort, cpus=cpuAffinity, mem=memLimit, jvmArgs=javaOpts, mongoHost=mongoHost)
     if instanceID is None:
-        return thrResults, rss
+        return thrResults, rss, peakRss, latencyResults
 
     # We know the app started successfuly
     loadDatabase(appServerHost, username)
@@ -416,7 +420,7 @@ def runBenchmarkOnce(image, javaOpts):
         else:
             cli = 1
             duration = durationOfOneClient
-        thrResults[pulse] = runPhase(duration, cli)
+        thrResults[pulse], latencyResults[pulse] = runPhase(duration, cli)
 
     # Collect RSS at end of run
     serverPID = getMainPIDFromContainer(host=appServerHost, username=username, instanceID=instanceID)
@@ -431,13 +435,14 @@ def runBenchmarkOnce(image, javaOpts):
     # If there were errors during the run, invalidate throughput results
     if not checkAppServerForErrors(instanceID, appServerHost, username):
         thrResults = [math.nan for i in range(maxPulses)] #np.full((maxPulses), fill_value=np.nan, dtype=np.float) # Reset any throughput values
+        latencyResults = [loadLatency.emptyLatency() for i in range(maxPulses)]
 
     # stop container and read CompCPU
     rc = stopAppServerByID(appServerHost, username, instanceID)
     # container is already removed
 
-    # return throughput as an array of throughput values for each burst and also the RSS
-    return thrResults, rss, peakRss
+    # return throughput as an array of throughput values for each burst and also the RSS and the latency of each burst
+    return thrResults, rss, peakRss, latencyResults
 
 
 def runBenchmarkIteratively(numIter, image, javaOpts):
@@ -445,17 +450,26 @@ def runBenchmarkIteratively(numIter, image, javaOpts):
     numPulses = numRepetitionsOneClient + numRepetitions50Clients
     thrResults = [] # List of lists
     rssResults = [] # Just a list
+    latencyAvgResults = {key: [] for key in loadLatency.latencyKeys} # latency of the last N pulses, for every run
 
     # clear SCC if needed (by destroying the SCC volume)
     if doColdRun:
         clearSCC(appServerHost, username)
 
+    sampler = sequentialSampling.SequentialSampler(targetCI95, minRuns)
     for iter in range(numIter):
-        thrList, rss, peakRss = runBenchmarkOnce(image, javaOpts)
+        thrList, rss, peakRss, latencyList = runBenchmarkOnce(image, javaOpts)
         lastThr = meanLastValues(thrList, numMeasurementTrials) # average for last N pulses
-        print(f"Run {iter}: Thr={lastThr:6.1f} RSS={rss} MB  PeakRSS={peakRss:6d} MB".format(lastThr=lastThr,rss=rss,peakRss=peakRss))
+        for key in loadLatency.latencyKeys:
+            latencyAvgResults[key].append(meanLastValues([latency[key] for latency in latencyList], numMeasurementTrials))
+        print(f"Run {iter}: Thr={lastThr:6.1f} p99={latencyAvgResults['p99'][-1]:7.2f} ms RSS={rss} MB  PeakRSS={peakRss:6d} MB".format(lastThr=lastThr,rss=rss,peakRss=peakRss))
         thrResults.append(thrList) # copy all the pulses
         rssResults.append(rss)
+        sampler.add(lastThr)
+        if adaptiveRuns and sampler.isDone():
+            print(f"Throughput CI95 target reached after {iter+1} runs: {sampler}")
+            numIter = iter + 1
+            break
 
     # print stats
     print(f"\nResults for image: {image} and opts: {javaOpts}")
@@ -481,6 +495,13 @@ def runBenchmarkIteratively(numIter, image, javaOpts):
     for pulse in range(numPulses):
         print("\t{thr:7.1f}".format(thr=verticalAverages[pulse]), end="")
     print("\tAvg={avgThr:7.1f}  RSS={rss:7.0f} MB".format(avgThr=nanmean(thrAvgResults), rss=nanmean(rssResults)))
+    # Latency stats, available when JMeter writes a JTL file
+    for key in loadLatency.latencyKeys:
+        if countNotNan(latencyAvgResults[key]) == 0:
+            continue
+        avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(latencyAvgResults[key])
+        print("Latency {key} ms:   Avg={avg:7.2f}  StdDev={stdDev:7.2f}  Min={min:7.2f}  Max={max:7.2f}  CI95={ci95:7.1f}% numSamples={numSamples:3d}".
+              format(key=key, avg=avg, stdDev=stdDev, min=min, max=max, ci95=ci95, numSamples=numSamples))
     # TODO: print stderr and CI
 
 ############################ MAIN ##################################
@@ -12,8 +12,11 @@ import math
 import os # for environment variables
 import re # for regular expressions
 import shlex, subprocess
-import statistics
 import sys # for number of arguments
+import sequentialSampling
+import readinessWatcher
+import smapsFootprint
+from benchStats import nanmean, computeStats, meanLastValues
 import time # for sleep
 from collections import deque
 
@@ -27,6 +30,9 @@ logging.basicConfig(level=logging.DEBUG, format='%(asctime)s :: %(levelname)s ::
 ################### Benchmark configuration #################
 doColdRun          = False # when True we clear the SCC before the first run. Set it to False for embedded SCC
 doOnlyColdRuns     = False # when True we run only the cold runs (doColdRun flag is ignored)
+adaptiveRuns       = False # when True stop iterating once the CI95 of the throughput drops below targetCI95; the number of iterations becomes the maximum
+targetCI95         = 2.0 # target half-width of the throughput CI95, as a percentage of the mean
+minRuns            = 5 # minimum number of measured iterations when adaptiveRuns is True
 AppServerHost      = "localhost" # the host where the app server is running from the point of view of the JMeter machine
 AppServerPort      = 9080
 AppServerLocation  = "/team/mpirvu/JackRabbit/wlp"
@@ -36,7 +42,7 @@ applicationLocation= f"{AppServerLocation}/usr/servers/{applicationName}"
 logFile            = f"{applicationLocation}/logs/messages.log"
 appServerStartCmd  = f"{AppServerAffinity} {AppServerLocation}/bin/server run {applicationName}"
 appServerStopCmd   = f"{AppServerLocation}/bin/server stop {applicationName}"
-startupWaitTime    = 180 # seconds to wait before checking to see if AppServer is up
+startupWaitTime    = 240 # maximum seconds to wait for the AppServer to be ready (the log is followed, see readinessWatcher.py)
 URL = f"http://{AppServerHost}:{AppServerPort}/crx/packmgr/index.jsp"
 USERNAME = "admin"
 PASSWD = "admin"
@@ -45,6 +51,7 @@ PACKAGE_PATH = r"/team/mpirvu/JackRabbit/sample_package_performance.zip" # Packa
 ENABLE_SCREENSHOTS = False  # Set to False to disable all screenshots
 
 memAnalysis = False # Collect javacores and smaps for memory analysis
+smapsSummaryEveryIteration = False # Log the RSS of each type of memory mapping (see smapsFootprint.py) at the end of every iteration
 dirForMemAnalysisFiles = "/tmp"
 extraArgsForMemAnalysis = f" -Dcom.ibm.dbgmalloc=true -Xdump:none -Xdump:system:events=user,file={dirForMemAnalysisFiles}/core.%pid.%seq.dmp -Xdump:java:events=user,file={dirForMemAnalysisFiles}/javacore.%pid.%seq.txt"
 # For collection of profiles, -Xjit:perfTool may need to be added to the OpenJ9 command line
@@ -97,145 +104,6 @@ jdks = [
     "/team/mpirvu/sdks/OpenJ9-JDK17-x86-64_linux-20251129-000857",
 ]
 
-def count_not_nan(myList):
-    total = 0
-    for elem in myList:
-        if not math.isnan(elem):
-            total += 1
-    return total
-
-def nanmean(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-    return total/numValidElems if numValidElems > 0 else math.nan
-
-
-def nanstd(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-
-    if numValidElems == 0:
-        return math.nan
-    if numValidElems == 1:
-        return 0
-    else:
-        mean = total/numValidElems
-        total = 0
-        for i in range(len(myList)):
-            if not math.isnan(myList[i]):
-                total += (myList[i] - mean)**2
-        return math.sqrt(total/(numValidElems-1))
-
-
-def nanmin(myList):
-    min = math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] < min:
-            min = myList[i]
-    return min
-
-
-def nanmax(myList):
-    max = -math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] > max:
-            max = myList[i]
-    return max
-
-'''
-Given an input list of values, eliminate all NaNs and return a new list
-'''
-def eliminateNans(myList):
-    return [value for value in myList if not math.isnan(value)]
-
-
-'''
-Receives an array reference with results.
-We compute the lower and and upper quartile, then compute the interquartile
-range (IQR=Q3-Q1) and the lower (Q1 - 1.5*IQR) and upper (Q3 + 1.5*IQR) fences.
-The two fences are returned to the caller in an array with 2 elements.
-Needs at least 4 data points
-'''
-def computeOutlierFences(myList):
-    Q1, Q2, Q3 = statistics.quantiles(myList, n = 4, method='inclusive')
-    # Compute the interquartile range
-    IQR = Q3 - Q1
-    lowerFence = Q1 - 3 * IQR
-    upperFence  = Q3 + 3 * IQR
-    return (lowerFence, upperFence)
-
-def tDistributionValue95(degreeOfFreedom):
-    if degreeOfFreedom < 1:
-        return math.nan
-        #import scipy.stats as stats
-        #  stats.t.ppf(0.975, degreesOfFreedom))
-    tValues = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
-               2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
-               2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,]
-    if degreeOfFreedom <= 30:
-        return tValues[degreeOfFreedom-1]
-    else:
-        if degreeOfFreedom <= 60:
-            return 2.042 - 0.0014 * (degreeOfFreedom - 30)
-        else:
-            return 1.96
-
-# Confidence intervals tutorial
-# mean +- t * std / sqrt(n)
-# For 95% confidence interval, t = 1.96 if we have many samples
-def meanConfidenceInterval95(myList):
-    n = len(myList)
-    if n <= 1:
-        return math.nan
-    tvalue = tDistributionValue95(n-1)
-    avg, stdDev = nanmean(myList), nanstd(myList)
-    marginOfError = tvalue * stdDev / math.sqrt(n)
-    return 100.0*marginOfError/avg
-
-
-def computeStats(myList, eliminateOutliers=False):
-    newList = eliminateNans(myList)
-    if len(newList) < 1:
-        return math.nan, math.nan, math.nan, math.nan, math.nan, 0, []
-    # Eliminate outliers
-    outlierList = []
-    goodValuesList = []
-    if eliminateOutliers and len(newList) > 3:
-        lowerFence, upperFence = computeOutlierFences(newList)
-        for val in newList:
-            if val < lowerFence or val > upperFence:
-                outlierList.append(val)
-            else:
-                goodValuesList.append(val)
-    else:
-        goodValuesList = newList
-    avg = statistics.fmean(goodValuesList)
-    stdDev = statistics.stdev(goodValuesList) if len(myList) > 1 else 0
-    minVal = min(goodValuesList)
-    maxVal = max(goodValuesList)
-    numSamples = len(goodValuesList)
-    tvalue = tDistributionValue95(numSamples-1)
-    marginOfError = tvalue * stdDev / math.sqrt(numSamples)
-    ci95 = 100.0*marginOfError/avg
-
-    return avg, stdDev, minVal, maxVal, ci95, numSamples, outlierList
-
-
-def meanLastValues(myList, numLastValues):
-    assert numLastValues > 0
-    if numLastValues > len(myList):
-        numLastValues = len(myList)
-    return nanmean(myList[-numLastValues:])
-
-
 # Given a PID, return RSS and peakRSS in MB for the process
 def getRss(pid):
     _scale = {'kB': 1024, 'mB': 1024*1024, 'KB': 1024, 'MB': 1024*1024}
@@ -285,6 +153,13 @@ def collectJavacoreAndSmaps(javaPID):
     collectSmaps(javaPID)
 
 
+def logSmapsSummary(javaPID):
+    try:
+        logging.info("RSS per mapping type (MB): " + smapsFootprint.formatRssSummary(javaPID))
+    except IOError as ioe:
+        logging.warning("Cannot read smaps for javaPID {javaPID}: {msg}".format(javaPID=javaPID, msg=str(ioe)))
+
+
 """
 Find the main compilation thread ID of an OpenJ9 JVM process
 The JVM can have multiple compilation threads; in this case we will
@@ -378,29 +253,15 @@ def clearSCC(jdk, sccDestroyParams):
     # TODO: make sure the SCC does not exist anymore
 
 
-def verifyAppserverStarted():
+def verifyAppserverStarted(logWatcher, childProcess):
     #[5/3/23, 8:27:25:850 PDT] 0000002a com.ibm.ws.kernel.feature.internal.FeatureManager   A CWWKF0011I: The crudserver server is ready to run a smarter planet. The crudserver server started in 48.607 seconds.
     # Look for "server is ready to run a smarter planet" in messages.log
     errPattern = re.compile('.+\[ERROR')
     readyPattern = re.compile(".+is ready to run a smarter planet")
-    for iter in range(20):
-        try:
-            with open(logFile) as f:
-                for line in f:
-                    print(line)
-                    m = errPattern.match(line)
-                    if m:
-                        logging.warning("AppServer {applicationName} errored while starting:\n\t {line}").format(applicationName=applicationName,line=line)
-                        return False
-                    m1 = readyPattern.match(line)
-                    if m1:
-                        return True # True means success
-        except IOError:
-            print("Could not open file", logFile)
-            return False
-        logging.warning("sleeping 1 sec and trying again")
-        time.sleep(1) # wait 1 sec and try again
-    return False # False means failure
+    ready, line, readyTime = logWatcher.wait(readyPattern, errPattern, startupWaitTime, isAlive=lambda: childProcess.poll() is None)
+    if not ready:
+        logging.warning("AppServer {applicationName} did not start correctly: {line}".format(applicationName=applicationName, line=line))
+    return ready # True means success
 
 
 def killAppServerIfRunning(childProcess):
@@ -420,15 +281,15 @@ def startAppServer(jdk, jvmArgs):
     myEnv["TR_Options"] = TR_Options
     myEnv["TR_OptionsAOT"] = TR_OptionsAOT
 
+    logWatcher = readinessWatcher.LogFileWatcher(logFile) # only the lines written by this AppServer count
     # Fork a process and run in background
     childProcess = subprocess.Popen(shlex.split(appServerStartCmd), env=myEnv, universal_newlines=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    logging.debug(f"Waiting for {startupWaitTime} sec for the AppServer to start")
-    time.sleep(startupWaitTime)
+    logging.debug(f"Waiting up to {startupWaitTime} sec for the AppServer to start")
     startOK = False
     if childProcess.poll() is None: # It's running
         logging.debug("AppServer started with pid {pid}".format(pid=childProcess.pid))
         # Verify that server started correctly
-        startOK = verifyAppserverStarted()
+        startOK = verifyAppserverStarted(logWatcher, childProcess)
         if not startOK:
             logging.error("AppServer did not start correctly")
             outs, errs = childProcess.communicate(timeout=15)
@@ -1103,6 +964,8 @@ def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
     # Collect RSS at end of run
     if childProcess.poll() is None: # Still running
         rss, peakRss = getRss(pid=childProcess.pid)
+        if smapsSummaryEveryIteration:
+            logSmapsSummary(childProcess.pid)
 
         if doMemAnalysis:
             logging.info("Generating javacore, core and smaps for process {pid}".format(pid=childProcess.pid))
@@ -1138,6 +1001,8 @@ def runBenchmarkIteratively(numIter, jdk, javaOpts):
         if jitServerHandle == None:
             sys.exit(-1)
 
+    startIter = 0 if (doOnlyColdRuns or not doColdRun) else 1
+    sampler = sequentialSampling.SequentialSampler(targetCI95, minRuns)
     for iter in range(numIter):
         if doOnlyColdRuns:
             clearSCC(jdk, sccDestroyParams)
@@ -1153,8 +1018,12 @@ def runBenchmarkIteratively(numIter, jdk, javaOpts):
         rssResults.append(rss)
         cpuResults.append(cpu)
         startupResults.append(startupTime)
-
-    startIter = 0 if (doOnlyColdRuns or not doColdRun) else 1
+        if iter >= startIter:
+            sampler.add(lastThr)
+        if adaptiveRuns and sampler.isDone():
+            print(f"Throughput CI95 target reached after {iter+1} runs: {sampler}")
+            numIter = iter + 1
+            break
 
     # print stats
     print(f"\nResults for jdk: {jdk} and opts: {javaOpts}")
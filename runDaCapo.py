@@ -1,27 +1,46 @@
 # Python script to run DaCapo benchmarks and collect performance statistics
-# Usage:  python3 runDaCapo.py
+# Usage:  python3 runDaCapo.py   or   python3 runDaCapo.py --campaign campaign.json (see campaignFile.py)
 # Note: dacapo-9.12-MR1-bach.jar  msut be present in current directory
 
 # The script can be customized as follows:
 # 1. Specify which benchmarks to run ==> change "benchmark" list below
 # 2. Specify the number iterations for each benchmark (to warm up the JVM) ==> change "benchmarkOpts" below
 # 3. Specify the number of runs for each benchmark ==> change "numRuns" below
+#    With adaptiveRuns=True, "numRuns" is the maximum and the runs stop once the CI95 drops below "targetCI95"
 # 4. Specify JDK options ==> change "jvmOption" list below
 # 5. Specify JDK to use ==> change "jdks" list below
+# 6. Run several configurations at the same time ==> change "numSlots" below
+#    Each configuration (benchmark x jdk x jvmOptions) then runs in its own slot of CPUs,
+#    memory node and SCC directory (see campaignSlots.py)
+# 7. Describe the benchmarks, jdks and options in a campaign file instead ==> matrix axes "benchmark", "jdk"
+#    and "jvmOpts" (they replace the lists below) and "iterations" (replaces "numRuns"). Every run is appended
+#    to the results log, and the runs found in the log are not repeated when the campaign is restarted
 
 import re # for regular expressions
 import sys # for accessing parameters and exit
 import shlex, subprocess
 import logging
 import numpy as np
+import sequentialSampling
+import benchStats
+import campaignSlots
+import campaignFile
 
 
 numRuns = 100 # number of runs to use for each benchmark in each configuration
+adaptiveRuns = False # when True stop running a configuration once the CI95 of the execution time drops below targetCI95
+targetCI95 = 1.0 # target half-width of the CI95, as a percentage of the mean
+minRuns = 10 # minimum number of runs for each configuration when adaptiveRuns is True
 benchmarkOpts = "--iterations 1 -s default" # not all benchmarks can use size large. Better to use "default"
 numlastIterForComputingAvg = 1 # number of last iterations for each JVM used for computing the average execution time
                                 # Must be smaller that --iterations in benchmarkOpts
 doColdRun = True # If True, destroy the SCC before each benchmark
-affinity = "taskset 0x3"
+affinity = "taskset 0x3" # used when numSlots == 1
+numSlots = 1 # number of configurations run at the same time, each in its own slot
+cpusPerSlot = 2 # CPUs of each slot; None divides slotAllowedCpus evenly among the slots
+slotAllowedCpus = None # CPUs that can be given to the slots, e.g. "0-31"; None means all the CPUs
+slotAffinityTool = "numactl" # "numactl" binds the CPUs and the memory node of a slot; "taskset" only the CPUs
+slotSCCBaseDir = "/tmp/dacapoSCC" # each slot uses its own SCC directory under this one (only for options with -Xshareclasses)
 #level=logging.DEBUG,
 logging.basicConfig(level=logging.INFO, format='%(asctime)s :: %(levelname)s :: (%(threadName)-6s) :: %(message)s',)
 
@@ -84,7 +103,7 @@ def destroySCC(jvm, jvmOpts):
 Returns the execution time in milliseconds as a float
 or Nan if the experiment fails
 '''
-def runBenchmarkOnce(benchmarkName, jvm, jvmOpts, benchIter):
+def runBenchmarkOnce(benchmarkName, jvm, jvmOpts, benchIter, affinity=affinity):
     cmd = f"{affinity} {jvm}/bin/java {jvmOpts} -jar dacapo-9.12-MR1-bach.jar {benchmarkOpts} {benchmarkName}"
     logging.info("Starting: {cmd}".format(cmd=cmd))
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True, stderr=subprocess.STDOUT)
@@ -121,34 +140,44 @@ def runBenchmarkOnce(benchmarkName, jvm, jvmOpts, benchIter):
     return avgTime if foundPassed else np.nan
     #print(output)
 
-def tdistribution(degreesOfFreedom):
-    table = [6.314, 2.92, 2.353, 2.132, 2.015, 1.943, 1.895, 1.860, 1.833, 1.812, 1.796, 1.782, 1.771, 1.761, 1.753, 1.746, 1.740, 1.734, 1.729, 1.725]
-    if degreesOfFreedom < 1:
-        return -1.0
-    if degreesOfFreedom <= 20:
-        return table[degreesOfFreedom-1]
-    if degreesOfFreedom < 30:
-        return 1.697
-    if degreesOfFreedom < 40:
-        return 1.684
-    if degreesOfFreedom < 50:
-        return 1.676
-    if degreesOfFreedom < 60:
-        return 1.671
-    if degreesOfFreedom < 70:
-        return 1.667
-    if degreesOfFreedom < 80:
-        return 1.664
-    if degreesOfFreedom < 90:
-        return 1.662
-    if degreesOfFreedom < 100:
-        return 1.660
-    return 1.65
-
-#import scipy.stats as st
-#def computeCI95(a):
-#    results = st.t.interval(0.95, len(a)-1, loc=0, scale=st.sem(a))
-#    return 100.0 * results[1] / st.tmean(a)
+'''
+Run one configuration numRuns times (after a cold run if needed), in a slot if one is given.
+With a results log, the runs found in the log are not repeated (nor the cold run, if no run is left).
+Returns the execution times; the runs skipped by adaptiveRuns are NaN
+'''
+def runConfiguration(config, slot=None):
+    bench, jdk, opt = config
+    jvmOpts = slot.jvmOptsWithSCCDir(jvmOptions[opt], slotSCCBaseDir) if slot else jvmOptions[opt]
+    runAffinity = slot.affinity(slotAffinityTool) if slot else affinity
+    cell = {"benchmark": benchmarks[bench], "jdk": jdks[jdk], "jvmOpts": jvmOptions[opt]}
+    execTimes = np.full(numRuns, fill_value=np.nan, dtype=float)
+    coldRunDone = not doColdRun
+    sampler = sequentialSampling.SequentialSampler(targetCI95, minRuns)
+    for i in range(numRuns):
+        metrics = resultsLog.get(cell, i) if resultsLog else None
+        if metrics is None:
+            if not coldRunDone:
+                destroySCC(jdks[jdk], jvmOpts)
+                runBenchmarkOnce(benchmarks[bench], jdks[jdk], jvmOpts, benchIter, runAffinity) # discard the cold run
+                coldRunDone = True
+            metrics = {"execTime": float(runBenchmarkOnce(benchmarks[bench], jdks[jdk], jvmOpts, benchIter, runAffinity))}
+            if resultsLog:
+                resultsLog.append(cell, i, metrics)
+        execTimes[i] = metrics["execTime"]
+        sampler.add(execTimes[i])
+        if adaptiveRuns and sampler.isDone(): # the remaining runs stay NaN and are ignored by the stats
+            print(f"CI95 target reached after {i+1} runs: {sampler}")
+            break
+    return execTimes
+
+campaign = campaignFile.parseCampaignArgs(sys.argv, axes=("benchmark", "jdk", "jvmOpts"))
+resultsLog = None
+if campaign:
+    benchmarks = campaign["matrix"].get("benchmark", benchmarks)
+    jdks = campaign["matrix"].get("jdk", jdks)
+    jvmOptions = campaign["matrix"].get("jvmOpts", jvmOptions)
+    numRuns = campaign["iterations"]
+    resultsLog = campaignFile.ResultsLog(campaign["resultsLog"])
 
 # Determine the number of iterations to use for each benchmark
 m = re.compile('--iterations (\d+)').match(benchmarkOpts)
@@ -161,30 +190,28 @@ if doColdRun:
 
 # multi-dimensional array of results
 results = np.full((len(benchmarks), len(jdks), len(jvmOptions), numRuns), fill_value=np.nan, dtype=float)
-for bench in range(len(benchmarks)):
-    for jdk in range(len(jdks)):
-        for opt in range(len(jvmOptions)):
-            if doColdRun:
-                destroySCC(jdks[jdk],jvmOptions[opt])
-                runBenchmarkOnce(benchmarks[bench], jdks[jdk], jvmOptions[opt], benchIter) # discard the cold run
-            for i in range(numRuns):
-                execTime = runBenchmarkOnce(benchmarks[bench], jdks[jdk], jvmOptions[opt], benchIter)
-                results[bench, jdk, opt, i] = execTime
+configs = [(bench, jdk, opt) for bench in range(len(benchmarks)) for jdk in range(len(jdks)) for opt in range(len(jvmOptions))]
+if numSlots > 1:
+    slots = campaignSlots.buildSlots(numSlots, cpusPerSlot, slotAllowedCpus)
+    if doColdRun and any("-Xshareclasses" not in opts for opts in jvmOptions):
+        logging.warning("Cold runs destroy the default SCC, which is shared by the slots; add -Xshareclasses to jvmOptions")
+    configResults = campaignSlots.runInSlots(configs, slots, runConfiguration)
+else:
+    configResults = [runConfiguration(config) for config in configs]
+for (bench, jdk, opt), execTimes in zip(configs, configResults):
+    results[bench, jdk, opt] = execTimes
+if resultsLog:
+    resultsLog.close()
 
 # Stats ignoring Nan which are due to failed experiments
-mean = np.nanmean(results, axis=3)
-std  = np.nanstd(results, axis=3)
-min  = np.nanmin(results, axis=3)
-max  = np.nanmax(results, axis=3)
-
-# Count valid experiments excluding Nan values
-numValidExperiments = np.count_nonzero(~np.isnan(results), axis=3)
-#print(numValidExperiments)
-
-# Create my function that will apply "tdistribution" to all elements in an ndarray
-tdist_vec = np.vectorize(tdistribution)
-# Compute 95% confidence intervals as percentages of the mean value
-ci95 = tdist_vec(numValidExperiments-1) * std / np.sqrt(numValidExperiments) / mean *100.0
+# (and the runs skipped by adaptiveRuns); ci95 is two-sided, as a percentage of the mean value
+stats = benchStats.summarizeResults(results, axis=3)
+mean = stats["mean"]
+std  = stats["std"]
+min  = stats["min"]
+max  = stats["max"]
+ci95 = stats["ci95"]
+numValidExperiments = stats["n"]
 
 
 # np.percentile(s1, [25, 50, 75], interpolation='midpoint')
@@ -1,14 +1,24 @@
 # Python script for runing ilog
+# Usage: python3 runIlog.py numIterations   or   python3 runIlog.py --campaign campaign.json (see campaignFile.py)
+# With a campaign file the matrix axes are "rule", "jdk" and "jvmOpts" (an axis left out takes the first entry of ruleSet, jdks or jvmOptions)
+# and "workload" (overrides for the configuration globals, e.g. {"numThreads": 8}). Every run is appended to the
+# results log, and the runs found in the log are not repeated when the campaign is restarted.
 import logging
 import math
 import os
 import re # for regular expressions
 import shlex, subprocess
 import sys # for accessing parameters and exit
+import sequentialSampling
+import campaignFile
+from benchStats import computeStats
 
 ILOG_HOME="/opt/IBM/ILOGForMarius/ilog/odm881eGa/J2SE"
 doColdRun = True # If True, destroy the SCC before each benchmark
 doOnlyColdRuns = False
+adaptiveRuns = False # when True stop iterating once the CI95 of the throughput drops below targetCI95; the number of iterations becomes the maximum
+targetCI95 = 1.0 # target half-width of the CI95, as a percentage of the mean
+minRuns = 5 # minimum number of measured iterations when adaptiveRuns is True
 affinity = "taskset 0x3"
 WARMUPTIME = 240
 TIMEOUTTIME = 400
@@ -34,94 +44,6 @@ jdks = [
     "/home/mpirvu/FullJava17/openj9-openjdk-jdk17/build/linux-x86_64-server-release/images/jdk",
 ]
 
-def count_not_nan(myList):
-    total = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += 1
-    return total
-
-def nanmean(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-    return total/numValidElems if numValidElems > 0 else math.nan
-
-def nanstd(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-
-    if numValidElems == 0:
-        return math.nan
-    if numValidElems == 1:
-        return 0
-    else:
-        mean = total/numValidElems
-        total = 0
-        for i in range(len(myList)):
-            if not math.isnan(myList[i]):
-                total += (myList[i] - mean)**2
-        return math.sqrt(total/(numValidElems-1))
-
-def nanmin(myList):
-    min = math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] < min:
-            min = myList[i]
-    return min
-
-def nanmax(myList):
-    max = -math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] > max:
-            max = myList[i]
-    return max
-
-def tDistributionValue95(degreeOfFreedom):
-    if degreeOfFreedom < 1:
-        return math.nan
-        #import scipy.stats as stats
-        #  stats.t.ppf(0.975, degreesOfFreedom))
-    tValues = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
-               2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
-               2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,]
-    if degreeOfFreedom <= 30:
-        return tValues[degreeOfFreedom-1]
-    else:
-        if degreeOfFreedom <= 60:
-            return 2.042 - 0.001 * (degreeOfFreedom - 30)
-        else:
-            return 1.96
-
-# Confidence intervals tutorial
-# mean +- t * std / sqrt(n)
-# For 95% confidence interval, t = 1.96 if we have many samples
-def meanConfidenceInterval95(myList):
-    n = len(myList)
-    if n <= 1:
-        return math.nan
-    tvalue = tDistributionValue95(n-1)
-    avg, stdDev = nanmean(myList), nanstd(myList)
-    marginOfError = tvalue * stdDev / math.sqrt(n)
-    return 100.0*marginOfError/avg
-
-def computeStats(myList):
-    avg = nanmean(myList)
-    stdDev = nanstd(myList)
-    min = nanmin(myList)
-    max = nanmax(myList)
-    ci95 = meanConfidenceInterval95(myList)
-    numValues = count_not_nan(myList)
-    return avg, stdDev, min, max, ci95, numValues
-
-
 def clearSCC(jvm, jvmOpts):
     print(jvm, jvmOpts)
     cmd = ""
@@ -183,28 +105,44 @@ def runBenchmarkOnce(rule, jvm, jvmOpts):
             break
     return tps
 
-def runBenchmarkIteratively(numIter, rule, jdk, javaOpts):
+# With a resultsLog, the iterations of `cell` found in the log are not run again
+def runBenchmarkIteratively(numIter, rule, jdk, javaOpts, resultsLog=None, cell=None):
     thrResults = []
-    # clear SCC if needed
-    if doColdRun or doOnlyColdRuns:
+    numDone = 0
+    while resultsLog and numDone < numIter and resultsLog.get(cell, numDone) is not None:
+        numDone += 1
+    # clear SCC if needed, unless we resume a set
+    if (doColdRun or doOnlyColdRuns) and numDone == 0:
         clearSCC(jdk, javaOpts)
 
+    startIter = 0 if (doOnlyColdRuns or not doColdRun) else 1
+    sampler = sequentialSampling.SequentialSampler(targetCI95, minRuns)
     for iter in range(numIter):
-        thr = runBenchmarkOnce(rule, jdk, javaOpts)
+        metrics = resultsLog.get(cell, iter) if resultsLog else None
+        if metrics is None:
+            metrics = {"thr": runBenchmarkOnce(rule, jdk, javaOpts)}
+            if resultsLog:
+                resultsLog.append(cell, iter, metrics)
+        thr = metrics["thr"]
         thrResults.append(thr)
+        if iter >= startIter:
+            sampler.add(thr)
+        if adaptiveRuns and sampler.isDone():
+            print(f"Throughput CI95 target reached after {iter+1} runs: {sampler}")
+            break
 
    # print stats
-    startIter = 0 if (doOnlyColdRuns or not doColdRun) else 1
     print(f"\nResults for jdk: {jdk} and opts: {javaOpts} and ruleSet: {rule}")
     if startIter > 0:
         print("First run is a cold run and is not included in the stats")
-    avg, stdDev, min, max, ci95, numSamples = computeStats(thrResults[startIter:])
+    avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(thrResults[startIter:])
     print("Thr stats:  Avg={avg:7.1f}  StdDev={stdDev:7.1f}  Min={min:7.1f}  Max={max:7.1f}  Max/Min={maxmin:4.0f}% CI95={ci95:7.1f}% numSamples={numSamples:3d}".
                         format(avg=avg, stdDev=stdDev, min=min, max=max, maxmin=(max-min)*100.0/min, ci95=ci95, numSamples=numSamples))
 
 ############################ MAIN ##################################
-if  len(sys.argv) < 2:
-    print ("Program must have an argument: the number of iterations\n")
+campaign = campaignFile.parseCampaignArgs(sys.argv, axes=("rule", "jdk", "jvmOpts", "workload"))
+if  len(sys.argv) < 2 and not campaign:
+    print ("Program must have an argument: the number of iterations, or --campaign <campaign file>\n")
     sys.exit(-1)
 
 if doOnlyColdRuns:
@@ -212,7 +150,15 @@ if doOnlyColdRuns:
 elif doColdRun:
     print("Will do a cold run before each set")
 
-for rule in ruleSet:
-    for jvmOpts in jvmOptions:
-        for jdk in jdks:
-            runBenchmarkIteratively(numIter=int(sys.argv[1]), rule=rule, jdk=jdk, javaOpts=jvmOpts)
+if campaign:
+    resultsLog = campaignFile.ResultsLog(campaign["resultsLog"])
+    for cell in campaign["cells"]:
+        campaignFile.applyWorkload(globals(), cell.get("workload"))
+        runBenchmarkIteratively(numIter=campaign["iterations"], rule=cell.get("rule", ruleSet[0]), jdk=cell.get("jdk", jdks[0]),
+                                javaOpts=cell.get("jvmOpts", jvmOptions[0]), resultsLog=resultsLog, cell=cell)
+    resultsLog.close()
+else:
+    for rule in ruleSet:
+        for jvmOpts in jvmOptions:
+            for jdk in jdks:
+                runBenchmarkIteratively(numIter=int(sys.argv[1]), rule=rule, jdk=jdk, javaOpts=jvmOpts)
@@ -4,6 +4,10 @@ import time # for sleep
 import re # for regular expressions
 import math
 import sys # for number of arguments
+import sequentialSampling
+import readinessWatcher
+import loadLatency
+from benchStats import nanmean, countNotNan, computeStats, meanLastValues
 import queue
 import os # for environment variables
 
@@ -13,6 +17,9 @@ docker = 'podman'
 
 ################### Benchmark configuration #################
 doColdRun       = False  # when True we clear the SCC before the first run. Set it to False for embedded SCC
+adaptiveRuns    = False # when True stop iterating once the CI95 of the throughput drops below targetCI95; the number of iterations becomes the maximum
+targetCI95      = 2.0 # target half-width of the throughput CI95, as a percentage of the mean
+minRuns         = 5 # minimum number of measured iterations when adaptiveRuns is True
 appServerHost   = "9.46.116.36" # Cannot use localhost because JMeter runs in docker
 username        = "" # for connecting remotely to the SUT. If this is empty we assume that local machine is going to be used
 instanceName    = "petclinic"
@@ -20,7 +27,7 @@ appServerPort   = "8080"
 appServerHttpsPort = "8443"
 cpuAffinity     = "1"
 memLimit        = "1G"
-delayToStart    = 30 # seconds; waiting for the AppServer to start before checking for valid startup
+startupTimeout  = 60 # maximum seconds to wait for the AppServer to be ready (the container log is followed, see readinessWatcher.py)
 extraDockerOpts = "-v /tmp:/tmp" # extra options to pass to docker run
 netOpts         = "--network=slirp4netns" if docker == "podman" else "" # for podman we need to use slirp4netns if running as root.
 ############### SCC configuration #####################
@@ -36,6 +43,8 @@ jmeterMachine   = "localhost"
 jmeterUsername  = ""  # If this is empty, we assume that JMeter runs on the local machine
 jmeterAffinity  = "2-3"
 protocol        = "http" # http or https
+jmeterJTLOpts   = "" # docker options that make the JMeter image write a JTL file, e.g. "-v /tmp/jtl:/jtl -e JRESULTS=/jtl/results.jtl"
+jmeterJTLFile   = "" # The JTL file on jmeterMachine, e.g. "/tmp/jtl/results.jtl"; leave empty to skip the latency percentiles
 ################ Load CONFIG ###############
 numRepetitionsOneClient = 0
 numRepetitions50Clients = 2
@@ -60,98 +69,6 @@ appImages = [
 ]
 
 
-def nanmean(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-    return total/numValidElems if numValidElems > 0 else math.nan
-
-
-def nanstd(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-
-    if numValidElems == 0:
-        return math.nan
-    if numValidElems == 1:
-        return 0
-    else:
-        mean = total/numValidElems
-        total = 0
-        for i in range(len(myList)):
-            if not math.isnan(myList[i]):
-                total += (myList[i] - mean)**2
-        return math.sqrt(total/(numValidElems-1))
-
-
-def nanmin(myList):
-    min = math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] < min:
-            min = myList[i]
-    return min
-
-
-def nanmax(myList):
-    max = -math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] > max:
-            max = myList[i]
-    return max
-
-
-def tDistributionValue95(degreeOfFreedom):
-    if degreeOfFreedom < 1:
-        return math.nan
-        #import scipy.stats as stats
-        #  stats.t.ppf(0.975, degreesOfFreedom))
-    tValues = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
-               2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
-               2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,]
-    if degreeOfFreedom <= 30:
-        return tValues[degreeOfFreedom-1]
-    else:
-        if degreeOfFreedom <= 60:
-            return 2.042 - 0.001 * (degreeOfFreedom - 30)
-        else:
-            return 1.96
-
-# Confidence intervals tutorial
-# mean +- t * std / sqrt(n)
-# For 95% confidence interval, t = 1.96 if we have many samples
-def meanConfidenceInterval95(myList):
-    n = len(myList)
-    if n <= 1:
-        return math.nan
-    tvalue = tDistributionValue95(n-1)
-    avg, stdDev = nanmean(myList), nanstd(myList)
-    marginOfError = tvalue * stdDev / math.sqrt(n)
-    return 100.0*marginOfError/avg
-
-
-def computeStats(myList):
-    avg = nanmean(myList)
-    stdDev = nanstd(myList)
-    min = nanmin(myList)
-    max = nanmax(myList)
-    ci95 = meanConfidenceInterval95(myList)
-    return avg, stdDev, min, max, ci95
-
-
-def meanLastValues(myList, numLastValues):
-    assert numLastValues > 0
-    if numLastValues > len(myList):
-        numLastValues = len(myList)
-    return nanmean(myList[-numLastValues:])
-
-
 def stopContainersFromImage(host, username, imageName):
     # Find all running containers from image
     remoteCmd = f"{docker} ps --quiet --filter ancestor={imageName}"
@@ -311,30 +228,19 @@ def verifyAppServerInContainerIDStarted(instanceID, host, username):
         logging.warning("AppServer container {instanceID} is not running").format(instanceID=instanceID)
         return False
 
-    remoteCmd = f"{docker} logs --tail=100 {instanceID}"
+    remoteCmd = f"{docker} logs -f {instanceID}"
     cmd = f"ssh {username}@{host} \"{remoteCmd}\"" if username else remoteCmd
     errPattern = re.compile('^.+ ERROR ')
 
     # 2023-01-21 23:41:45.449  INFO 1 --- [           main] o.s.s.petclinic.PetClinicApplication     : Started PetClinicApplication in 3.564 seconds (JVM running for 3.913)
     # 2023-01-24 11:06:59.960  INFO 1 --- [           main] o.s.boot.SpringApplication               : Started application in 6.355 seconds (JVM running for 7.04)
     readyPattern = re.compile('^(.+) INFO .+ Started (PetClinicApplication|application) in')
-
-    for iter in range(10):
-        output = subprocess.check_output(shlex.split(cmd), universal_newlines=True, stderr=subprocess.STDOUT)
-        liblines = output.splitlines()
-        for line in liblines:
-            m = errPattern.match(line)
-            if m:
-                logging.error("AppServer container {instanceID} errored while starting: {line}").format(instanceID=instanceID,line=line)
-                return False
-            m1 = readyPattern.match(line)
-            if m1:
-                if logging.root.level <= logging.INFO:
-                    print(line)
-                return True # True means success
-        time.sleep(1) # wait 1 sec and try again
-        logging.warning("Checking again for app start")
-    return False
+    ready, line, readyTime = readinessWatcher.watchCommand(cmd, readyPattern, errPattern, startupTimeout)
+    if not ready:
+        logging.error("AppServer container {instanceID} did not start correctly: {line}".format(instanceID=instanceID, line=line))
+    elif logging.root.level <= logging.INFO:
+        print(line)
+    return ready # True means success
 
 
 def stopAppServerByID(host, username, containerID):
@@ -378,7 +284,6 @@ def startAppServerContainer(host, username, instanceName, image, port, httpsport
     if logging.root.level <= logging.DEBUG:
         print(lines)
     instanceID = lines[0] # ['2ccae49f3c03af57da27f5990af54df8a81c7ce7f7aace9a834e4c3dddbca97e']
-    time.sleep(delayToStart) # delay to let application start
     started = verifyAppServerInContainerIDStarted(instanceID, host, username)
     if not started:
         logging.error("AppServer failed to start")
@@ -389,8 +294,12 @@ def startAppServerContainer(host, username, instanceName, image, port, httpsport
 
 # Run jmeter remotely
 def applyLoad(duration, clients):
+    if jmeterJTLFile: # JMeter appends to an existing JTL file
+        remoteCmd = f"rm -f {jmeterJTLFile}"
+        cmd = f"ssh {jmeterUsername}@{jmeterMachine} \"{remoteCmd}\"" if jmeterUsername else remoteCmd
+        subprocess.run(shlex.split(cmd), check=False)
     port = appServerHttpsPort if protocol == "https" else appServerPort
-    remoteCmd = f"{docker} run -d --net=host --cpuset-cpus={jmeterAffinity} -e JTHREADS={clients} -e JDURATION={duration} -e JPORT={port} -e JHOST={appServerHost} -e JTHINKTIME={thinkTime} --name {jmeterContainerName} {jmeterImage}"
+    remoteCmd = f"{docker} run -d --net=host --cpuset-cpus={jmeterAffinity} -e JTHREADS={clients} -e JDURATION={duration} -e JPORT={port} -e JHOST={appServerHost} -e JTHINKTIME={thinkTime} {jmeterJTLOpts} --name {jmeterContainerName} {jmeterImage}"
     cmd = f"ssh {jmeterUsername}@{jmeterMachine} \"{remoteCmd}\"" if username else remoteCmd
     logging.info("Apply load: {cmd}".format(cmd=cmd))
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
@@ -473,6 +382,24 @@ def getJMeterSummary():
     return throughput, elapsedTime, peakThr, errs
 
 
+'''
+Latency percentiles of the last JMeter pulse, streamed from the JTL file on the JMeter machine
+'''
+def getLatencyJMeter():
+    remoteCmd = f"cat {jmeterJTLFile}"
+    cmd = f"ssh {jmeterUsername}@{jmeterMachine} \"{remoteCmd}\"" if jmeterUsername else remoteCmd
+    process = subprocess.Popen(shlex.split(cmd), universal_newlines=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        histogram, numErrors = loadLatency.parseJTL(process.stdout)
+    except ValueError as e:
+        logging.warning("Cannot read latencies from {f}: {e}".format(f=jmeterJTLFile, e=e))
+        return loadLatency.emptyLatency()
+    finally:
+        process.stdout.close()
+        process.wait()
+    return loadLatency.latencySummary(histogram)
+
+
 def runPhase(duration, clients):
     logging.debug("Sleeping for {n} sec".format(n=delayBetweenRepetitions))
     time.sleep(delayBetweenRepetitions)
@@ -485,14 +412,15 @@ def runPhase(duration, clients):
     logging.debug("Wait for {jmeter} to end: {cmd}".format(jmeter=jmeterContainerName, cmd=cmd))
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
 
-    # Read throughput
+    # Read throughput and latency
     thr, elapsed, peakThr, errors = getJMeterSummary()
+    latency = getLatencyJMeter() if jmeterJTLFile else loadLatency.emptyLatency()
 
     stopJMeter()
-    print("Throughput={thr:7.1f} duration={elapsed:6.1f} peak={peakThr:7.1f} errors={err:4d}".format(thr=thr,elapsed=elapsed,peakThr=peakThr,err=errors))
+    print("Throughput={thr:7.1f} duration={elapsed:6.1f} peak={peakThr:7.1f} errors={err:4d}  Latency: {lat}".format(thr=thr,elapsed=elapsed,peakThr=peakThr,err=errors,lat=loadLatency.formatLatency(latency)))
     if errors > 0:
         logging.error(f"JMeter encountered {errors} errors")
-    return thr
+    return thr, latency
 
 
 def checkAppServerForErrors(instanceID, host, username):
@@ -520,11 +448,12 @@ def runBenchmarkOnce(image, javaOpts):
     # Will apply load in small bursts
     maxPulses = numRepetitionsOneClient + numRepetitions50Clients
     thrResults = [math.nan for i in range(maxPulses)] # np.full((maxPulses), fill_value=np.nan, dtype=np.float)
+    latencyResults = [loadLatency.emptyLatency() for i in range(maxPulses)] # p50/p90/p99/max for each pulse
     rss, peakRss = math.nan, math.nan
 
     instanceID = startAppServerContainer(host=appServerHost, username=username, instanceName=instanceName, image=image, port=appServerPort, httpsport=appServerHttpsPort, cpus=cpuAffinity, mem=memLimit, jvmArgs=javaOpts)
     if instanceID is None:
-        return thrResults, rss
+        return thrResults, rss, peakRss, math.nan, latencyResults
 
     for pulse in range(maxPulses):
         if pulse >= numRepetitionsOneClient:
@@ -533,7 +462,7 @@ def runBenchmarkOnce(image, javaOpts):
         else:
             cli = 1
             duration = durationOfOneClient
-        thrResults[pulse] = runPhase(duration, cli)
+        thrResults[pulse], latencyResults[pulse] = runPhase(duration, cli)
 
     # Collect RSS at end of run
     serverPID = getJavaPIDFromContainer(host=appServerHost, username=username, instanceID=instanceID)
@@ -548,6 +477,7 @@ def runBenchmarkOnce(image, javaOpts):
     # If there were errors during the run, invalidate throughput results
     if not checkAppServerForErrors(instanceID, appServerHost, username):
         thrResults = [math.nan for i in range(maxPulses)] #np.full((maxPulses), fill_value=np.nan, dtype=np.float) # Reset any throughput values
+        latencyResults = [loadLatency.emptyLatency() for i in range(maxPulses)]
 
     # stop container
     success = stopAppServerByID(appServerHost, username, instanceID)
@@ -561,8 +491,8 @@ def runBenchmarkOnce(image, javaOpts):
     else:
         sys.exit(-1)
 
-    # return throughput as an array of throughput values for each burst and also the RSS
-    return thrResults, rss, peakRss, float(cpu/1000.0)
+    # return throughput as an array of throughput values for each burst and also the RSS, CPU and the latency of each burst
+    return thrResults, rss, peakRss, float(cpu/1000.0), latencyResults
 
 
 def runBenchmarkIteratively(numIter, image, javaOpts):
@@ -571,18 +501,27 @@ def runBenchmarkIteratively(numIter, image, javaOpts):
     thrResults = [] # List of lists
     rssResults = [] # Just a list
     cpuResults = []
+    latencyAvgResults = {key: [] for key in loadLatency.latencyKeys} # latency of the last N pulses, for every run
 
     # clear SCC if needed (by destroying the SCC volume)
     if doColdRun:
         clearSCC(appServerHost, username)
 
+    sampler = sequentialSampling.SequentialSampler(targetCI95, minRuns)
     for iter in range(numIter):
-        thrList, rss, peakRss, cpu = runBenchmarkOnce(image, javaOpts)
+        thrList, rss, peakRss, cpu, latencyList = runBenchmarkOnce(image, javaOpts)
         lastThr = meanLastValues(thrList, numMeasurementTrials) # average for last N pulses
-        print(f"Run {iter}: Thr={lastThr:6.1f} RSS={rss:6.1f} MB  PeakRSS={peakRss:6.1f} MB  CPU={cpu:4.1f} sec".format(lastThr=lastThr,rss=rss,peakRss=peakRss,cpu=cpu))
+        for key in loadLatency.latencyKeys:
+            latencyAvgResults[key].append(meanLastValues([latency[key] for latency in latencyList], numMeasurementTrials))
+        print(f"Run {iter}: Thr={lastThr:6.1f} p99={latencyAvgResults['p99'][-1]:7.2f} ms RSS={rss:6.1f} MB  PeakRSS={peakRss:6.1f} MB  CPU={cpu:4.1f} sec".format(lastThr=lastThr,rss=rss,peakRss=peakRss,cpu=cpu))
         thrResults.append(thrList) # copy all the pulses
         rssResults.append(rss)
         cpuResults.append(cpu)
+        sampler.add(lastThr)
+        if adaptiveRuns and sampler.isDone():
+            print(f"Throughput CI95 target reached after {iter+1} runs: {sampler}")
+            numIter = iter + 1
+            break
 
     # print stats
     print(f"\nResults for image: {image} and opts: {javaOpts}")
@@ -609,9 +548,16 @@ def runBenchmarkIteratively(numIter, image, javaOpts):
         print("\t{thr:7.1f}".format(thr=verticalAverages[pulse]), end="")
     print("\tAvg={avgThr:7.1f}  RSS={rss:7.0f} MB  CompCPU={cpu:5.1f}".format(avgThr=nanmean(thrAvgResults), rss=nanmean(rssResults), cpu=nanmean(cpuResults)))
     # Throughput stats
-    avg, stdDev, min, max, ci95 = computeStats(thrAvgResults)
+    avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(thrAvgResults)
     print("Throughput stats: Avg={avg:7.1f}  StdDev={stdDev:7.1f}  Min={min:7.1f}  Max={max:7.1f}  Max/Min={maxmin:7.1f} CI95={ci95:7.1f}%".
                         format(avg=avg, stdDev=stdDev, min=min, max=max, maxmin=max/min, ci95=ci95))
+    # Latency stats, available when JMeter writes a JTL file
+    for key in loadLatency.latencyKeys:
+        if countNotNan(latencyAvgResults[key]) == 0:
+            continue
+        avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(latencyAvgResults[key])
+        print("Latency {key} ms:   Avg={avg:7.2f}  StdDev={stdDev:7.2f}  Min={min:7.2f}  Max={max:7.2f}  Max/Min={maxmin:7.1f} CI95={ci95:7.1f}%".
+                            format(key=key, avg=avg, stdDev=stdDev, min=min, max=max, maxmin=max/min if min > 0 else math.nan, ci95=ci95))
 
 
 ############################ MAIN ##################################
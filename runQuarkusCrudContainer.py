@@ -8,14 +8,24 @@
 # a JITServer will be launched automatically
 # If using CRIU, we need to have a network defined with1
 #          docker network create --subnet 192.168.200.0/24 myNetwork
-import datetime # for datetime.datetime.now()
-from collections import deque
+# Usage: python3 runQuarkusCrudContainer.py numIterations
+#    or: python3 runQuarkusCrudContainer.py --campaign campaign.json
+# With a campaign file (see campaignFile.py) the matrix axes are "image", "args" and "workload",
+# every finished run is appended to the results log and a restarted campaign skips the runs already done
 import logging # https://www.machinelearningplus.com/python/python-logging-guide/
 import math
 import queue
 import re # for regular expressions
 import shlex, subprocess
 import sys # for exit
+import sequentialSampling
+import readinessWatcher
+import firstResponseProber
+import asyncLoadGen
+import loadLatency
+import rampupAnalyzer
+import campaignFile
+from benchStats import nanmean, computeStats, meanLastValues, countNotNan
 import time # for sleep
 
 ############################### CONFIG ###############################################
@@ -28,18 +38,21 @@ instantOnRestore = False  # Set to true to add --cap-add=CHECKPOINT_RESTORE (or
 
 ################### Benchmark configuration #################
 doColdRun = False
+adaptiveRuns = False # when True stop iterating once the CI95 of the throughput drops below targetCI95; the number of iterations becomes the maximum
+targetCI95 = 2.0 # target half-width of the throughput CI95, as a percentage of the mean
+minRuns = 5 # minimum number of measured iterations when adaptiveRuns is True
 appServerMachine = "localhost" # This address is used by the load generator
 username = "" # for connecting remotely to the SUT; leave empty to connect without ssh
 containerName = "restcrud"
 appServerPort   = "9090"
 cpuLimit        = "--cpuset-cpus=1" # --cpuset-mems=0
 memLimit        = "-m=256m"
-delayToStart    = 5 # seconds; waiting for the AppServer to start before checking for valid startup
+startupTimeout  = 30 # maximum seconds to wait for the AppServer to be ready (the container log is followed, see readinessWatcher.py)
 extraDockerOpts = "-v /tmp:/tmp" # extra options to pass to docker run
 postRestoreOpts = "-XX:+UseJITServer -XX:+JITServerLogConnections" if instantOnRestore else "" # Options to add to the JVM for restore
 
 getFirstResponseTime = True # Set to true to get the first response time
-firstResponseHelperScript = "./loop_curl.sh" # Script to get the first response time
+firstResponsePath = "/fruits" # URL path probed until the first HTTP 200 (see firstResponseProber.py)
 netOpts = "--network=slirp4netns" if docker == "podman" else "--network=host" # for podman we need to use slirp4netns if running as root.
 if instantOnRestore:
     #netOpts = "--net myNetwork --ip 192.168.200.20"
@@ -64,14 +77,21 @@ dbNetOpts       = "--net=host" # "--net myNetwork --ip 192.168.200.10" if instan
 
 ################ Load CONFIG ###############
 doApplyLoad      = True # Set to false to skip load generation
-printRampup      = True # If True, print all JMeter throughput values to plot rampup curve; only applicable to JMeter
+printRampup      = True # If True, print all JMeter throughput values to plot rampup curve; only applicable to JMeter and asyncLoadGen
 useJMeterForLoad = True # The alternative is to use wrk
+usePythonLoadGen = False # When True, use the built-in asyncLoadGen.py from this machine instead of JMeter/wrk containers
+pythonLoadGenPath = "/fruits" # URL path requested by asyncLoadGen.py
+pythonLoadGenRate = 0 # requests/sec for open-loop load with numClients connections; 0 means closed-loop with numClients clients
+pythonLoadGenProcesses = 1 # worker processes for asyncLoadGen.py; use more for high request rates
 loadGenMachine   = "localhost" if useJMeterForLoad else "localhost"
 loadGenUsername  = "" if useJMeterForLoad else "" # To connect to load generator machine; leave empty to connect without ssh
 loadgenImage     = "jmeter_simple:5.5" if useJMeterForLoad else "wrk"
 loadGenContainerName = "jmeter" if useJMeterForLoad else "wrk"
 loadGenNetOpts   = "--net=host" #"--net myNetwork --ip 192.168.200.60" if instantOnRestore else "--net=host"
 loadGenAffinity  = "--cpuset-cpus 0,4" #"--net myNetwork --ip 192.168.200.60" if instantOnRestore else "--net=host"
+wrkLatencyOpts   = "" # docker options that make the wrk image run `wrk --latency`, e.g. "-e WRK_OPTS=--latency" if the image passes WRK_OPTS to wrk; leave empty to skip the wrk latency percentiles
+jmeterJTLOpts    = "" # docker options that make the JMeter image write a JTL file, e.g. "-v /tmp/jtl:/jtl -e JRESULTS=/jtl/results.jtl"
+jmeterJTLFile    = "" # The JTL file on loadGenMachine, e.g. "/tmp/jtl/results.jtl"; leave empty to skip the JMeter latency percentiles
 
 numRepetitionsOneClient = 0
 numRepetitions50Clients = 1 
@@ -80,6 +100,7 @@ durationOfOneRepetition = 180 # seconds
 numClients              = 10 # Number of wrk threads
 delayBetweenRepetitions = 10
 numMeasurementTrials    = 1 # Last N trials are used in computation of throughput
+rampupPulse             = None # Pulse whose throughput curve is analyzed for warm-up; None means the first one with numClients
 
 ################# JITServer CONFIG ###############
 # JITServer is automatically launched if the JVM option include -XX:+UseJITServer
@@ -128,104 +149,11 @@ configs = [
 #    {"image":"", "args":""},
 ]
 
-def nancount(myList):
-    count = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            count += 1
-    return count
-
-def nanmean(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-    return total/numValidElems if numValidElems > 0 else math.nan
-
-def nanstd(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-
-    if numValidElems == 0:
-        return math.nan
-    if numValidElems == 1:
-        return 0
-    else:
-        mean = total/numValidElems
-        total = 0
-        for i in range(len(myList)):
-            if not math.isnan(myList[i]):
-                total += (myList[i] - mean)**2
-        return math.sqrt(total/(numValidElems-1))
-
-def nanmin(myList):
-    min = math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] < min:
-            min = myList[i]
-    return min
-
-def nanmax(myList):
-    max = -math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] > max:
-            max = myList[i]
-    return max
-
-def tDistributionValue95(degreeOfFreedom):
-    if degreeOfFreedom < 1:
-        return math.nan
-        #import scipy.stats as stats
-        #  stats.t.ppf(0.975, degreesOfFreedom))
-    tValues = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
-               2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
-               2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,]
-    if degreeOfFreedom <= 30:
-        return tValues[degreeOfFreedom-1]
-    else:
-        if degreeOfFreedom <= 60:
-            return 2.042 - 0.001 * (degreeOfFreedom - 30)
-        else:
-            return 1.96
-
-# Confidence intervals tutorial
-# mean +- t * std / sqrt(n)
-# For 95% confidence interval, t = 1.96 if we have many samples
-def meanConfidenceInterval95(myList):
-    cnt = nancount(myList)
-    if cnt <= 1:
-        return math.nan
-    tvalue = tDistributionValue95(cnt-1)
-    avg, stdDev = nanmean(myList), nanstd(myList)
-    marginOfError = tvalue * stdDev / math.sqrt(cnt)
-    return 100.0*marginOfError/avg
-
-def computeStats(myList):
-    avg = nanmean(myList)
-    stdDev = nanstd(myList)
-    min = nanmin(myList)
-    max = nanmax(myList)
-    ci95 = meanConfidenceInterval95(myList)
-    samples = nancount(myList)
-    return avg, stdDev, min, max, ci95, samples
-
 def printStats(myList, name):
-    avg, stdDev, min, max, ci95, samples = computeStats(myList)
+    avg, stdDev, min, max, ci95, samples, outliers = computeStats(myList)
     print("{name:<17} Avg={avg:7.1f}  StdDev={stdDev:7.1f}  Min={min:7.1f}  Max={max:7.1f}  Max/Min={maxmin:7.1f} CI95={ci95:7.1f}%  samples={n}".
             format(name=name, avg=avg, stdDev=stdDev, min=min, max=max, maxmin=max/min, ci95=ci95, n=samples))
 
-def meanLastValues(myList, numLastValues):
-    assert numLastValues > 0
-    if numLastValues > len(myList):
-        numLastValues = len(myList)
-    return nanmean(myList[-numLastValues:])
-
 def getMainPIDFromContainer(host, username, instanceID):
     remoteCmd = f"{docker} inspect " + "--format='{{.State.Pid}}' " + instanceID
     cmd = f"ssh {username}@{host} \"{remoteCmd}\"" if username else remoteCmd
@@ -393,29 +321,17 @@ def verifyAppServerInContainerIDStarted(instanceID, host, username):
     if instantOnRestore:
         return True
 
-    remoteCmd = f"{docker} logs --tail=100 {instanceID}"
+    remoteCmd = f"{docker} logs -f {instanceID}"
     cmd = f"ssh {username}@{host} \"{remoteCmd}\"" if username else remoteCmd
     errPattern = re.compile('.+\[ERROR')
     # 2025-10-17 23:30:25,616 INFO  [io.quarkus] (main) rest-crud 1.0 on JVM (powered by Quarkus 3.20.3) started in 3.462s. Listening on: http://0.0.0.0:9090
     readyPattern = re.compile("rest-crud .+ started in \d+\.\d+s. Listening on")
-    for iter in range(15):
-        output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
-        liblines = output.splitlines()
-        for line in liblines:
-            m = errPattern.match(line)
-            if m:
-                logging.warning("AppServer container {instanceID} errored while starting: {line}").format(instanceID=instanceID,line=line)
-                return False
-            m1 = readyPattern.search(line)
-            if m1:
-                if logging.root.level <= logging.DEBUG:
-                   print(lines)
-                return True # True means success
-        if logging.root.level <= logging.DEBUG:
-            print(liblines)
-        time.sleep(1) # wait 1 sec and try again
-        logging.warning("Checking again")
-    return False
+    ready, line, readyTime = readinessWatcher.watchCommand(cmd, readyPattern, errPattern, startupTimeout)
+    if not ready:
+        logging.error("AppServer container {instanceID} did not start correctly: {line}".format(instanceID=instanceID, line=line))
+    elif logging.root.level <= logging.INFO:
+        print(line)
+    return ready # True means success
 
 def startAppServerContainer(host, username, instanceName, image, port, jvmArgs, mountOpts, dbMachine):
     # vlogs can be created in /tmp/vlogs -v /tmp/vlogs:/tmp/vlogs
@@ -449,7 +365,6 @@ def startAppServerContainer(host, username, instanceName, image, port, jvmArgs,
     if logging.root.level <= logging.DEBUG:
         print(lines)
     instanceID = lines[0] # ['2ccae49f3c03af57da27f5990af54df8a81c7ce7f7aace9a834e4c3dddbca97e']
-    time.sleep(delayToStart)
     started = verifyAppServerInContainerIDStarted(instanceID, host, username)
     if not started:
         logging.error(f"AppServer instance {instanceName} from {image} cannot start in the alloted time")
@@ -501,11 +416,15 @@ def getCompCPUFromContainer(host, username, instanceID):
             threadTime += float(m.group(1))
     return threadTime if threadTime > 0 else math.nan
 
-def getAppServerStartupTime(host, username, containerID, userStartTimeMs, curlProcess):
+'''
+Complete the start-up timeline of a container with the time docker started it, the time of its
+first log line and the time of the ready line (all docker timestamps, in nanoseconds) and wait
+for the first response, if a prober is given.
+Returns startupTime and 3 types of first response time (ms) depending on the starting point:
+launch of the container, StartedAt of the container and first line of the AppServer log
+'''
+def getAppServerStartupTime(host, username, containerID, timeline, prober):
     logging.debug("Computing startup time for AppServer instance {instanceID}".format(instanceID=containerID))
-    # userStartTimeMs is the time when the user launched the container
-    startupTime = math.nan
-    firstResponseTime = math.nan
     # Check that the indicated container still exists
     remoteCmd = f"{docker} ps -a --quiet --filter id={containerID}"
     cmd = f"ssh {username}@{host} \"{remoteCmd}\"" if username else remoteCmd
@@ -513,101 +432,49 @@ def getAppServerStartupTime(host, username, containerID, userStartTimeMs, curlPr
     lines = output.splitlines()
     if not lines:
         logging.warning("AppServer instance {instanceID} does not exist.".format(instanceID=containerID))
-        return startupTime, firstResponseTime
+        if prober:
+            prober.stop()
+        return math.nan, math.nan, math.nan, math.nan
 
-    # Use "docker inspect" to get the time when container was initialized
-    remoteCmd = f"{docker} inspect {containerID}" # I need to capture stderr as well
+    # Use "docker inspect" to get the time when container was initialized, e.g. 2025-10-23T15:01:39.342994166Z
+    remoteCmd = f"{docker} inspect --format={{{{.State.StartedAt}}}} {containerID}"
     cmd = f"ssh {username}@{host} \"{remoteCmd}\"" if username else remoteCmd
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True, stderr=subprocess.STDOUT)
-    lines = output.splitlines()
-     # "StartedAt": "2025-10-23T15:01:39.342994166Z",
-    startatPattern = re.compile("StartedAt.+T(\d+):(\d+):(\d+)\.(\d\d\d)")
-    containerStartAtTime = 0
-    for line in lines:
-        m = startatPattern.search(line)
-        if m:
-            containerStartAtTime = (int(m.group(2)) * 60 + int(m.group(3)))*1000 + int(m.group(4))
-            if containerStartAtTime < userStartTimeMs:
-                containerStartAtTime = containerStartAtTime + 3600*1000 # add one hour
-            break
-    if containerStartAtTime == 0:
-        logging.warning("Container startAt time could not be retrieved")
+    startedAt = firstResponseProber.parseDockerTimestamp(output)
+    if startedAt:
+        timeline.mark("containerStartedAt", startedAt)
+    else:
+        logging.warning("Container startAt time could not be retrieved: " + output)
 
-    remoteCmd = f"{docker} logs --tail=200 {containerID}" # I need to capture stderr as well
+    # Every line is prefixed by the time docker received it, e.g.
+    # 2025-10-17T23:30:25.616353812Z 2025-10-17 23:30:25,616 INFO  [io.quarkus] (main) rest-crud 1.0 on JVM (powered by Quarkus 3.20.3) started in 3.462s. Listening on: http://0.0.0.0:9090
+    remoteCmd = f"{docker} logs --timestamps {containerID}" # I need to capture stderr as well
     cmd = f"ssh {username}@{host} \"{remoteCmd}\"" if username else remoteCmd
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True, stderr=subprocess.STDOUT)
     liblines = output.splitlines()
-
-    # The very first line may include a timestamp in the form of "15:01:39.472491267" representing the time when the appServer started
-    appServerStart = 0
-    if len(liblines) > 0:
-        firstLine = liblines[0]
-        timePattern = re.compile("(\d+):(\d+):(\d+)\.(\d\d\d)")
-        m = timePattern.match(firstLine)
-        if m:
-            appServerStart = (int(m.group(2)) * 60 + int(m.group(3)))*1000 + int(m.group(4))
-            if appServerStart < userStartTimeMs:
-                appServerStart = appServerStart + 3600*1000 # add one hour
-        if appServerStart == 0:
-            logging.warning("AppServer start time could not be retrieved. First line is: " + firstLine)
-
-    # 2025-10-17 23:30:25,616 INFO  [io.quarkus] (main) rest-crud 1.0 on JVM (powered by Quarkus 3.20.3) started in 3.462s. Listening on: http://0.0.0.0:9090
-    readyPattern = re.compile("([\d\- :,]*) INFO .+ rest-crud .+ started in \d+\.\d+s. Listening on")
+    if liblines:
+        appServerStart = firstResponseProber.parseDockerTimestamp(liblines[0])
+        if appServerStart:
+            timeline.mark("appServerStart", appServerStart)
+        else:
+            logging.warning("AppServer start time could not be retrieved. First line is: " + liblines[0])
+    readyPattern = re.compile("(\S+) .+ INFO .+ rest-crud .+ started in \d+\.\d+s. Listening on")
     for line in liblines:
         m = readyPattern.match(line)
         if m:
-            timestamp = m.group(1)
-            # 2025-10-17 23:30:25,616
-            pattern1 = re.compile("(\d+)-(\d+)-(\d+),? (\d+):(\d+):(\d+),(\d\d\d)")
-            m1 = pattern1.match(timestamp)
-            if m1:
-                # Ignore the hour to avoid time zone issues
-                endTime = (int(m1.group(5)) * 60 + int(m1.group(6)))*1000 + int(m1.group(7))
-                if endTime < userStartTimeMs:
-                    endTime = endTime + 3600*1000 # add one hour
-                startupTime = float(endTime - userStartTimeMs)
-                break
-            else:
-                logging.warning("Quarkus timestamp is in the wrong format: {timestamp}".format(timestamp=timestamp))
-                break
-    if startupTime == math.nan:
+            ready = firstResponseProber.parseDockerTimestamp(m.group(1))
+            if ready:
+                timeline.mark("ready", ready)
+            break
+    if "ready" not in timeline.events:
         logging.warning("AppServer instance {containerID} did not start correctly".format(containerID=containerID))
 
-    endTimeCurlMs = 0
-    if curlProcess: # We intend to get the firstResponse time
-        outs = None
-        errs = None
-        try:
-            outs, errs = curlProcess.communicate(timeout=15)
-        except subprocess.TimeoutExpired:
-            curlProcess.kill()
-            outs, errs = curlProcess.communicate()
-
-        if curlProcess.returncode == 0:
-            firstResponseTimeString = outs #curlProcess.stdout
-            # my output coming from `date +"%H:%M:%S.%N"` is in the format HH:MM:SS.NNNNNNNNN
-            logging.debug(f"Computing first response time. End time is {firstResponseTimeString}")
-            tpattern = re.compile("(\d+):(\d+):(\d+)\.(\d\d\d)")
-            m2 = tpattern.match(firstResponseTimeString)
-            if m2:
-                # Ignore the hour to avoid time zone issues
-                endTimeCurlMs = (int(m2.group(2))*60 + int(m2.group(3)))*1000 + int(m2.group(4))
-                if endTimeCurlMs < userStartTimeMs:
-                    endTimeCurlMs = endTimeCurlMs + 3600*1000 # add one hour
-            else:
-                logging.warning("First response time is in the wrong format: {firstResponseTimeString}".format(firstResponseTimeString=firstResponseTimeString))
-
-    responseTime1 = 0
-    responseTime2 = 0
-    responseTime3 = 0
-    if endTimeCurlMs > 0:
-        responseTime1 = endTimeCurlMs - userStartTimeMs
-        if containerStartAtTime > 0:
-            responseTime2 = endTimeCurlMs - containerStartAtTime
-        if appServerStart > 0:
-            responseTime3 = endTimeCurlMs - appServerStart
+    if prober: # We intend to get the firstResponse time
+        prober.wait(timeout=15)
+    logging.debug(f"Startup timeline: {timeline}")
 
-    return startupTime, responseTime1, responseTime2, responseTime3
+    return (timeline.durationMs("launch", "ready"), timeline.durationMs("launch", "firstResponse"),
+            timeline.durationMs("containerStartedAt", "firstResponse"), timeline.durationMs("appServerStart", "firstResponse"))
 
 def startJITServer(serverImage):
     # -v /tmp/vlogs:/tmp/JITServer_vlog -e TR_Options=\"statisticsFrequency=10000,vlog=/tmp/vlogs/vlog.txt\"
@@ -647,10 +514,14 @@ def cleanup():
 def applyLoad(duration, numClients):
     remoteCmd = ""
     if useJMeterForLoad:
+        if jmeterJTLFile: # JMeter appends to an existing JTL file
+            remoteCmd = f"rm -f {jmeterJTLFile}"
+            cmd = f"ssh {loadGenUsername}@{loadGenMachine} \"{remoteCmd}\"" if loadGenUsername else remoteCmd
+            subprocess.run(shlex.split(cmd), check=False)
         # Run jmeter remotely
-        remoteCmd = f"{docker} run -d {loadGenNetOpts} {loadGenAffinity} -e JTHREAD={numClients} -e JDURATION={duration} -e JHOST={appServerMachine} -e JPORT={appServerPort} --name {loadGenContainerName} {loadgenImage}"
+        remoteCmd = f"{docker} run -d {loadGenNetOpts} {loadGenAffinity} -e JTHREAD={numClients} -e JDURATION={duration} -e JHOST={appServerMachine} -e JPORT={appServerPort} {jmeterJTLOpts} --name {loadGenContainerName} {loadgenImage}"
     else: # use wrk
-        remoteCmd = f"{docker} run -d {loadGenNetOpts} {loadGenAffinity} -e THREADS={numClients} -e CONNECTIONS={numClients} -e DURATION={duration} -e SUT_IP={appServerMachine} -e SUT_PORT={appServerPort} --name {loadGenContainerName} {loadgenImage}"
+        remoteCmd = f"{docker} run -d {loadGenNetOpts} {loadGenAffinity} -e THREADS={numClients} -e CONNECTIONS={numClients} -e DURATION={duration} -e SUT_IP={appServerMachine} -e SUT_PORT={appServerPort} {wrkLatencyOpts} --name {loadGenContainerName} {loadgenImage}"
 
     cmd = f"ssh {loadGenUsername}@{loadGenMachine} \"{remoteCmd}\"" if loadGenUsername else remoteCmd
     logging.info("Apply load: {cmd}".format(cmd=cmd))
@@ -663,6 +534,9 @@ def getThroughputWrk(lines):
 #  Thread Stats   Avg      Stdev     Max   +/- Stdev
 #    Latency     2.55ms    3.79ms  24.81ms   83.61%
 #    Req/Sec     1.22k   263.42     3.51k    73.94%
+#  Latency Distribution
+#     50%    1.10ms
+#     ...
 #  10899233 requests in 6.00m, 0.93GB read
 #Requests/sec:  30267.47
 #Transfer/sec:      2.66MB
@@ -684,26 +558,8 @@ def getThroughputJMeter(lines):
     throughput = 0
     errs = 0
     lastSummaryLine = ""
-    slidingWindow = deque([0.0, 0.0, 0.0])
-    pattern1 = re.compile('summary \+\s+(\d+) in\s+(\d+\.*\d*)s =\s+(\d+\.\d+)/s.+Finished: 0')
-    pattern2 = re.compile('summary \+\s+(\d+) in\s+(\d\d):(\d\d):(\d\d) =\s+(\d+\.\d+)/s.+Finished: 0')
+    # The "summary +" lines (throughput of every interval) are analyzed by rampupAnalyzer
     for line in lines:
-        # summary +  17050 in 00:00:06 = 2841.7/s Avg:     0 Min:     0 Max:    49 Err:     0 (0.00%) Active: 2 Started: 2 Finished: 0
-        if line.startswith("summary +"):
-            if printRampup:
-                print(line)
-            m = pattern1.match(line)
-            if m:
-                thr = float(m.group(3))
-                slidingWindow.pop()
-                slidingWindow.appendleft(thr)
-            else:
-                m = pattern2.match(line)
-                if m:
-                    thr = float(m.group(5))
-                    slidingWindow.pop()
-                    slidingWindow.appendleft(thr)
-
         if line.startswith("summary ="):
             lastSummaryLine = line
 
@@ -721,8 +577,6 @@ def getThroughputJMeter(lines):
             # Next 3 groups are the interval of time that passed
             throughput = float(m.group(5))  # Fifth group is the throughput value
             errs = int(m.group(6)) # Sixth group is the number of errors
-    # Compute the peak throughput as a sliding window of 3 consecutive entries
-    #peakThr = sum(slidingWindow)/len(slidingWindow)
 
     if errs > 0:
         logging.error("JMeter Errors: {n}".format(n=errs))
@@ -730,12 +584,33 @@ def getThroughputJMeter(lines):
 
 def getThroughput():
     logging.debug("Getting throughput info...")
-    remoteCmd = f"{docker} logs --tail=200 {loadGenContainerName}"
+    # The whole log is needed for the rampup curve (one "summary +" line per JMeter interval)
+    remoteCmd = f"{docker} logs {loadGenContainerName}"
     cmd = f"ssh {loadGenUsername}@{loadGenMachine} \"{remoteCmd}\"" if loadGenUsername else remoteCmd
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True, stderr=subprocess.DEVNULL)
     lines = output.splitlines()
-    thr, errs = getThroughputJMeter(lines) if useJMeterForLoad else getThroughputWrk(lines)
-    return thr, errs
+    if useJMeterForLoad:
+        thr, errs = getThroughputJMeter(lines)
+        return thr, errs, loadLatency.emptyLatency(), rampupAnalyzer.parseJMeterRampup(lines)
+    thr, errs = getThroughputWrk(lines)
+    return thr, errs, loadLatency.parseWrkLatency(lines), ([], []) # wrk has no throughput curve
+
+'''
+Latency percentiles of the last JMeter pulse, streamed from the JTL file on the load generator machine
+'''
+def getLatencyJMeter():
+    remoteCmd = f"cat {jmeterJTLFile}"
+    cmd = f"ssh {loadGenUsername}@{loadGenMachine} \"{remoteCmd}\"" if loadGenUsername else remoteCmd
+    process = subprocess.Popen(shlex.split(cmd), universal_newlines=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        histogram, numErrors = loadLatency.parseJTL(process.stdout)
+    except ValueError as e:
+        logging.warning("Cannot read latencies from {f}: {e}".format(f=jmeterJTLFile, e=e))
+        return loadLatency.emptyLatency()
+    finally:
+        process.stdout.close()
+        process.wait()
+    return loadLatency.latencySummary(histogram)
 
 
 def stopLoad():
@@ -748,6 +623,17 @@ def runPhase(duration, numClients):
     logging.debug("Sleeping for {n} sec".format(n=delayBetweenRepetitions))
     time.sleep(delayBetweenRepetitions)
 
+    if usePythonLoadGen:
+        result = asyncLoadGen.runLoad(f"http://{appServerMachine}:{appServerPort}{pythonLoadGenPath}", duration, numClients,
+                                      rate=pythonLoadGenRate, numProcesses=pythonLoadGenProcesses)
+        rampup = rampupAnalyzer.curveFromPerSecond(result.throughputSeries())
+        if printRampup:
+            print("Rampup: " + rampupAnalyzer.formatCurve(*rampup))
+        print("Throughput={thr:7.1f}  Latency: {lat}".format(thr=result.throughput(), lat=result.histogram.formatPercentiles()))
+        if result.numErrors > 0:
+            logging.error(f"asyncLoadGen encountered {result.numErrors} errors")
+        return result.throughput(), loadLatency.latencySummary(result.histogram), rampup
+
     output = applyLoad(duration, numClients)
     # Wait for load to finish
     remoteCmd = f"{docker} wait {loadGenContainerName}"
@@ -755,38 +641,43 @@ def runPhase(duration, numClients):
     logging.debug("Wait for {jmeter} to end: {cmd}".format(jmeter=loadGenContainerName, cmd=cmd))
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
 
-    # Read throughput
-    thr, errs = getThroughput()
+    # Read throughput, latency and rampup curve
+    thr, errs, latency, rampup = getThroughput()
+    if useJMeterForLoad and jmeterJTLFile:
+        latency = getLatencyJMeter()
 
     stopLoad()
-    if logging.root.level <= logging.DEBUG:
-        print("Throughput={thr:7.1f}".format(thr=thr))
+    if printRampup and rampup[0]:
+        print("Rampup: " + rampupAnalyzer.formatCurve(*rampup))
+    print("Throughput={thr:7.1f}  Latency: {lat}".format(thr=thr, lat=loadLatency.formatLatency(latency)))
     if errs > 0:
         logging.error(f"JMeter encountered {errs} errors")
 
-    return thr
+    return thr, latency, rampup
 
 def runBenchmarkOnce(image, javaOpts):
     # Will apply load in small bursts
     maxPulses = numRepetitionsOneClient + numRepetitions50Clients
     thrResults = [math.nan for i in range(maxPulses)] # np.full((maxPulses), fill_value=np.nan, dtype=np.float)
+    latencyResults = [loadLatency.emptyLatency() for i in range(maxPulses)] # p50/p90/p99/max for each pulse
+    rampupResults = [([], []) for i in range(maxPulses)] # (times, thr) curve for each pulse
     rss, peakRss, cpu = math.nan, math.nan, math.nan
-    curlProcess = None
 
     restoreDatabase(dbMachine, dbUsername, dbImage)
 
-    # Start an external program called curl_loop in background
-    # This program will keep sending requests to the app server until it responds with 200 once
+    # The prober keeps sending requests to the app server until it responds with 200 once
+    timeline = firstResponseProber.StartupTimeline()
+    prober = None
     if getFirstResponseTime:
-        curlCmd = f"{firstResponseHelperScript}"
-        curlProcess = subprocess.Popen(shlex.split(curlCmd), universal_newlines=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-    crtTime = datetime.datetime.now()
-    userStartTimeMs = (crtTime.minute * 60 + crtTime.second)*1000 + crtTime.microsecond//1000
+        prober = firstResponseProber.FirstResponseProber(appServerMachine, appServerPort, firstResponsePath, timeline)
+        prober.start()
 
+    timeline.mark("launch")
     instanceID = startAppServerContainer(host=appServerMachine, username=username, instanceName=containerName, image=image, port=appServerPort, jvmArgs=javaOpts, mountOpts=mountOpts, dbMachine=dbMachine)
     if instanceID is None:
-        return thrResults, rss, peakRss, cpu
+        if prober:
+            prober.stop()
+        return thrResults, rss, peakRss, cpu, math.nan, math.nan, math.nan, math.nan, latencyResults, rampupResults
 
     # We know the app started successfuly
 
@@ -798,7 +689,7 @@ def runBenchmarkOnce(image, javaOpts):
             else:
                 cli = 1
                 duration = durationOfOneClient
-            thrResults[pulse] = runPhase(duration, cli)
+            thrResults[pulse], latencyResults[pulse], rampupResults[pulse] = runPhase(duration, cli)
 
     # Collect RSS at end of run
     # When running the native image there is no java application
@@ -819,19 +710,25 @@ def runBenchmarkOnce(image, javaOpts):
     if doApplyLoad:
         if not checkAppServerForErrors(instanceID, appServerMachine, username):
             thrResults = [math.nan for i in range(maxPulses)] #np.full((maxPulses), fill_value=np.nan, dtype=np.float) # Reset any throughput values
+            latencyResults = [loadLatency.emptyLatency() for i in range(maxPulses)]
+            rampupResults = [([], []) for i in range(maxPulses)]
 
     # stop container and read CompCPU
     rc = stopAppServerByID(appServerMachine, username, instanceID)
     cpu = getCompCPUFromContainer(appServerMachine, username, instanceID)
     # There are 3 types of first response time depending on how we decide on the starting point
-    startTimeMillis, frt1, frt2, frt3 = getAppServerStartupTime(appServerMachine, username, instanceID, userStartTimeMs, curlProcess)
+    startTimeMillis, frt1, frt2, frt3 = getAppServerStartupTime(appServerMachine, username, instanceID, timeline, prober)
     removeForceContainer(host=appServerMachine, username=username, instanceName=containerName)
 
     # return throughput as an array of throughput values for each burst and also the RSS
-    return thrResults, float(rss), float(peakRss), float(cpu/1000.0), startTimeMillis, frt1, frt2, frt3
+    return thrResults, float(rss), float(peakRss), float(cpu/1000.0), startTimeMillis, frt1, frt2, frt3, latencyResults, rampupResults
+
+# Metrics of a run, in the order returned by runBenchmarkOnce(), as recorded in the campaign results log
+campaignMetrics = ("thrPulses", "rss", "peakRss", "compCPU", "startup", "firstResponse1", "firstResponse2", "firstResponse3", "latencyPulses", "rampupPulses")
 
 ####################### runBenchmarksIteratively ##############################
-def runBenchmarkIteratively(numIter, image, javaOpts):
+# With a resultsLog, the iterations of `cell` found in the log are not run again
+def runBenchmarkIteratively(numIter, image, javaOpts, resultsLog=None, cell=None):
     # Initialize stats; 2D array of throughput results
     numPulses = numRepetitionsOneClient + numRepetitions50Clients
     thrResults = [] # List of lists
@@ -842,23 +739,48 @@ def runBenchmarkIteratively(numIter, image, javaOpts):
     firstResponseResults1 = []
     firstResponseResults2 = []
     firstResponseResults3 = []
-
-    # clear SCC if needed (by destroying the SCC volume)
-    if doColdRun:
+    latencyAvgResults = {key: [] for key in loadLatency.latencyKeys} # latency of the last N pulses, for every run
+    rampupCurves = [] # throughput curve of rampupPulse, for every run
+    rampupMetrics = {key: [] for key in rampupAnalyzer.rampupKeys}
+
+    numDone = 0
+    while resultsLog and numDone < numIter and resultsLog.get(cell, numDone) is not None:
+        numDone += 1
+    # clear SCC if needed (by destroying the SCC volume), unless we resume a set
+    if doColdRun and numDone == 0:
         clearSCC(appServerMachine, username)
 
-    useJITServer = ("-XX:+UseJITServer" in javaOpts) or (instantOnRestore and ("-XX:+UseJITServer" in postRestoreOpts))
+    useJITServer = numDone < numIter and (("-XX:+UseJITServer" in javaOpts) or (instantOnRestore and ("-XX:+UseJITServer" in postRestoreOpts)))
     if useJITServer:
         # If the JITServer image has been specifically provided, use that; otherwise use the image for test
         serverImage = JITServerImage if JITServerImage else image
         startJITServer(serverImage)
         time.sleep(2) # Give JITServer some time to start
 
+    sampler = sequentialSampling.SequentialSampler(targetCI95, minRuns)
     for iter in range(numIter):
-        thrList, rss, peakRss, cpu, startupTime, frt1, frt2, frt3 = runBenchmarkOnce(image, javaOpts)
+        metrics = resultsLog.get(cell, iter) if resultsLog else None
+        if metrics is None:
+            metrics = runBenchmarkOnce(image, javaOpts)
+            if resultsLog:
+                resultsLog.append(cell, iter, dict(zip(campaignMetrics, metrics)))
+        else:
+            # Logs written before latencies and rampup curves were recorded have no "latencyPulses"/"rampupPulses"
+            defaults = {"latencyPulses": [loadLatency.emptyLatency() for pulse in range(numPulses)], "rampupPulses": [([], []) for pulse in range(numPulses)]}
+            metrics = [metrics.get(name, defaults.get(name)) for name in campaignMetrics]
+        thrList, rss, peakRss, cpu, startupTime, frt1, frt2, frt3, latencyList, rampupList = metrics
         lastThr = meanLastValues(thrList, numMeasurementTrials) # average for last N pulses
-        print("Run {iter}: Thr={lastThr:6.1f} RSS={rss:6.0f} MB  PeakRSS={peakRss:6.0f} MB  CPU={cpu:6.1f} sec".
-              format(iter=iter, lastThr=lastThr, rss=rss, peakRss=peakRss, cpu=cpu))
+        for key in loadLatency.latencyKeys:
+            latencyAvgResults[key].append(meanLastValues([latency[key] for latency in latencyList], numMeasurementTrials))
+        print("Run {iter}: Thr={lastThr:6.1f} p99={p99:7.2f} ms RSS={rss:6.0f} MB  PeakRSS={peakRss:6.0f} MB  CPU={cpu:6.1f} sec".
+              format(iter=iter, lastThr=lastThr, p99=latencyAvgResults["p99"][-1], rss=rss, peakRss=peakRss, cpu=cpu))
+        analyzedPulse = numRepetitionsOneClient if rampupPulse is None else rampupPulse
+        if analyzedPulse < len(rampupList) and rampupList[analyzedPulse][0]:
+            rampupCurves.append(rampupList[analyzedPulse])
+            rampup = rampupAnalyzer.analyzeRampup(*rampupCurves[-1])
+            for key in rampupAnalyzer.rampupKeys:
+                rampupMetrics[key].append(rampup[key])
+            print("Run {iter} warm-up: {r}".format(iter=iter, r=rampupAnalyzer.formatRampup(rampup)))
         thrResults.append(thrList) # copy all the pulses
         rssResults.append(rss)
         peakRssResults.append(peakRss)
@@ -870,6 +792,11 @@ def runBenchmarkIteratively(numIter, image, javaOpts):
             firstResponseResults2.append(frt2)
         if frt3 > 0:
             firstResponseResults3.append(frt3)
+        sampler.add(lastThr)
+        if adaptiveRuns and sampler.isDone():
+            print(f"Throughput CI95 target reached after {iter+1} runs: {sampler}")
+            numIter = iter + 1
+            break
 
     # print stats
     print(f"\nResults for image: {image} and opts: {javaOpts}")
@@ -899,6 +826,18 @@ def runBenchmarkIteratively(numIter, image, javaOpts):
           format(avgThr=nanmean(thrAvgResults), rss=nanmean(rssResults), peakRss=nanmean(peakRssResults), cpu=nanmean(cpuResults)))
 
     printStats(thrAvgResults, "Thr stats:")
+    for key in loadLatency.latencyKeys:
+        if countNotNan(latencyAvgResults[key]) > 0:
+            printStats(latencyAvgResults[key], f"Latency {key} ms:")
+    if rampupCurves:
+        printStats(rampupMetrics["peak"], "PeakThr stats:")
+        printStats(rampupMetrics["t90"], "Time to 90% sec:")
+        printStats(rampupMetrics["t95"], "Time to 95% sec:")
+        printStats(rampupMetrics["lostSec"], "Warm-up lost sec:")
+        printStats(rampupMetrics["fitTau"], "Warm-up tau sec:")
+        times, thr = rampupAnalyzer.averageCurves(rampupCurves)
+        print("Avg rampup: " + rampupAnalyzer.formatCurve(times, thr))
+        print("Avg rampup warm-up: " + rampupAnalyzer.formatRampup(rampupAnalyzer.analyzeRampup(times, thr)))
     printStats(rssResults, "RSS stats:")
     printStats(peakRssResults, "Peak RSS stats:")
     printStats(cpuResults, "CompCPU stats:")
@@ -913,8 +852,9 @@ def runBenchmarkIteratively(numIter, image, javaOpts):
 
 ############################ MAIN ##################################
 def mainRoutine():
-    if  len(sys.argv) < 2:
-        print ("Program must have an argument: the number of iterations\n")
+    campaign = campaignFile.parseCampaignArgs(sys.argv, axes=("image", "args", "workload"))
+    if  len(sys.argv) < 2 and not campaign:
+        print ("Program must have an argument: the number of iterations, or --campaign <campaign file>\n")
         sys.exit(-1)
 
     cleanup() # Clean-up from a previous possible bad run
@@ -924,10 +864,18 @@ def mainRoutine():
     if doColdRun:
         logging.warning("Will do a cold run before each set")
 
-    for config in configs:
-        runBenchmarkIteratively(numIter=int(sys.argv[1]), image=config["image"], javaOpts=config["args"])
+    if campaign:
+        resultsLog = campaignFile.ResultsLog(campaign["resultsLog"])
+        for cell in campaign["cells"]:
+            campaignFile.applyWorkload(globals(), cell.get("workload"))
+            runBenchmarkIteratively(numIter=campaign["iterations"], image=cell["image"], javaOpts=cell.get("args", ""), resultsLog=resultsLog, cell=cell)
+        resultsLog.close()
+    else:
+        for config in configs:
+            runBenchmarkIteratively(numIter=int(sys.argv[1]), image=config["image"], javaOpts=config["args"])
 
     # Execute final clean-up step
     cleanup()
 
-mainRoutine()
+if __name__ == "__main__": # asyncLoadGen worker processes may import this module
+    mainRoutine()
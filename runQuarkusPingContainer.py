@@ -10,6 +10,10 @@ import shlex, subprocess
 import time # for sleep
 import re # for regular expressions
 import sys # for exit
+import sequentialSampling
+import readinessWatcher
+import loadLatency
+from benchStats import nanmean, computeStats, meanLastValues, countNotNan
 import logging # https://www.machinelearningplus.com/python/python-logging-guide/
 import queue
 from collections import deque
@@ -24,13 +28,16 @@ netOpts = "--network=slirp4netns" if docker == "podman" else "--network=host" #
 
 ################### Benchmark configuration #################
 doColdRun = True
+adaptiveRuns = False # when True stop iterating once the CI95 of the throughput drops below targetCI95; the number of iterations becomes the maximum
+targetCI95 = 2.0 # target half-width of the throughput CI95, as a percentage of the mean
+minRuns = 5 # minimum number of measured iterations when adaptiveRuns is True
 appServerMachine = "9.42.142.176"
 username = "" # for connecting remotely to the SUT; leave empty to connect without ssh
 containerName = "pingperf"
 appServerPort   = "9090"
 cpuLimit        = "--cpuset-cpus=0-7 --cpus=2.0" # --cpuset-mems=0
 memLimit        = "-m=16G"
-delayToStart    = 10 # seconds; waiting for the AppServer to start before checking for valid startup
+startupTimeout  = 30 # maximum seconds to wait for the AppServer to be ready (the container log is followed, see readinessWatcher.py)
 extraDockerOpts = "" # extra options to pass to docker run
 instantOnRestore= False # Set to true to add --cap-add=CHECKPOINT_RESTORE to docker run command
 
@@ -80,91 +87,6 @@ configs = [
 #    {"image":"", "args":""},
 ]
 
-def nanmean(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-    return total/numValidElems if numValidElems > 0 else math.nan
-
-def nanstd(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-
-    if numValidElems == 0:
-        return math.nan
-    if numValidElems == 1:
-        return 0
-    else:
-        mean = total/numValidElems
-        total = 0
-        for i in range(len(myList)):
-            if not math.isnan(myList[i]):
-                total += (myList[i] - mean)**2
-        return math.sqrt(total/(numValidElems-1))
-
-def nanmin(myList):
-    min = math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] < min:
-            min = myList[i]
-    return min
-
-def nanmax(myList):
-    max = -math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] > max:
-            max = myList[i]
-    return max
-
-def tDistributionValue95(degreeOfFreedom):
-    if degreeOfFreedom < 1:
-        return math.nan
-        #import scipy.stats as stats
-        #  stats.t.ppf(0.975, degreesOfFreedom))
-    tValues = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
-               2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
-               2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,]
-    if degreeOfFreedom <= 30:
-        return tValues[degreeOfFreedom-1]
-    else:
-        if degreeOfFreedom <= 60:
-            return 2.042 - 0.001 * (degreeOfFreedom - 30)
-        else:
-            return 1.96
-
-# Confidence intervals tutorial
-# mean +- t * std / sqrt(n)
-# For 95% confidence interval, t = 1.96 if we have many samples
-def meanConfidenceInterval95(myList):
-    n = len(myList)
-    if n <= 1:
-        return math.nan
-    tvalue = tDistributionValue95(n-1)
-    avg, stdDev = nanmean(myList), nanstd(myList)
-    marginOfError = tvalue * stdDev / math.sqrt(n)
-    return 100.0*marginOfError/avg
-
-def computeStats(myList):
-    avg = nanmean(myList)
-    stdDev = nanstd(myList)
-    min = nanmin(myList)
-    max = nanmax(myList)
-    ci95 = meanConfidenceInterval95(myList)
-    return avg, stdDev, min, max, ci95
-
-def meanLastValues(myList, numLastValues):
-    assert numLastValues > 0
-    if numLastValues > len(myList):
-        numLastValues = len(myList)
-    return nanmean(myList[-numLastValues:])
-
 def getMainPIDFromContainer(host, username, instanceID):
     remoteCmd = f"{docker} inspect " + "--format='{{.State.Pid}}' " + instanceID
     cmd = f"ssh {username}@{host} \"{remoteCmd}\"" if username else remoteCmd
@@ -330,29 +252,17 @@ def verifyAppServerInContainerIDStarted(instanceID, host, username):
         logging.warning("AppServer container {instanceID} is not running").format(instanceID=instanceID)
         return False
 
-    remoteCmd = f"{docker} logs --tail=100 {instanceID}"
+    remoteCmd = f"{docker} logs -f {instanceID}"
     cmd = f"ssh {username}@{host} \"{remoteCmd}\"" if username else remoteCmd
     errPattern = re.compile('.+\[ERROR')
     #  pingperf 1.0 on JVM (powered by Quarkus 3.13.2) started in 0.858s. Listening on: http://0.0.0.0:8080'
     readyPattern = re.compile("pingperf .+ started in \d+\.\d+s. Listening on")
-    for iter in range(15):
-        output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
-        liblines = output.splitlines()
-        for line in liblines:
-            m = errPattern.match(line)
-            if m:
-                logging.warning("AppServer container {instanceID} errored while starting: {line}").format(instanceID=instanceID,line=line)
-                return False
-            m1 = readyPattern.search(line)
-            if m1:
-                if logging.root.level <= logging.DEBUG:
-                   print(lines)
-                return True # True means success
-        if logging.root.level <= logging.DEBUG:
-            print(liblines)
-        time.sleep(1) # wait 1 sec and try again
-        logging.warning("Checking again")
-    return False
+    ready, line, readyTime = readinessWatcher.watchCommand(cmd, readyPattern, errPattern, startupTimeout)
+    if not ready:
+        logging.error("AppServer container {instanceID} did not start correctly: {line}".format(instanceID=instanceID, line=line))
+    elif logging.root.level <= logging.INFO:
+        print(line)
+    return ready # True means success
 
 def startAppServerContainer(host, username, instanceName, image, port, cpus, mem, jvmArgs, mountOpts, mongoMachine):
     # vlogs can be created in /tmp/vlogs -v /tmp/vlogs:/tmp/vlogs
@@ -368,7 +278,6 @@ def startAppServerContainer(host, username, instanceName, image, port, cpus, mem
     if logging.root.level <= logging.DEBUG:
         print(lines)
     instanceID = lines[0] # ['2ccae49f3c03af57da27f5990af54df8a81c7ce7f7aace9a834e4c3dddbca97e']
-    time.sleep(delayToStart)
     started = verifyAppServerInContainerIDStarted(instanceID, host, username)
     if not started:
         logging.error(f"AppServer instance {instanceName} from {image} cannot start in the alloted time")
@@ -451,7 +360,7 @@ def cleanup():
 
 def applyLoad(duration, numClients):
     # Run jmeter remotely
-    remoteCmd = f"{wrkAffinity} {wrkExecutable} -t{numClients} -c{numClients} -d{duration} http://{appServerMachine}:{appServerPort}/ping/greeting"
+    remoteCmd = f"{wrkAffinity} {wrkExecutable} --latency -t{numClients} -c{numClients} -d{duration} http://{appServerMachine}:{appServerPort}/ping/greeting"
     cmd = f"ssh {wrkUsername}@{wrkMachine} \"{remoteCmd}\"" if wrkUsername else remoteCmd
     logging.info("Apply load: {cmd}".format(cmd=cmd))
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
@@ -557,25 +466,26 @@ def runPhase(duration, numClients):
 
     output = applyLoad(duration, numClients)
 
-    # Read throughput
+    # Read throughput and latency (wrk runs with --latency)
     thr = getThroughput(output)
+    latency = loadLatency.parseWrkLatency(output.splitlines())
 
-    if logging.root.level <= logging.DEBUG:
-        print("Throughput={thr:7.1f}".format(thr=thr))
+    print("Throughput={thr:7.1f}  Latency: {lat}".format(thr=thr, lat=loadLatency.formatLatency(latency)))
 
-    return thr
+    return thr, latency
 
 def runBenchmarkOnce(image, javaOpts):
     # Will apply load in small bursts
     maxPulses = numRepetitionsOneClient + numRepetitions50Clients
     thrResults = [math.nan for i in range(maxPulses)] # np.full((maxPulses), fill_value=np.nan, dtype=np.float)
+    latencyResults = [loadLatency.emptyLatency() for i in range(maxPulses)] # p50/p90/p99/max for each pulse
     rss, peakRss, cpu = math.nan, math.nan, math.nan
 
     #restoreDatabase(mongoMachine, mongoUsername, mongoImage)
 
     instanceID = startAppServerContainer(host=appServerMachine, username=username, instanceName=containerName, image=image, port=appServerPort, cpus=cpuLimit, mem=memLimit, jvmArgs=javaOpts, mountOpts=mountOpts, mongoMachine=mongoMachine)
     if instanceID is None:
-        return thrResults, rss, peakRss, cpu
+        return thrResults, rss, peakRss, cpu, latencyResults
 
     # We know the app started successfuly
 
@@ -586,7 +496,7 @@ def runBenchmarkOnce(image, javaOpts):
         else:
             cli = 1
             duration = durationOfOneClient
-        thrResults[pulse] = runPhase(duration, cli)
+        thrResults[pulse], latencyResults[pulse] = runPhase(duration, cli)
 
     # Collect RSS at end of run
     serverPID = getMainPIDFromContainer(host=appServerMachine, username=username, instanceID=instanceID)
@@ -601,6 +511,7 @@ def runBenchmarkOnce(image, javaOpts):
     # If there were errors during the run, invalidate throughput results
     if not checkAppServerForErrors(instanceID, appServerMachine, username):
         thrResults = [math.nan for i in range(maxPulses)] #np.full((maxPulses), fill_value=np.nan, dtype=np.float) # Reset any throughput values
+        latencyResults = [loadLatency.emptyLatency() for i in range(maxPulses)]
 
     # stop container and read CompCPU
     rc = stopAppServerByID(appServerMachine, username, instanceID)
@@ -608,7 +519,7 @@ def runBenchmarkOnce(image, javaOpts):
     removeForceContainer(host=appServerMachine, username=username, instanceName=containerName)
 
     # return throughput as an array of throughput values for each burst and also the RSS
-    return thrResults, float(rss), float(peakRss), float(cpu/1000.0)
+    return thrResults, float(rss), float(peakRss), float(cpu/1000.0), latencyResults
 
 ####################### runBenchmarksIteratively ##############################
 def runBenchmarkIteratively(numIter, image, javaOpts):
@@ -618,6 +529,7 @@ def runBenchmarkIteratively(numIter, image, javaOpts):
     rssResults = [] # Just a list
     peakRssResults = []
     cpuResults = []
+    latencyAvgResults = {key: [] for key in loadLatency.latencyKeys} # latency of the last N pulses, for every run
 
     # clear SCC if needed (by destroying the SCC volume)
     if doColdRun:
@@ -628,15 +540,23 @@ def runBenchmarkIteratively(numIter, image, javaOpts):
         startJITServer()
         time.sleep(1) # Give JITServer some time to start
 
+    sampler = sequentialSampling.SequentialSampler(targetCI95, minRuns)
     for iter in range(numIter):
-        thrList, rss, peakRss, cpu = runBenchmarkOnce(image, javaOpts)
+        thrList, rss, peakRss, cpu, latencyList = runBenchmarkOnce(image, javaOpts)
         lastThr = meanLastValues(thrList, numMeasurementTrials) # average for last N pulses
+        for key in loadLatency.latencyKeys:
+            latencyAvgResults[key].append(meanLastValues([latency[key] for latency in latencyList], numMeasurementTrials))
         print("Run {iter}: Thr={lastThr:6.1f} RSS={rss:6.0f} MB  PeakRSS={peakRss:6.0f} MB  CPU={cpu:6.1f} sec".
               format(iter=iter, lastThr=lastThr, rss=rss, peakRss=peakRss, cpu=cpu))
         thrResults.append(thrList) # copy all the pulses
         rssResults.append(rss)
         peakRssResults.append(peakRss)
         cpuResults.append(cpu)
+        sampler.add(lastThr)
+        if adaptiveRuns and sampler.isDone():
+            print(f"Throughput CI95 target reached after {iter+1} runs: {sampler}")
+            numIter = iter + 1
+            break
 
     # print stats
     print(f"\nResults for image: {image} and opts: {javaOpts}")
@@ -665,19 +585,26 @@ def runBenchmarkIteratively(numIter, image, javaOpts):
     print("\tAvg={avgThr:7.1f}  RSS={rss:7.0f} MB  PeakRSS={peakRss:7.0f} MB  CPU={cpu:7.1f} sec".
           format(avgThr=nanmean(thrAvgResults), rss=nanmean(rssResults), peakRss=nanmean(peakRssResults), cpu=nanmean(cpuResults)))
 
-    avg, stdDev, min, max, ci95 = computeStats(thrAvgResults)
+    avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(thrAvgResults)
     print("Thr stats:      Avg={avg:7.1f}  StdDev={stdDev:7.1f}  Min={min:7.1f}  Max={max:7.1f}  Max/Min={maxmin:7.1f} CI95={ci95:7.1f}%".
                         format(avg=avg, stdDev=stdDev, min=min, max=max, maxmin=max/min, ci95=ci95))
 
-    avg, stdDev, min, max, ci95 = computeStats(rssResults)
+    # Latency stats (p50/p90/p99/max from wrk --latency); skipped when wrk printed no latency distribution
+    for key in loadLatency.latencyKeys:
+        if countNotNan(latencyAvgResults[key]) > 0:
+            avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(latencyAvgResults[key])
+            print("Latency {key:4s}ms: Avg={avg:7.2f}  StdDev={stdDev:7.2f}  Min={min:7.2f}  Max={max:7.2f}  Max/Min={maxmin:7.1f} CI95={ci95:7.1f}%".
+                  format(key=key, avg=avg, stdDev=stdDev, min=min, max=max, maxmin=max/min, ci95=ci95))
+
+    avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(rssResults)
     print("RSS stats:      Avg={avg:7.1f}  StdDev={stdDev:7.1f}  Min={min:7.1f}  Max={max:7.1f}  Max/Min={maxmin:7.1f} CI95={ci95:7.1f}%".
                         format(avg=avg, stdDev=stdDev, min=min, max=max, maxmin=max/min, ci95=ci95))
 
-    avg, stdDev, min, max, ci95 = computeStats(peakRssResults)
+    avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(peakRssResults)
     print("Peak RSS stats: Avg={avg:7.1f}  StdDev={stdDev:7.1f}  Min={min:7.1f}  Max={max:7.1f}  Max/Min={maxmin:7.1f} CI95={ci95:7.1f}%".
                         format(avg=avg, stdDev=stdDev, min=min, max=max, maxmin=max/min, ci95=ci95))
 
-    avg, stdDev, min, max, ci95 = computeStats(cpuResults)
+    avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(cpuResults)
     print("CompCPU stats:  Avg={avg:7.1f}  StdDev={stdDev:7.1f}  Min={min:7.1f}  Max={max:7.1f}  Max/Min={maxmin:7.1f} CI95={ci95:7.1f}%".
                         format(avg=avg, stdDev=stdDev, min=min, max=max, maxmin=max/min, ci95=ci95))
     if useJITServer:
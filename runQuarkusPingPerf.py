@@ -10,6 +10,11 @@ import re # for regular expressions
 import shlex, subprocess
 import signal
 import sys # for number of arguments
+import sequentialSampling
+import readinessWatcher
+import smapsFootprint
+import loadLatency
+from benchStats import nanmean, computeStats, meanLastValues, countNotNan
 import time # for sleep
 
 
@@ -22,6 +27,9 @@ netOpts = "--network=slirp4netns" if docker == "podman" else "" # for podman we
 ################### Benchmark configuration #################
 doColdRun          = False # when True we clear the SCC before the first run. Set it to False for embedded SCC
 doOnlyColdRuns     = False # when True we run only the cold runs (doColdRun flag is ignored)
+adaptiveRuns       = False # when True stop iterating once the CI95 of the throughput drops below targetCI95; the number of iterations becomes the maximum
+targetCI95         = 2.0 # target half-width of the throughput CI95, as a percentage of the mean
+minRuns            = 5 # minimum number of measured iterations when adaptiveRuns is True
 AppServerHost      = "localhost" # the host where the app server is running from the point of view of the JMeter/wrk machine
 AppServerPort      = 9090
 AppServerLocation  = "/team/mpirvu/QuarkusGary/quarkus-exp/pingPerf"
@@ -29,9 +37,10 @@ applicationName    = "target/quarkus-app/quarkus-run.jar"
 QuarkusOpts        = f"-Dquarkus.thread-pool.core-threads=2 -Dquarkus.thread-pool.max-threads=2 -Dquarkus.http.port={AppServerPort} -Dquarkus.http.host=0.0.0.0 -Djava.util.logging.manager=org.jboss.logmanager.LogManager" # additional options for Quarkus
 AppServerAffinity  = "numactl --physcpubind=2,3"
 logFile            = f"{AppServerLocation}/quarkus.log"
-startupWaitTime    = 5 # seconds to wait before checking to see if AppServer is up
+startupWaitTime    = 30 # maximum seconds to wait for the AppServer to be ready (the log is followed, see readinessWatcher.py)
 
 memAnalysis = False # Collect javacores and smaps for memory analysis
+smapsSummaryEveryIteration = False # Log the RSS of each type of memory mapping (see smapsFootprint.py) at the end of every iteration
 dirForMemAnalysisFiles = "/tmp"
 extraArgsForMemAnalysis = f" -Dcom.ibm.dbgmalloc=true -Xdump:none -Xdump:system:events=user,file={dirForMemAnalysisFiles}/core.%pid.%seq.dmp -Xdump:java:events=user,file={dirForMemAnalysisFiles}/javacore.%pid.%seq.txt"
 # For collection of profiles, -Xjit:perfTool may need to be added to the OpenJ9 command line
@@ -83,106 +92,6 @@ jdks = [
     "/team/mpirvu/sdks/OpenJDK17U-jre_x64_linux_hotspot_17.0.11_9",
 ]
 
-def count_not_nan(myList):
-    total = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += 1
-    return total
-
-def nanmean(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-    return total/numValidElems if numValidElems > 0 else math.nan
-
-
-def nanstd(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-
-    if numValidElems == 0:
-        return math.nan
-    if numValidElems == 1:
-        return 0
-    else:
-        mean = total/numValidElems
-        total = 0
-        for i in range(len(myList)):
-            if not math.isnan(myList[i]):
-                total += (myList[i] - mean)**2
-        return math.sqrt(total/(numValidElems-1))
-
-
-def nanmin(myList):
-    min = math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] < min:
-            min = myList[i]
-    return min
-
-
-def nanmax(myList):
-    max = -math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] > max:
-            max = myList[i]
-    return max
-
-
-def tDistributionValue95(degreeOfFreedom):
-    if degreeOfFreedom < 1:
-        return math.nan
-        #import scipy.stats as stats
-        #  stats.t.ppf(0.975, degreesOfFreedom))
-    tValues = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
-               2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
-               2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,]
-    if degreeOfFreedom <= 30:
-        return tValues[degreeOfFreedom-1]
-    else:
-        if degreeOfFreedom <= 60:
-            return 2.042 - 0.001 * (degreeOfFreedom - 30)
-        else:
-            return 1.96
-
-# Confidence intervals tutorial
-# mean +- t * std / sqrt(n)
-# For 95% confidence interval, t = 1.96 if we have many samples
-def meanConfidenceInterval95(myList):
-    n = len(myList)
-    if n <= 1:
-        return math.nan
-    tvalue = tDistributionValue95(n-1)
-    avg, stdDev = nanmean(myList), nanstd(myList)
-    marginOfError = tvalue * stdDev / math.sqrt(n)
-    return 100.0*marginOfError/avg
-
-
-def computeStats(myList):
-    avg = nanmean(myList)
-    stdDev = nanstd(myList)
-    min = nanmin(myList)
-    max = nanmax(myList)
-    ci95 = meanConfidenceInterval95(myList)
-    numValues = count_not_nan(myList)
-    return avg, stdDev, min, max, ci95, numValues
-
-
-def meanLastValues(myList, numLastValues):
-    assert numLastValues > 0
-    if numLastValues > len(myList):
-        numLastValues = len(myList)
-    return nanmean(myList[-numLastValues:])
-
-
 def getJavaProcesses():
     cmd = "ps -eo pid,cmd --no-headers"
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
@@ -246,6 +155,13 @@ def collectJavacoreAndSmaps(javaPID):
     collectSmaps(javaPID)
 
 
+def logSmapsSummary(javaPID):
+    try:
+        logging.info("RSS per mapping type (MB): " + smapsFootprint.formatRssSummary(javaPID))
+    except IOError as ioe:
+        logging.warning("Cannot read smaps for javaPID {javaPID}: {msg}".format(javaPID=javaPID, msg=str(ioe)))
+
+
 """
 Find the main compilation thread ID of an OpenJ9 JVM process
 The JVM can have multiple compilation threads; in this case we will
@@ -339,30 +255,16 @@ def clearSCC(jdk, sccDestroyParams):
     # TODO: make sure the SCC does not exist anymore
 
 
-def verifyAppserverStarted():
+def verifyAppserverStarted(logWatcher, childProcess):
     logging.info("Verify app server started")
     #[5/3/23, 8:27:25:850 PDT] 0000002a com.ibm.ws.kernel.feature.internal.FeatureManager   A CWWKF0011I: The crudserver server is ready to run a smarter planet. The crudserver server started in 48.607 seconds.
     # Look for "server is ready to run a smarter planet" in messages.log
     errPattern = re.compile('.+\[ERROR')
     readyPattern = re.compile("pingperf .+ started in \d+\.\d+s. Listening on")
-    for iter in range(20):
-        try:
-            with open(logFile) as f:
-                for line in f:
-                    print(line)
-                    m = errPattern.search(line)
-                    if m:
-                        logging.warning("AppServer {applicationName} errored while starting:\n\t {line}").format(applicationName=applicationName,line=line)
-                        return False
-                    m1 = readyPattern.search(line)
-                    if m1:
-                        return True # True means success
-        except IOError:
-            print("Could not open file", logFile)
-            return False
-        logging.warning("sleeping 1 sec and trying again")
-        time.sleep(1) # wait 1 sec and try again
-    return False # False means failure
+    ready, line, readyTime = logWatcher.wait(readyPattern, errPattern, startupWaitTime, isAlive=lambda: childProcess.poll() is None)
+    if not ready:
+        logging.warning("AppServer {applicationName} did not start correctly: {line}".format(applicationName=applicationName, line=line))
+    return ready # True means success
 
 
 def killAppServerIfRunning(childProcess):
@@ -384,15 +286,15 @@ def startAppServer(jdk, jvmArgs):
     myEnv["QUARKUS_LOG_FILE_ENABLE"] = "true"
     myEnv["QUARKUS_LOG_FILE_FORMAT"] = "%d{yyyy-MM-dd HH:mm:ss,SSS} %-5p [%c{3.}] (%t) %s%e%n"
     # Also useful:  QUARKUS_LOG_FILE_PATH, otherwise use ./quarkus.log
+    logWatcher = readinessWatcher.LogFileWatcher(logFile) # only the lines written by this AppServer count
     # Fork a process and run in background
     childProcess = subprocess.Popen(shlex.split(cmd), env=myEnv, universal_newlines=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    logging.debug(f"Waiting for {startupWaitTime} sec for the AppServer to start")
-    time.sleep(startupWaitTime)
+    logging.debug(f"Waiting up to {startupWaitTime} sec for the AppServer to start")
     startOK = False
     if childProcess.poll() is None: # It's running
         logging.debug("AppServer started with pid {pid}".format(pid=childProcess.pid))
         # Verify that server started correctly
-        startOK = verifyAppserverStarted()
+        startOK = verifyAppserverStarted(logWatcher, childProcess)
         if not startOK:
             logging.error("AppServer did not start correctly")
             outs, errs = childProcess.communicate(timeout=15)
@@ -479,7 +381,7 @@ def stopJITServer(jitServerProcess):
 
 def applyLoad(duration, numClients):
     # Run jmeter remotely
-    remoteCmd = f"{wrkAffinity} {wrkExecutable} -t{numClients} -c{numClients} -d{duration} http://{AppServerHost}:{AppServerPort}/ping/greeting"
+    remoteCmd = f"{wrkAffinity} {wrkExecutable} --latency -t{numClients} -c{numClients} -d{duration} http://{AppServerHost}:{AppServerPort}/ping/greeting"
     cmd = f"ssh {wrkUsername}@{wrkMachine} \"{remoteCmd}\"" if wrkUsername else remoteCmd
     logging.info("Apply load: {cmd}".format(cmd=cmd))
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
@@ -512,13 +414,13 @@ def runPhase(duration, numClients):
 
     output = applyLoad(duration, numClients)
 
-    # Read throughput
+    # Read throughput and latency (wrk runs with --latency)
     thr = getThroughput(output)
+    latency = loadLatency.parseWrkLatency(output.splitlines())
 
-    if logging.root.level <= logging.DEBUG:
-        print("Throughput={thr:7.1f}".format(thr=thr))
+    print("Throughput={thr:7.1f}  Latency: {lat}".format(thr=thr, lat=loadLatency.formatLatency(latency)))
 
-    return thr
+    return thr, latency
 
 
 def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
@@ -529,15 +431,15 @@ def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
     # Will apply load in small bursts
     maxPulses = numRepetitionsOneClient + numRepetitions50Clients
     thrResults = [math.nan for i in range(maxPulses)] # np.full((maxPulses), fill_value=np.nan, dtype=np.float)
+    latencyResults = [loadLatency.emptyLatency() for i in range(maxPulses)] # p50/p90/p99/max for each pulse
     rss, peakRss, cpu, startupTime = math.nan, math.nan, math.nan, math.nan
-    peakThroughput = math.nan
 
     crtTime = datetime.datetime.now()
     startTimeMs = (crtTime.minute * 60 + crtTime.second)*1000 + crtTime.microsecond//1000
 
     childProcess = startAppServer(jdk=jdk, jvmArgs=jvmArgs)
     if childProcess is None: # Failed to start properly
-        return thrResults, peakThroughput, rss, peakRss, cpu, startupTime
+        return thrResults, rss, peakRss, cpu, startupTime, latencyResults
 
     # Compute AppServer start-up time
     startupTime = getStartupTime(startTimeMs)
@@ -548,7 +450,6 @@ def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
         else:
             logging.error("Failed to start JIT perf profiling because Java process has terminated")
 
-    peakThroughput = 0
     for pulse in range(maxPulses):
         # Determine run characteristics
         if pulse >= numRepetitionsOneClient:
@@ -564,13 +465,15 @@ def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
             else:
                 logging.error("Failed to start JVM perf profiling because Java process has terminated")
 
-        thrResults[pulse] = runPhase(duration, cli)
+        thrResults[pulse], latencyResults[pulse] = runPhase(duration, cli)
 
         logging.info("Throughput={thr}".format(thr=thrResults[pulse]))
 
     # Collect RSS at end of run
     if childProcess.poll() is None: # Still running
         rss, peakRss = getRss(pid=childProcess.pid)
+        if smapsSummaryEveryIteration:
+            logSmapsSummary(childProcess.pid)
 
         if doMemAnalysis:
             logging.info("Generating javacore, core and smaps for process {pid}".format(pid=childProcess.pid))
@@ -585,7 +488,7 @@ def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
     cpu = getCompCPU(childProcess)
 
     # return throughput as an array of throughput values for each burst and also the RSS, PeakRSS and CPU
-    return thrResults, rss, peakRss, cpu, startupTime
+    return thrResults, rss, peakRss, cpu, startupTime, latencyResults
 
 
 def runBenchmarkIteratively(numIter, jdk, javaOpts):
@@ -595,6 +498,7 @@ def runBenchmarkIteratively(numIter, jdk, javaOpts):
     rssResults = [] # Just a list
     cpuResults = []
     startupResults = []
+    latencyAvgResults = {key: [] for key in loadLatency.latencyKeys} # latency of the last N pulses, for every run
 
     # clear SCC if needed (by destroying the SCC volume)
     if doColdRun or doOnlyColdRuns:
@@ -603,21 +507,29 @@ def runBenchmarkIteratively(numIter, jdk, javaOpts):
     # Start JITServer if needed
     jitServerHandle = startJITServer(jdk) if "-XX:+UseJITServer" in javaOpts else None
 
+    startIter = 0 if (doOnlyColdRuns or not doColdRun) else 1
+    sampler = sequentialSampling.SequentialSampler(targetCI95, minRuns)
     for iter in range(numIter):
         # if memAnalysis is True, add the options required for memory analysis, but only for the last iteration
         doMemAnalysis = memAnalysis and iter == numIter - 1
         if doMemAnalysis:
             javaOpts = javaOpts + extraArgsForMemAnalysis
-        thrList, rss, peakRss, cpu, startupTime = runBenchmarkOnce(jdk, javaOpts, doMemAnalysis)
+        thrList, rss, peakRss, cpu, startupTime, latencyList = runBenchmarkOnce(jdk, javaOpts, doMemAnalysis)
         lastThr = meanLastValues(thrList, numMeasurementTrials) # average for last N pulses
+        for key in loadLatency.latencyKeys:
+            latencyAvgResults[key].append(meanLastValues([latency[key] for latency in latencyList], numMeasurementTrials))
         print(f"Run {iter}: Thr={lastThr:6.1f} RSS={rss:6.1f} MB  PeakRSS={peakRss:6.1f} MB  CPU={cpu:4.1f} sec  Startup={startupTime:5.0f}".
               format(lastThr=lastThr, rss=rss, peakRss=peakRss, cpu=cpu, startupTime=startupTime), flush=True)
         thrResults.append(thrList) # copy all the pulses
         rssResults.append(rss)
         cpuResults.append(cpu)
         startupResults.append(startupTime)
-
-    startIter = 0 if (doOnlyColdRuns or not doColdRun) else 1
+        if iter >= startIter:
+            sampler.add(lastThr)
+        if adaptiveRuns and sampler.isDone():
+            print(f"Throughput CI95 target reached after {iter+1} runs: {sampler}")
+            numIter = iter + 1
+            break
 
     # print stats
     print(f"\nResults for jdk: {jdk} and opts: {javaOpts}")
@@ -648,19 +560,25 @@ def runBenchmarkIteratively(numIter, jdk, javaOpts):
     print("\tThr={avgThr:7.1f}  RSS={rss:7.0f} MB  CompCPU={cpu:5.1f} sec  Startup={startup:5.0f} ms".
           format(avgThr=nanmean(thrAvgResults[startIter:]), rss=nanmean(rssResults[startIter:]), cpu=nanmean(cpuResults[startIter:]), startup=nanmean(startupResults[startIter:])))
     # Throughput stats
-    avg, stdDev, min, max, ci95, numSamples = computeStats(thrAvgResults[startIter:])
+    avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(thrAvgResults[startIter:])
     print("Throughput stats: Avg={avg:7.1f}  StdDev={stdDev:7.1f}  Min={min:7.1f}  Max={max:7.1f}  Max/Min={maxmin:4.0f}% CI95={ci95:7.1f}% numSamples={numSamples:3d}".
                         format(avg=avg, stdDev=stdDev, min=min, max=max, maxmin=(max-min)*100.0/min, ci95=ci95, numSamples=numSamples))
+    # Latency stats (p50/p90/p99/max from wrk --latency); skipped when wrk printed no latency distribution
+    for key in loadLatency.latencyKeys:
+        if countNotNan(latencyAvgResults[key][startIter:]) > 0:
+            avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(latencyAvgResults[key][startIter:])
+            print("Latency {key:4s} ms:  Avg={avg:7.2f}  StdDev={stdDev:7.2f}  Min={min:7.2f}  Max={max:7.2f}  Max/Min={maxmin:4.0f}% CI95={ci95:7.1f}% numSamples={numSamples:3d}".
+                  format(key=key, avg=avg, stdDev=stdDev, min=min, max=max, maxmin=max/min, ci95=ci95, numSamples=numSamples))
     # Footprint stats
-    avg, stdDev, min, max, ci95, numSamples = computeStats(rssResults[startIter:])
+    avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(rssResults[startIter:])
     print("Footprint stats:  Avg={avg:7.1f}  StdDev={stdDev:7.1f}  Min={min:7.1f}  Max={max:7.1f}  Max/Min={maxmin:4.0f}% CI95={ci95:7.1f}% numSamples={numSamples:3d}".
                         format(avg=avg, stdDev=stdDev, min=min, max=max, maxmin=(max-min)*100.0/min, ci95=ci95, numSamples=numSamples))
     # CompCPU stats
-    avg, stdDev, min, max, ci95, numSamples = computeStats(cpuResults[startIter:])
+    avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(cpuResults[startIter:])
     print("Comp CPU stats:   Avg={avg:7.1f}  StdDev={stdDev:7.1f}  Min={min:7.1f}  Max={max:7.1f}  Max/Min={maxmin:4.0f}% CI95={ci95:7.1f}% numSamples={numSamples:3d}".
                         format(avg=avg, stdDev=stdDev, min=min, max=max, maxmin=(max-min)*100.0/min, ci95=ci95, numSamples=numSamples))
     # Start-up stats
-    avg, stdDev, min, max, ci95, numSamples = computeStats(startupResults[startIter:])
+    avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(startupResults[startIter:])
     print("StartupTime stats:Avg={avg:7.1f}  StdDev={stdDev:7.1f}  Min={min:7.1f}  Max={max:7.1f}  Max/Min={maxmin:4.0f}% CI95={ci95:7.1f}% numSamples={numSamples:3d}".
                         format(avg=avg, stdDev=stdDev, min=min, max=max, maxmin=(max-min)*100.0/min, ci95=ci95, numSamples=numSamples))
 
@@ -688,4 +606,3 @@ for jvmOpts in jvmOptions:
     for jdk in jdks:
         runBenchmarkIteratively(numIter=int(sys.argv[1]), jdk=jdk, javaOpts=jvmOpts)
 
-
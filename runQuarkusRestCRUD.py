@@ -1,6 +1,7 @@
 # Python script to run RestCRUD app in Quarkus
 # Quarkus is not run in containers. The script should be run on the same machine as the app server
 # postgres and JMeter are run in containers. Both docker and podman should work.
+# Usage: python3 runQuarkusRestCRUD.py numIterations   or   python3 runQuarkusRestCRUD.py --campaign campaign.json (see campaignFile.py)
 
 import datetime # for datetime.datetime.now()
 import logging # https://www.machinelearningplus.com/python/python-logging-guide/
@@ -8,8 +9,14 @@ import math
 import os # for environment variables
 import re # for regular expressions
 import shlex, subprocess
-import statistics
 import sys # for number of arguments
+import sequentialSampling
+import readinessWatcher
+import smapsFootprint
+import campaignScheduler
+import campaignFile
+import loadLatency
+from benchStats import nanmean, countNotNan, computeStats, meanLastValues
 import time # for sleep
 from collections import deque
 
@@ -23,6 +30,11 @@ netOpts = "--network=slirp4netns" if docker == "podman" else "" # for podman we
 ################### Benchmark configuration #################
 doColdRun          = False # when True we clear the SCC before the first run. Set it to False for embedded SCC
 doOnlyColdRuns     = False # when True we run only the cold runs (doColdRun flag is ignored)
+adaptiveRuns       = False # when True stop iterating once the CI95 of the throughput drops below targetCI95; the number of iterations becomes the maximum
+targetCI95         = 2.0 # target half-width of the throughput CI95, as a percentage of the mean
+minRuns            = 5 # minimum number of measured iterations when adaptiveRuns is True
+campaignSchedule   = "sequential" # "sequential" runs all iterations of a configuration before the next one; "roundRobin" or "randomBlocks" interleave the configurations (adaptiveRuns and memAnalysis are not used then)
+campaignSeed       = None # seed for the "randomBlocks" schedule
 AppServerHost      = "localhost" # the host where the app server is running from the point of view of the JMeter machine
 AppServerPort      = 9090
 AppServerLocation  = "/team/mpirvu/Quarkus-restcrud-Joe/restCrud-main"
@@ -30,9 +42,10 @@ applicationName    = "target/quarkus-app/quarkus-run.jar"
 AppServerAffinity  = "numactl --physcpubind=2,3"
 AppServerOpts      = f"-Dquarkus.thread-pool.core-threads=8 -Dquarkus.thread-pool.max-threads=8 -Dquarkus.http.port={AppServerPort} -Dquarkus.http.host=0.0.0.0 -Djava.util.logging.manager=org.jboss.logmanager.LogManager" # additional options for Quarkus
 logFile            = f"{AppServerLocation}/quarkus.log" # Enabled by setting QUARKUS_LOG_FILE_ENABLE
-startupWaitTime    = 10 # seconds to wait before checking to see if AppServer is up
+startupWaitTime    = 30 # maximum seconds to wait for the AppServer to be ready (the log is followed, see readinessWatcher.py)
 
 memAnalysis = False # Collect javacores and smaps for memory analysis
+smapsSummaryEveryIteration = False # Log the RSS of each type of memory mapping (see smapsFootprint.py) at the end of every iteration
 dirForMemAnalysisFiles = "/tmp"
 extraArgsForMemAnalysis = f" -Dcom.ibm.dbgmalloc=true -Xdump:none -Xdump:system:events=user,file={dirForMemAnalysisFiles}/core.%pid.%seq.dmp -Xdump:java:events=user,file={dirForMemAnalysisFiles}/javacore.%pid.%seq.txt"
 # For collection of profiles, -Xjit:perfTool may need to be added to the OpenJ9 command line
@@ -64,6 +77,8 @@ jmeterContainerName = "jmeter"
 jmeterAffinity      = "--cpuset-cpus 16-19"
 jmeterNetOpts       = "--net=host"
 printRampup         =  False # If True, print all JMeter throughput values to plot rampup curve
+jmeterJTLOpts       = "" # docker options that make the JMeter image write a JTL file, e.g. "-v /tmp/jtl:/jtl -e JRESULTS=/jtl/results.jtl"
+jmeterJTLFile       = "" # The JTL file on jmeterMachine, e.g. "/tmp/jtl/results.jtl"; leave empty to skip the latency percentiles
 
 ################ Load CONFIG ###############
 numRepetitionsOneClient = 0
@@ -100,145 +115,6 @@ jdks = [
     "/team/mpirvu/Build/FullJava17/openj9-openjdk-jdk17/build/linux-x86_64-server-release/images/jdk",
 ]
 
-def count_not_nan(myList):
-    total = 0
-    for elem in myList:
-        if not math.isnan(elem):
-            total += 1
-    return total
-
-def nanmean(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-    return total/numValidElems if numValidElems > 0 else math.nan
-
-
-def nanstd(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-
-    if numValidElems == 0:
-        return math.nan
-    if numValidElems == 1:
-        return 0
-    else:
-        mean = total/numValidElems
-        total = 0
-        for i in range(len(myList)):
-            if not math.isnan(myList[i]):
-                total += (myList[i] - mean)**2
-        return math.sqrt(total/(numValidElems-1))
-
-
-def nanmin(myList):
-    min = math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] < min:
-            min = myList[i]
-    return min
-
-
-def nanmax(myList):
-    max = -math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] > max:
-            max = myList[i]
-    return max
-
-'''
-Given an input list of values, eliminate all NaNs and return a new list
-'''
-def eliminateNans(myList):
-    return [value for value in myList if not math.isnan(value)]
-
-
-'''
-Receives an array reference with results.
-We compute the lower and and upper quartile, then compute the interquartile
-range (IQR=Q3-Q1) and the lower (Q1 - 1.5*IQR) and upper (Q3 + 1.5*IQR) fences.
-The two fences are returned to the caller in an array with 2 elements.
-Needs at least 4 data points
-'''
-def computeOutlierFences(myList):
-    Q1, Q2, Q3 = statistics.quantiles(myList, n = 4, method='inclusive')
-    # Compute the interquartile range
-    IQR = Q3 - Q1
-    lowerFence = Q1 - 3 * IQR
-    upperFence  = Q3 + 3 * IQR
-    return (lowerFence, upperFence)
-
-def tDistributionValue95(degreeOfFreedom):
-    if degreeOfFreedom < 1:
-        return math.nan
-        #import scipy.stats as stats
-        #  stats.t.ppf(0.975, degreesOfFreedom))
-    tValues = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
-               2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
-               2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,]
-    if degreeOfFreedom <= 30:
-        return tValues[degreeOfFreedom-1]
-    else:
-        if degreeOfFreedom <= 60:
-            return 2.042 - 0.0014 * (degreeOfFreedom - 30)
-        else:
-            return 1.96
-
-# Confidence intervals tutorial
-# mean +- t * std / sqrt(n)
-# For 95% confidence interval, t = 1.96 if we have many samples
-def meanConfidenceInterval95(myList):
-    n = len(myList)
-    if n <= 1:
-        return math.nan
-    tvalue = tDistributionValue95(n-1)
-    avg, stdDev = nanmean(myList), nanstd(myList)
-    marginOfError = tvalue * stdDev / math.sqrt(n)
-    return 100.0*marginOfError/avg
-
-
-def computeStats(myList, eliminateOutliers=False):
-    newList = eliminateNans(myList)
-    if len(newList) < 1:
-        return math.nan, math.nan, math.nan, math.nan, math.nan, 0, []
-    # Eliminate outliers
-    outlierList = []
-    goodValuesList = []
-    if eliminateOutliers and len(newList) > 3:
-        lowerFence, upperFence = computeOutlierFences(newList)
-        for val in newList:
-            if val < lowerFence or val > upperFence:
-                outlierList.append(val)
-            else:
-                goodValuesList.append(val)
-    else:
-        goodValuesList = newList
-    avg = statistics.fmean(goodValuesList)
-    stdDev = statistics.stdev(goodValuesList) if len(myList) > 1 else 0
-    minVal = min(goodValuesList)
-    maxVal = max(goodValuesList)
-    numSamples = len(goodValuesList)
-    tvalue = tDistributionValue95(numSamples-1)
-    marginOfError = tvalue * stdDev / math.sqrt(numSamples)
-    ci95 = 100.0*marginOfError/avg
-
-    return avg, stdDev, minVal, maxVal, ci95, numSamples, outlierList
-
-
-def meanLastValues(myList, numLastValues):
-    assert numLastValues > 0
-    if numLastValues > len(myList):
-        numLastValues = len(myList)
-    return nanmean(myList[-numLastValues:])
-
-
 def getJavaProcesses():
     cmd = "ps -eo pid,cmd --no-headers"
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
@@ -336,6 +212,13 @@ def collectJavacoreAndSmaps(javaPID):
     collectSmaps(javaPID)
 
 
+def logSmapsSummary(javaPID):
+    try:
+        logging.info("RSS per mapping type (MB): " + smapsFootprint.formatRssSummary(javaPID))
+    except IOError as ioe:
+        logging.warning("Cannot read smaps for javaPID {javaPID}: {msg}".format(javaPID=javaPID, msg=str(ioe)))
+
+
 """
 Find the main compilation thread ID of an OpenJ9 JVM process
 The JVM can have multiple compilation threads; in this case we will
@@ -429,29 +312,15 @@ def clearSCC(jdk, sccDestroyParams):
     # TODO: make sure the SCC does not exist anymore
 
 
-def verifyAppserverStarted():
+def verifyAppserverStarted(logWatcher, childProcess):
     # 2025-11-13 15:56:41,476 INFO  [io.quarkus] (main) rest-crud 1.0 on JVM (powered by Quarkus 3.20.3) started in 3.882s. Listening on: http://0.0.0.0:9090
     # Look for "rest-crud .... started in"
     errPattern = re.compile('.+\[ERROR')
     readyPattern = re.compile(".+rest-crud.+ started in (\d+\.\d+)s. Listening on")
-    for iter in range(20):
-        try:
-            with open(logFile) as f:
-                for line in f:
-                    print(line)
-                    m = errPattern.match(line)
-                    if m:
-                        logging.warning("AppServer {applicationName} errored while starting:\n\t {line}").format(applicationName=applicationName,line=line)
-                        return False
-                    m1 = readyPattern.match(line)
-                    if m1:
-                        return True # True means success
-        except IOError:
-            print("Could not open file", logFile)
-            return False
-        logging.warning("sleeping 1 sec and trying again")
-        time.sleep(1) # wait 1 sec and try again
-    return False # False means failure
+    ready, line, readyTime = logWatcher.wait(readyPattern, errPattern, startupWaitTime, isAlive=lambda: childProcess.poll() is None)
+    if not ready:
+        logging.warning("AppServer {applicationName} did not start correctly: {line}".format(applicationName=applicationName, line=line))
+    return ready # True means success
 
 
 def killAppServerIfRunning(childProcess):
@@ -476,15 +345,15 @@ def startAppServer(jdk, jvmArgs):
     myEnv["QUARKUS_LOG_FILE_FORMAT"] = "%d{yyyy-MM-dd HH:mm:ss,SSS} %-5p [%c{3.}] (%t) %s%e%n"
     # Also useful:  QUARKUS_LOG_FILE_PATH, otherwise use ./quarkus.log
 
+    logWatcher = readinessWatcher.LogFileWatcher(logFile) # only the lines written by this AppServer count
     # Fork a process and run in background
     childProcess = subprocess.Popen(shlex.split(cmd), env=myEnv, universal_newlines=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    logging.debug(f"Waiting for {startupWaitTime} sec for the AppServer to start")
-    time.sleep(startupWaitTime)
+    logging.debug(f"Waiting up to {startupWaitTime} sec for the AppServer to start")
     startOK = False
     if childProcess.poll() is None: # It's running
         logging.debug("AppServer started with pid {pid}".format(pid=childProcess.pid))
         # Verify that server started correctly
-        startOK = verifyAppserverStarted()
+        startOK = verifyAppserverStarted(logWatcher, childProcess)
         if not startOK:
             logging.error("AppServer did not start correctly")
             outs, errs = childProcess.communicate(timeout=15)
@@ -586,8 +455,12 @@ def stopJITServer(jitServerProcess):
             stderrFile.write(stderr)
 
 def applyLoad(duration, numClients):
+    if jmeterJTLFile: # JMeter appends to an existing JTL file
+        remoteCmd = f"rm -f {jmeterJTLFile}"
+        cmd = f"ssh {jmeterUsername}@{jmeterMachine} \"{remoteCmd}\"" if jmeterUsername else remoteCmd
+        subprocess.run(shlex.split(cmd), check=False)
     # Run jmeter remotely
-    remoteCmd = f"{docker} run -d {jmeterNetOpts} {jmeterAffinity} -e JTHREAD={numClients} -e JDURATION={duration} -e JHOST={AppServerHost} -e JPORT={AppServerPort} --name {jmeterContainerName} {jmeterImage}"
+    remoteCmd = f"{docker} run -d {jmeterNetOpts} {jmeterAffinity} -e JTHREAD={numClients} -e JDURATION={duration} -e JHOST={AppServerHost} -e JPORT={AppServerPort} {jmeterJTLOpts} --name {jmeterContainerName} {jmeterImage}"
     cmd = f"ssh {jmeterUsername}@{jmeterMachine} \"{remoteCmd}\"" if jmeterUsername else remoteCmd
     logging.info("Apply load: {cmd}".format(cmd=cmd))
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
@@ -655,6 +528,23 @@ def getThroughput():
         logging.error("JMeter Errors: {n}".format(n=errs))
     return throughput, elapsedTime, peakThr, errs
 
+'''
+Latency percentiles of the last JMeter pulse, streamed from the JTL file on the JMeter machine
+'''
+def getLatencyJMeter():
+    remoteCmd = f"cat {jmeterJTLFile}"
+    cmd = f"ssh {jmeterUsername}@{jmeterMachine} \"{remoteCmd}\"" if jmeterUsername else remoteCmd
+    process = subprocess.Popen(shlex.split(cmd), universal_newlines=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        histogram, numErrors = loadLatency.parseJTL(process.stdout)
+    except ValueError as e:
+        logging.warning("Cannot read latencies from {f}: {e}".format(f=jmeterJTLFile, e=e))
+        return loadLatency.emptyLatency()
+    finally:
+        process.stdout.close()
+        process.wait()
+    return loadLatency.latencySummary(histogram)
+
 def stopJMeter():
     remoteCmd = f"{docker} rm {jmeterContainerName}"
     cmd = f"ssh {jmeterUsername}@{jmeterMachine} \"{remoteCmd}\"" if jmeterUsername else remoteCmd
@@ -674,15 +564,16 @@ def runPhase(duration, numClients):
     logging.debug("Wait for {jmeter} to end: {cmd}".format(jmeter=jmeterContainerName, cmd=cmd))
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
 
-    # Read throughput
+    # Read throughput and latency
     thr, elapsed, peakThr, errors = getThroughput()
+    latency = getLatencyJMeter() if jmeterJTLFile else loadLatency.emptyLatency()
 
     stopJMeter()
     if logging.root.level <= logging.DEBUG:
-        print("Throughput={thr:7.1f} duration={elapsed:6.1f} peak={peakThr:7.1f} errors={err:4d}".format(thr=thr,elapsed=elapsed,peakThr=peakThr,err=errors))
+        print("Throughput={thr:7.1f} duration={elapsed:6.1f} peak={peakThr:7.1f} errors={err:4d}  Latency: {lat}".format(thr=thr,elapsed=elapsed,peakThr=peakThr,err=errors,lat=loadLatency.formatLatency(latency)))
     if errors > 0:
         logging.error(f"JMeter encountered {errors} errors")
-    return thr, elapsed, peakThr, errors
+    return thr, elapsed, peakThr, errors, latency
 
 
 def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
@@ -693,6 +584,7 @@ def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
     # Will apply load in small bursts
     maxPulses = numRepetitionsOneClient + numRepetitions50Clients
     thrResults = [math.nan for i in range(maxPulses)] # np.full((maxPulses), fill_value=np.nan, dtype=np.float)
+    latencyResults = [loadLatency.emptyLatency() for i in range(maxPulses)] # p50/p90/p99/max for each pulse
     rss, peakRss, cpu, startupTime = math.nan, math.nan, math.nan, math.nan
     peakThroughput = math.nan
 
@@ -703,7 +595,7 @@ def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
 
     childProcess = startAppServer(jdk=jdk, jvmArgs=jvmArgs)
     if childProcess is None: # Failed to start properly
-        return thrResults, peakThroughput, rss, peakRss, cpu, startupTime
+        return thrResults, peakThroughput, rss, peakRss, cpu, startupTime, latencyResults
 
     # Compute AppServer start-up time
     startupTime = getStartupTime(startTimeMs)
@@ -730,7 +622,7 @@ def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
             else:
                 logging.error("Failed to start JVM perf profiling because Java process has terminated")
 
-        thrResults[pulse], elapsed, peakThr, errors = runPhase(duration, cli)
+        thrResults[pulse], elapsed, peakThr, errors, latencyResults[pulse] = runPhase(duration, cli)
         if errors == 0:
             peakThroughput = max(peakThroughput, peakThr)
         logging.info("Throughput={thr}".format(thr=thrResults[pulse]))
@@ -738,6 +630,8 @@ def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
     # Collect RSS at end of run
     if childProcess.poll() is None: # Still running
         rss, peakRss = getRss(pid=childProcess.pid)
+        if smapsSummaryEveryIteration:
+            logSmapsSummary(childProcess.pid)
 
         if doMemAnalysis:
             logging.info("Generating javacore, core and smaps for process {pid}".format(pid=childProcess.pid))
@@ -751,47 +645,17 @@ def runBenchmarkOnce(jdk, jvmArgs, doMemAnalysis):
     cpu = getCompCPU(childProcess)
 
     # return throughput as an array of throughput values for each burst and also the RSS, PeakRSS and CPU
-    return thrResults, peakThroughput, rss, peakRss, cpu, startupTime
+    return thrResults, peakThroughput, rss, peakRss, cpu, startupTime, latencyResults
 
 
-def runBenchmarkIteratively(numIter, jdk, javaOpts):
-    # Initialize stats; 2D array of throughput results
+'''
+Print the results of all the runs of a configuration and their statistics.
+The runs before `startIter` (the cold run) are not included in the statistics.
+`latencyResults` holds the p50/p90/p99/max latency pulses of every run.
+'''
+def printResults(jdk, javaOpts, thrResults, rssResults, cpuResults, startupResults, latencyResults, startIter):
+    numIter = len(thrResults)
     numPulses = numRepetitionsOneClient + numRepetitions50Clients
-    thrResults = [] # List of lists
-    rssResults = [] # Just a list
-    cpuResults = []
-    startupResults = []
-
-    # clear SCC if needed (by destroying the SCC volume)
-    if doColdRun:
-        clearSCC(jdk, sccDestroyParams)
-
-    # Start JITServer if needed
-    jitServerHandle = None
-    if "-XX:+UseJITServer" in javaOpts:
-        jitServerHandle = startJITServer(jdk)
-        if jitServerHandle == None:
-            sys.exit(-1)
-
-    for iter in range(numIter):
-        if doOnlyColdRuns:
-            clearSCC(jdk, sccDestroyParams)
-        # if memAnalysis is True, add the options required for memory analysis, but only for the last iteration
-        doMemAnalysis = memAnalysis and iter == numIter - 1
-        if doMemAnalysis:
-            javaOpts = javaOpts + extraArgsForMemAnalysis
-        thrList, peakThr, rss, peakRss, cpu, startupTime = runBenchmarkOnce(jdk, javaOpts, doMemAnalysis)
-        lastThr = meanLastValues(thrList, numMeasurementTrials) # average for last N pulses
-        print(f"Run {iter}: Thr={lastThr:6.1f} RSS={rss:6.1f} MB  PeakRSS={peakRss:6.1f} MB  CPU={cpu:4.1f} sec  Startup={startupTime:5.0f} PeakThr={peakThr:6.1f}".
-              format(lastThr=lastThr, rss=rss, peakRss=peakRss, cpu=cpu, startupTime=startupTime, peakThr=peakThr), flush=True)
-        thrResults.append(thrList) # copy all the pulses
-        rssResults.append(rss)
-        cpuResults.append(cpu)
-        startupResults.append(startupTime)
-
-    startIter = 0 if (doOnlyColdRuns or not doColdRun) else 1
-
-    # print stats
     print(f"\nResults for jdk: {jdk} and opts: {javaOpts}")
     if startIter > 0:
         print("First run is a cold run and is not included in the stats")
@@ -835,10 +699,118 @@ def runBenchmarkIteratively(numIter, jdk, javaOpts):
     avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(startupResults[startIter:], eliminateOutliers=True)
     print("StartupTime stats:Avg={avg:7.1f}  StdDev={stdDev:7.1f}  Min={min:7.1f}  Max={max:7.1f}  Max/Min={maxmin:4.0f}% CI95={ci95:7.1f}% numSamples={numSamples:3d}".
                         format(avg=avg, stdDev=stdDev, min=min, max=max, maxmin=(max-min)*100.0/min, ci95=ci95, numSamples=numSamples))
+    # Latency stats (average of the last N pulses of every run), available when JMeter writes a JTL file
+    for key in loadLatency.latencyKeys:
+        latencyAvgResults = [meanLastValues([latency[key] for latency in latencyList], numMeasurementTrials) for latencyList in latencyResults[startIter:]]
+        if countNotNan(latencyAvgResults) == 0:
+            continue
+        avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(latencyAvgResults, eliminateOutliers=True)
+        print("Latency {key} ms:   Avg={avg:7.2f}  StdDev={stdDev:7.2f}  Min={min:7.2f}  Max={max:7.2f}  Max/Min={maxmin:4.0f}% CI95={ci95:7.1f}% numSamples={numSamples:3d}".
+                            format(key=key, avg=avg, stdDev=stdDev, min=min, max=max, maxmin=(max-min)*100.0/min if min > 0 else math.nan, ci95=ci95, numSamples=numSamples))
+
+
+def runBenchmarkIteratively(numIter, jdk, javaOpts):
+    # Initialize stats; 2D array of throughput results
+    thrResults = [] # List of lists
+    rssResults = [] # Just a list
+    cpuResults = []
+    startupResults = []
+    latencyResults = []
+
+    # clear SCC if needed (by destroying the SCC volume)
+    if doColdRun:
+        clearSCC(jdk, sccDestroyParams)
+
+    # Start JITServer if needed
+    jitServerHandle = None
+    if "-XX:+UseJITServer" in javaOpts:
+        jitServerHandle = startJITServer(jdk)
+        if jitServerHandle == None:
+            sys.exit(-1)
+
+    startIter = 0 if (doOnlyColdRuns or not doColdRun) else 1
+    sampler = sequentialSampling.SequentialSampler(targetCI95, minRuns)
+    for iter in range(numIter):
+        if doOnlyColdRuns:
+            clearSCC(jdk, sccDestroyParams)
+        # if memAnalysis is True, add the options required for memory analysis, but only for the last iteration
+        doMemAnalysis = memAnalysis and iter == numIter - 1
+        if doMemAnalysis:
+            javaOpts = javaOpts + extraArgsForMemAnalysis
+        thrList, peakThr, rss, peakRss, cpu, startupTime, latencyList = runBenchmarkOnce(jdk, javaOpts, doMemAnalysis)
+        lastThr = meanLastValues(thrList, numMeasurementTrials) # average for last N pulses
+        p99 = meanLastValues([latency["p99"] for latency in latencyList], numMeasurementTrials)
+        print(f"Run {iter}: Thr={lastThr:6.1f} p99={p99:7.2f} ms RSS={rss:6.1f} MB  PeakRSS={peakRss:6.1f} MB  CPU={cpu:4.1f} sec  Startup={startupTime:5.0f} PeakThr={peakThr:6.1f}".
+              format(lastThr=lastThr, rss=rss, peakRss=peakRss, cpu=cpu, startupTime=startupTime, peakThr=peakThr), flush=True)
+        thrResults.append(thrList) # copy all the pulses
+        rssResults.append(rss)
+        cpuResults.append(cpu)
+        startupResults.append(startupTime)
+        latencyResults.append(latencyList)
+        if iter >= startIter:
+            sampler.add(lastThr)
+        if adaptiveRuns and sampler.isDone():
+            print(f"Throughput CI95 target reached after {iter+1} runs: {sampler}")
+            numIter = iter + 1
+            break
+
+    printResults(jdk, javaOpts, thrResults, rssResults, cpuResults, startupResults, latencyResults, startIter)
 
     if jitServerHandle:
         stopJITServer(jitServerHandle)
 
+'''
+Run one iteration of a campaign configuration: a dictionary with "jdk", "jvmOpts"
+and optionally "workload" (overrides for the configuration globals, see campaignFile.py).
+Returns the metrics of the run as a dictionary.
+'''
+def runCampaignIteration(config, round):
+    campaignFile.applyWorkload(globals(), config.get("workload"))
+    jdk, javaOpts = config["jdk"], config["jvmOpts"]
+    thrList, peakThr, rss, peakRss, cpu, startupTime, latencyList = runBenchmarkOnce(jdk, javaOpts, False)
+    lastThr = meanLastValues(thrList, numMeasurementTrials) # average for last N pulses
+    p99 = meanLastValues([latency["p99"] for latency in latencyList], numMeasurementTrials)
+    print(f"Round {round}: Thr={lastThr:6.1f} p99={p99:7.2f} ms RSS={rss:6.1f} MB  PeakRSS={peakRss:6.1f} MB  CPU={cpu:4.1f} sec  Startup={startupTime:5.0f} PeakThr={peakThr:6.1f}  {campaignLabel(config)}", flush=True)
+    return {"thrPulses": thrList, "peakThr": peakThr, "rss": rss, "peakRss": peakRss, "compCPU": cpu, "startup": startupTime, "latencyPulses": latencyList}
+
+
+def campaignLabel(config):
+    return f"jdk: {config['jdk']} opts: {config['jvmOpts']}" + (f" workload: {config['workload']}" if config.get("workload") else "")
+
+
+'''
+Run all the configurations of a campaign in rounds, according to `schedule` (see campaignScheduler.py),
+then print the results of each configuration and the paired per-round throughput deltas relative
+to the first configuration. With a resultsLog, the runs already done are loaded instead of being repeated.
+'''
+def runCampaign(configs, numIter, schedule, seed, resultsLog=None):
+    # The JITServer of a jdk is shared by all the configurations that use it
+    jitServerHandles = {}
+    for config in configs:
+        jdk = config["jdk"]
+        if "-XX:+UseJITServer" in config["jvmOpts"] and jdk not in jitServerHandles:
+            jitServerHandles[jdk] = startJITServer(jdk)
+            if jitServerHandles[jdk] == None:
+                sys.exit(-1)
+
+    sccKey = lambda config: campaignScheduler.sccKeyFromOptions(config["jvmOpts"], sccDir)
+    destroySCC = lambda config: clearSCC(config["jdk"], campaignScheduler.sccDestroyOption(sccKey(config)))
+    results, coldResults = campaignScheduler.runCampaign(configs, numIter, runCampaignIteration, destroySCC, sccKey, doColdRun=doColdRun,
+                                                         doOnlyColdRuns=doOnlyColdRuns, schedule=schedule, seed=seed, resultsLog=resultsLog)
+    for config, runs in zip(configs, results):
+        campaignFile.applyWorkload(globals(), config.get("workload")) # the number of pulses may depend on the workload
+        printResults(config["jdk"], config["jvmOpts"], [run["thrPulses"] for run in runs], [run["rss"] for run in runs],
+                     [run["compCPU"] for run in runs], [run["startup"] for run in runs],
+                     [run.get("latencyPulses", [loadLatency.emptyLatency()]) for run in runs], 0) # logs written before latencies were recorded have no "latencyPulses"
+    if doColdRun and not doOnlyColdRuns:
+        print("The cold runs are not included in the stats")
+    campaignScheduler.printPairedDeltas([campaignLabel(config) for config in configs],
+                                        [[meanLastValues(run["thrPulses"], numMeasurementTrials) for run in runs] for runs in results])
+
+    for jitServerHandle in jitServerHandles.values():
+        stopJITServer(jitServerHandle)
+
+
 def cleanup():
     stopContainersFromImage(dbMachine, dbUsername, dbImage)
     # CWWKE0029E: An instance of server crudserver is already running.
@@ -846,8 +818,9 @@ def cleanup():
 
 
 ############################ MAIN ##################################
-if  len(sys.argv) < 2:
-    print ("Program must have an argument: the number of iterations\n")
+campaign = campaignFile.parseCampaignArgs(sys.argv, axes=("jdk", "jvmOpts", "workload"))
+if  len(sys.argv) < 2 and not campaign:
+    print ("Program must have an argument: the number of iterations, or --campaign <campaign file>\n")
     sys.exit(-1)
 
 # Clean-up from a previous possible bad run
@@ -861,9 +834,16 @@ if doOnlyColdRuns:
 elif doColdRun:
     print("Will do a cold run before each set")
 
-for jvmOpts in jvmOptions:
-    for jdk in jdks:
-        runBenchmarkIteratively(numIter=int(sys.argv[1]), jdk=jdk, javaOpts=jvmOpts)
+if campaign:
+    resultsLog = campaignFile.ResultsLog(campaign["resultsLog"])
+    runCampaign(campaign["cells"], campaign["iterations"], campaign["schedule"], campaign["seed"], resultsLog)
+    resultsLog.close()
+elif campaignSchedule == "sequential":
+    for jvmOpts in jvmOptions:
+        for jdk in jdks:
+            runBenchmarkIteratively(numIter=int(sys.argv[1]), jdk=jdk, javaOpts=jvmOpts)
+else:
+    runCampaign([{"jdk": jdk, "jvmOpts": jvmOpts} for jvmOpts in jvmOptions for jdk in jdks], int(sys.argv[1]), campaignSchedule, campaignSeed)
 
 # Stop the database
 stopDatabase(dbMachine, dbUsername)
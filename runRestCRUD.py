@@ -6,6 +6,10 @@ import os # for environment variables
 import re # for regular expressions
 import shlex, subprocess
 import sys # for number of arguments
+import sequentialSampling
+import readinessWatcher
+import loadLatency
+from benchStats import nanmean, computeStats, meanLastValues, countNotNan
 import time # for sleep
 
 
@@ -14,6 +18,9 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s :: %(levelname)s ::
 
 ################### Benchmark configuration #################
 doColdRun          = True # when True we clear the SCC before the first run. Set it to False for embedded SCC
+adaptiveRuns       = False # when True stop iterating once the CI95 of the throughput drops below targetCI95; the number of iterations becomes the maximum
+targetCI95         = 2.0 # target half-width of the throughput CI95, as a percentage of the mean
+minRuns            = 5 # minimum number of measured iterations when adaptiveRuns is True
 AppServerHost      = "localhost" # the host where the app server is running
 AppServerPort      = 9080
 AppServerLocation  = "/opt/IBM/OL-23.0.0.3/liberty"
@@ -23,7 +30,7 @@ applicationLocation= f"{AppServerLocation}/usr/servers/{applicationName}"
 logFile            = f"{applicationLocation}/logs/messages.log"
 appServerStartCmd  = f"{AppServerAffinity} {AppServerLocation}/bin/server run {applicationName}"
 appServerStopCmd   = f"{AppServerLocation}/bin/server stop {applicationName}"
-startupWaitTime    = 20 # seconds to wait before checking to see if AppServer is up
+startupWaitTime    = 60 # maximum seconds to wait for the AppServer to be ready (the log is followed, see readinessWatcher.py)
 
 ############### SCC configuration ###########################
 sccDir  = f"{AppServerLocation}/usr/servers/.classCache" # Location of the shared class cache
@@ -71,98 +78,6 @@ jdks = [
     #"/home/mpirvu/sdks/OpenJ9-JDK20-x86-64_linux-20230504-201827"
 ]
 
-def nanmean(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-    return total/numValidElems if numValidElems > 0 else math.nan
-
-
-def nanstd(myList):
-    total = 0
-    numValidElems = 0
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]):
-            total += myList[i]
-            numValidElems += 1
-
-    if numValidElems == 0:
-        return math.nan
-    if numValidElems == 1:
-        return 0
-    else:
-        mean = total/numValidElems
-        total = 0
-        for i in range(len(myList)):
-            if not math.isnan(myList[i]):
-                total += (myList[i] - mean)**2
-        return math.sqrt(total/(numValidElems-1))
-
-
-def nanmin(myList):
-    min = math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] < min:
-            min = myList[i]
-    return min
-
-
-def nanmax(myList):
-    max = -math.inf
-    for i in range(len(myList)):
-        if not math.isnan(myList[i]) and myList[i] > max:
-            max = myList[i]
-    return max
-
-
-def tDistributionValue95(degreeOfFreedom):
-    if degreeOfFreedom < 1:
-        return math.nan
-        #import scipy.stats as stats
-        #  stats.t.ppf(0.975, degreesOfFreedom))
-    tValues = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
-               2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
-               2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,]
-    if degreeOfFreedom <= 30:
-        return tValues[degreeOfFreedom-1]
-    else:
-        if degreeOfFreedom <= 60:
-            return 2.042 - 0.001 * (degreeOfFreedom - 30)
-        else:
-            return 1.96
-
-# Confidence intervals tutorial
-# mean +- t * std / sqrt(n)
-# For 95% confidence interval, t = 1.96 if we have many samples
-def meanConfidenceInterval95(myList):
-    n = len(myList)
-    if n <= 1:
-        return math.nan
-    tvalue = tDistributionValue95(n-1)
-    avg, stdDev = nanmean(myList), nanstd(myList)
-    marginOfError = tvalue * stdDev / math.sqrt(n)
-    return 100.0*marginOfError/avg
-
-
-def computeStats(myList):
-    avg = nanmean(myList)
-    stdDev = nanstd(myList)
-    min = nanmin(myList)
-    max = nanmax(myList)
-    ci95 = meanConfidenceInterval95(myList)
-    return avg, stdDev, min, max, ci95
-
-
-def meanLastValues(myList, numLastValues):
-    assert numLastValues > 0
-    if numLastValues > len(myList):
-        numLastValues = len(myList)
-    return nanmean(myList[-numLastValues:])
-
-
 def getJavaProcesses():
     cmd = "ps -eo pid,cmd --no-headers"
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
@@ -248,24 +163,15 @@ def clearSCC(jdk, sccDestroyParams):
     # TODO: make sure the SCC does not exist anymore
 
 
-def verifyAppserverStarted():
+def verifyAppserverStarted(logWatcher, childProcess):
     #[5/3/23, 8:27:25:850 PDT] 0000002a com.ibm.ws.kernel.feature.internal.FeatureManager   A CWWKF0011I: The crudserver server is ready to run a smarter planet. The crudserver server started in 48.607 seconds.
     # Look for "server is ready to run a smarter planet" in messages.log
     errPattern = re.compile('.+\[ERROR')
     readyPattern = re.compile(".+is ready to run a smarter planet")
-    for iter in range(20):
-        with open(logFile) as f:
-            for line in f:
-                m = errPattern.match(line)
-                if m:
-                    logging.warning("AppServer {applicationName} errored while starting:\n\t {line}").format(applicationName=applicationName,line=line)
-                    return False
-                m1 = readyPattern.match(line)
-                if m1:
-                    return True # True means success
-        logging.warning("sleeping 1 sec and trying again")
-        time.sleep(1) # wait 1 sec and try again
-    return False # False means failure
+    ready, line, readyTime = logWatcher.wait(readyPattern, errPattern, startupWaitTime, isAlive=lambda: childProcess.poll() is None)
+    if not ready:
+        logging.warning("AppServer {applicationName} did not start correctly: {line}".format(applicationName=applicationName, line=line))
+    return ready # True means success
 
 
 def killAppServerIfRunning(childProcess):
@@ -281,14 +187,14 @@ def startAppServer(jdk, jvmArgs):
     myEnv["JAVA_HOME"] = jdk
     myEnv["JVM_ARGS"] = jvmArgs
     myEnv["TR_PrintCompTime"] = "1"
+    logWatcher = readinessWatcher.LogFileWatcher(logFile) # only the lines written by this AppServer count
     # Fork a process and run in background
     childProcess = subprocess.Popen(shlex.split(appServerStartCmd), env=myEnv, universal_newlines=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    logging.debug(f"Waiting for {startupWaitTime} sec for the AppServer to start")
-    time.sleep(startupWaitTime)
+    logging.debug(f"Waiting up to {startupWaitTime} sec for the AppServer to start")
     if childProcess.poll() is None: # It's running
         logging.debug("AppServer started with pid {pid}".format(pid=childProcess.pid))
     # Verify that server started correctly
-    startOK = verifyAppserverStarted()
+    startOK = verifyAppserverStarted(logWatcher, childProcess)
     if not startOK:
         logging.error("AppServer did not start correctly")
         killAppServerIfRunning(childProcess)
@@ -353,7 +259,7 @@ def getCompCPU(childProcess):
 
 
 def applyLoadGetThroughput(duration, numClients):
-    remoteCmd = f"{wrkAffinity} {wrkCmd} --threads {numClients} --connections {numClients} --duration {duration}s {wrkTarget}"
+    remoteCmd = f"{wrkAffinity} {wrkCmd} --latency --threads {numClients} --connections {numClients} --duration {duration}s {wrkTarget}"
     cmd = f"ssh {wrkUsername}@{wrkMachine} \"{remoteCmd}\"" if wrkUsername else remoteCmd
     logging.info("Apply load: {cmd}".format(cmd=cmd))
     output = subprocess.check_output(shlex.split(cmd), universal_newlines=True)
@@ -365,14 +271,20 @@ def applyLoadGetThroughput(duration, numClients):
     #1291284 requests in 5.00m, 256.14MB read
     #Requests/sec:   4302.85
     #Transfer/sec:      0.85MB
+    #Latency Distribution
+    #   50%    1.10ms
+    #   ...
     pattern = re.compile('Requests/sec:\s+(\d+\.\d+)')
     lines = output.splitlines()
     for line in lines:
         m = pattern.match(line)
         if m:
-            return float(m.group(1))
+            thr = float(m.group(1))
+            latency = loadLatency.parseWrkLatency(lines)
+            print("Throughput={thr:7.1f}  Latency: {lat}".format(thr=thr, lat=loadLatency.formatLatency(latency)))
+            return thr, latency
     logging.debug(output)
-    return math.nan # Error case
+    return math.nan, loadLatency.emptyLatency() # Error case
 
 
 def runPhase(duration, numClients):
@@ -389,6 +301,7 @@ def runBenchmarkOnce(jdk, jvmArgs):
     # Will apply load in small bursts
     maxPulses = numRepetitionsOneClient + numRepetitions50Clients
     thrResults = [math.nan for i in range(maxPulses)] # np.full((maxPulses), fill_value=np.nan, dtype=np.float)
+    latencyResults = [loadLatency.emptyLatency() for i in range(maxPulses)] # p50/p90/p99/max for each pulse
     rss, peakRss, cpu, startupTime = math.nan, math.nan, math.nan, math.nan
 
     #restoreDatabase(mongoMachine, mongoUsername, mongoImage)
@@ -398,7 +311,7 @@ def runBenchmarkOnce(jdk, jvmArgs):
 
     childProcess = startAppServer(jdk=jdk, jvmArgs=jvmArgs)
     if childProcess is None: # Failed to start properly
-        return thrResults, rss, peakRss, cpu, startupTime
+        return thrResults, rss, peakRss, cpu, startupTime, latencyResults
 
     # Compute AppServer start-up time
     startupTime = getStartupTime(startTimeMs)
@@ -410,7 +323,7 @@ def runBenchmarkOnce(jdk, jvmArgs):
         else:
             cli = 1
             duration = durationOfOneClient
-        thrResults[pulse] = runPhase(duration, cli)
+        thrResults[pulse], latencyResults[pulse] = runPhase(duration, cli)
         logging.info("Throughput={thr}".format(thr=thrResults[pulse]))
 
     # Collect RSS at end of run
@@ -424,7 +337,7 @@ def runBenchmarkOnce(jdk, jvmArgs):
     cpu = getCompCPU(childProcess)
 
     # return throughput as an array of throughput values for each burst and also the RSS, PeakRSS and CPU
-    return thrResults, rss, peakRss, cpu, startupTime
+    return thrResults, rss, peakRss, cpu, startupTime, latencyResults
 
 
 def runBenchmarkIteratively(numIter, jdk, javaOpts):
@@ -434,20 +347,29 @@ def runBenchmarkIteratively(numIter, jdk, javaOpts):
     rssResults = [] # Just a list
     cpuResults = []
     startupResults = []
+    latencyAvgResults = {key: [] for key in loadLatency.latencyKeys} # latency of the last N pulses, for every run
 
     # clear SCC if needed (by destroying the SCC volume)
     if doColdRun:
         clearSCC(jdk, sccDestroyParams)
 
+    sampler = sequentialSampling.SequentialSampler(targetCI95, minRuns)
     for iter in range(numIter):
-        thrList, rss, peakRss, cpu, startupTime = runBenchmarkOnce(jdk, javaOpts)
+        thrList, rss, peakRss, cpu, startupTime, latencyList = runBenchmarkOnce(jdk, javaOpts)
         lastThr = meanLastValues(thrList, numMeasurementTrials) # average for last N pulses
+        for key in loadLatency.latencyKeys:
+            latencyAvgResults[key].append(meanLastValues([latency[key] for latency in latencyList], numMeasurementTrials))
         print(f"Run {iter}: Thr={lastThr:6.1f} RSS={rss:6.1f} MB  PeakRSS={peakRss:6.1f} MB  CPU={cpu:4.1f} sec  Startup={startupTime:5.0f}".
               format(lastThr=lastThr, rss=rss, peakRss=peakRss, cpu=cpu, startupTime=startupTime))
         thrResults.append(thrList) # copy all the pulses
         rssResults.append(rss)
         cpuResults.append(cpu)
         startupResults.append(startupTime)
+        sampler.add(lastThr)
+        if adaptiveRuns and sampler.isDone():
+            print(f"Throughput CI95 target reached after {iter+1} runs: {sampler}")
+            numIter = iter + 1
+            break
 
     # print stats
     print(f"\nResults for jdk: {jdk} and opts: {javaOpts}")
@@ -476,9 +398,15 @@ def runBenchmarkIteratively(numIter, jdk, javaOpts):
     print("\tAvg={avgThr:7.1f}  RSS={rss:7.0f} MB  CompCPU={cpu:5.1f} sec  Startup={startup:5.0f} ms".
           format(avgThr=nanmean(thrAvgResults), rss=nanmean(rssResults), cpu=nanmean(cpuResults), startup=nanmean(startupResults)))
     # Throughput stats
-    avg, stdDev, min, max, ci95 = computeStats(thrAvgResults)
+    avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(thrAvgResults)
     print("Throughput stats: Avg={avg:7.1f}  StdDev={stdDev:7.1f}  Min={min:7.1f}  Max={max:7.1f}  Max/Min={maxmin:7.1f} CI95={ci95:7.1f}%".
                         format(avg=avg, stdDev=stdDev, min=min, max=max, maxmin=max/min, ci95=ci95))
+    # Latency stats (p50/p90/p99/max from wrk --latency); skipped when wrk printed no latency distribution
+    for key in loadLatency.latencyKeys:
+        if countNotNan(latencyAvgResults[key]) > 0:
+            avg, stdDev, min, max, ci95, numSamples, outliers = computeStats(latencyAvgResults[key])
+            print("Latency {key:4s} ms:  Avg={avg:7.2f}  StdDev={stdDev:7.2f}  Min={min:7.2f}  Max={max:7.2f}  Max/Min={maxmin:7.1f} CI95={ci95:7.1f}%".
+                  format(key=key, avg=avg, stdDev=stdDev, min=min, max=max, maxmin=max/min, ci95=ci95))
 
 def cleanup():
     stopContainersFromImage(dbMachine, dbUsername, dbImage)
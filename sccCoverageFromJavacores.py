@@ -0,0 +1,201 @@
+# Python script that parses several OpenJ9 javacores (e.g. one per run, as produced
+# by collectJavacore() in the run* scripts) and analyzes how consistently each class
+# is stored in the shared class cache (SCC) across runs.
+# The javacores are parsed in parallel and a class x run sharing matrix is built.
+# Classes are identified by (class loader name, class name) because addresses differ
+# between runs. The script reports:
+#  - classes that are never/sometimes/always shared in the runs where they were loaded
+#  - the sharing ratio (shared classes / loaded classes) of each class loader across runs
+#  - when a second group of javacores is given (e.g. obtained with a different JDK build),
+#    the classes and class loaders whose sharing changed between the two groups
+# The goal is to explain AOT coverage gaps that hurt start-up time.
+#
+# Usage: python3 sccCoverageFromJavacores.py "javacoreGlob" ["javacoreGlobOtherBuild"] [--format text|tsv|csv|jsonl|parquet] [--output prefix]
+# Note: use quotes around the file names with wildcards
+#
+# Author: Marius Pirvu
+
+import glob
+import multiprocessing
+import os
+import sys # for accessing parameters and exit
+import numpy as np
+import javacoreParser
+import outputWriter
+
+################## Configuration #####################
+numProcesses = os.cpu_count() # javacores parsed in parallel
+printCategories = ("never", "sometimes") # which class categories to list; add "always" to list all classes
+minClassesForLoaderRatio = 10 # ignore class loaders that load fewer classes than this (on average)
+minSharingDiff = 0.5 # classes whose shared fraction differs by at least this much between groups are printed
+#######################################################
+
+notLoaded, notShared, shared = -1, 0, 1 # values in the sharing matrix
+
+
+'''
+Parse one javacore and return a dictionary (classLoaderName, className) --> shared
+or None if the javacore cannot be parsed
+'''
+def parseJavacoreFile(javacoreFileName):
+    try:
+        with open(javacoreFileName, 'r') as javacore:
+            classLoaderSection = javacoreParser.parseClassLoaders(javacore)
+    except ValueError: # javacore without a (valid) class loader section
+        return None
+    classLoaderHash = classLoaderSection.classLoaderHash
+    return {(classLoaderHash[attribs['classLoaderAddr']]['classLoaderName'], attribs['className']) : attribs['shared']
+            for attribs in classLoaderSection.classHash.values()}
+
+
+'''
+Build the class x run matrix from the per-run dictionaries.
+Returns (classKeys, matrix) where matrix[i, j] is shared/notShared/notLoaded
+for class classKeys[i] in run j
+'''
+def buildSharingMatrix(runs, classIndex):
+    for run in runs:
+        for key in run:
+            if key not in classIndex:
+                classIndex[key] = len(classIndex)
+    matrix = np.full((len(classIndex), len(runs)), notLoaded, dtype=np.int8)
+    for j, run in enumerate(runs):
+        rows = np.fromiter((classIndex[key] for key in run), dtype=np.int64, count=len(run))
+        matrix[rows, j] = np.fromiter(run.values(), dtype=np.int8, count=len(run))
+    return matrix
+
+
+'''
+Return (numRunsLoaded, numRunsShared) per class, computed from the matrix
+'''
+def classCounts(matrix):
+    return (matrix != notLoaded).sum(axis=1), (matrix == shared).sum(axis=1)
+
+
+def classCategory(numLoaded, numShared):
+    if numShared == 0:
+        return "never"
+    return "always" if numShared == numLoaded else "sometimes"
+
+
+'''
+Compute the sharing ratio of each class loader in each run.
+Returns a dictionary classLoaderName --> (avgClassesLoaded, array of per-run ratios)
+Runs in which the class loader did not load any class are excluded.
+'''
+def loaderSharingRatios(matrix, loaderOfClass, loaderNames):
+    ratios = {}
+    numLoaders = len(loaderNames)
+    loadedPerRun = np.stack([np.bincount(loaderOfClass, weights=(matrix[:, j] != notLoaded), minlength=numLoaders) for j in range(matrix.shape[1])], axis=1)
+    sharedPerRun = np.stack([np.bincount(loaderOfClass, weights=(matrix[:, j] == shared), minlength=numLoaders) for j in range(matrix.shape[1])], axis=1)
+    for l, loaderName in enumerate(loaderNames):
+        present = loadedPerRun[l] > 0
+        if not present.any() or loadedPerRun[l][present].mean() < minClassesForLoaderRatio:
+            continue
+        ratios[loaderName] = (loadedPerRun[l][present].mean(), sharedPerRun[l][present] / loadedPerRun[l][present])
+    return ratios
+
+
+def analyzeGroup(groupName, matrix, classKeys, loaderOfClass, loaderNames, outputConfig):
+    numLoaded, numShared = classCounts(matrix)
+    inGroup = numLoaded > 0
+    categories = {"never": 0, "sometimes": 0, "always": 0}
+    with outputConfig.openTable("classCoverage." + groupName, ["category", "classLoader", "className", "runsLoaded", "runsShared"],
+                                textFormat="{:9s}\t{:60s}\t{}\t{:4d}\t{:4d}",
+                                textHeader="\nClass coverage for group {g}\nCategory \tClassLoader{pad}\tClass\tLoaded\tShared".format(g=groupName, pad=" " * 49)) as table:
+        rows = []
+        for i in np.nonzero(inGroup)[0]:
+            category = classCategory(numLoaded[i], numShared[i])
+            categories[category] += 1
+            if category in printCategories:
+                rows.append((category, classKeys[i][0], classKeys[i][1], int(numLoaded[i]), int(numShared[i])))
+        rows.sort()
+        table.writeRows(rows)
+
+    with outputConfig.openTable("categorySummary." + groupName, ["group", "category", "numClasses"], textFormat="{}\t{:9s}\t{:8d}",
+                                textHeader="\nGroup\tCategory \tClasses") as table:
+        for category, count in categories.items():
+            table.writeRow(groupName, category, count)
+
+    ratios = loaderSharingRatios(matrix, loaderOfClass, loaderNames)
+    with outputConfig.openTable("loaderRatios." + groupName, ["classLoader", "avgClassesLoaded", "numRuns", "avgRatio", "minRatio", "maxRatio"],
+                                textFormat="{:60s}\t{:8.0f}\t{:4d}\t{:6.3f}\t{:6.3f}\t{:6.3f}",
+                                textHeader="\nSharing ratio per class loader for group {g}\nClassLoader{pad}\t Classes\tRuns\t   Avg\t   Min\t   Max".format(g=groupName, pad=" " * 49)) as table:
+        for loaderName, (avgLoaded, loaderRatios) in sorted(ratios.items(), key=lambda item: item[1][0] * (1 - item[1][1].mean()), reverse=True):
+            table.writeRow(loaderName, avgLoaded, len(loaderRatios), loaderRatios.mean(), loaderRatios.min(), loaderRatios.max())
+    return ratios
+
+
+'''
+Compare the fraction of runs in which each class is shared between two groups of runs
+'''
+def compareGroups(matrixA, matrixB, ratiosA, ratiosB, classKeys, outputConfig):
+    numLoadedA, numSharedA = classCounts(matrixA)
+    numLoadedB, numSharedB = classCounts(matrixB)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fractionA = numSharedA / numLoadedA
+        fractionB = numSharedB / numLoadedB
+    # Classes loaded in only one group count as a change as well
+    changed = np.abs(np.nan_to_num(fractionA, nan=0.0) - np.nan_to_num(fractionB, nan=0.0)) >= minSharingDiff
+    changed &= (numLoadedA > 0) | (numLoadedB > 0)
+    with outputConfig.openTable("classDiff", ["classLoader", "className", "runsLoadedA", "sharedFractionA", "runsLoadedB", "sharedFractionB"],
+                                textFormat="{:60s}\t{}\t{:4d}\t{:5.2f}\t{:4d}\t{:5.2f}",
+                                textHeader="\nClasses whose sharing changed between group A and group B\nClassLoader{pad}\tClass\tLoadedA\tSharedA\tLoadedB\tSharedB".format(pad=" " * 49)) as table:
+        rows = [(classKeys[i][0], classKeys[i][1], int(numLoadedA[i]), float(fractionA[i]), int(numLoadedB[i]), float(fractionB[i])) for i in np.nonzero(changed)[0]]
+        rows.sort(key=lambda row: (np.nan_to_num(row[3], nan=0.0) - np.nan_to_num(row[5], nan=0.0), row[0], row[1]), reverse=True)
+        table.writeRows(rows)
+
+    with outputConfig.openTable("loaderDiff", ["classLoader", "avgRatioA", "avgRatioB", "delta"], textFormat="{:60s}\t{:6.3f}\t{:6.3f}\t{:+6.3f}",
+                                textHeader="\nSharing ratio per class loader: group A vs group B\nClassLoader{pad}\t  RatioA\t  RatioB\t Delta".format(pad=" " * 49)) as table:
+        rows = []
+        for loaderName in set(ratiosA) | set(ratiosB):
+            ratioA = ratiosA[loaderName][1].mean() if loaderName in ratiosA else float("nan")
+            ratioB = ratiosB[loaderName][1].mean() if loaderName in ratiosB else float("nan")
+            rows.append((loaderName, ratioA, ratioB, ratioB - ratioA))
+        rows.sort(key=lambda row: abs(np.nan_to_num(row[3], nan=1.0)), reverse=True)
+        table.writeRows(rows)
+
+
+'''
+Parse the javacores in parallel. Returns the list of per-run dictionaries for the files that could be parsed.
+'''
+def parseJavacores(fileNames):
+    with multiprocessing.Pool(processes=max(1, min(numProcesses, len(fileNames)))) as pool:
+        runs = pool.map(parseJavacoreFile, fileNames, chunksize=1)
+    parsedRuns = []
+    for fileName, run in zip(fileNames, runs):
+        if run is None:
+            print("Skipping", fileName, ": cannot find the class loader section")
+        else:
+            parsedRuns.append(run)
+    return parsedRuns
+
+
+if __name__ == "__main__":
+    outputConfig = outputWriter.parseOutputArgs(sys.argv)
+    if len(sys.argv) < 2:
+        print("Program must have an argument: the javacore files (wildcards allowed) and optionally the javacores of another build\n")
+        sys.exit(-1)
+
+    groups = []
+    for groupName, pattern in zip(("A", "B"), sys.argv[1:3]):
+        fileNames = sorted(glob.glob(pattern))
+        print("Group {g}: {n} javacores matching {p}".format(g=groupName, n=len(fileNames), p=pattern))
+        runs = parseJavacores(fileNames) if fileNames else []
+        if not runs:
+            print("No javacores could be parsed for group", groupName)
+            sys.exit(-1)
+        groups.append((groupName, runs))
+
+    # Use a common class index for all groups so that the matrices can be compared row by row
+    classIndex = {}
+    matrices = [buildSharingMatrix(runs, classIndex) for groupName, runs in groups]
+    classKeys = list(classIndex)
+    matrices = [np.vstack((m, np.full((len(classKeys) - m.shape[0], m.shape[1]), notLoaded, dtype=np.int8))) for m in matrices]
+    loaderIndex = {}
+    loaderOfClass = np.fromiter((loaderIndex.setdefault(loaderName, len(loaderIndex)) for loaderName, className in classKeys), dtype=np.int64, count=len(classKeys))
+    loaderNames = list(loaderIndex)
+
+    ratios = [analyzeGroup(groupName, matrix, classKeys, loaderOfClass, loaderNames, outputConfig) for (groupName, runs), matrix in zip(groups, matrices)]
+    if len(groups) == 2:
+        compareGroups(matrices[0], matrices[1], ratios[0], ratios[1], classKeys, outputConfig)
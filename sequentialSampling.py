@@ -0,0 +1,65 @@
+# Sequential sampling for the run* scripts: instead of running a fixed number of
+# iterations, a runner feeds the result of every iteration to a SequentialSampler
+# and stops as soon as the 95% confidence interval of the mean is narrow enough.
+# The running mean and variance are updated incrementally (Welford's algorithm)
+# and the half-width of the CI95 is computed with the Student t distribution
+# (see benchStats.tDistributionValue95),
+# as a percentage of the mean (the same definition as `ci95` in computeStats()).
+# Stable configurations stop after `minRuns` iterations, while noisy ones keep
+# running until the target is reached or the maximum number of iterations is done.
+#
+# Usage (in a runner):
+#   sampler = sequentialSampling.SequentialSampler(targetCI95, minRuns)
+#   for iter in range(maxRuns):
+#       value = runBenchmarkOnce(...)
+#       sampler.add(value)
+#       if adaptiveRuns and sampler.isDone():
+#           break
+#
+# Author: Marius Pirvu
+
+import math
+from benchStats import tDistributionValue95
+
+
+class SequentialSampler:
+    '''
+    Keeps the running mean and variance of the results of a benchmark.
+    Failed runs (NaN results) are ignored.
+    '''
+    def __init__(self, targetCI95, minRuns):
+        self.targetCI95 = targetCI95 # half-width of the CI95 as a percentage of the mean
+        self.minRuns = max(minRuns, 2) # the variance needs at least 2 samples
+        self.numSamples = 0
+        self.mean = 0.0
+        self.m2 = 0.0 # sum of squared deviations from the mean
+
+    def add(self, value):
+        if math.isnan(value):
+            return
+        self.numSamples += 1
+        delta = value - self.mean
+        self.mean += delta / self.numSamples
+        self.m2 += delta * (value - self.mean)
+
+    def stdDev(self):
+        return math.sqrt(self.m2 / (self.numSamples - 1)) if self.numSamples > 1 else math.nan
+
+    '''
+    Half-width of the 95% confidence interval of the mean, as a percentage of the mean
+    '''
+    def ci95(self):
+        if self.numSamples < 2 or self.mean == 0:
+            return math.nan
+        marginOfError = tDistributionValue95(self.numSamples - 1) * self.stdDev() / math.sqrt(self.numSamples)
+        return 100.0 * marginOfError / abs(self.mean)
+
+    '''
+    Return True when enough samples have been collected to reach the target CI95
+    '''
+    def isDone(self):
+        return self.numSamples >= self.minRuns and self.ci95() <= self.targetCI95
+
+    def __str__(self):
+        return "numSamples={n:3d} Avg={avg:7.1f} CI95={ci95:5.2f}% (target {target:4.1f}%)".format(
+               n=self.numSamples, avg=self.mean, ci95=self.ci95(), target=self.targetCI95)
@@ -0,0 +1,190 @@
+# Python script that analyzes a /proc/<pid>/smaps file of a JVM, such as the
+# ones copied by collectSmaps() in the run* scripts, or a live /proc/<pid>/smaps.
+# The mappings are grouped by type (Java heap, JIT code cache, JIT scratch,
+# SCC, shared libraries, thread stacks, malloc arenas, ...) and for each group
+# the script prints Size, Rss, Pss, Private_Dirty and Swap in KB.
+# When two smaps files are given, the groups are shown side by side
+# together with the difference B-A.
+# The mapping types are inferred with the heuristics from classifyMappings():
+#  - anonymous mappings named by the JVM ([anon:name]) are grouped by name
+#  - anonymous executable mappings are the JIT code cache
+#  - 64 MB aligned anonymous regions (rw-p followed by ---p) are glibc malloc arenas
+#  - anonymous mappings preceded by a small ---p guard region are thread stacks
+#  - anonymous mappings below `lowMemoryLimit` hold the compressed-refs Java heap
+#    and class memory, unless the heap range is given in `javaHeapRange`
+# The parser only splits the lines it needs, so that it can be run on every
+# iteration of a benchmark (see summarizeSmaps()).
+#
+# Usage: python3 smapsFootprint.py smapsA [smapsB] [--format text|tsv|csv|jsonl|parquet] [--output prefix]
+#
+# Author: Marius Pirvu
+
+import os
+import sys # for accessing parameters and exit
+import outputWriter
+
+################## Configuration #####################
+javaHeapRange = None # (startAddr, endAddr) of the Java heap, e.g. from the 1STHEAPREGION lines of a javacore
+lowMemoryLimit = 0x800000000 # anonymous memory below 32 GB is considered compressed-refs Java heap/class memory
+arenaSize = 64 * 1024 * 1024 # size of glibc malloc arenas on 64-bit
+maxGuardSize = 64 * 1024 # ---p regions up to this size right before a mapping are thread stack guard pages
+sccPathMarkers = ("javasharedresources", ".classCache", "/C290M", "/C2902M") # paths that identify the SCC file
+#######################################################
+
+statColumns = ["sizeKB", "rssKB", "pssKB", "privateDirtyKB", "swapKB"]
+statFields = {"Size:": 0, "Rss:": 1, "Pss:": 2, "Private_Dirty:": 3, "Swap:": 4}
+
+
+'''
+Parse an smaps file. Returns a list of mappings [startAddr, endAddr, perms, path, stats]
+where stats is a list of KB values in the order given by `statColumns`
+'''
+def parseSmaps(smapsFile):
+    mappings = []
+    stats = None
+    for line in smapsFile:
+        fields = line.split(None, 5)
+        if not fields:
+            continue
+        key = fields[0]
+        index = statFields.get(key)
+        if index is not None:
+            stats[index] = int(fields[1])
+        elif key[-1] != ":": # other statistics like "VmFlags:" are not needed
+            # 7f2a4c000000-7f2a4c021000 rw-p 00000000 00:00 0    [anon:JIT scratch]
+            start, sep, end = key.partition("-")
+            if not sep or len(fields) < 5:
+                continue
+            stats = [0] * len(statColumns)
+            mappings.append([int(start, base=16), int(end, base=16), fields[1], fields[5].strip() if len(fields) > 5 else "", stats])
+    return mappings
+
+
+'''
+Return the name of the group of each mapping
+'''
+def classifyMappings(mappings):
+    groups = [None] * len(mappings)
+    for i, (start, end, perms, path, stats) in enumerate(mappings):
+        if groups[i] is not None: # already classified as part of a malloc arena
+            continue
+        if path.startswith("[anon:"):
+            name = path[6:-1]
+            group = "JIT scratch" if "scratch" in name.lower() else "anon:" + name
+        elif javaHeapRange and start >= javaHeapRange[0] and end <= javaHeapRange[1]:
+            group = "Java heap"
+        elif path == "[heap]":
+            group = "Malloc heap (brk)"
+        elif path == "[stack]":
+            group = "Main thread stack"
+        elif path in ("[vdso]", "[vvar]", "[vsyscall]"):
+            group = "Kernel"
+        elif path:
+            if any(marker in path for marker in sccPathMarkers):
+                group = "SCC mmap"
+            elif ".so" in os.path.basename(path):
+                group = "Libraries"
+            else:
+                group = "Mapped files"
+        elif "x" in perms:
+            group = "JIT code cache"
+        elif start % arenaSize == 0 and isMallocArena(mappings, i):
+            group = "Malloc arenas"
+            # The ---p remainder of the arena belongs to it as well
+            j = i + 1
+            while j < len(mappings) and mappings[j][0] == mappings[j - 1][1] and mappings[j][1] <= start + arenaSize and not mappings[j][3]:
+                groups[j] = group
+                j += 1
+        elif i > 0 and mappings[i - 1][2].startswith("---") and mappings[i - 1][1] == start and mappings[i - 1][1] - mappings[i - 1][0] <= maxGuardSize and not mappings[i - 1][3]:
+            group = "Thread stacks"
+            groups[i - 1] = group # the guard page
+        elif perms.startswith("---"):
+            group = "Reserved (no access)"
+        elif start < lowMemoryLimit:
+            group = "Java heap/low memory"
+        else:
+            group = "Other anonymous"
+        groups[i] = group
+    return groups
+
+
+'''
+A glibc malloc arena is a 64 MB aligned anonymous region made of a
+read-write part followed by an inaccessible part (or only the read-write part)
+'''
+def isMallocArena(mappings, i):
+    start = mappings[i][0]
+    end = mappings[i][1]
+    if end - start > arenaSize or not mappings[i][2].startswith("rw"):
+        return False
+    j = i + 1
+    while end < start + arenaSize and j < len(mappings) and mappings[j][0] == end and mappings[j][2].startswith("---") and not mappings[j][3]:
+        end = mappings[j][1]
+        j += 1
+    return end == start + arenaSize
+
+
+'''
+Read an smaps file and return a dictionary group --> [numMappings, sizeKB, rssKB, pssKB, privateDirtyKB, swapKB]
+'''
+def summarizeSmaps(smapsFileName):
+    with open(smapsFileName, 'r') as smapsFile:
+        mappings = parseSmaps(smapsFile)
+    summary = {}
+    for mapping, group in zip(mappings, classifyMappings(mappings)):
+        entry = summary.get(group)
+        if entry is None:
+            summary[group] = entry = [0] * (len(statColumns) + 1)
+        entry[0] += 1
+        for k, value in enumerate(mapping[4]):
+            entry[k + 1] += value
+    return summary
+
+
+'''
+Format the RSS (MB) of every group of mappings of a running process on a single line,
+largest first, e.g. for logging the footprint at the end of every benchmark iteration.
+Raises IOError if /proc/<pid>/smaps cannot be read
+'''
+def formatRssSummary(pid):
+    summary = summarizeSmaps(f"/proc/{pid}/smaps")
+    # summary: group --> [numMappings, sizeKB, rssKB, pssKB, privateDirtyKB, swapKB]
+    return "  ".join("{group}={rss:.1f}".format(group=group, rss=entry[2]/1024)
+                     for group, entry in sorted(summary.items(), key=lambda item: item[1][2], reverse=True))
+
+
+def printSmapsSummary(smapsFileNames, outputConfig):
+    summaries = [summarizeSmaps(fileName) for fileName in smapsFileNames]
+    labels = ["A", "B", "Delta"] if len(summaries) > 1 else [""]
+    for label, fileName in zip(labels, smapsFileNames):
+        print("smaps {l}: {f}".format(l=label, f=fileName) if len(summaries) > 1 else "smaps: " + fileName)
+
+    groups = {}
+    for summary in summaries:
+        for group, entry in summary.items():
+            groups[group] = max(groups.get(group, 0), entry[2]) # sort by the largest Rss
+    columns = ["group"] + [column + label for label in labels for column in ["numMappings"] + statColumns]
+    textFormat = "{:22s}" + "".join("\t{:6d}" + "\t{:9d}" * len(statColumns) for label in labels)
+    textHeader = "Group".ljust(22) + "".join("\t" + (column + label).rjust(6 if column == "Maps" else 9)
+                                             for label in labels for column in ["Maps", "Size", "Rss", "Pss", "PrivDirty", "Swap"])
+    totals = [[0] * (len(statColumns) + 1) for summary in summaries]
+    with outputConfig.openTable("smaps", columns, textFormat, "\n" + textHeader) as table:
+        for group in sorted(groups, key=groups.get, reverse=True):
+            entries = [summary.get(group, [0] * (len(statColumns) + 1)) for summary in summaries]
+            for total, entry in zip(totals, entries):
+                for k, value in enumerate(entry):
+                    total[k] += value
+            if len(entries) > 1:
+                entries.append([b - a for a, b in zip(entries[0], entries[-1])])
+            table.writeRow(group, *[value for entry in entries for value in entry])
+        if len(totals) > 1:
+            totals.append([b - a for a, b in zip(totals[0], totals[-1])])
+        table.writeRow("Total", *[value for total in totals for value in total])
+
+
+if __name__ == "__main__":
+    outputConfig = outputWriter.parseOutputArgs(sys.argv)
+    if len(sys.argv) < 2:
+        print("Program must have an argument: the name of the smaps file and optionally the name of a second smaps file to compare with\n")
+        sys.exit(-1)
+    printSmapsSummary(sys.argv[1:3], outputConfig)
@@ -0,0 +1,265 @@
+# Python script that parses an OpenJ9 verbose log and analyzes compilation failures.
+# Each failure is recorded as (time, method, opt level, reason, Q_SZ, compTime)
+# in compact column storage and then the script reports:
+# (1) failure counts and compilation time wasted per failure reason
+# (2) failure rates per reason over time (one row every `timeGranularity` ms)
+# (3) retry chains for methods that failed more than once
+# (4) bursts of failures with the same reason (e.g. many compilationAotClassReloFailure
+#     right after start-up)
+# Tables are buffered and written in blocks (see outputWriter.py).
+#
+# Usage: python3 vlogFailures.py vlogFilename [--format text|tsv|csv|jsonl|parquet] [--output prefix]
+#
+# Author: Marius Pirvu
+
+import re # for regular expressions
+import sys # for accessing parameters and exit
+from array import array
+import outputWriter
+
+################## Configuration #####################
+timeGranularity = 10000 # ms; failure rates are reported for intervals of this size
+maxReasonsInTimeline = 8 # Only the most frequent reasons get a column in the timeline
+minRetryChainLength = 2 # Print methods that failed at least this many times
+maxRetryChainsToPrint = 50
+burstWindow = 1000 # ms; sliding window used for burst detection
+burstThreshold = 50 # a burst is at least this many failures with the same reason inside `burstWindow`
+#######################################################
+
+
+'''
+Column oriented storage for compilation failures.
+Strings (method names, opt levels, failure reasons) are interned and
+only their integer index is stored for each failure.
+'''
+class FailureLog:
+    def __init__(self):
+        self.timeMs  = array('l') # time of failure in ms since JVM start
+        self.method  = array('l') # index into self.methodNames
+        self.level   = array('l') # index into self.levelNames
+        self.reason  = array('l') # index into self.reasonNames
+        self.qSZ     = array('l') # -1 if Q_SZ is not present
+        self.usec    = array('l') # time spent in the failed compilation
+        self.methodNames = []
+        self.levelNames  = []
+        self.reasonNames = []
+        self._methodIdx = {}
+        self._levelIdx  = {}
+        self._reasonIdx = {}
+
+    def __len__(self):
+        return len(self.timeMs)
+
+    @staticmethod
+    def _intern(name, indexHash, nameList):
+        idx = indexHash.get(name)
+        if idx is None:
+            idx = len(nameList)
+            indexHash[name] = idx
+            nameList.append(name)
+        return idx
+
+    def add(self, timeMs, methodName, optLevel, reason, qSZ, usec):
+        self.timeMs.append(timeMs)
+        self.method.append(self._intern(methodName, self._methodIdx, self.methodNames))
+        self.level.append(self._intern(optLevel, self._levelIdx, self.levelNames))
+        self.reason.append(self._intern(reason, self._reasonIdx, self.reasonNames))
+        self.qSZ.append(qSZ)
+        self.usec.append(usec)
+
+    def methodIndex(self, methodName):
+        return self._methodIdx.get(methodName)
+
+
+'''
+Parse the vlog and return a tuple (failureLog, successes, startupEndMs) where
+`successes` maps a method index from failureLog to the list of (timeMs, optLevel)
+successful compilations that happened after the first failure of that method.
+'''
+def parseFailures(vlog):
+    failureLog = FailureLog()
+    successes = {}
+    startupEndMs = -1
+    crtTimeMs = 0
+    # ! (cold) java/nio/Buffer.<init>(IIII)V Q_SZ=274 Q_SZI=274 QW=275 j9m=00000000000B3970 time=99us compilationAotClassReloFailure memLimit=206574 KB freePhysicalMemory=205 MB mem=[region=64 system=2048]KB compThreadID=0
+    compFailPattern = re.compile(r'^\! \((.+)\) (\S+) .*time=(\d+)us (\S+) ')
+    # ! sun/misc/Unsafe.ensureClassInitialized(Ljava/lang/Class;)V cannot be translated
+    uncompilablePattern = re.compile(r'^\! (\S+) cannot be translated')
+    # + (cold) sun/reflect/Reflection.getCallerClass()Ljava/lang/Class; @ 00007FB21300003C-00007FB213000167 OrdinaryMethod - Q_SZ=1 ...
+    compEndPattern = re.compile(r'^\+ \(([\S -]+)\) (\S+) ')
+    qszPattern = re.compile(r'Q_SZ=(\d+)')
+    timePattern = re.compile(r'\st=\s*(\d+)')
+    for line in vlog:
+        if line.startswith("!"):
+            m = compFailPattern.match(line)
+            if m:
+                match = qszPattern.search(line)
+                qSZ = int(match.group(1)) if match else -1
+                failureLog.add(crtTimeMs, m.group(2), m.group(1), m.group(4), qSZ, int(m.group(3)))
+            else:
+                m = uncompilablePattern.match(line)
+                if m:
+                    failureLog.add(crtTimeMs, m.group(1), "none", "uncompilable", -1, 0)
+            continue
+        if line.startswith("+"):
+            if failureLog.methodNames: # only track successes for methods that have failed before
+                m = compEndPattern.match(line)
+                if m:
+                    idx = failureLog.methodIndex(m.group(2))
+                    if idx is not None:
+                        successes.setdefault(idx, []).append((crtTimeMs, m.group(1)))
+            continue
+        match = timePattern.search(line)
+        if match:
+            crtTimeMs = int(match.group(1))
+            # #JITSTATE:  t=  6544 VM changed state to NOT_STARTUP
+            if startupEndMs < 0 and "VM changed state to NOT_STARTUP" in line:
+                startupEndMs = crtTimeMs
+    return failureLog, successes, startupEndMs
+
+
+def reportFailureReasons(failureLog, outputConfig):
+    numFailures = len(failureLog)
+    totalUsec = sum(failureLog.usec)
+    print("Compilation failures: {n}  Time wasted in failed compilations: {t:.1f} ms".format(n=numFailures, t=totalUsec/1000))
+    if numFailures == 0:
+        return
+    numReasons = len(failureLog.reasonNames)
+    countPerReason = [0] * numReasons
+    usecPerReason = [0] * numReasons
+    maxQSZPerReason = [0] * numReasons
+    for reason, usec, qSZ in zip(failureLog.reason, failureLog.usec, failureLog.qSZ):
+        countPerReason[reason] += 1
+        usecPerReason[reason] += usec
+        if qSZ > maxQSZPerReason[reason]:
+            maxQSZPerReason[reason] = qSZ
+    with outputConfig.openTable("failureReasons", ["reason", "count", "totalMs", "avgUsec", "maxQSZ"],
+                                textFormat="{:40s}\t{:7d}\t{:9.1f}\t{:9.0f}\t{:8d}",
+                                textHeader="\n{r:40s}\t  Count\tTOTAL(ms)\tAVG(usec)\tMAX Q_SZ".format(r="Failure reason")) as table:
+        for reason in sorted(range(numReasons), key=lambda r: usecPerReason[r], reverse=True):
+            table.writeRow(failureLog.reasonNames[reason], countPerReason[reason], usecPerReason[reason]/1000,
+                           usecPerReason[reason]/countPerReason[reason], maxQSZPerReason[reason])
+
+    numLevels = len(failureLog.levelNames)
+    countPerLevel = [0] * numLevels
+    usecPerLevel = [0] * numLevels
+    for level, usec in zip(failureLog.level, failureLog.usec):
+        countPerLevel[level] += 1
+        usecPerLevel[level] += usec
+    with outputConfig.openTable("failureLevels", ["optLevel", "count", "totalMs"], textFormat="{:20s}\t{:7d}\t{:9.1f}",
+                                textHeader="\n{l:20s}\t  Count\tTOTAL(ms)".format(l="Opt level")) as table:
+        for level in sorted(range(numLevels), key=lambda l: usecPerLevel[l], reverse=True):
+            table.writeRow(failureLog.levelNames[level], countPerLevel[level], usecPerLevel[level]/1000)
+
+
+def reportFailureTimeline(failureLog, outputConfig):
+    if len(failureLog) == 0:
+        return
+    numReasons = len(failureLog.reasonNames)
+    countPerReason = [0] * numReasons
+    for reason in failureLog.reason:
+        countPerReason[reason] += 1
+    topReasons = sorted(range(numReasons), key=lambda r: countPerReason[r], reverse=True)[:maxReasonsInTimeline]
+    column = {reason: col for col, reason in enumerate(topReasons)}
+    otherCol = len(topReasons)
+    # One row per time interval; the last column cumulates all the reasons that are not in topReasons
+    numIntervals = max(failureLog.timeMs) // timeGranularity + 1
+    rows = [[0] * (otherCol + 1) for i in range(numIntervals)]
+    for timeMs, reason in zip(failureLog.timeMs, failureLog.reason):
+        rows[timeMs // timeGranularity][column.get(reason, otherCol)] += 1
+    columnNames = [failureLog.reasonNames[reason] for reason in topReasons] + ["other"]
+    legend = " ".join("{col}={name}".format(col=col, name=name) for col, name in enumerate(columnNames))
+    textHeader = "\nFailures per {g} ms interval:\nColumns: {legend}\nTime(s)\t".format(g=timeGranularity, legend=legend) + \
+                 "\t".join("{col:5d}".format(col=col) for col in range(otherCol + 1))
+    with outputConfig.openTable("failureTimeline", ["timeSec"] + columnNames, textFormat="{:7d}" + "\t{:5d}" * len(columnNames),
+                                textHeader=textHeader) as table:
+        for i, row in enumerate(rows):
+            if any(row):
+                table.writeRow(i * timeGranularity // 1000, *row)
+
+
+def reportRetryChains(failureLog, successes, outputConfig):
+    chains = {} # method index --> list of (timeMs, text) for each attempt
+    for timeMs, method, level, reason in zip(failureLog.timeMs, failureLog.method, failureLog.level, failureLog.reason):
+        chains.setdefault(method, []).append((timeMs, "! ({l}) {r}".format(l=failureLog.levelNames[level], r=failureLog.reasonNames[reason])))
+    longChains = [method for method, chain in chains.items() if len(chain) >= minRetryChainLength]
+    if not longChains:
+        return
+    longChains.sort(key=lambda method: len(chains[method]), reverse=True)
+    numNeverCompiled = sum(1 for method in chains if method not in successes)
+    print("\nMethods with failures: {n}  Never compiled successfully after a failure: {nc}".format(n=len(chains), nc=numNeverCompiled))
+    with outputConfig.openTable("retryChains", ["numFailures", "method", "chain"], textFormat="{:4d} failures  {}\n\t{}",
+                                textHeader="Retry chains for methods with at least {n} failures:".format(n=minRetryChainLength)) as table:
+        for method in longChains[:maxRetryChainsToPrint]:
+            attempts = chains[method] + [(timeMs, "+ ({l})".format(l=level)) for timeMs, level in successes.get(method, [])]
+            attempts.sort(key=lambda a: a[0]) # stable sort keeps vlog order for equal timestamps
+            chain = " -> ".join("{t}ms {a}".format(t=timeMs, a=text) for timeMs, text in attempts)
+            table.writeRow(len(chains[method]), failureLog.methodNames[method], chain)
+    if len(longChains) > maxRetryChainsToPrint:
+        print("... {n} more methods".format(n=len(longChains) - maxRetryChainsToPrint))
+
+
+'''
+Find intervals where at least `burstThreshold` failures with the same reason
+happen within `burstWindow` ms. Overlapping windows are merged into one burst.
+'''
+def findBursts(failureLog):
+    timesPerReason = {}
+    for timeMs, reason in zip(failureLog.timeMs, failureLog.reason):
+        timesPerReason.setdefault(reason, []).append(timeMs)
+    bursts = [] # list of (reason, startMs, endMs, numFailures)
+    for reason, times in timesPerReason.items():
+        if len(times) < burstThreshold:
+            continue
+        times.sort()
+        burstStart = -1
+        burstEnd = -1
+        left = 0
+        for right in range(len(times)):
+            while times[right] - times[left] > burstWindow:
+                left += 1
+            if right - left + 1 >= burstThreshold:
+                if burstStart >= 0 and times[left] <= times[burstEnd]:
+                    burstEnd = right # extend current burst
+                else:
+                    if burstStart >= 0:
+                        bursts.append((reason, times[burstStart], times[burstEnd], burstEnd - burstStart + 1))
+                    burstStart = left
+                    burstEnd = right
+        if burstStart >= 0:
+            bursts.append((reason, times[burstStart], times[burstEnd], burstEnd - burstStart + 1))
+    bursts.sort(key=lambda b: b[1])
+    return bursts
+
+
+def reportBursts(failureLog, startupEndMs, outputConfig):
+    bursts = findBursts(failureLog)
+    if not bursts:
+        return
+    textHeader = "\nFailure bursts (at least {n} failures within {w} ms):\n".format(n=burstThreshold, w=burstWindow) + \
+                 "{r:40s}\tStart(ms)\t  End(ms)\t  Count\tPhase".format(r="Failure reason")
+    with outputConfig.openTable("failureBursts", ["reason", "startMs", "endMs", "count", "phase"],
+                                textFormat="{:40s}\t{:9d}\t{:9d}\t{:7d}\t{}", textHeader=textHeader) as table:
+        for reason, startMs, endMs, numFailures in bursts:
+            phase = "startup" if startupEndMs < 0 or startMs < startupEndMs else "after startup"
+            table.writeRow(failureLog.reasonNames[reason], startMs, endMs, numFailures, phase)
+
+
+def analyzeFailures(vlog, outputConfig):
+    failureLog, successes, startupEndMs = parseFailures(vlog)
+    reportFailureReasons(failureLog, outputConfig)
+    reportFailureTimeline(failureLog, outputConfig)
+    reportRetryChains(failureLog, successes, outputConfig)
+    reportBursts(failureLog, startupEndMs, outputConfig)
+
+
+if __name__ == "__main__":
+    outputConfig = outputWriter.parseOutputArgs(sys.argv)
+    # Get the name of vlog
+    if  len(sys.argv) < 2:
+        print ("Program must have an argument: the name of the vlog\n")
+        sys.exit(-1)
+
+    vlogFileName = str(sys.argv[1])
+    with open(vlogFileName, 'r') as Vlog:
+        analyzeFailures(Vlog, outputConfig)